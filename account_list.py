@@ -0,0 +1,396 @@
+"""
+暴雪战网账号切换器 - 账号列表
+基于QAbstractListModel的账号列表：委托直接绘制账号卡片（不为每个账号创建控件、阴影和样式表），
+列表只绘制可见的行；刷新时按账号ID比较新旧数据，只插入/更新/删除变化的行
+"""
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QMenu, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QEvent, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QFont, QFontMetrics, QPen
+
+
+# 行数据（dict）所在的角色
+ACCOUNT_ROLE = Qt.UserRole + 1
+
+CARD_HEIGHT = 120
+CARD_SPACING = 15
+# 卡片右侧留给滚动条的空白
+CARD_RIGHT_MARGIN = 10
+
+# 卡片右侧的按钮：(名称, 文字, 高度)
+BUTTONS = (("switch", "切换", 32), ("rename", "重命名", 28), ("delete", "删除", 28))
+BUTTON_WIDTH = 70
+BUTTON_SPACING = 5
+
+
+def mask_email(email: str) -> str:
+    """隐藏邮箱/手机号中间部分"""
+    if not email:
+        return ""
+    if '@' in email:
+        # 邮箱格式
+        parts = email.split('@')
+        name = parts[0]
+        if len(name) > 2:
+            masked = name[0] + '*' * (len(name) - 2) + name[-1]
+        else:
+            masked = name[0] + '*'
+        return masked + '@' + parts[1]
+    else:
+        # 手机号格式
+        if len(email) > 4:
+            return email[:3] + '*' * (len(email) - 6) + email[-3:]
+        return email
+
+
+class AccountListModel(QAbstractListModel):
+    """
+    账号列表模型，每行是一个dict：
+    {"id", "nickname", "status", "email", "last_login", "version", "hot"}
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        # 账号ID -> 行号
+        self._positions = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        row = self._rows[index.row()]
+        if role == ACCOUNT_ROLE:
+            return row
+        if role == Qt.DisplayRole:
+            return row["nickname"]
+        if role == Qt.ToolTipRole and row.get("hot"):
+            return "数据已提前准备好，切换时无需复制"
+        return None
+
+    def account_id(self, index) -> str:
+        row = self.data(index, ACCOUNT_ROLE)
+        return row["id"] if row else None
+
+    def _reindex(self):
+        self._positions = {row["id"]: i for i, row in enumerate(self._rows)}
+
+    def _update_row(self, position: int, row: dict) -> bool:
+        if self._rows[position] == row:
+            return False
+        self._rows[position] = row
+        index = self.index(position)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def set_accounts(self, rows: list) -> dict:
+        """
+        用新的完整列表替换模型数据，只对变化的行发出插入/更新/删除信号
+        （顺序变化时整体重置）
+
+        Returns:
+            dict: {"inserted", "updated", "removed", "reset"}
+        """
+        stats = {"inserted": 0, "updated": 0, "removed": 0, "reset": False}
+        new_ids = [row["id"] for row in rows]
+        wanted = set(new_ids)
+
+        for position in range(len(self._rows) - 1, -1, -1):
+            if self._rows[position]["id"] not in wanted:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self._rows[position]
+                self.endRemoveRows()
+                stats["removed"] += 1
+
+        # 剩下的行必须保持原来的相对顺序，否则逐行插入无法得到新顺序
+        kept = [row["id"] for row in self._rows]
+        kept_set = set(kept)
+        if kept != [account_id for account_id in new_ids if account_id in kept_set]:
+            self.beginResetModel()
+            self._rows = list(rows)
+            self.endResetModel()
+            self._reindex()
+            stats["reset"] = True
+            return stats
+
+        for position, row in enumerate(rows):
+            if position < len(self._rows) and self._rows[position]["id"] == row["id"]:
+                stats["updated"] += self._update_row(position, row)
+            else:
+                self.beginInsertRows(QModelIndex(), position, position)
+                self._rows.insert(position, row)
+                self.endInsertRows()
+                stats["inserted"] += 1
+        self._reindex()
+        return stats
+
+    def update_accounts(self, rows: list):
+        """更新指定账号的行（不存在的追加到末尾）"""
+        for row in rows:
+            position = self._positions.get(row["id"])
+            if position is not None:
+                self._update_row(position, row)
+            else:
+                position = len(self._rows)
+                self.beginInsertRows(QModelIndex(), position, position)
+                self._rows.append(row)
+                self.endInsertRows()
+                self._positions[row["id"]] = position
+
+    def hot_flags(self) -> dict:
+        """账号ID -> 行中的热账号标记"""
+        return {row["id"]: bool(row.get("hot")) for row in self._rows}
+
+    def remove_account(self, account_id: str):
+        position = self._positions.get(account_id)
+        if position is None:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self._rows[position]
+        self.endRemoveRows()
+        self._reindex()
+
+
+class AccountDelegate(QStyledItemDelegate):
+    """绘制账号卡片，处理卡片上按钮的点击"""
+    button_clicked = pyqtSignal(str, str)
+
+    def __init__(self, colors: dict, parent=None):
+        super().__init__(parent)
+        self.colors = {name: QColor(value) for name, value in colors.items()}
+        self.global_color = QColor("#9333ea")
+        # 字体和字体度量只创建一次
+        self.avatar_font = self._font(24, bold=True)
+        self.name_font = self._font(16, bold=True)
+        self.email_font = self._font(12)
+        self.time_font = self._font(11)
+        self.tag_font = self._font(10)
+        self.switch_font = self._font(12, bold=True)
+        self.button_font = self._font(11)
+        self.tag_metrics = QFontMetrics(self.tag_font)
+        self.text_lines = ((self.name_font, QFontMetrics(self.name_font), 'text', 22),
+                           (self.email_font, QFontMetrics(self.email_font), 'text_light', 18),
+                           (self.time_font, QFontMetrics(self.time_font), 'text_light', 16))
+        # 鼠标所在的 (行, 按钮名)
+        self.hover = (None, None)
+
+    @staticmethod
+    def _font(pixel_size: int, bold: bool = False) -> QFont:
+        font = QFont("微软雅黑")
+        font.setPixelSize(pixel_size)
+        font.setBold(bold)
+        return font
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), CARD_HEIGHT + CARD_SPACING)
+
+    @staticmethod
+    def card_rect(option_rect: QRect) -> QRect:
+        return option_rect.adjusted(0, 0, -CARD_RIGHT_MARGIN, -CARD_SPACING)
+
+    def button_rects(self, card: QRect) -> dict:
+        total = sum(height for _, _, height in BUTTONS) + BUTTON_SPACING * (len(BUTTONS) - 1)
+        x = card.right() - 20 - BUTTON_WIDTH
+        y = card.top() + (card.height() - total) // 2
+        rects = {}
+        for name, _, height in BUTTONS:
+            rects[name] = QRect(x, y, BUTTON_WIDTH, height)
+            y += height + BUTTON_SPACING
+        return rects
+
+    def _tag(self, painter, x_right: int, y: int, text: str, color: QColor) -> int:
+        """在右边界x_right处画一个标签，返回标签高度"""
+        width = self.tag_metrics.horizontalAdvance(text) + 16
+        rect = QRect(x_right - width, y, width, 22)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(color)
+        painter.drawRoundedRect(rect, 8, 8)
+        painter.setPen(self.colors['white'])
+        painter.setFont(self.tag_font)
+        painter.drawText(rect, Qt.AlignCenter, text)
+        return rect.height()
+
+    def paint(self, painter, option, index):
+        row = index.data(ACCOUNT_ROLE)
+        if not row:
+            return
+        colors = self.colors
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        card = self.card_rect(option.rect)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        # 卡片（下方偏移的浅色圆角矩形代替阴影效果）
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 18))
+        painter.drawRoundedRect(card.translated(0, 2), 12, 12)
+        painter.setBrush(colors['card_hover'] if hovered else colors['card'])
+        painter.drawRoundedRect(card, 12, 12)
+
+        # 头像
+        avatar = QRect(card.left() + 20, card.center().y() - 30, 60, 60)
+        painter.setBrush(colors['primary'])
+        painter.drawEllipse(avatar)
+        painter.setPen(colors['white'])
+        painter.setFont(self.avatar_font)
+        nickname = row["nickname"]
+        painter.drawText(avatar, Qt.AlignCenter, nickname[0].upper() if nickname else "?")
+
+        # 按钮
+        buttons = self.button_rects(card)
+        hover_row, hover_button = self.hover
+        for name, text, _ in BUTTONS:
+            rect = buttons[name]
+            over = hover_row == index.row() and hover_button == name
+            if name == "switch":
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(colors['primary_dark'] if over else colors['primary'])
+                text_color = colors['white']
+                painter.setFont(self.switch_font)
+            elif name == "delete":
+                painter.setPen(QPen(colors['danger'], 1))
+                painter.setBrush(colors['danger'] if over else Qt.NoBrush)
+                text_color = colors['white'] if over else colors['danger']
+                painter.setFont(self.button_font)
+            else:
+                painter.setPen(QPen(colors['border'], 1))
+                painter.setBrush(colors['border'] if over else Qt.NoBrush)
+                text_color = colors['text'] if over else colors['text_light']
+                painter.setFont(self.button_font)
+            painter.drawRoundedRect(rect, 6, 6)
+            painter.setPen(text_color)
+            painter.drawText(rect, Qt.AlignCenter, text)
+
+        # 标签（版本、登录状态、预取）
+        tags_right = buttons["switch"].left() - 15
+        tags = [(row["version"], self.global_color if row["version"] == "国际服" else colors['primary']),
+                ("已登录" if row["status"] else "未登录", colors['success'] if row["status"] else colors['warning'])]
+        if row.get("hot"):
+            tags.append(("⚡ 秒切", colors['secondary']))
+        tags_height = len(tags) * 22 + (len(tags) - 1) * 4
+        y = card.center().y() - tags_height // 2
+        tags_left = tags_right
+        for text, color in tags:
+            tags_left = min(tags_left, tags_right - self.tag_metrics.horizontalAdvance(text) - 16)
+            y += self._tag(painter, tags_right, y, text, color) + 4
+
+        # 文字
+        text_left = avatar.right() + 15
+        text_width = max(tags_left - 15 - text_left, 10)
+        texts = (nickname, row["email"] or "未知邮箱", f"最后登录: {row['last_login']}" if row["last_login"] else "")
+        y = card.center().y() - sum(line[3] for line in self.text_lines) // 2 - 4
+        for (font, metrics, color, height), text in zip(self.text_lines, texts):
+            painter.setFont(font)
+            painter.setPen(colors[color])
+            elided = metrics.elidedText(text, Qt.ElideRight, text_width)
+            painter.drawText(QRect(text_left, y, text_width, height), Qt.AlignLeft | Qt.AlignVCenter, elided)
+            y += height + 4
+        painter.restore()
+
+    def button_at(self, option_rect: QRect, pos) -> str:
+        for name, rect in self.button_rects(self.card_rect(option_rect)).items():
+            if rect.contains(pos):
+                return name
+        return None
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseMove:
+            hover = (index.row(), self.button_at(option.rect, event.pos()))
+            if hover != self.hover:
+                self.hover = hover
+                if self.parent():
+                    self.parent().viewport().update()
+            return False
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            name = self.button_at(option.rect, event.pos())
+            if name:
+                self.button_clicked.emit(name, model.account_id(index))
+                return True
+        if event.type() == QEvent.MouseButtonDblClick and event.button() == Qt.LeftButton:
+            # 双击卡片切换账号
+            self.button_clicked.emit("switch", model.account_id(index))
+            return True
+        return False
+
+
+class AccountListView(QListView):
+    """账号列表，信号与原来的账号卡片一致"""
+    switch_clicked = pyqtSignal(str)
+    delete_clicked = pyqtSignal(str)
+    rename_clicked = pyqtSignal(str)
+    toggle_version_clicked = pyqtSignal(str)
+    update_clicked = pyqtSignal(str)
+
+    def __init__(self, colors: dict, parent=None):
+        super().__init__(parent)
+        self.colors = colors
+        self.account_model = AccountListModel(self)
+        self.delegate = AccountDelegate(colors, self)
+        self.setModel(self.account_model)
+        self.setItemDelegate(self.delegate)
+        # 所有行等高，滚动时只需计算和绘制可见行
+        self.setUniformItemSizes(True)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setMouseTracking(True)
+        self.viewport().setCursor(Qt.PointingHandCursor)
+        self.setStyleSheet("QListView { border: none; background-color: transparent; }")
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        self.delegate.button_clicked.connect(self.on_button_clicked)
+
+    def on_button_clicked(self, name, account_id):
+        if not account_id:
+            return
+        signal = {"switch": self.switch_clicked, "rename": self.rename_clicked,
+                  "delete": self.delete_clicked}.get(name)
+        if signal:
+            signal.emit(account_id)
+
+    def leaveEvent(self, event):
+        self.delegate.hover = (None, None)
+        self.viewport().update()
+        super().leaveEvent(event)
+
+    def show_context_menu(self, pos):
+        """显示右键菜单"""
+        account_id = self.account_model.account_id(self.indexAt(pos))
+        if not account_id:
+            return
+        menu = QMenu(self)
+        menu.setStyleSheet(f"""
+            QMenu {{
+                background-color: white;
+                border: 1px solid {self.colors['border']};
+                border-radius: 8px;
+                padding: 5px;
+            }}
+            QMenu::item {{
+                padding: 8px 20px;
+                border-radius: 4px;
+            }}
+            QMenu::item:selected {{
+                background-color: {self.colors['bg']};
+            }}
+        """)
+
+        switch_action = menu.addAction("🔄 切换")
+        update_action = menu.addAction("💾 更新账号数据")
+        rename_action = menu.addAction("✏️ 重命名")
+
+        menu.addSeparator()
+        delete_action = menu.addAction("🗑️ 删除")
+
+        action = menu.exec_(self.viewport().mapToGlobal(pos))
+
+        if action == switch_action:
+            self.switch_clicked.emit(account_id)
+        elif action == update_action:
+            self.update_clicked.emit(account_id)
+        elif action == rename_action:
+            self.rename_clicked.emit(account_id)
+        elif action == delete_action:
+            self.delete_clicked.emit(account_id)
@@ -1,12 +1,11 @@
 """
 暴雪战网账号管理工具 - 账号管理模块
 """
-import os
-import json
 import uuid
 from datetime import datetime
 from config import ACCOUNTS_FILE, ensure_dirs
 from cookie_handler import CookieHandler
+from account_store import AccountStore
 
 
 class AccountManager:
@@ -15,28 +14,12 @@ class AccountManager:
     def __init__(self):
         ensure_dirs()
         self.cookie_handler = CookieHandler()
-        self.accounts = self._load_accounts()
-    
-    def _load_accounts(self) -> dict:
-        """加载账号列表"""
-        try:
-            if os.path.exists(ACCOUNTS_FILE):
-                with open(ACCOUNTS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            print(f"加载账号列表失败: {e}")
-            return {}
+        self.store = AccountStore(ACCOUNTS_FILE)
+        self.accounts = self.store.accounts
     
     def _save_accounts(self) -> bool:
         """保存账号列表"""
-        try:
-            with open(ACCOUNTS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.accounts, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"保存账号列表失败: {e}")
-            return False
+        return self.store.save()
     
     def add_account(self, nickname: str, note: str = "") -> str:
         """
@@ -118,11 +101,13 @@ class AccountManager:
     def get_all_accounts(self) -> list:
         """获取所有账号列表"""
         accounts = []
-        for account_id, account_data in self.accounts.items():
-            account = account_data.copy()
-            account["id"] = account_id
-            account["cookie_info"] = self.cookie_handler.get_cookie_info(account_id)
-            accounts.append(account)
+        # cookie摘要来自元数据缓存，只stat文件；有变化的文件更新后索引最后写入一次
+        with self.cookie_handler.metadata.batch():
+            for account_id, account_data in self.accounts.items():
+                account = account_data.copy()
+                account["id"] = account_id
+                account["cookie_info"] = self.cookie_handler.get_cookie_info(account_id)
+                accounts.append(account)
         return accounts
     
     def has_valid_cookies(self, account_id: str) -> bool:
@@ -0,0 +1,193 @@
+"""
+暴雪战网账号管理工具 - 账号数据存储
+accounts.json / isolated_accounts.json 等账号文件的统一读写层：
+- 启动时只加载一次，内存中按ID和邮箱建立索引
+- 保存时只把有变化的账号追加到日志文件（.journal），I/O量与账号总数无关
+- 日志超过阈值时压缩：写临时文件 + fsync + 原子替换，崩溃不会截断文件
+- 日志第一行记录它所基于的主文件的哈希，压缩后崩溃留下的旧日志不会重放到新的主文件上
+- batch() 内的多次修改合并为一次写入
+"""
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """原子写入：临时文件 + fsync + 重命名"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def atomic_write_json(path: str, data, **dump_kwargs):
+    """原子写入JSON：临时文件 + fsync + 重命名"""
+    atomic_write_bytes(path, json.dumps(data, **dump_kwargs).encode('utf-8'))
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class AccountStore:
+    """账号数据存储（账号ID -> 账号信息字典）"""
+
+    def __init__(self, path: str, compact_threshold: int = 64):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending = False
+        self._journal_records = 0
+        # 主文件内容的哈希（日志第一行记录它，用来判断日志是否属于当前的主文件）
+        self._base = None
+        self._email_index = {}
+        self.accounts = {}
+        self._saved = {}
+        self._load()
+
+    # ---------- 加载 ----------
+
+    def _load(self):
+        accounts = {}
+        self._base = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    content = f.read()
+                self._base = _content_hash(content)
+                accounts = json.loads(content.decode('utf-8'))
+            except Exception as e:
+                print(f"加载账号文件失败: {self.path}, 错误: {e}")
+        # 重放日志；最后一行不完整（写入中途崩溃）时截掉，避免之后追加的记录接在残行后面
+        if os.path.exists(self.journal_path):
+            good = 0
+            stale = False
+            with open(self.journal_path, 'rb+') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError
+                        record = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        f.truncate(good)
+                        break
+                    good += len(line)
+                    if "base" in record:
+                        # 日志头：基于的主文件不是当前的主文件，说明压缩写入主文件后、删除日志前崩溃了，
+                        # 日志中的修改都已包含在主文件中
+                        if self._base is not None and record["base"] != self._base:
+                            stale = True
+                            break
+                        continue
+                    if record.get("deleted"):
+                        accounts.pop(record["id"], None)
+                    else:
+                        accounts[record["id"]] = record["data"]
+                    self._journal_records += 1
+            if stale:
+                os.remove(self.journal_path)
+        self.accounts.clear()
+        self.accounts.update(accounts)
+        self._saved = {acc_id: self._dump(data) for acc_id, data in self.accounts.items()}
+        self._rebuild_email_index()
+
+    @staticmethod
+    def _dump(data) -> str:
+        return json.dumps(data, ensure_ascii=False, sort_keys=True)
+
+    # ---------- 索引 ----------
+
+    def _rebuild_email_index(self):
+        self._email_index = {}
+        for acc_id, info in self.accounts.items():
+            email = info.get("email") if isinstance(info, dict) else None
+            if email and email not in self._email_index:
+                self._email_index[email] = acc_id
+
+    def get(self, account_id: str) -> dict:
+        return self.accounts.get(account_id)
+
+    def find_by_email(self, email: str) -> str:
+        """按邮箱查找账号ID，找不到返回None"""
+        if not email:
+            return None
+        acc_id = self._email_index.get(email)
+        if acc_id is not None and self.accounts.get(acc_id, {}).get("email") == email:
+            return acc_id
+        # 调用方可能直接修改了accounts，索引过期时重建一次
+        self._rebuild_email_index()
+        return self._email_index.get(email)
+
+    # ---------- 保存 ----------
+
+    @contextmanager
+    def batch(self):
+        """合并多次修改为一次写入"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._pending:
+                    self.flush()
+
+    def save(self) -> bool:
+        """保存修改；在batch()内时延迟到batch结束"""
+        with self._lock:
+            if self._batch_depth:
+                self._pending = True
+                return True
+            return self.flush()
+
+    def flush(self) -> bool:
+        """把有变化的账号写入日志，必要时压缩为完整文件"""
+        with self._lock:
+            self._pending = False
+            try:
+                current = {acc_id: self._dump(data) for acc_id, data in self.accounts.items()}
+                records = []
+                for acc_id, text in current.items():
+                    if self._saved.get(acc_id) != text:
+                        records.append(json.dumps({"id": acc_id, "data": self.accounts[acc_id]}, ensure_ascii=False))
+                for acc_id in self._saved:
+                    if acc_id not in current:
+                        records.append(json.dumps({"id": acc_id, "deleted": True}, ensure_ascii=False))
+                if not records and os.path.exists(self.path):
+                    return True
+
+                if (not os.path.exists(self.path)
+                        or self._journal_records + len(records) > max(self.compact_threshold, len(current))):
+                    self.compact()
+                else:
+                    with open(self.journal_path, 'a', encoding='utf-8') as f:
+                        header = [json.dumps({"base": self._base})] if f.tell() == 0 else []
+                        f.write('\n'.join(header + records) + '\n')
+                        f.flush()
+                        os.fsync(f.fileno())
+                    self._journal_records += len(records)
+                self._saved = current
+                self._rebuild_email_index()
+                return True
+            except Exception as e:
+                print(f"保存账号文件失败: {self.path}, 错误: {e}")
+                return False
+
+    def compact(self):
+        """把当前数据原子写入主文件并清空日志"""
+        with self._lock:
+            content = json.dumps(self.accounts, ensure_ascii=False, indent=2).encode('utf-8')
+            atomic_write_bytes(self.path, content)
+            # 在这里崩溃时旧日志还在，但它的日志头与新主文件的哈希不同，加载时会被丢弃
+            self._base = _content_hash(content)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_records = 0
@@ -1,74 +1,57 @@
 """分析战网客户端的账号数据存储"""
-import sqlite3
 import os
-import json
+from db_inspect import get_inspector, KIND_TABLES
 
 ACCOUNT_DIR = os.path.join(os.environ['LOCALAPPDATA'], 'Battle.net', 'Account')
 
+def account_db_path(account_id):
+    return os.path.join(ACCOUNT_DIR, str(account_id), 'account.db')
+
+def print_result(result):
+    """打印单个账号数据库的检查结果"""
+    if 'error' in result:
+        print(f"    数据库错误: {result['error']}")
+        return
+    tables = result['tables']
+    print(f"    找到 {len(tables)} 个表: {list(tables)}（{result['method']}，{result['seconds'] * 1000:.1f} ms）")
+    for table, info in tables.items():
+        if 'error' in info:
+            print(f"    表 {table} 读取错误: {info['error']}")
+            continue
+        print(f"    表 {table}: 列={info['columns']} 行数={info['rows']}")
+        for row in info['sample_rows']:
+            print(f"      {row}")
+
 def analyze_account_db(account_id):
-    """分析单个账号的数据库"""
-    db_path = os.path.join(ACCOUNT_DIR, str(account_id), 'account.db')
+    """分析单个账号的数据库（只读打开，客户端运行时也不影响它的数据库）"""
+    db_path = account_db_path(account_id)
     if not os.path.exists(db_path):
         return None
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # 获取所有表
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [r[0] for r in cursor.fetchall()]
-        print(f"    找到 {len(tables)} 个表: {tables}")
-        
-        result = {'account_id': account_id, 'tables': {}}
-        
-        for table in tables:
-            try:
-                cursor.execute(f"SELECT * FROM [{table}] LIMIT 5")
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                result['tables'][table] = {
-                    'columns': columns,
-                    'sample_rows': rows[:2]
-                }
-                print(f"    表 {table}: 列={columns}")
-                for row in rows[:2]:
-                    print(f"      {row}")
-            except Exception as te:
-                print(f"    表 {table} 读取错误: {te}")
-        
-        conn.close()
-        return result
-    except Exception as e:
-        print(f"    数据库错误: {e}")
-        return {'error': str(e)}
+    result = get_inspector().inspect(db_path)
+    print_result(result)
+    return result
 
 def main():
     # 获取最近使用的账号
     accounts = []
     for folder in os.listdir(ACCOUNT_DIR):
-        folder_path = os.path.join(ACCOUNT_DIR, folder)
-        if os.path.isdir(folder_path):
-            db_path = os.path.join(folder_path, 'account.db')
-            if os.path.exists(db_path):
-                mtime = os.path.getmtime(db_path)
-                accounts.append((folder, mtime))
-    
+        db_path = account_db_path(folder)
+        if os.path.exists(db_path):
+            mtime = os.path.getmtime(db_path)
+            accounts.append((folder, mtime))
+
     # 按修改时间排序
     accounts.sort(key=lambda x: x[1], reverse=True)
-    
-    print(f"找到 {len(accounts)} 个账号数据库")
+
+    # 所有账号的数据库并行检查
+    results = get_inspector().inspect_many([(account_db_path(a), KIND_TABLES) for a, _ in accounts])
+    errors = sum(1 for r in results if 'error' in r)
+    print(f"找到 {len(accounts)} 个账号数据库（{errors} 个读取失败）")
     print("\n最近使用的3个账号:")
-    
-    for account_id, mtime in accounts[:3]:
+
+    for (account_id, mtime), result in zip(accounts[:3], results):
         print(f"\n=== 账号ID: {account_id} ===")
-        result = analyze_account_db(account_id)
-        if result and 'tables' in result:
-            for table, info in result['tables'].items():
-                print(f"  表: {table}")
-                print(f"    列: {info['columns']}")
-                if info['sample_rows']:
-                    print(f"    示例数据: {info['sample_rows'][0][:3]}...")
+        print_result(result)
 
 if __name__ == '__main__':
     main()
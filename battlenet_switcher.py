@@ -4,74 +4,58 @@
 """
 import os
 import shutil
-import json
 import subprocess
-import time
-import psutil
 from datetime import datetime
-from config import DATA_DIR, ensure_dirs
+from environment import SwitcherEnvironment
+from copy_engine import get_engine
+from account_store import AccountStore
+from snapshot_store import walk_tree
+from snapshot_rules import RuleBook
 
 
 class BattleNetSwitcher:
     """战网账号切换器"""
     
-    # 战网相关路径
-    BATTLENET_EXE = r"C:\Program Files (x86)\Battle.net\Battle.net Launcher.exe"
-    # 需要备份的目录
-    BATTLENET_LOCAL = os.path.join(os.environ['LOCALAPPDATA'], 'Battle.net')
-    BATTLENET_ROAMING = os.path.join(os.environ['APPDATA'], 'Battle.net')
-    BROWSER_CACHES_PATH = os.path.join(os.environ['LOCALAPPDATA'], 'Battle.net', 'BrowserCaches')
-    ACCOUNT_DATA_PATH = os.path.join(os.environ['LOCALAPPDATA'], 'Battle.net', 'Account')
-    
-    def __init__(self):
-        ensure_dirs()
-        self.backups_dir = os.path.join(DATA_DIR, "battlenet_backups")
-        self.accounts_file = os.path.join(DATA_DIR, "switcher_accounts.json")
+    def __init__(self, env: SwitcherEnvironment = None):
+        # 运行环境（战网路径、存储目录、进程访问），默认使用本机环境
+        self.env = env or SwitcherEnvironment()
+        # 战网相关路径
+        self.BATTLENET_EXE = self.env.battlenet_exe
+        # 需要备份的目录
+        self.BATTLENET_LOCAL = self.env.local_root
+        self.BATTLENET_ROAMING = self.env.roaming_root
+        self.BROWSER_CACHES_PATH = os.path.join(self.BATTLENET_LOCAL, 'BrowserCaches')
+        self.ACCOUNT_DATA_PATH = os.path.join(self.BATTLENET_LOCAL, 'Account')
+        self.backups_dir = self.env.storage_path("battlenet_backups")
+        self.accounts_file = self.env.storage_path("switcher_accounts.json")
         os.makedirs(self.backups_dir, exist_ok=True)
-        self.accounts = self._load_accounts()
-    
-    def _load_accounts(self) -> dict:
-        """加载账号配置"""
-        if os.path.exists(self.accounts_file):
-            with open(self.accounts_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        self.processes = self.env.processes
+        # 备份/恢复使用的复制引擎，以及最近一次复制的分阶段统计
+        self.engine = get_engine()
+        self.last_copy_stats = None
+        # 备份时跳过缓存和垃圾文件，恢复时保留当前目录中的这些文件
+        self.rules = RuleBook(self.env.storage_path("snapshot_rules.json")).for_profile()
+        self.account_store = AccountStore(self.accounts_file)
+        self.accounts = self.account_store.accounts
     
     def _save_accounts(self):
         """保存账号配置"""
-        with open(self.accounts_file, 'w', encoding='utf-8') as f:
-            json.dump(self.accounts, f, ensure_ascii=False, indent=2)
+        self.account_store.save()
     
     def is_battlenet_running(self) -> bool:
         """检查战网客户端是否在运行"""
-        for proc in psutil.process_iter(['name']):
-            try:
-                if proc.info['name'] and 'battle.net' in proc.info['name'].lower():
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        return False
+        return self.processes.is_running()
     
     def close_battlenet(self) -> bool:
-        """关闭战网客户端"""
-        closed = False
-        for proc in psutil.process_iter(['name', 'pid']):
-            try:
-                if proc.info['name'] and 'battle.net' in proc.info['name'].lower():
-                    proc.terminate()
-                    closed = True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        if closed:
-            time.sleep(2)  # 等待进程完全退出
-        return closed
+        """关闭战网客户端（等待进程完全退出）"""
+        return self.processes.stop(timeout=10)
     
     def start_battlenet(self) -> bool:
         """启动战网客户端"""
         if os.path.exists(self.BATTLENET_EXE):
             try:
                 subprocess.Popen([self.BATTLENET_EXE])
+                self.processes.invalidate()
                 return True
             except Exception as e:
                 print(f"启动战网失败: {e}")
@@ -95,6 +79,24 @@ class BattleNetSwitcher:
         
         return latest_account
     
+    @staticmethod
+    def _check_copy_errors(copy_stats: dict):
+        """有文件复制失败时抛出异常（与shutil.copytree一致）"""
+        failed = sum(stats["errors"] for stats in copy_stats.values())
+        if failed:
+            raise OSError(f"{failed} 个文件复制失败")
+    
+    def _clear_tree(self, root: str, name: str):
+        """删除目录中快照规则会保存的文件（缓存和垃圾文件保留），再删除空目录"""
+        files, dirs = walk_tree(root, skip=self.rules.skipper(name))
+        for rel in files:
+            os.remove(os.path.join(root, *rel.split('/')))
+        for rel in sorted(dirs, key=lambda d: d.count('/'), reverse=True):
+            try:
+                os.rmdir(os.path.join(root, *rel.split('/')))
+            except OSError:
+                pass
+    
     def backup_current_state(self, account_id: str, nickname: str) -> bool:
         """
         备份当前登录状态（备份整个Battle.net本地数据）
@@ -121,14 +123,16 @@ class BattleNetSwitcher:
                 shutil.rmtree(backup_path)
             os.makedirs(backup_path)
             
-            # 复制LocalAppData\Battle.net（排除Logs目录减少大小）
-            def ignore_logs(dir, files):
-                return ['Logs'] if 'Logs' in files else []
-            shutil.copytree(self.BATTLENET_LOCAL, backup_local, ignore=ignore_logs)
+            # 复制LocalAppData\Battle.net（按快照规则跳过缓存、日志等）
+            copy_stats = {"LocalAppData": self.engine.copy_tree(self.BATTLENET_LOCAL, backup_local,
+                                                                skip=self.rules.skipper("LocalAppData"))}
             
             # 复制Roaming\Battle.net（配置文件）
             if os.path.exists(self.BATTLENET_ROAMING):
-                shutil.copytree(self.BATTLENET_ROAMING, backup_roaming)
+                copy_stats["Roaming"] = self.engine.copy_tree(self.BATTLENET_ROAMING, backup_roaming,
+                                                              skip=self.rules.skipper("Roaming"))
+            self.last_copy_stats = copy_stats
+            self._check_copy_errors(copy_stats)
             
             # 保存账号信息
             bn_account_id = self.get_current_account_id()
@@ -168,32 +172,20 @@ class BattleNetSwitcher:
             return False
         
         try:
-            # 删除当前Battle.net本地数据（保留Logs）
-            if os.path.exists(self.BATTLENET_LOCAL):
-                for item in os.listdir(self.BATTLENET_LOCAL):
-                    if item != 'Logs':
-                        item_path = os.path.join(self.BATTLENET_LOCAL, item)
-                        if os.path.isdir(item_path):
-                            shutil.rmtree(item_path)
-                        else:
-                            os.remove(item_path)
+            # 删除当前Battle.net本地数据（保留缓存和日志）
+            self._clear_tree(self.BATTLENET_LOCAL, "LocalAppData")
             
-            # 恢复LocalAppData备份
-            for item in os.listdir(backup_local):
-                src = os.path.join(backup_local, item)
-                dst = os.path.join(self.BATTLENET_LOCAL, item)
-                if os.path.isdir(src):
-                    if os.path.exists(dst):
-                        shutil.rmtree(dst)
-                    shutil.copytree(src, dst)
-                else:
-                    shutil.copy2(src, dst)
+            # 恢复LocalAppData备份（旧备份中的缓存和日志不再写回）
+            copy_stats = {"LocalAppData": self.engine.copy_tree(backup_local, self.BATTLENET_LOCAL,
+                                                                skip=self.rules.skipper("LocalAppData"))}
             
             # 恢复Roaming备份
             if os.path.exists(backup_roaming):
-                if os.path.exists(self.BATTLENET_ROAMING):
-                    shutil.rmtree(self.BATTLENET_ROAMING)
-                shutil.copytree(backup_roaming, self.BATTLENET_ROAMING)
+                self._clear_tree(self.BATTLENET_ROAMING, "Roaming")
+                copy_stats["Roaming"] = self.engine.copy_tree(backup_roaming, self.BATTLENET_ROAMING,
+                                                              skip=self.rules.skipper("Roaming"))
+            self.last_copy_stats = copy_stats
+            self._check_copy_errors(copy_stats)
             
             return True
         except Exception as e:
@@ -216,7 +208,6 @@ class BattleNetSwitcher:
         # 1. 关闭战网
         if self.is_battlenet_running():
             self.close_battlenet()
-            time.sleep(1)
         
         # 2. 恢复备份
         if not self.restore_state(account_id):
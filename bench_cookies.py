@@ -0,0 +1,186 @@
+"""
+暴雪战网账号管理工具 - Cookie恢复基准测试
+用模拟的WebDriver（每个命令固定往返延迟，add_cookie只接受当前页面域名的cookies，与真实浏览器一致）
+对比恢复一个会话的几种方式：
+  legacy   - 原来的做法：每次解析JSON，delete_all_cookies 后逐个 add_cookie
+  bulk     - CookieHandler.apply_cookies：使用整理好的缓存，通过CDP Network.setCookies 一次写入
+  fallback - CookieHandler.apply_cookies(bulk=False)：不支持CDP的浏览器，使用缓存逐个 add_cookie
+统计 p50/p95 耗时、WebDriver往返次数、写入和丢失的cookies数
+
+用法:
+    python bench_cookies.py --cookies 20,100,300 --latency 2 --iterations 20
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from cookie_handler import CookieHandler
+
+
+# 模拟会话的cookies域名（第一个是登录时打开的页面）
+DOMAINS = ("account.battlenet.com.cn", ".battlenet.com.cn", ".battle.net", ".blizzard.com", ".163.com")
+CURRENT_PAGE = "account.battlenet.com.cn"
+
+
+class FakeDriver:
+    """
+    模拟的WebDriver：每个命令sleep latency秒（本机WebDriver一次HTTP往返），
+    add_cookie 与真实浏览器一样拒绝不属于当前页面的域名
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.cookies = {}
+        self.rejected = 0
+
+    def _round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def delete_all_cookies(self):
+        self._round_trip()
+        self.cookies.clear()
+
+    def add_cookie(self, cookie: dict):
+        self._round_trip()
+        domain = cookie.get('domain', CURRENT_PAGE).lstrip('.')
+        if not CURRENT_PAGE.endswith(domain):
+            self.rejected += 1
+            raise ValueError(f"invalid cookie domain: {cookie.get('domain')}")
+        self.cookies[(cookie.get('domain'), cookie['name'])] = cookie
+
+    def execute_cdp_cmd(self, cmd: str, params: dict):
+        self._round_trip()
+        if cmd == "Network.clearBrowserCookies":
+            self.cookies.clear()
+        elif cmd == "Network.setCookies":
+            for cookie in params["cookies"]:
+                domain = cookie.get('domain') or cookie['url'].split('/')[2]
+                self.cookies[(domain, cookie['name'])] = cookie
+        return {}
+
+
+def make_cookies(count: int, rng: random.Random) -> list:
+    """get_cookies() 格式的模拟会话cookies"""
+    cookies = []
+    for i in range(count):
+        domain = DOMAINS[i % len(DOMAINS)]
+        cookie = {
+            "name": f"c{i}_{rng.randrange(1 << 20):x}",
+            "value": rng.randbytes(48).hex(),
+            "domain": domain,
+            "path": "/",
+            "secure": True,
+            "httpOnly": i % 3 == 0,
+            "sameSite": ("Lax", "None", "Strict")[i % 3],
+        }
+        if i % 4:
+            cookie["expiry"] = 1900000000 + i
+        cookies.append(cookie)
+    return cookies
+
+
+def legacy_apply(driver, cookie_file: str) -> bool:
+    """原来的 apply_cookies：解析JSON，逐个add_cookie"""
+    with open(cookie_file, 'r', encoding='utf-8') as f:
+        cookies = json.load(f).get("cookies", [])
+    if not cookies:
+        return False
+    driver.delete_all_cookies()
+    for cookie in cookies:
+        try:
+            driver.add_cookie({k: v for k, v in cookie.items()
+                               if k in ['name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry']})
+        except Exception as cookie_error:
+            print(f"添加单个cookie失败: {cookie_error}")
+            continue
+    return True
+
+
+def _percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def bench(count: int, latency: float, iterations: int, seed: int, workdir: str) -> dict:
+    rng = random.Random(seed)
+    handler = CookieHandler(cookies_dir=workdir)
+    handler.save_cookies("bench", make_cookies(count, rng))
+    # 从文件开始（模拟重启后第一次恢复），第一次之后使用缓存
+    handler._cache.clear()
+    cookie_file = os.path.join(workdir, "bench.json")
+
+    methods = {
+        "legacy": lambda driver: legacy_apply(driver, cookie_file),
+        "bulk": lambda driver: handler.apply_cookies(driver, "bench"),
+        "fallback": lambda driver: handler.apply_cookies(driver, "bench", bulk=False),
+    }
+    results = {}
+    for name, func in methods.items():
+        seconds, drivers = [], []
+        for _ in range(iterations):
+            driver = FakeDriver(latency)
+            # 丢弃逐个添加失败时的提示（两种逐个添加的方式都会打印）
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                start = time.perf_counter()
+                func(driver)
+                seconds.append(time.perf_counter() - start)
+            drivers.append(driver)
+        results[name] = {
+            "p50_ms": _percentile(seconds, 50) * 1000,
+            "p95_ms": _percentile(seconds, 95) * 1000,
+            "first_ms": seconds[0] * 1000,
+            "round_trips": drivers[-1].calls,
+            "applied": len(drivers[-1].cookies),
+            "dropped": count - len(drivers[-1].cookies),
+        }
+    return results
+
+
+def _int_list(text: str) -> list:
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cookie恢复性能基准测试")
+    parser.add_argument('--cookies', type=_int_list, default=[100], help="每个会话的cookies数，可用逗号分隔多个值")
+    parser.add_argument('--latency', type=float, default=2.0, help="模拟的WebDriver单次往返延迟（毫秒）")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="结果JSON路径")
+    args = parser.parse_args(argv)
+
+    report = {"timestamp": datetime.now().isoformat(), "latency_ms": args.latency, "runs": []}
+    for count in args.cookies:
+        work = tempfile.mkdtemp(prefix="bnswitch-cookies-")
+        try:
+            results = bench(count, args.latency / 1000, args.iterations, args.seed, work)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        for method, stats in results.items():
+            report["runs"].append({"method": method, "cookies": count, **stats})
+            print(f"{method:<9} cookies={count:<5} p50={stats['p50_ms']:8.2f}ms p95={stats['p95_ms']:8.2f}ms "
+                  f"first={stats['first_ms']:8.2f}ms round_trips={stats['round_trips']:<5} "
+                  f"applied={stats['applied']:<5} dropped={stats['dropped']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+暴雪战网账号管理工具 - 账号列表元数据基准测试
+生成 N 个账号的 cookies / tokens / callbacks 文件，对比列出所有账号摘要的耗时：
+  legacy  - 原来的做法：每个文件完整 json.load
+  cold    - 元数据缓存第一次使用（没有索引文件，解析所有文件并写入索引）
+  restart - 重新启动后（从索引文件加载，每个文件只stat）
+  warm    - 同一进程内再次列出
+  changed - 1%的文件被改写后再次列出（只重新解析这些文件）
+
+用法:
+    python bench_metadata.py --accounts 10,100,1000 --iterations 5
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+
+from metadata_cache import MetadataCache
+from cookie_handler import summarize_cookies
+from token_manager import summarize_token
+try:
+    from protocol_handler import summarize_callback
+except ImportError:
+    # protocol_handler 依赖winreg，非Windows平台上使用相同的字段
+    def summarize_callback(callback_data: dict) -> dict:
+        return {"saved_at": callback_data.get("saved_at", "未知"),
+                "has_url": bool(callback_data.get("callback_url"))}
+
+
+# 目录名 -> (摘要函数, 原来的get_*_info)
+KINDS = {
+    "cookies": (summarize_cookies, lambda d: {"exists": True, "saved_at": d.get("saved_at", "未知"),
+                                              "cookie_count": d.get("cookie_count", 0)}),
+    "tokens": (summarize_token, lambda d: {"exists": True, "saved_at": d.get("saved_at", "未知"),
+                                           "has_callback": bool(d.get("callback_url")),
+                                           "has_auth_code": bool(d.get("auth_code"))}),
+    "callbacks": (summarize_callback, lambda d: {"exists": True, "saved_at": d.get("saved_at", "未知"),
+                                                 "has_url": bool(d.get("callback_url"))}),
+}
+
+
+def _write(path: str, data: dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def generate(root: str, accounts: int, cookies: int, rng: random.Random) -> list:
+    """生成账号文件（格式与各处理类保存的一致），返回账号ID列表"""
+    ids = [f"{rng.randrange(1 << 32):08x}" for _ in range(accounts)]
+    for kind in KINDS:
+        os.makedirs(os.path.join(root, kind), exist_ok=True)
+    now = datetime.now().isoformat()
+    for account_id in ids:
+        session = [{"name": f"c{i}", "value": rng.randbytes(64).hex(), "domain": ".battlenet.com.cn",
+                    "path": "/", "secure": True, "httpOnly": bool(i % 2), "sameSite": "Lax",
+                    "expiry": 1900000000 + i} for i in range(cookies)]
+        _write(os.path.join(root, "cookies", f"{account_id}.json"),
+               {"account_id": account_id, "cookies": session, "saved_at": now, "cookie_count": cookies})
+        url = f"battlenet://login?ST={rng.randbytes(48).hex()}&region=CN"
+        _write(os.path.join(root, "tokens", f"{account_id}.json"),
+               {"account_id": account_id, "saved_at": now, "callback_url": url,
+                "auth_code": rng.randbytes(16).hex(), "cookies": session[:10]})
+        _write(os.path.join(root, "callbacks", f"{account_id}.json"),
+               {"account_id": account_id, "callback_url": url, "scheme": "battlenet", "netloc": "login",
+                "path": "", "params": {"ST": url[22:], "region": "CN"}, "saved_at": now})
+    return ids
+
+
+def list_legacy(root: str, ids: list) -> int:
+    count = 0
+    for kind, (_, info) in KINDS.items():
+        for account_id in ids:
+            path = os.path.join(root, kind, f"{account_id}.json")
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                info(json.load(f))
+            count += 1
+    return count
+
+
+def open_caches(root: str) -> dict:
+    return {kind: MetadataCache(os.path.join(root, kind), summarize, kind)
+            for kind, (summarize, _) in KINDS.items()}
+
+
+def list_cached(caches: dict, ids: list) -> int:
+    count = 0
+    for cache in caches.values():
+        with cache.batch():
+            for account_id in ids:
+                if cache.get(account_id) is not None:
+                    count += 1
+    return count
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench(root: str, accounts: int, cookies: int, iterations: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    ids = generate(root, accounts, cookies, rng)
+    samples = {name: [] for name in ("legacy", "cold", "restart", "warm", "changed")}
+    for _ in range(iterations):
+        for kind in KINDS:
+            try:
+                os.remove(os.path.join(root, kind, ".metadata_index"))
+            except FileNotFoundError:
+                pass
+        samples["legacy"].append(_timed(lambda: list_legacy(root, ids)))
+        caches = open_caches(root)
+        samples["cold"].append(_timed(lambda: list_cached(caches, ids)))
+        restarted = {}
+        samples["restart"].append(_timed(lambda: (restarted.update(open_caches(root)),
+                                                  list_cached(restarted, ids))))
+        samples["warm"].append(_timed(lambda: list_cached(restarted, ids)))
+        # 改写1%的cookies文件（修改时间变化）
+        for account_id in rng.sample(ids, max(1, accounts // 100)):
+            path = os.path.join(root, "cookies", f"{account_id}.json")
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+        samples["changed"].append(_timed(lambda: list_cached(restarted, ids)))
+    return {name: sorted(values)[len(values) // 2] * 1000 for name, values in samples.items()}
+
+
+def _int_list(text: str) -> list:
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账号列表元数据基准测试")
+    parser.add_argument('--accounts', type=_int_list, default=[10, 100, 1000], help="账号数，可用逗号分隔多个值")
+    parser.add_argument('--cookies', type=int, default=100, help="每个账号保存的cookies数")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="结果JSON路径")
+    args = parser.parse_args(argv)
+
+    report = {"timestamp": datetime.now().isoformat(), "cookies": args.cookies, "runs": []}
+    for accounts in args.accounts:
+        work = tempfile.mkdtemp(prefix="bnswitch-metadata-")
+        try:
+            result = bench(work, accounts, args.cookies, args.iterations, args.seed)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        report["runs"].append({"accounts": accounts, **{f"{k}_ms": v for k, v in result.items()}})
+        print(f"accounts={accounts:<6} " + "  ".join(f"{k}={v:9.2f}ms" for k, v in result.items()))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,655 @@
+"""
+暴雪战网账号切换器 - 切换性能基准测试
+生成模拟的Battle.net LocalAppData/Roaming目录（文件数、大小、LevelDB式变动可调），
+通过SwitcherEnvironment让切换器指向这些目录，进程和注册表操作注入桩实现，
+统计 switch_to_account / create_account_from_current / BattleNetSwitcher.restore_state
+的 p50/p95 耗时、复制字节数和系统调用次数，结果保存为JSON便于版本间对比
+
+用法:
+    python bench_switch.py --files 500,5000 --accounts 3,10 --iterations 20
+    python bench_switch.py --compare 旧结果.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import builtins
+import platform
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from datetime import datetime
+
+import copy_engine
+from environment import SwitcherEnvironment, SNAPSHOT_MODE_ENV, SWITCH_MODE_ENV, CAPSULE_MODE_ENV
+from isolated_switcher import IsolatedSwitcher
+from battlenet_switcher import BattleNetSwitcher
+from registry_backend import MemoryRegistryBackend, REG_BINARY
+
+
+# ---------- 模拟数据 ----------
+
+# Chromium Cookies数据库的表结构（与新版客户端一致）
+CHROMIUM_COOKIES_SCHEMA = """
+CREATE TABLE meta(key LONGVARCHAR NOT NULL UNIQUE PRIMARY KEY, value LONGVARCHAR);
+CREATE TABLE cookies(creation_utc INTEGER NOT NULL, host_key TEXT NOT NULL, top_frame_site_key TEXT NOT NULL,
+    name TEXT NOT NULL, value TEXT NOT NULL, encrypted_value BLOB NOT NULL, path TEXT NOT NULL,
+    expires_utc INTEGER NOT NULL, is_secure INTEGER NOT NULL, is_httponly INTEGER NOT NULL,
+    last_access_utc INTEGER NOT NULL, has_expires INTEGER NOT NULL, is_persistent INTEGER NOT NULL,
+    priority INTEGER NOT NULL, samesite INTEGER NOT NULL, source_scheme INTEGER NOT NULL,
+    source_port INTEGER NOT NULL, last_update_utc INTEGER NOT NULL, source_type INTEGER NOT NULL,
+    has_cross_site_ancestor INTEGER NOT NULL);
+CREATE UNIQUE INDEX cookies_unique_index ON cookies(host_key, top_frame_site_key, has_cross_site_ancestor,
+    name, path, source_scheme, source_port);
+INSERT INTO meta VALUES ('version', '23'), ('last_compatible_version', '23');
+"""
+# 战网会话Cookie所在的域名
+SESSION_HOSTS = (".battlenet.com.cn", "account.battlenet.com.cn", ".blizzard.com", ".battle.net")
+
+class SyntheticBattleNet:
+    """
+    模拟的战网数据目录
+    LocalAppData: BrowserCaches（Cookies、Local State、LevelDB、HTTP缓存）、Account、Logs
+    Roaming: Battle.net.config
+    """
+
+    LEVELDB_DIRS = ("Local Storage/leveldb", "IndexedDB/https_account.battlenet.com.cn_0.indexeddb.leveldb")
+
+    def __init__(self, local_root: str, roaming_root: str, files: int, avg_size: int, seed: int = 0,
+                 other_cookies: int = 2000):
+        self.local_root = local_root
+        self.roaming_root = roaming_root
+        self.files = files
+        self.avg_size = avg_size
+        # Cookies数据库中其他网站的行数（决定数据库文件大小）
+        self.other_cookies = other_cookies
+        self.rng = random.Random(seed)
+        self.common = os.path.join(local_root, "BrowserCaches", "common")
+
+    def _size(self) -> int:
+        # 大部分文件很小，少数较大（指数分布）
+        return max(1, min(int(self.rng.expovariate(1 / self.avg_size)), self.avg_size * 20))
+
+    def _payload(self, size: int) -> bytes:
+        # 四分之一随机内容重复填充，压缩率接近真实缓存（文本、JSON和已压缩资源混合）
+        chunk = self.rng.randbytes(max(1, size // 4))
+        return (chunk * 5)[:size]
+
+    def _write(self, path: str, size: int = None, mode: str = 'wb'):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(self._payload(self._size() if size is None else size))
+
+    def generate(self, email: str):
+        """生成完整的目录树，约files个文件"""
+        shutil.rmtree(self.local_root, ignore_errors=True)
+        shutil.rmtree(self.roaming_root, ignore_errors=True)
+        os.makedirs(self.common, exist_ok=True)
+        with open(os.path.join(self.common, "Local State"), 'w', encoding='utf-8') as f:
+            json.dump({"os_crypt": {"encrypted_key": self.rng.randbytes(32).hex()}}, f)
+        self._write_cookies(os.path.join(self.common, "Network", "Cookies"))
+        self._write(os.path.join(self.common, "Network", "Cookies-journal"), 0)
+        count = 4
+
+        # LevelDB目录约占十分之一
+        for rel in self.LEVELDB_DIRS:
+            db = os.path.join(self.common, *rel.split('/'))
+            os.makedirs(db, exist_ok=True)
+            with open(os.path.join(db, "CURRENT"), 'w') as f:
+                f.write("MANIFEST-000001\n")
+            self._write(os.path.join(db, "LOCK"), 0)
+            self._write(os.path.join(db, "MANIFEST-000001"), 256)
+            self._write(os.path.join(db, "000003.log"))
+            count += 4
+            for i in range(max(1, self.files // 20)):
+                self._write(os.path.join(db, f"{i + 5:06d}.ldb"))
+                count += 1
+
+        # 账号目录
+        account = os.path.join(self.local_root, "Account", str(self.rng.randrange(10 ** 8, 10 ** 9)))
+        self._write(os.path.join(account, "account.db"), 4096)
+        self._write(os.path.join(self.local_root, "Logs", "Battle.net.log"))
+        count += 2
+
+        # 其余为HTTP缓存
+        cache = os.path.join(self.common, "Cache", "Cache_Data")
+        for i in range(max(0, self.files - count)):
+            self._write(os.path.join(cache, f"f_{i:06x}"))
+
+        self.set_email(email)
+
+    def _cookie_row(self, host: str, name: str) -> tuple:
+        now = 13300000000000000 + self.rng.randrange(10 ** 12)
+        return (now, host, "", name, "", self.rng.randbytes(self.rng.randrange(40, 800)), "/",
+                now + 10 ** 14, 1, 1, now, 1, 1, 1, 0, 2, 443, now, 0, 0)
+
+    def _write_cookies(self, path: str):
+        """Chromium结构的Cookies数据库：少量战网会话行 + 大量其他网站的行"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.executescript(CHROMIUM_COOKIES_SCHEMA)
+            rows = [self._cookie_row(f"site{i % 300}.example.com", f"c{i}") for i in range(self.other_cookies)]
+            rows += [self._cookie_row(host, name) for host in SESSION_HOSTS for name in ("BA-tassadar", "web.id")]
+            conn.executemany(f"INSERT INTO cookies VALUES ({', '.join('?' * 20)})", rows)
+        conn.close()
+
+    def _rotate_session_cookies(self):
+        """登录会话刷新战网Cookie（以及少量其他网站的Cookie）"""
+        path = os.path.join(self.common, "Network", "Cookies")
+        conn = sqlite3.connect(path)
+        with conn:
+            for host in SESSION_HOSTS:
+                conn.execute("UPDATE cookies SET encrypted_value=?, last_update_utc=last_update_utc+1 WHERE host_key=?",
+                             (self.rng.randbytes(200), host))
+            conn.execute("UPDATE cookies SET encrypted_value=? WHERE rowid % 50 = ?",
+                         (self.rng.randbytes(100), self.rng.randrange(50)))
+        conn.close()
+
+    def set_email(self, email: str):
+        """写入Battle.net.config，email成为SavedAccountNames的第一个"""
+        os.makedirs(self.roaming_root, exist_ok=True)
+        config_path = os.path.join(self.roaming_root, "Battle.net.config")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({"Client": {"SavedAccountNames": email}}, f, indent=2)
+
+    def churn(self, rate: float):
+        """
+        模拟一次登录会话对数据目录的修改：
+        LevelDB追加日志、偶尔压缩（删除旧ldb、生成新ldb、更新MANIFEST），
+        Cookies重写，按rate比例改写/删除/新增缓存文件
+        """
+        for rel in self.LEVELDB_DIRS:
+            db = os.path.join(self.common, *rel.split('/'))
+            if not os.path.isdir(db):
+                continue
+            logs = [n for n in os.listdir(db) if n.endswith('.log')]
+            for name in logs:
+                self._write(os.path.join(db, name), mode='ab')
+            if self.rng.random() < 0.5:
+                tables = sorted(n for n in os.listdir(db) if n.endswith('.ldb'))
+                for name in tables[:2]:
+                    os.remove(os.path.join(db, name))
+                last = int(tables[-1][:6]) if tables else 4
+                self._write(os.path.join(db, f"{last + 1:06d}.ldb"), self.avg_size * 4)
+                self._write(os.path.join(db, "MANIFEST-000001"), 256, mode='ab')
+
+        self._rotate_session_cookies()
+
+        cache = os.path.join(self.common, "Cache", "Cache_Data")
+        if os.path.isdir(cache):
+            entries = sorted(os.listdir(cache))
+            changed = int(len(entries) * rate)
+            for name in self.rng.sample(entries, min(changed, len(entries))):
+                if self.rng.random() < 0.5:
+                    self._write(os.path.join(cache, name))
+                else:
+                    os.remove(os.path.join(cache, name))
+                    self._write(os.path.join(cache, f"n_{self.rng.getrandbits(48):012x}"))
+
+
+# ---------- 桩实现 ----------
+
+class StubProcessTracker:
+    """不访问真实进程表的进程跟踪器（战网始终未运行）"""
+
+    full_scans = 0
+
+    def refresh(self, force: bool = False):
+        pass
+
+    def invalidate(self):
+        pass
+
+    def processes(self, kind: str = 'client') -> list:
+        return []
+
+    def is_running(self) -> bool:
+        return False
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        return False
+
+    def wait_exit(self, procs=None, timeout: float = 10.0) -> bool:
+        return True
+
+
+def bench_environment(work: str) -> SwitcherEnvironment:
+    """
+    基准测试环境：模拟目录 + 临时存储目录 + 内存注册表 + 桩进程跟踪器，
+    启动器路径不存在，start_battlenet不会启动任何进程
+    """
+    return SwitcherEnvironment(
+        battlenet_exe=os.path.join(work, "Battle.net Launcher.exe"),
+        local_root=os.path.join(work, "Local", "Battle.net"),
+        roaming_root=os.path.join(work, "Roaming", "Battle.net"),
+        storage_root=os.path.join(work, "data"),
+        registry=MemoryRegistryBackend(),
+        processes=StubProcessTracker(),
+    )
+
+
+# ---------- 计数 ----------
+
+# 统计调用次数的os函数（近似系统调用数，DirEntry.stat等内部调用不计入）
+COUNTED_OS_FUNCS = (
+    'stat', 'lstat', 'scandir', 'listdir', 'open', 'read', 'write', 'close',
+    'replace', 'rename', 'remove', 'unlink', 'mkdir', 'rmdir', 'utime', 'fsync',
+    'sendfile', 'copy_file_range', 'link', 'chmod', 'truncate', 'ftruncate',
+)
+
+
+class SyscallCounter:
+    """在with块内统计os调用次数（包括复制线程池中的调用）和复制的字节数"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.bytes_copied = 0
+        self._saved = []
+        self._lock = threading.Lock()
+
+    def _patch(self, module, name: str, wrapper_factory):
+        original = getattr(module, name, None)
+        if original is None:
+            return
+        self._saved.append((module, name, original))
+        setattr(module, name, wrapper_factory(original))
+
+    def _counting(self, key: str):
+        def factory(original):
+            def wrapper(*args, **kwargs):
+                with self._lock:
+                    self.counts[key] += 1
+                return original(*args, **kwargs)
+            return wrapper
+        return factory
+
+    def __enter__(self):
+        real_stat = os.stat
+        for name in COUNTED_OS_FUNCS:
+            self._patch(os, name, self._counting(name))
+        self._patch(builtins, 'open', self._counting('open'))
+
+        def copy_factory(original):
+            def copyfile(src, dst, *args, **kwargs):
+                result = original(src, dst, *args, **kwargs)
+                try:
+                    size = real_stat(dst).st_size
+                except OSError:
+                    size = 0
+                with self._lock:
+                    self.bytes_copied += size
+                return result
+            return copyfile
+        self._patch(shutil, 'copyfile', copy_factory)
+
+        def engine_factory(original):
+            def copy_file(engine, *args, **kwargs):
+                written = original(engine, *args, **kwargs)
+                with self._lock:
+                    self.bytes_copied += written
+                return written
+            return copy_file
+        self._patch(copy_engine.CopyEngine, 'copy_file', engine_factory)
+        return self
+
+    def __exit__(self, *exc):
+        for module, name, original in reversed(self._saved):
+            setattr(module, name, original)
+        self._saved = []
+        return False
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+def measure(func) -> dict:
+    """执行一次操作，返回耗时、复制字节数和系统调用统计"""
+    with SyscallCounter() as counter:
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+    return {
+        "result": result,
+        "seconds": seconds,
+        "bytes_copied": counter.bytes_copied,
+        "syscalls": counter.total,
+        "syscalls_by_name": dict(counter.counts),
+    }
+
+
+def _percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def summarize(samples: list) -> dict:
+    """汇总同一操作的多次测量"""
+    seconds = [s["seconds"] for s in samples]
+    by_name = Counter()
+    for s in samples:
+        by_name.update(s["syscalls_by_name"])
+    n = len(samples) or 1
+    return {
+        "runs": len(samples),
+        "p50_ms": _percentile(seconds, 50) * 1000,
+        "p95_ms": _percentile(seconds, 95) * 1000,
+        "mean_ms": sum(seconds) / n * 1000,
+        "bytes_copied": sum(s["bytes_copied"] for s in samples) / n,
+        "syscalls": sum(s["syscalls"] for s in samples) / n,
+        "syscalls_by_name": {k: v / n for k, v in by_name.most_common()},
+    }
+
+
+# ---------- 场景 ----------
+
+def _token(rng) -> dict:
+    return {f"{rng.getrandbits(32):08X}": (REG_BINARY, rng.randbytes(64))}
+
+
+def bench_isolated(work: str, files: int, accounts: int, iterations: int, avg_size: int,
+                   churn: float, seed: int) -> dict:
+    """IsolatedSwitcher: create_account_from_current + switch_to_account"""
+    env = bench_environment(work)
+    switcher = IsolatedSwitcher(env)
+    tree = SyntheticBattleNet(env.local_root, env.roaming_root, files, avg_size, seed)
+    rng = random.Random(seed + 1)
+
+    create_samples = []
+    ids = []
+    for i in range(accounts):
+        email = f"{13800000000 + i}"
+        if i == 0:
+            tree.generate(email)
+        else:
+            tree.churn(churn)
+            tree.set_email(email)
+        switcher.registry.set_values(switcher.BATTLENET_REG_PATH, _token(rng))
+        sample = measure(lambda: switcher.create_account_from_current(f"bench{i}", force_version="cn"))
+        if not sample["result"]:
+            raise RuntimeError("create_account_from_current 失败")
+        ids.append(sample["result"])
+        create_samples.append(sample)
+
+    switch_samples = []
+    for i in range(iterations):
+        tree.churn(churn)
+        target = ids[i % len(ids)]
+        sample = measure(lambda: switcher.switch_to_account(target))
+        if not sample["result"][0]:
+            raise RuntimeError(f"switch_to_account 失败: {sample['result'][1]}")
+        sample["down_seconds"] = switcher.last_switch_stats["down_seconds"]
+        switch_samples.append(sample)
+
+    create = summarize(create_samples)
+    # 快照规则跳过的缓存和垃圾文件
+    create["categories"] = switcher.snapshot_rule_report("cn")
+    switch = summarize(switch_samples)
+    # 客户端不可用的时间（关闭到重新启动），暂存模式下只包含两次重命名
+    down = [s["down_seconds"] for s in switch_samples]
+    switch["down_p50_ms"] = _percentile(down, 50) * 1000
+    switch["down_p95_ms"] = _percentile(down, 95) * 1000
+    switch["switch_mode"] = switcher.last_switch_stats["mode"]
+    if switcher.capsule_mode:
+        # 胶囊数量、总大小、足够自动登录的胶囊数
+        create["capsules"] = switcher.capsules.report()
+    return {
+        "IsolatedSwitcher.create_account_from_current": create,
+        "IsolatedSwitcher.switch_to_account": switch,
+    }
+
+
+def bench_backup_restore(work: str, files: int, accounts: int, iterations: int, avg_size: int,
+                         churn: float, seed: int) -> dict:
+    """BattleNetSwitcher: restore_state（整目录备份/恢复方案）"""
+    env = bench_environment(work)
+    switcher = BattleNetSwitcher(env)
+    tree = SyntheticBattleNet(env.local_root, env.roaming_root, files, avg_size, seed)
+
+    ids = []
+    for i in range(accounts):
+        email = f"{13800000000 + i}"
+        if i == 0:
+            tree.generate(email)
+        else:
+            tree.churn(churn)
+            tree.set_email(email)
+        account_id = f"bench{i}"
+        if not switcher.backup_current_state(account_id, account_id):
+            raise RuntimeError("backup_current_state 失败")
+        ids.append(account_id)
+
+    samples = []
+    for i in range(iterations):
+        tree.churn(churn)
+        target = ids[i % len(ids)]
+        sample = measure(lambda: switcher.restore_state(target))
+        if not sample["result"]:
+            raise RuntimeError("restore_state 失败")
+        samples.append(sample)
+
+    return {"BattleNetSwitcher.restore_state": summarize(samples)}
+
+
+def bench_cold_storage(work: str, files: int, accounts: int, iterations: int, avg_size: int,
+                       churn: float, seed: int) -> dict:
+    """IsolatedSwitcher: 冷存储账号的切换耗时（含解压）和节省的空间，与常驻账号对比"""
+    env = bench_environment(work)
+    switcher = IsolatedSwitcher(env)
+    tree = SyntheticBattleNet(env.local_root, env.roaming_root, files, avg_size, seed)
+    rng = random.Random(seed + 1)
+
+    ids = []
+    for i in range(max(accounts, 2)):
+        email = f"{13800000000 + i}"
+        if i == 0:
+            tree.generate(email)
+        else:
+            tree.churn(churn)
+            tree.set_email(email)
+        switcher.registry.set_values(switcher.BATTLENET_REG_PATH, _token(rng))
+        ids.append(switcher.create_account_from_current(f"bench{i}", force_version="cn"))
+
+    hot_samples = []
+    cold_samples = []
+    freeze_samples = []
+    storage = {"saved_bytes": 0, "blob_bytes": 0, "archive_bytes": 0}
+    for i in range(iterations):
+        tree.churn(churn)
+        target = ids[i % len(ids)]
+        if i % 2:
+            # 让目标账号闲置超过阈值后转入冷存储
+            switcher.accounts[target]["last_login"] = "2000-01-01T00:00:00"
+            freeze_samples.append(measure(switcher.apply_storage_tiering))
+            report = switcher.cold.report()
+            for key in storage:
+                storage[key] = max(storage[key], report[key])
+            samples = cold_samples
+        else:
+            samples = hot_samples
+        sample = measure(lambda: switcher.switch_to_account(target))
+        if not sample["result"][0]:
+            raise RuntimeError(f"switch_to_account 失败: {sample['result'][1]}")
+        sample["thaw_seconds"] = switcher.last_switch_stats["thaw_seconds"]
+        samples.append(sample)
+
+    cold = summarize(cold_samples)
+    cold["thaw_ms"] = sum(s["thaw_seconds"] for s in cold_samples) / max(len(cold_samples), 1) * 1000
+    cold["storage"] = storage
+    return {
+        "IsolatedSwitcher.switch_to_account[hot]": summarize(hot_samples),
+        "IsolatedSwitcher.switch_to_account[cold]": cold,
+        "IsolatedSwitcher.apply_storage_tiering": summarize(freeze_samples),
+    }
+
+
+def bench_prefetch(work: str, files: int, accounts: int, iterations: int, avg_size: int,
+                   churn: float, seed: int) -> dict:
+    """IsolatedSwitcher: 每次切换后执行一轮预取，对比切换到已预取账号和未预取账号的耗时"""
+    env = bench_environment(work)
+    switcher = IsolatedSwitcher(env)
+    tree = SyntheticBattleNet(env.local_root, env.roaming_root, files, avg_size, seed)
+    rng = random.Random(seed + 1)
+
+    ids = []
+    for i in range(max(accounts, 2)):
+        email = f"{13800000000 + i}"
+        if i == 0:
+            tree.generate(email)
+        else:
+            tree.churn(churn)
+            tree.set_email(email)
+        switcher.registry.set_values(switcher.BATTLENET_REG_PATH, _token(rng))
+        ids.append(switcher.create_account_from_current(f"bench{i}", force_version="cn"))
+
+    hot_samples = []
+    miss_samples = []
+    prefetch_samples = []
+    for i in range(iterations):
+        tree.churn(churn)
+        target = ids[i % len(ids)]
+        sample = measure(lambda: switcher.switch_to_account(target))
+        if not sample["result"][0]:
+            raise RuntimeError(f"switch_to_account 失败: {sample['result'][1]}")
+        sample["down_seconds"] = switcher.last_switch_stats["down_seconds"]
+        (hot_samples if switcher.last_switch_stats["prestaged"] else miss_samples).append(sample)
+        prefetch_samples.append(measure(switcher.prefetcher.run_once))
+
+    results = {}
+    for op, samples in (("hot", hot_samples), ("miss", miss_samples)):
+        if samples:
+            stats = summarize(samples)
+            stats["down_p50_ms"] = _percentile([s["down_seconds"] for s in samples], 50) * 1000
+            results[f"IsolatedSwitcher.switch_to_account[{op}]"] = stats
+    results["Prefetcher.run_once"] = summarize(prefetch_samples)
+    return results
+
+
+SCENARIOS = {
+    "isolated": bench_isolated,
+    "prefetch": bench_prefetch,
+    "backup": bench_backup_restore,
+    "cold": bench_cold_storage,
+}
+
+
+def _git_revision() -> str:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args) -> dict:
+    report = {
+        "revision": _git_revision(),
+        "timestamp": datetime.now().isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "params": {
+            "avg_size": args.size, "churn": args.churn,
+            "iterations": args.iterations, "seed": args.seed,
+            "snapshot_mode": args.snapshot_mode or "auto",
+            "switch_mode": args.switch_mode or "staged",
+            "capsule_mode": args.capsule,
+        },
+        "runs": [],
+    }
+    for files in args.files:
+        for accounts in args.accounts:
+            for scenario in args.scenarios:
+                work = tempfile.mkdtemp(prefix="bnswitch-bench-", dir=args.workdir)
+                try:
+                    ops = SCENARIOS[scenario](work, files, accounts, args.iterations,
+                                              args.size, args.churn, args.seed)
+                finally:
+                    shutil.rmtree(work, ignore_errors=True)
+                for op, stats in ops.items():
+                    report["runs"].append({"op": op, "files": files, "accounts": accounts, **stats})
+                    print(f"{op:<48} files={files:<6} accounts={accounts:<4} "
+                          f"p50={stats['p50_ms']:8.1f}ms p95={stats['p95_ms']:8.1f}ms "
+                          f"copied={stats['bytes_copied'] / 1024:10.1f}KB syscalls={stats['syscalls']:9.0f}")
+    return report
+
+
+def compare(old_path: str, new_report: dict):
+    """和之前保存的结果对比p50耗时、复制字节数和系统调用数"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    old_runs = {(r["op"], r["files"], r["accounts"]): r for r in old.get("runs", [])}
+    print(f"\n对比 {old.get('revision')} -> {new_report.get('revision')}")
+    for run_ in new_report["runs"]:
+        key = (run_["op"], run_["files"], run_["accounts"])
+        before = old_runs.get(key)
+        if not before:
+            continue
+        parts = []
+        for field in ("p50_ms", "bytes_copied", "syscalls"):
+            a, b = before[field], run_[field]
+            change = (b - a) / a * 100 if a else 0.0
+            parts.append(f"{field} {change:+6.1f}%")
+        print(f"{run_['op']:<48} files={key[1]:<6} accounts={key[2]:<4} " + "  ".join(parts))
+
+
+def _int_list(text: str) -> list:
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="战网账号切换性能基准测试")
+    parser.add_argument('--files', type=_int_list, default=[500], help="每个目录树的文件数，可用逗号分隔多个值")
+    parser.add_argument('--accounts', type=_int_list, default=[3], help="账号数，可用逗号分隔多个值")
+    parser.add_argument('--iterations', type=int, default=10, help="每个场景的切换/恢复次数")
+    parser.add_argument('--size', type=int, default=8192, help="平均文件大小（字节）")
+    parser.add_argument('--churn', type=float, default=0.05, help="每次会话改动的缓存文件比例")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', default="isolated,backup", help="isolated,backup,cold,prefetch")
+    parser.add_argument('--snapshot-mode', default=None, choices=('copy', 'reflink', 'hardlink'),
+                        help="固定快照复制方式（默认自动探测）")
+    parser.add_argument('--switch-mode', default=None, choices=('staged', 'inplace'),
+                        help="IsolatedSwitcher切换方式（默认staged）")
+    parser.add_argument('--capsule', action='store_true', help="使用会话胶囊（只保存和切换自动登录需要的文件）")
+    parser.add_argument('--workdir', default=None, help="模拟数据所在目录（默认系统临时目录）")
+    parser.add_argument('--output', default=None, help="结果JSON路径")
+    parser.add_argument('--compare', default=None, help="与之前的结果JSON对比")
+    args = parser.parse_args(argv)
+    args.scenarios = [s for s in args.scenarios.split(',') if s]
+    if args.snapshot_mode:
+        os.environ[SNAPSHOT_MODE_ENV] = args.snapshot_mode
+    if args.switch_mode:
+        os.environ[SWITCH_MODE_ENV] = args.switch_mode
+    if args.capsule:
+        os.environ[CAPSULE_MODE_ENV] = "1"
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"未知场景: {scenario}")
+
+    report = run(args)
+
+    output = args.output or f"bench_switch_{report['revision'] or 'local'}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+    if args.compare:
+        compare(args.compare, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -193,37 +193,12 @@ class BrowserController:
                 print("没有找到保存的Cookie")
                 return False
             
-            # 按域名分组cookies
-            domain_cookies = {}
-            for cookie in cookies:
-                domain = cookie.get('domain', '')
-                if domain not in domain_cookies:
-                    domain_cookies[domain] = []
-                domain_cookies[domain].append(cookie)
-            
-            # 首先访问主域名并注入cookies
-            self.driver.get("https://account.battlenet.com.cn")
-            time.sleep(1)
-            
-            # 删除现有cookies
-            self.driver.delete_all_cookies()
-            
-            # 注入所有cookies
-            for cookie in cookies:
-                try:
-                    # 清理cookie，只保留必要字段
-                    clean_cookie = {}
-                    for key in ['name', 'value', 'domain', 'path', 'secure', 'httpOnly']:
-                        if key in cookie:
-                            clean_cookie[key] = cookie[key]
-                    # expiry需要特殊处理
-                    if 'expiry' in cookie:
-                        clean_cookie['expiry'] = int(cookie['expiry'])
-                    
-                    self.driver.add_cookie(clean_cookie)
-                except Exception as ce:
-                    print(f"添加cookie失败 {cookie.get('name')}: {ce}")
-                    continue
+            # Edge/Chrome通过CDP一次写入所有域名的cookies，不需要先打开页面
+            if not self.cookie_handler.apply_cookies_bulk(self.driver, account_id):
+                # 逐个添加只能写入当前页面域名的cookies，先访问主域名
+                self.driver.get("https://account.battlenet.com.cn")
+                time.sleep(1)
+                self.cookie_handler.apply_cookies(self.driver, account_id, bulk=False)
             
             # 刷新页面使cookies生效
             time.sleep(0.5)
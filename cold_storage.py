@@ -0,0 +1,223 @@
+"""
+暴雪战网账号切换器 - 冷存储
+按 last_login 分层：长时间未使用的账号，把只属于它的blob流式压缩为一个 tar.xz 归档
+（清单保留在原位，共享的blob不动），切换到该账号时先流式解压回快照存储；
+常用账号保持未压缩，切换速度不受影响
+"""
+import os
+import json
+import lzma
+import time
+import shutil
+import tarfile
+import threading
+from datetime import datetime, timedelta
+from account_store import atomic_write_json
+
+
+# 默认闲置多少天后转入冷存储
+DEFAULT_IDLE_DAYS = 30
+# xz压缩级别（0-9），较低的级别压缩更快、解压速度基本相同
+DEFAULT_PRESET = 6
+
+
+def _parse_time(value: str):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ColdStorage:
+    """账号快照的压缩冷存储"""
+
+    def __init__(self, store, root: str, idle_days: int = DEFAULT_IDLE_DAYS, preset: int = DEFAULT_PRESET):
+        self.store = store
+        self.root = root
+        self.idle_days = idle_days
+        self.preset = preset
+        self.stats_file = os.path.join(root, "stats.json")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- 路径 ----------
+
+    def archive_path(self, account_id: str) -> str:
+        return os.path.join(self.root, f"{account_id}.tar.xz")
+
+    def meta_path(self, account_id: str) -> str:
+        return os.path.join(self.root, f"{account_id}.json")
+
+    def is_cold(self, account_id: str) -> bool:
+        return os.path.exists(self.archive_path(account_id))
+
+    def _load_json(self, path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    # ---------- 压缩 / 解压 ----------
+
+    def _unique_blobs(self, account_id: str) -> list:
+        """只被该账号引用、且当前在磁盘上的blob"""
+        manifest = self.store.load_manifest(account_id) or {}
+        own = set()
+        for tree in manifest.get('trees', {}).values():
+            for entry in tree.get('files', {}).values():
+                own.add(entry['blob'])
+        shared = self.store.referenced_blobs(exclude_account=account_id)
+        return sorted(b for b in own - shared if self.store.has_blob(b))
+
+    def freeze(self, account_id: str) -> dict:
+        """
+        把账号独有的blob压缩为归档并从快照存储中删除
+
+        Returns:
+            dict: 统计信息（blob数、原大小、归档大小、耗时），账号没有快照或已冷存储时返回None
+        """
+        with self._lock:
+            if self.is_cold(account_id) or not self.store.has_snapshot(account_id):
+                return None
+            start = time.perf_counter()
+            blobs = self._unique_blobs(account_id)
+            blob_bytes = 0
+            archive = self.archive_path(account_id)
+            tmp = archive + ".tmp"
+            try:
+                with lzma.open(tmp, 'wb', preset=self.preset) as xz, \
+                        tarfile.open(fileobj=xz, mode='w|') as tar:
+                    for blob_id in blobs:
+                        path = self.store.blob_path(blob_id)
+                        blob_bytes += os.path.getsize(path)
+                        tar.add(path, arcname=f"blobs/{blob_id}", recursive=False)
+                os.replace(tmp, archive)
+            except Exception as e:
+                print(f"压缩账号数据失败: {account_id}, 错误: {e}")
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                return None
+
+            stats = {
+                "blobs": len(blobs),
+                "blob_bytes": blob_bytes,
+                "archive_bytes": os.path.getsize(archive),
+                "frozen_at": datetime.now().isoformat(),
+                "freeze_seconds": time.perf_counter() - start,
+            }
+            atomic_write_json(self.meta_path(account_id), stats, indent=2)
+            # 归档写完后才删除blob，中途退出时账号仍可正常使用
+            for blob_id in blobs:
+                try:
+                    os.remove(self.store.blob_path(blob_id))
+                except OSError:
+                    pass
+            return stats
+
+    def thaw(self, account_id: str) -> dict:
+        """
+        把归档流式解压回快照存储（已存在的blob跳过）
+
+        Returns:
+            dict: 统计信息（blob数、解压字节数、耗时），账号不在冷存储中返回None
+        """
+        with self._lock:
+            archive = self.archive_path(account_id)
+            if not os.path.exists(archive):
+                return None
+            start = time.perf_counter()
+            restored = 0
+            restored_bytes = 0
+            with tarfile.open(archive, mode='r|xz') as tar:
+                for member in tar:
+                    if not member.isfile() or not member.name.startswith("blobs/"):
+                        continue
+                    blob_id = member.name[len("blobs/"):]
+                    dst = self.store.blob_path(blob_id)
+                    if os.path.exists(dst):
+                        continue
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    src = tar.extractfile(member)
+                    with open(dst + ".tmp", 'wb') as f:
+                        shutil.copyfileobj(src, f)
+                    os.replace(dst + ".tmp", dst)
+                    restored += 1
+                    restored_bytes += member.size
+
+            seconds = time.perf_counter() - start
+            meta = self._load_json(self.meta_path(account_id))
+            os.remove(archive)
+            if os.path.exists(self.meta_path(account_id)):
+                os.remove(self.meta_path(account_id))
+            self._record_thaw(account_id, seconds, meta)
+            return {"blobs": restored, "bytes": restored_bytes, "thaw_seconds": seconds}
+
+    def discard(self, account_id: str):
+        """删除账号时一并删除归档"""
+        with self._lock:
+            for path in (self.archive_path(account_id), self.meta_path(account_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _record_thaw(self, account_id: str, seconds: float, meta: dict):
+        stats = self._load_json(self.stats_file)
+        thaws = stats.get("thaws", [])
+        thaws.append({
+            "account_id": account_id,
+            "seconds": seconds,
+            "archive_bytes": meta.get("archive_bytes", 0),
+            "at": datetime.now().isoformat(),
+        })
+        stats["thaws"] = thaws[-50:]
+        atomic_write_json(self.stats_file, stats, indent=2)
+
+    # ---------- 分层 ----------
+
+    def idle_accounts(self, accounts: dict, current_account_id: str = None, now: datetime = None) -> list:
+        """闲置超过阈值、尚未冷存储的账号（当前账号除外）"""
+        if not self.idle_days:
+            return []
+        cutoff = (now or datetime.now()) - timedelta(days=self.idle_days)
+        result = []
+        for account_id, info in accounts.items():
+            if account_id == current_account_id or self.is_cold(account_id):
+                continue
+            last = _parse_time(info.get("last_login")) or _parse_time(info.get("created_time"))
+            if last and last < cutoff:
+                result.append(account_id)
+        return result
+
+    def apply_tiering(self, accounts: dict, current_account_id: str = None) -> dict:
+        """把闲置账号转入冷存储，返回 账号ID -> 统计信息"""
+        results = {}
+        for account_id in self.idle_accounts(accounts, current_account_id):
+            stats = self.freeze(account_id)
+            if stats:
+                results[account_id] = stats
+        return results
+
+    def report(self) -> dict:
+        """冷存储节省的空间和解压带来的额外切换耗时"""
+        cold = []
+        blob_bytes = archive_bytes = 0
+        for filename in os.listdir(self.root):
+            if filename.endswith(".tar.xz"):
+                account_id = filename[:-len(".tar.xz")]
+                meta = self._load_json(self.meta_path(account_id))
+                cold.append(account_id)
+                blob_bytes += meta.get("blob_bytes", 0)
+                archive_bytes += meta.get("archive_bytes", 0)
+        thaws = self._load_json(self.stats_file).get("thaws", [])
+        seconds = sorted(t["seconds"] for t in thaws)
+        return {
+            "cold_accounts": cold,
+            "blob_bytes": blob_bytes,
+            "archive_bytes": archive_bytes,
+            "saved_bytes": blob_bytes - archive_bytes,
+            "thaws": len(thaws),
+            "thaw_avg_seconds": sum(seconds) / len(seconds) if seconds else 0.0,
+            "thaw_max_seconds": seconds[-1] if seconds else 0.0,
+        }
@@ -7,13 +7,104 @@ import json
 import pickle
 from datetime import datetime
 from config import COOKIES_DIR, ensure_dirs
+from metadata_cache import get_metadata_cache
+
+
+# WebDriver add_cookie 接受的字段
+WEBDRIVER_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry', 'sameSite')
+# sameSite的取值（WebDriver和CDP相同）
+SAME_SITE_VALUES = ('Strict', 'Lax', 'None')
+
+
+def summarize_cookies(cookie_data: dict) -> dict:
+    """get_cookie_info 使用的摘要字段"""
+    return {
+        "saved_at": cookie_data.get("saved_at", "未知"),
+        "cookie_count": cookie_data.get("cookie_count", 0)
+    }
+
+
+def to_webdriver_cookie(cookie: dict) -> dict:
+    """整理成 add_cookie 可以直接使用的格式"""
+    clean = {k: cookie[k] for k in WEBDRIVER_FIELDS if k in cookie}
+    if 'expiry' in clean:
+        clean['expiry'] = int(clean['expiry'])
+    if clean.get('sameSite') not in SAME_SITE_VALUES:
+        clean.pop('sameSite', None)
+    return clean
+
+
+def to_cdp_cookie(cookie: dict) -> dict:
+    """
+    转换为CDP Network.setCookies 的 CookieParam
+    domain以.开头的是域Cookie；否则是只属于该主机的Cookie，用url指定（传domain会变成域Cookie）
+    """
+    param = {"name": cookie['name'], "value": cookie.get('value', ''), "path": cookie.get('path') or '/'}
+    domain = cookie.get('domain') or ''
+    if domain.startswith('.'):
+        param["domain"] = domain
+    else:
+        scheme = "https" if cookie.get('secure') else "http"
+        param["url"] = f"{scheme}://{domain}{param['path']}"
+    for key in ('secure', 'httpOnly'):
+        if key in cookie:
+            param[key] = bool(cookie[key])
+    if 'expiry' in cookie:
+        param["expires"] = float(cookie['expiry'])
+    same_site = cookie.get('sameSite')
+    # 浏览器拒绝没有secure的 SameSite=None
+    if same_site in SAME_SITE_VALUES and (same_site != 'None' or param.get('secure')):
+        param["sameSite"] = same_site
+    return param
 
 
 class CookieHandler:
     """Cookie处理类"""
     
-    def __init__(self):
-        ensure_dirs()
+    def __init__(self, cookies_dir: str = None):
+        """
+        Args:
+            cookies_dir: cookies文件目录，默认使用配置中的目录
+        """
+        if cookies_dir is None:
+            ensure_dirs()
+        self.cookies_dir = cookies_dir or COOKIES_DIR
+        # 账号ID -> (文件大小和修改时间, 原始cookies, WebDriver格式, CDP格式)，文件不变时不再解析JSON
+        self._cache = {}
+        # 列出账号时使用的摘要（保存在目录的索引文件中）
+        self.metadata = get_metadata_cache(self.cookies_dir, summarize_cookies, "cookies")
+    
+    def _cookie_file(self, account_id: str) -> str:
+        return os.path.join(self.cookies_dir, f"{account_id}.json")
+    
+    @staticmethod
+    def _signature(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+    
+    def _remember(self, account_id: str, signature, cookies: list) -> tuple:
+        entry = (signature, cookies,
+                 [to_webdriver_cookie(c) for c in cookies if c.get('name')],
+                 [to_cdp_cookie(c) for c in cookies if c.get('name')])
+        self._cache[account_id] = entry
+        return entry
+    
+    def _load_entry(self, account_id: str):
+        """账号的cookies（原始和整理好的），文件不存在返回None"""
+        cookie_file = self._cookie_file(account_id)
+        signature = self._signature(cookie_file)
+        if signature is None:
+            self._cache.pop(account_id, None)
+            return None
+        cached = self._cache.get(account_id)
+        if cached and cached[0] == signature:
+            return cached
+        with open(cookie_file, 'r', encoding='utf-8') as f:
+            cookie_data = json.load(f)
+        return self._remember(account_id, signature, cookie_data.get("cookies", []))
     
     def save_cookies(self, account_id: str, cookies: list, driver=None) -> bool:
         """
@@ -31,7 +122,7 @@ class CookieHandler:
             if driver:
                 cookies = driver.get_cookies()
             
-            cookie_file = os.path.join(COOKIES_DIR, f"{account_id}.json")
+            cookie_file = self._cookie_file(account_id)
             cookie_data = {
                 "account_id": account_id,
                 "cookies": cookies,
@@ -41,6 +132,8 @@ class CookieHandler:
             
             with open(cookie_file, 'w', encoding='utf-8') as f:
                 json.dump(cookie_data, f, ensure_ascii=False, indent=2)
+            self._remember(account_id, self._signature(cookie_file), list(cookies))
+            self.metadata.update(account_id, cookie_data)
             
             return True
         except Exception as e:
@@ -58,45 +151,41 @@ class CookieHandler:
             list: cookie列表，失败返回空列表
         """
         try:
-            cookie_file = os.path.join(COOKIES_DIR, f"{account_id}.json")
-            if not os.path.exists(cookie_file):
-                return []
-            
-            with open(cookie_file, 'r', encoding='utf-8') as f:
-                cookie_data = json.load(f)
-            
-            return cookie_data.get("cookies", [])
+            entry = self._load_entry(account_id)
+            return list(entry[1]) if entry else []
         except Exception as e:
             print(f"加载Cookie失败: {e}")
             return []
     
-    def apply_cookies(self, driver, account_id: str) -> bool:
+    def apply_cookies(self, driver, account_id: str, bulk: bool = True) -> bool:
         """
         将保存的cookies应用到浏览器
+        Edge/Chrome通过CDP一次写入全部cookies（包括其他域名的cookies和sameSite）；
+        其他浏览器或CDP调用失败时逐个add_cookie，只能写入当前页面域名的cookies
         
         Args:
             driver: selenium webdriver实例
             account_id: 账号ID
+            bulk: 是否尝试CDP批量写入
         
         Returns:
             bool: 是否应用成功
         """
         try:
-            cookies = self.load_cookies(account_id)
-            if not cookies:
+            entry = self._load_entry(account_id)
+            if not entry or not entry[1]:
                 return False
             
+            if bulk and self._apply_cdp(driver, entry[3]):
+                return True
+            
             # 先删除现有cookies
             driver.delete_all_cookies()
             
             # 添加保存的cookies
-            for cookie in cookies:
-                # 处理可能的兼容性问题
+            for cookie in entry[2]:
                 try:
-                    # 移除可能导致问题的字段
-                    cookie_clean = {k: v for k, v in cookie.items() 
-                                   if k in ['name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry']}
-                    driver.add_cookie(cookie_clean)
+                    driver.add_cookie(cookie)
                 except Exception as cookie_error:
                     print(f"添加单个cookie失败: {cookie_error}")
                     continue
@@ -106,6 +195,35 @@ class CookieHandler:
             print(f"应用Cookie失败: {e}")
             return False
     
+    def apply_cookies_bulk(self, driver, account_id: str) -> bool:
+        """
+        只用CDP批量写入（不需要先打开对应域名的页面）
+        
+        Returns:
+            bool: 是否写入成功，浏览器不支持CDP、调用失败或没有保存的cookies时返回False
+        """
+        try:
+            entry = self._load_entry(account_id)
+        except Exception as e:
+            print(f"加载Cookie失败: {e}")
+            return False
+        return bool(entry and entry[1]) and self._apply_cdp(driver, entry[3])
+    
+    @staticmethod
+    def _apply_cdp(driver, cookies: list) -> bool:
+        """清空浏览器cookies后用一次 Network.setCookies 写入，浏览器不支持CDP时返回False"""
+        execute = getattr(driver, "execute_cdp_cmd", None)
+        if execute is None:
+            return False
+        try:
+            # 每个账号使用独立的浏览器配置文件，清空全部cookies不影响其他账号
+            execute("Network.clearBrowserCookies", {})
+            execute("Network.setCookies", {"cookies": cookies})
+            return True
+        except Exception as e:
+            print(f"CDP批量设置Cookie失败，改为逐个添加: {e}")
+            return False
+    
     def delete_cookies(self, account_id: str) -> bool:
         """
         删除账号的cookies文件
@@ -117,9 +235,11 @@ class CookieHandler:
             bool: 是否删除成功
         """
         try:
-            cookie_file = os.path.join(COOKIES_DIR, f"{account_id}.json")
+            cookie_file = self._cookie_file(account_id)
+            self._cache.pop(account_id, None)
             if os.path.exists(cookie_file):
                 os.remove(cookie_file)
+            self.metadata.discard(account_id)
             return True
         except Exception as e:
             print(f"删除Cookie失败: {e}")
@@ -127,7 +247,7 @@ class CookieHandler:
     
     def get_cookie_info(self, account_id: str) -> dict:
         """
-        获取cookie信息（不包含实际cookie值）
+        获取cookie信息（不包含实际cookie值），文件没有变化时不读取文件
         
         Args:
             account_id: 账号ID
@@ -136,17 +256,10 @@ class CookieHandler:
             dict: cookie信息
         """
         try:
-            cookie_file = os.path.join(COOKIES_DIR, f"{account_id}.json")
-            if not os.path.exists(cookie_file):
+            summary = self.metadata.get(account_id)
+            if summary is None:
                 return {"exists": False}
             
-            with open(cookie_file, 'r', encoding='utf-8') as f:
-                cookie_data = json.load(f)
-            
-            return {
-                "exists": True,
-                "saved_at": cookie_data.get("saved_at", "未知"),
-                "cookie_count": cookie_data.get("cookie_count", 0)
-            }
+            return {"exists": True, **summary}
         except Exception as e:
             return {"exists": False, "error": str(e)}
@@ -0,0 +1,280 @@
+"""
+暴雪战网账号切换器 - Cookie行存储
+战网客户端的登录会话保存在内置浏览器的Cookies数据库中（BrowserCaches\\<配置>\\Network\\Cookies，SQLite）。
+这里只提取战网/网易相关域名的行，所有账号共用一个小数据库保存；切换时在一个事务中把这些行写入当前的
+Cookies数据库（读取使用SQLite备份接口，不复制整个文件），几MB的文件复制变成几行写入。
+Cookie值用Local State中的密钥加密，保存时记录密钥指纹，当前目录的密钥不同时不能写入
+"""
+import os
+import json
+import time
+import base64
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+# 需要保存的Cookie域名（host_key包含其中之一）
+HOST_PATTERNS = ("battle.net", "battlenet", "blizzard", "netease", "163.com")
+
+# 相对LocalAppData的Cookies数据库位置（新版Chromium在Network目录下）
+COOKIE_DB_GLOBS = ("BrowserCaches/*/Network/Cookies", "BrowserCaches/*/Cookies")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    account_id TEXT NOT NULL,
+    db TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    key_fingerprint TEXT,
+    saved_at REAL,
+    PRIMARY KEY (account_id, db)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cookies (
+    account_id TEXT NOT NULL,
+    db TEXT NOT NULL,
+    host_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cookies_account ON cookies (account_id, db);
+"""
+
+
+def host_clause(column: str = "host_key") -> tuple:
+    """匹配战网/网易域名的WHERE子句和参数"""
+    clause = " OR ".join(f"{column} LIKE ?" for _ in HOST_PATTERNS)
+    return f"({clause})", [f"%{p}%" for p in HOST_PATTERNS]
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"b64": base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["b64"])
+    return value
+
+
+def find_cookie_dbs(local_root: str) -> list:
+    """LocalAppData中的Cookies数据库（相对路径，/分隔）"""
+    found = []
+    caches = os.path.join(local_root, "BrowserCaches")
+    try:
+        profiles = sorted(os.listdir(caches))
+    except OSError:
+        return found
+    for profile in profiles:
+        for pattern in COOKIE_DB_GLOBS:
+            rel = pattern.replace("*", profile)
+            if os.path.isfile(os.path.join(local_root, *rel.split('/'))):
+                found.append(rel)
+                break
+    return found
+
+
+def key_fingerprint(local_root: str, db: str) -> str:
+    """Cookies数据库所属配置的Local State中加密密钥的指纹，没有密钥时返回None"""
+    parts = db.split('/')
+    # BrowserCaches/<配置>/Local State
+    path = os.path.join(local_root, parts[0], parts[1], "Local State")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            key = json.load(f).get("os_crypt", {}).get("encrypted_key")
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not key:
+        return None
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def read_rows(db_path: str) -> tuple:
+    """
+    用备份接口把Cookies数据库读到内存中（客户端正在写入时也得到一致的内容），返回战网相关的行
+
+    Returns:
+        (列名列表, [行])
+    """
+    src = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=5)
+    mem = sqlite3.connect(":memory:")
+    try:
+        src.backup(mem)
+        where, params = host_clause()
+        cursor = mem.execute(f"SELECT * FROM cookies WHERE {where}", params)
+        columns = [d[0] for d in cursor.description]
+        return columns, cursor.fetchall()
+    finally:
+        src.close()
+        mem.close()
+
+
+def _fill_value(declared_type: str):
+    """目标表中必填、没有默认值、保存时没有的列使用的值"""
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return 0
+    if "BLOB" in declared_type:
+        return b""
+    return ""
+
+
+def upsert_rows(db_path: str, columns: list, rows: list, timeout: float = 5.0) -> int:
+    """
+    在一个事务中替换Cookies数据库中的战网相关行：删除当前的（上一个账号的），写入保存的
+    两边Chromium版本不同时只写入共同的列，返回写入的行数
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        table = conn.execute("PRAGMA table_info(cookies)").fetchall()
+        if not table:
+            raise sqlite3.DatabaseError("没有cookies表")
+        live = {row[1]: row for row in table}
+        keep = [i for i, c in enumerate(columns) if c in live]
+        names = [columns[i] for i in keep]
+        fill = [(name, _fill_value(info[2])) for name, info in live.items()
+                if info[3] and info[4] is None and not info[5] and name not in names]
+        names += [name for name, _ in fill]
+        values = [tuple(row[i] for i in keep) + tuple(v for _, v in fill) for row in rows]
+
+        where, params = host_clause()
+        placeholders = ", ".join("?" for _ in names)
+        column_list = ", ".join(f'"{n}"' for n in names)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DELETE FROM cookies WHERE {where}", params)
+            conn.executemany(f"INSERT OR REPLACE INTO cookies ({column_list}) VALUES ({placeholders})", values)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(values)
+    finally:
+        conn.close()
+
+
+class CookieStore:
+    """所有账号的战网Cookie行（SQLite）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    # ---------- 保存 ----------
+
+    def capture(self, account_id: str, local_root: str) -> dict:
+        """
+        从当前目录的Cookies数据库中提取战网相关的行保存为账号的Cookie
+
+        Returns:
+            dict: {"dbs": 数据库数, "rows": 行数, "seconds": 耗时}
+        """
+        start = time.perf_counter()
+        sources = []
+        for db in find_cookie_dbs(local_root):
+            try:
+                columns, rows = read_rows(os.path.join(local_root, *db.split('/')))
+            except sqlite3.Error as e:
+                print(f"读取Cookies数据库失败: {db}, 错误: {e}")
+                continue
+            sources.append((db, columns, rows, key_fingerprint(local_root, db)))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cookies WHERE account_id=?", (account_id,))
+            conn.execute("DELETE FROM sources WHERE account_id=?", (account_id,))
+            for db, columns, rows, fingerprint in sources:
+                conn.execute(
+                    "INSERT INTO sources (account_id, db, columns, key_fingerprint, saved_at) VALUES (?, ?, ?, ?, ?)",
+                    (account_id, db, json.dumps(columns), fingerprint, time.time()))
+                host = columns.index("host_key")
+                name = columns.index("name")
+                conn.executemany(
+                    "INSERT INTO cookies (account_id, db, host_key, name, data) VALUES (?, ?, ?, ?, ?)",
+                    ((account_id, db, row[host], row[name], json.dumps([_encode(v) for v in row]))
+                     for row in rows))
+        return {
+            "dbs": len(sources),
+            "rows": sum(len(s[2]) for s in sources),
+            "seconds": time.perf_counter() - start,
+        }
+
+    def has_rows(self, account_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM cookies WHERE account_id=? LIMIT 1", (account_id,)).fetchone()
+        return row is not None
+
+    def _sources(self, account_id: str) -> list:
+        with self._connect() as conn:
+            sources = conn.execute(
+                "SELECT db, columns, key_fingerprint FROM sources WHERE account_id=?", (account_id,)).fetchall()
+            result = []
+            for db, columns, fingerprint in sources:
+                rows = conn.execute(
+                    "SELECT data FROM cookies WHERE account_id=? AND db=?", (account_id, db)).fetchall()
+                result.append((db, json.loads(columns), fingerprint,
+                               [tuple(_decode(v) for v in json.loads(r[0])) for r in rows]))
+        return result
+
+    def delete(self, account_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cookies WHERE account_id=?", (account_id,))
+            conn.execute("DELETE FROM sources WHERE account_id=?", (account_id,))
+
+    # ---------- 写入 ----------
+
+    def apply(self, account_id: str, local_root: str) -> dict:
+        """
+        把账号的Cookie行写入当前目录的Cookies数据库（客户端必须已关闭）
+        任一数据库不存在或密钥指纹不一致时不写入，由调用方改为写入整个Cookies文件
+
+        Returns:
+            dict: {"applied": 是否写入, "rows": 写入行数, "reason": 未写入的原因, "seconds": 耗时}
+        """
+        start = time.perf_counter()
+        result = {"applied": False, "rows": 0, "reason": None, "seconds": 0.0}
+        sources = self._sources(account_id)
+        if not sources:
+            result["reason"] = "没有保存的Cookie"
+            return result
+        for db, _, fingerprint, _ in sources:
+            if not os.path.isfile(os.path.join(local_root, *db.split('/'))):
+                result["reason"] = f"{db} 不存在"
+                return result
+            if key_fingerprint(local_root, db) != fingerprint:
+                result["reason"] = f"{db} 的加密密钥不同"
+                return result
+        try:
+            for db, columns, _, rows in sources:
+                result["rows"] += upsert_rows(os.path.join(local_root, *db.split('/')), columns, rows)
+        except sqlite3.Error as e:
+            print(f"写入Cookies失败: {e}")
+            result["reason"] = str(e)
+            return result
+        result["applied"] = True
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def stats(self) -> dict:
+        """保存的账号数、行数和数据库大小"""
+        with self._connect() as conn:
+            accounts, rows = conn.execute(
+                "SELECT COUNT(DISTINCT account_id), COUNT(*) FROM cookies").fetchone()
+        try:
+            size = os.path.getsize(self.db_path)
+        except OSError:
+            size = 0
+        return {"accounts": accounts, "rows": rows, "bytes": size}
@@ -0,0 +1,320 @@
+"""
+暴雪战网账号切换器 - 复制引擎
+目录只遍历一次，文件按大小排序：小文件（大量浏览器缓存）交给线程池并行复制，
+大文件在当前线程分块复制（优先copy_file_range/sendfile，否则复用同一块缓冲区），
+按阶段统计耗时和吞吐量；替代shutil.copytree/copy2和robocopy。
+文件系统支持时可改用写时复制克隆或硬链接（见fs_clone），只操作元数据
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fs_clone import MODE_COPY, MODE_REFLINK, MODE_HARDLINK, reflink
+
+
+# 小于此大小的文件一次读入内存后写出，在线程池中并行复制
+SMALL_FILE_LIMIT = 1024 * 1024
+# 大文件每次复制的块大小
+CHUNK_SIZE = 4 * 1024 * 1024
+# 每个线程池任务处理的小文件数
+BATCH_SIZE = 32
+# 原子写入时使用的临时文件后缀
+TMP_SUFFIX = ".bnswitch.tmp"
+
+
+class ContentMismatchError(OSError):
+    """写入的内容与预期的哈希不一致（复制过程中源文件被修改），目标文件已删除"""
+
+
+def default_workers() -> int:
+    return min(16, (os.cpu_count() or 4) * 2)
+
+
+def _kernel_copy(in_fd: int, out_fd: int, chunk: int) -> bool:
+    """在内核中复制（不经过用户态缓冲区），平台不支持时返回False"""
+    for name in ('copy_file_range', 'sendfile'):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        copied = 0
+        try:
+            while True:
+                if name == 'copy_file_range':
+                    n = func(in_fd, out_fd, chunk)
+                else:
+                    n = func(out_fd, in_fd, None, chunk)
+                if not n:
+                    return True
+                copied += n
+        except OSError:
+            # 一开始就失败（跨文件系统、文件系统不支持等）换下一种方式
+            if copied:
+                raise
+    return False
+
+
+class CopyEngine:
+    """多线程分块复制引擎"""
+
+    def __init__(self, workers: int = None, small_limit: int = SMALL_FILE_LIMIT, chunk_size: int = CHUNK_SIZE):
+        self.workers = workers or default_workers()
+        self.small_limit = small_limit
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="copy")
+            return self._pool
+
+    def map(self, func, items) -> list:
+        """在线程池中并行执行func（哈希等I/O密集操作），结果按输入顺序返回"""
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        return list(self.pool.map(func, items))
+
+    # ---------- 单个文件 ----------
+
+    def _buffer(self) -> bytearray:
+        """每个线程复用一块缓冲区"""
+        buf = getattr(self._local, 'buffer', None)
+        if buf is None or len(buf) != self.chunk_size:
+            buf = self._local.buffer = bytearray(self.chunk_size)
+        return buf
+
+    def _copy_small(self, src: str, dst: str, h=None):
+        with open(src, 'rb') as f:
+            data = f.read()
+        if h is not None:
+            h.update(data)
+        with open(dst, 'wb') as f:
+            f.write(data)
+
+    def _copy_large(self, src: str, dst: str, h=None):
+        with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+            # 需要计算写入内容的哈希时不能在内核中复制
+            if h is None and _kernel_copy(fsrc.fileno(), fdst.fileno(), self.chunk_size):
+                return
+            buf = self._buffer()
+            view = memoryview(buf)
+            while True:
+                n = fsrc.readinto(buf)
+                if not n:
+                    break
+                if h is not None:
+                    h.update(view[:n])
+                fdst.write(view[:n])
+
+    def _hash_target(self, path: str, h):
+        """克隆和硬链接没有经过缓冲区，读取目标文件计算哈希"""
+        buf = self._buffer()
+        view = memoryview(buf)
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+
+    def copy_file(self, src: str, dst: str, size: int = None, mtime_ns: int = None, atomic: bool = False,
+                  mode: str = MODE_COPY, link: bool = False, expected: str = None, digest=None):
+        """
+        复制单个文件
+
+        Args:
+            size: 源文件大小（已知时避免再stat一次）
+            mtime_ns: 写入后设置的修改时间
+            atomic: 先写同目录临时文件再替换，目标文件不会出现写了一半的状态
+            mode: copy / reflink（克隆失败时退回复制）/ hardlink
+            link: hardlink模式下该文件是否可以硬链接（写入后不再修改的文件）
+            expected: 写入内容的哈希（十六进制），与实际写入的内容不一致时删除目标文件并抛出ContentMismatchError
+            digest: 创建哈希对象的函数（与expected一起使用），如 lambda: hashlib.blake2b(digest_size=16)
+
+        Returns:
+            int: 实际复制的字节数（克隆和硬链接为0）
+        """
+        if size is None:
+            size = os.path.getsize(src)
+        target = dst + TMP_SUFFIX if atomic else dst
+        h = digest() if expected is not None else None
+        try:
+            written = 0
+            # 硬链接与源文件共用inode，不能再修改时间
+            linked = mode == MODE_HARDLINK and link and self._hardlink(src, target)
+            cloned = linked or (mode == MODE_REFLINK and reflink(src, target))
+            if not cloned:
+                if size < self.small_limit:
+                    self._copy_small(src, target, h)
+                else:
+                    self._copy_large(src, target, h)
+                written = size
+            if h is not None:
+                if cloned:
+                    self._hash_target(target, h)
+                if h.hexdigest() != expected:
+                    raise ContentMismatchError(f"写入的内容与预期不一致（源文件已被修改）: {src}")
+            if mtime_ns is not None and not linked:
+                os.utime(target, ns=(mtime_ns, mtime_ns))
+            if atomic:
+                os.replace(target, dst)
+            return written
+        except BaseException as e:
+            if (atomic or isinstance(e, ContentMismatchError)) and os.path.exists(target):
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+            raise
+
+    @staticmethod
+    def _hardlink(src: str, target: str) -> bool:
+        """创建硬链接，不在同一卷等原因失败时返回False（退回复制）"""
+        try:
+            if os.path.lexists(target):
+                os.remove(target)
+            os.link(src, target)
+            return True
+        except OSError:
+            return False
+
+    # ---------- 批量 ----------
+
+    def _copy_batch(self, batch: list, atomic: bool, mode: str, progress=None, cancel=None, digest=None) -> tuple:
+        """返回 (完成文件数, 文件总字节数, 实际复制字节数, 错误列表)"""
+        done = 0
+        copied = 0
+        written = 0
+        errors = []
+        for src, dst, size, mtime_ns, *rest in batch:
+            if cancel is not None and cancel.is_set():
+                break
+            link = bool(rest and rest[0])
+            expected = rest[1] if len(rest) > 1 else None
+            try:
+                written += self.copy_file(src, dst, size, mtime_ns, atomic, mode, link, expected, digest)
+                copied += size
+                done += 1
+            except OSError as e:
+                errors.append((src, e))
+            if progress:
+                progress(1, size)
+        return done, copied, written, errors
+
+    def copy_files(self, jobs, atomic: bool = False, mode: str = MODE_COPY, progress=None, cancel=None,
+                   digest=None) -> dict:
+        """
+        复制一批文件
+
+        Args:
+            jobs: [(源路径, 目标路径, 大小, 修改时间ns或None[, 可否硬链接[, 预期哈希]])]，目标所在目录会自动创建
+            mode: copy / reflink / hardlink，见copy_file
+            digest: 有预期哈希的任务用它计算写入内容的哈希，不一致的文件计入错误，见copy_file
+            progress: 每处理完一个文件调用 progress(文件数, 字节数)，可能在工作线程中调用
+            cancel: threading.Event，设置后不再开始新的文件（已开始的文件会写完）
+
+        Returns:
+            dict: 统计信息 {"files", "bytes", "errors", "cancelled", "seconds", "phases": {阶段: {...}}}
+        """
+        start = time.perf_counter()
+        jobs = sorted(jobs, key=lambda job: job[2])
+        phases = {}
+
+        # 预先创建所有目标目录（每个目录只创建一次）
+        t = time.perf_counter()
+        parents = {os.path.dirname(job[1]) for job in jobs}
+        for parent in sorted(parents):
+            os.makedirs(parent, exist_ok=True)
+        phases["mkdir"] = {"dirs": len(parents), "seconds": time.perf_counter() - t}
+
+        split = 0
+        while split < len(jobs) and jobs[split][2] < self.small_limit:
+            split += 1
+        small, large = jobs[:split], jobs[split:]
+        errors = []
+
+        # 小文件分批提交到线程池，大文件同时在当前线程分块复制
+        small_start = time.perf_counter()
+        futures = [self.pool.submit(self._copy_batch, small[i:i + BATCH_SIZE], atomic, mode, progress, cancel, digest)
+                   for i in range(0, len(small), BATCH_SIZE)]
+
+        large_start = time.perf_counter()
+        done, large_bytes, large_written, large_errors = self._copy_batch(large, atomic, mode, progress, cancel,
+                                                                          digest)
+        large_seconds = time.perf_counter() - large_start
+        errors.extend(large_errors)
+
+        small_bytes = small_written = 0
+        for future in futures:
+            batch_done, copied, written, batch_errors = future.result()
+            done += batch_done
+            small_bytes += copied
+            small_written += written
+            errors.extend(batch_errors)
+        small_seconds = time.perf_counter() - small_start
+
+        phases["small"] = self._phase(len(small), small_bytes, small_seconds)
+        phases["large"] = self._phase(len(large), large_bytes, large_seconds)
+        for src, e in errors:
+            print(f"复制文件失败: {src}, 错误: {e}")
+        return {
+            "files": done,
+            "bytes": small_bytes + large_bytes,
+            "bytes_copied": small_written + large_written,
+            "errors": len(errors),
+            "cancelled": bool(cancel is not None and cancel.is_set() and done + len(errors) < len(jobs)),
+            "seconds": time.perf_counter() - start,
+            "phases": phases,
+            "mode": mode,
+        }
+
+    @staticmethod
+    def _phase(files: int, nbytes: int, seconds: float) -> dict:
+        return {
+            "files": files,
+            "bytes": nbytes,
+            "seconds": seconds,
+            "mb_per_s": nbytes / 1024 / 1024 / seconds if seconds > 0 else 0.0,
+        }
+
+    def copy_tree(self, src_root: str, dst_root: str, exclude_dirs=None, preserve_times: bool = True,
+                  skip=None) -> dict:
+        """
+        复制整个目录树（目标目录可以已存在，同名文件被覆盖）
+        exclude_dirs: 任意层级下跳过的目录名
+        skip: 过滤函数 (相对路径, 是否目录) -> 是否跳过（快照规则）
+        """
+        from snapshot_store import walk_tree
+        t = time.perf_counter()
+        files, dirs = walk_tree(src_root, exclude_dirs, skip)
+        list_phase = {"files": len(files), "dirs": len(dirs), "seconds": time.perf_counter() - t}
+
+        os.makedirs(dst_root, exist_ok=True)
+        for rel in sorted(dirs):
+            os.makedirs(os.path.join(dst_root, *rel.split('/')), exist_ok=True)
+        jobs = [
+            (os.path.join(src_root, *rel.split('/')), os.path.join(dst_root, *rel.split('/')),
+             st.st_size, st.st_mtime_ns if preserve_times else None)
+            for rel, st in files.items()
+        ]
+        stats = self.copy_files(jobs)
+        stats["phases"] = {"list": list_phase, **stats["phases"]}
+        stats["seconds"] += list_phase["seconds"]
+        return stats
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> CopyEngine:
+    """全局共享的复制引擎"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = CopyEngine()
+        return _engine
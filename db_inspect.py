@@ -0,0 +1,350 @@
+"""
+暴雪战网账号切换器 - 数据库检查
+只读检查战网客户端的SQLite数据库（Account\\<ID>\\account.db、内置浏览器的Cookies）：
+先用只读URI（mode=ro）打开；客户端锁定数据库且没有未完成的写入时用 immutable=1 跳过锁直接读取；
+有写入进行中或immutable读取失败时用SQLite备份接口读到内存中，得到一致的内容。
+不复制整个文件，也不以读写方式打开（不会在客户端的数据库旁边留下日志文件）。
+结果按 (路径, 大小, 修改时间) 缓存，当前目录和快照存储中的所有数据库在线程池中并行检查
+"""
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from copy_engine import get_engine
+from cookie_store import host_clause, find_cookie_dbs
+
+
+# 检查内容：所有表的列、行数和示例行 / 另加战网相关的Cookie
+KIND_TABLES = "tables"
+KIND_COOKIES = "cookies"
+
+# 打开方式
+METHOD_RO = "ro"
+METHOD_IMMUTABLE = "immutable"
+METHOD_BACKUP = "backup"
+
+# 每个表保留的示例行数
+SAMPLE_ROWS = 2
+# 只读打开时等待锁的时间（秒），客户端一直持有排他锁时不用等太久
+LOCK_TIMEOUT = 0.2
+# 备份到内存时最多等待写入完成的时间（秒）
+BACKUP_TIMEOUT = 5.0
+# 缓存的结果数
+CACHE_SIZE = 1024
+
+# 客户端数据库相对LocalAppData的位置
+ACCOUNT_DB_DIR = "Account"
+ACCOUNT_DB_NAME = "account.db"
+# 快照清单中按文件名识别的数据库
+STORED_DB_NAMES = {ACCOUNT_DB_NAME: KIND_TABLES, "cookies": KIND_COOKIES}
+# 数据库旁边的日志文件（内容变化时缓存也要失效）
+SIDECAR_SUFFIXES = ("-journal", "-wal")
+
+
+def sqlite_uri(path: str, **params) -> str:
+    """
+    SQLite的文件URI（Windows路径转换为 file:///C:/...，路径中的 ? # % 等字符转义）
+    """
+    path = os.path.abspath(path).replace('\\', '/')
+    if not path.startswith('/'):
+        path = '/' + path
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return f"file://{quote(path, safe='/:')}" + (f"?{query}" if query else "")
+
+
+def file_signature(path: str) -> tuple:
+    """数据库和日志文件的 (大小, 修改时间)，任一变化表示内容可能变化"""
+    st = os.stat(path)
+    sig = [st.st_size, st.st_mtime_ns]
+    for suffix in SIDECAR_SUFFIXES:
+        try:
+            st = os.stat(path + suffix)
+            sig += [st.st_size, st.st_mtime_ns]
+        except OSError:
+            sig += [None, None]
+    return tuple(sig)
+
+
+def _write_pending(path: str) -> bool:
+    """有非空的回滚日志（写入事务进行中或中断）时，跳过锁直接读取可能读到写入一半的页面"""
+    try:
+        return os.path.getsize(path + "-journal") > 0
+    except OSError:
+        return False
+
+
+def _lock_error(e: Exception) -> bool:
+    message = str(e).lower()
+    return "locked" in message or "busy" in message or "unable to open" in message
+
+
+def _run(uri: str, func, timeout: float):
+    conn = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False)
+    try:
+        return func(conn)
+    finally:
+        conn.close()
+
+
+def _run_backup(path: str, func, timeout: float):
+    """用备份接口把数据库读到内存中再执行func；写入进行中时等待，超时放弃"""
+    deadline = time.monotonic() + timeout
+
+    def progress(status, remaining, total):
+        if time.monotonic() > deadline:
+            raise sqlite3.OperationalError("等待数据库写入完成超时")
+
+    src = sqlite3.connect(sqlite_uri(path, mode="ro"), uri=True, timeout=LOCK_TIMEOUT, check_same_thread=False)
+    mem = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        src.backup(mem, pages=256, progress=progress, sleep=0.05)
+        return func(mem)
+    finally:
+        src.close()
+        mem.close()
+
+
+def read_consistent(path: str, func, timeout: float = BACKUP_TIMEOUT) -> tuple:
+    """
+    以只读方式打开数据库执行 func(conn)
+
+    Returns:
+        (func的返回值, 打开方式 METHOD_*)
+
+    Raises:
+        sqlite3.Error: 三种方式都失败
+    """
+    try:
+        return _run(sqlite_uri(path, mode="ro"), func, LOCK_TIMEOUT), METHOD_RO
+    except sqlite3.OperationalError as e:
+        if not _lock_error(e):
+            raise
+    if not _write_pending(path):
+        try:
+            return _run(sqlite_uri(path, mode="ro", immutable=1), func, LOCK_TIMEOUT), METHOD_IMMUTABLE
+        except sqlite3.DatabaseError:
+            # 读取期间客户端开始写入，改用备份接口
+            pass
+    return _run_backup(path, func, timeout), METHOD_BACKUP
+
+
+# ---------- 检查内容 ----------
+
+def _quote_name(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _describe_tables(conn) -> dict:
+    """所有表的列、行数和示例行"""
+    tables = {}
+    names = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    for name in names:
+        try:
+            cursor = conn.execute(f"SELECT * FROM {_quote_name(name)} LIMIT {SAMPLE_ROWS}")
+            columns = [d[0] for d in cursor.description]
+            sample = cursor.fetchall()
+            count = conn.execute(f"SELECT COUNT(*) FROM {_quote_name(name)}").fetchone()[0]
+            tables[name] = {"columns": columns, "rows": count, "sample_rows": sample}
+        except sqlite3.Error as e:
+            tables[name] = {"error": str(e)}
+    return tables
+
+
+def _describe_cookies(conn) -> dict:
+    """表结构和战网相关的Cookie（只记录值是否存在和加密值长度，不保存Cookie值）"""
+    result = {"tables": _describe_tables(conn), "session_cookies": []}
+    if "cookies" not in result["tables"]:
+        return result
+    where, params = host_clause()
+    cursor = conn.execute(
+        f"SELECT host_key, name, value, encrypted_value, expires_utc FROM cookies WHERE {where}", params)
+    for host, name, value, encrypted, expires in cursor:
+        result["session_cookies"].append({
+            "host": host,
+            "name": name,
+            "has_value": bool(value),
+            "encrypted_bytes": len(encrypted or b""),
+            "expires_utc": expires,
+        })
+    for info in result["tables"].values():
+        # Cookie表的示例行包含加密的会话值，不放进结果
+        info.pop("sample_rows", None)
+    return result
+
+
+DESCRIBERS = {
+    KIND_TABLES: lambda conn: {"tables": _describe_tables(conn)},
+    KIND_COOKIES: _describe_cookies,
+}
+
+
+class DbInspector:
+    """带缓存的只读数据库检查"""
+
+    def __init__(self, engine=None, cache_size: int = CACHE_SIZE):
+        # 并行检查使用复制引擎的线程池（sqlite3查询期间释放GIL）
+        self.engine = engine or get_engine()
+        self.cache_size = cache_size
+        # (路径, 检查内容) -> (文件签名, 结果)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def inspect(self, path: str, kind: str = KIND_TABLES) -> dict:
+        """
+        检查一个数据库，内容没有变化时直接返回缓存的结果（调用方不要修改返回的dict）
+
+        Returns:
+            dict: {"path", "kind", "method": 打开方式, "seconds": 读取耗时, "tables": {表名: {"columns",
+                   "rows", "sample_rows"}}}，KIND_COOKIES另有 "session_cookies"；失败时有 "error"
+        """
+        key = (os.path.abspath(path), kind)
+        try:
+            sig = file_signature(path)
+        except OSError as e:
+            return {"path": path, "kind": kind, "error": str(e)}
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == sig:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        start = time.perf_counter()
+        try:
+            described, method = read_consistent(path, DESCRIBERS[kind])
+        except sqlite3.Error as e:
+            print(f"读取数据库失败: {path}, 错误: {e}")
+            return {"path": path, "kind": kind, "error": str(e)}
+        result = {"path": path, "kind": kind, "method": method, "seconds": time.perf_counter() - start,
+                  **described}
+
+        with self._lock:
+            self._cache[key] = (sig, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def inspect_many(self, items) -> list:
+        """并行检查 [(路径, 检查内容)]，结果按输入顺序返回"""
+        return self.engine.map(lambda item: self.inspect(*item), items)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+# ---------- 数据库列表 ----------
+
+def live_databases(local_root: str) -> list:
+    """
+    当前战网目录中的数据库
+
+    Returns:
+        list: [(说明, 路径, 检查内容)]，说明为相对LocalAppData的路径
+    """
+    found = []
+    account_dir = os.path.join(local_root, ACCOUNT_DB_DIR)
+    try:
+        folders = sorted(os.listdir(account_dir))
+    except OSError:
+        folders = []
+    for folder in folders:
+        path = os.path.join(account_dir, folder, ACCOUNT_DB_NAME)
+        if os.path.isfile(path):
+            found.append((f"{ACCOUNT_DB_DIR}/{folder}/{ACCOUNT_DB_NAME}", path, KIND_TABLES))
+    for rel in find_cookie_dbs(local_root):
+        found.append((rel, os.path.join(local_root, *rel.split('/')), KIND_COOKIES))
+    return found
+
+
+def stored_databases(store) -> list:
+    """
+    快照存储中各账号保存的数据库（blob），内容相同的blob只列出一次
+    冷存储中已归档的blob不在列表中
+
+    Returns:
+        list: [(说明列表 ["账号ID:相对路径", ...], blob路径, 检查内容)]
+    """
+    blobs = OrderedDict()
+    try:
+        filenames = sorted(os.listdir(store.manifests_dir))
+    except OSError:
+        return []
+    for filename in filenames:
+        if not filename.endswith('.json'):
+            continue
+        snapshot_id = filename[:-5]
+        manifest = store.load_manifest(snapshot_id) or {}
+        for tree in manifest.get('trees', {}).values():
+            for rel, entry in tree.get('files', {}).items():
+                kind = STORED_DB_NAMES.get(rel.rsplit('/', 1)[-1].lower())
+                if kind is None:
+                    continue
+                item = blobs.setdefault(entry['blob'], ([], kind))
+                item[0].append(f"{snapshot_id}:{rel}")
+    return [(labels, store.blob_path(blob_id), kind) for blob_id, (labels, kind) in blobs.items()
+            if store.has_blob(blob_id)]
+
+
+def inventory(local_root: str = None, store=None, inspector=None) -> dict:
+    """
+    检查当前目录和快照存储中的所有数据库
+
+    Returns:
+        dict: {"live": [(说明, 结果)], "stored": [(说明列表, 结果)], "databases": 检查的数据库数,
+               "seconds": 耗时, "cache": 缓存统计}
+    """
+    inspector = inspector or get_inspector()
+    start = time.perf_counter()
+    live = live_databases(local_root) if local_root else []
+    stored = stored_databases(store) if store is not None else []
+    items = [(path, kind) for _, path, kind in live] + [(path, kind) for _, path, kind in stored]
+    results = inspector.inspect_many(items)
+    return {
+        "live": [(label, result) for (label, _, _), result in zip(live, results)],
+        "stored": [(labels, result) for (labels, _, _), result in zip(stored, results[len(live):])],
+        "databases": len(items),
+        "seconds": time.perf_counter() - start,
+        "cache": inspector.stats(),
+    }
+
+
+_inspector = None
+_inspector_lock = threading.Lock()
+
+
+def get_inspector() -> DbInspector:
+    """全局共享的数据库检查器"""
+    global _inspector
+    with _inspector_lock:
+        if _inspector is None:
+            _inspector = DbInspector()
+        return _inspector
+
+
+if __name__ == "__main__":
+    from environment import SwitcherEnvironment
+    from snapshot_store import SnapshotStore
+
+    env = SwitcherEnvironment()
+    store_root = env.storage_path("snapshot_store")
+    store = SnapshotStore(store_root) if os.path.isdir(store_root) else None
+    report = inventory(env.local_root, store)
+    for label, result in report["live"]:
+        detail = result.get("error") or f"{len(result['tables'])} 个表，{result['method']}"
+        print(f"当前  {label}: {detail}")
+    for labels, result in report["stored"]:
+        detail = result.get("error") or f"{len(result['tables'])} 个表，{result['method']}"
+        print(f"快照  {labels[0]} 等{len(labels)}处: {detail}")
+    print(f"检查 {report['databases']} 个数据库，耗时 {report['seconds'] * 1000:.1f} ms")
@@ -0,0 +1,154 @@
+"""
+暴雪战网账号切换器 - 增量同步引擎
+比较账号快照和当前战网目录（大小 + 修改时间，可选哈希），
+只新增、替换、删除有差异的文件，替代整目录删除后再robocopy /MIR
+"""
+import os
+import time
+from snapshot_store import hash_file, walk_tree
+
+
+class DeltaPlan:
+    """一次同步需要执行的操作"""
+
+    def __init__(self):
+        self.adds = []          # [(相对路径, 清单条目)]
+        self.replaces = []      # [(相对路径, 清单条目)]
+        self.deletes = []       # [相对路径]
+        self.make_dirs = []     # [相对路径]
+        self.remove_dirs = []   # [相对路径]，由深到浅
+        self.unchanged = 0
+
+    @property
+    def bytes_to_copy(self) -> int:
+        return sum(entry['size'] for _, entry in self.adds + self.replaces)
+
+    def is_empty(self) -> bool:
+        return not (self.adds or self.replaces or self.deletes or self.make_dirs or self.remove_dirs)
+
+    def summary(self) -> dict:
+        return {
+            "adds": len(self.adds),
+            "replaces": len(self.replaces),
+            "deletes": len(self.deletes),
+            "unchanged": self.unchanged,
+            "bytes_to_copy": self.bytes_to_copy
+        }
+
+
+def _abs(root: str, rel: str) -> str:
+    return os.path.join(root, *rel.split('/'))
+
+
+def plan_tree(tree: dict, live_root: str, verify_hash: bool = False, store=None, rules=None, name: str = None) -> DeltaPlan:
+    """
+    计算把live_root同步成快照树需要的操作
+
+    Args:
+        tree: 快照清单中的一棵树 {"files": {...}, "dirs": [...]}
+        live_root: 当前战网目录
+        verify_hash: 大小和时间相同时是否再比较内容哈希（更慢但更严格）
+        store: 快照存储，hardlink模式下用于识别已链接到blob的文件
+        rules: 快照规则，缓存和垃圾文件两边都不处理（当前目录中的保留，旧清单中的不写出）
+        name: 树名（LocalAppData / Roaming），规则按树匹配
+    """
+    plan = DeltaPlan()
+    if rules:
+        tree = rules.filter_tree(name, tree)
+    wanted_files = tree.get('files', {})
+    wanted_dirs = set(tree.get('dirs', []))
+    live_files, live_dirs = walk_tree(live_root, skip=rules.skipper(name) if rules else None)
+
+    for rel, entry in wanted_files.items():
+        st = live_files.get(rel)
+        if st is None:
+            plan.adds.append((rel, entry))
+        elif st.st_size != entry['size']:
+            plan.replaces.append((rel, entry))
+        elif st.st_mtime_ns != entry['mtime_ns']:
+            if store is not None and store.is_linked(_abs(live_root, rel), entry['blob']):
+                plan.unchanged += 1
+            else:
+                plan.replaces.append((rel, entry))
+        elif verify_hash and hash_file(_abs(live_root, rel)) != entry['blob']:
+            plan.replaces.append((rel, entry))
+        else:
+            plan.unchanged += 1
+
+    for rel in live_files:
+        if rel not in wanted_files:
+            plan.deletes.append(rel)
+
+    live_dir_set = set(live_dirs)
+    plan.make_dirs = sorted(d for d in wanted_dirs if d not in live_dir_set)
+    # 快照中的文件所在目录不算多余目录
+    parent_dirs = set()
+    for rel in wanted_files:
+        parts = rel.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            parent_dirs.add('/'.join(parts[:i]))
+    plan.remove_dirs = sorted(
+        (d for d in live_dirs if d not in wanted_dirs and d not in parent_dirs),
+        key=lambda d: d.count('/'), reverse=True
+    )
+    return plan
+
+
+def apply_plan(plan: DeltaPlan, store, live_root: str, progress=None, cancel=None) -> dict:
+    """
+    执行同步计划，返回统计信息（复制字节数、耗时等）
+    progress / cancel: 传给复制引擎，见 CopyEngine.copy_files
+    """
+    start = time.perf_counter()
+    stats = plan.summary()
+    stats["bytes_moved"] = 0
+    stats["errors"] = 0
+
+    os.makedirs(live_root, exist_ok=True)
+    for rel in plan.deletes:
+        try:
+            os.remove(_abs(live_root, rel))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"删除文件失败: {rel}, 错误: {e}")
+            stats["errors"] += 1
+    for rel in plan.remove_dirs:
+        try:
+            os.rmdir(_abs(live_root, rel))
+        except OSError:
+            pass
+    for rel in plan.make_dirs:
+        os.makedirs(_abs(live_root, rel), exist_ok=True)
+    # 复制到同目录临时文件后原子替换，并恢复快照中的修改时间
+    if plan.adds or plan.replaces:
+        copy_stats = store.engine.copy_files([
+            store.copy_job(store.blob_path(entry['blob']), _abs(live_root, rel), rel, entry['size'], entry['mtime_ns'])
+            for rel, entry in plan.adds + plan.replaces
+        ], atomic=True, mode=store.mode, progress=progress, cancel=cancel)
+        stats["bytes_moved"] = copy_stats["bytes_copied"]
+        stats["bytes_cloned"] = copy_stats["bytes"] - copy_stats["bytes_copied"]
+        stats["errors"] += copy_stats["errors"]
+        stats["copy"] = copy_stats["phases"]
+        stats["cancelled"] = copy_stats["cancelled"]
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def plan_account(store, account_id: str, name: str, live_root: str, verify_hash: bool = False,
+                 rules=None) -> DeltaPlan:
+    """计算把live_root同步成账号快照中的一棵树需要的操作（rules默认使用store.rules）"""
+    manifest = store.load_manifest(account_id)
+    if manifest is None or name not in manifest.get('trees', {}):
+        raise FileNotFoundError(f"账号 {account_id} 没有 {name} 快照")
+    return plan_tree(manifest['trees'][name], live_root, verify_hash, store, rules or store.rules, name)
+
+
+def sync_tree(store, account_id: str, name: str, live_root: str, verify_hash: bool = False, rules=None) -> dict:
+    """把账号快照中的一棵树增量同步到live_root（rules默认使用store.rules）"""
+    start = time.perf_counter()
+    plan = plan_account(store, account_id, name, live_root, verify_hash, rules)
+    stats = apply_plan(plan, store, live_root)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
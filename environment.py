@@ -0,0 +1,108 @@
+"""
+暴雪战网账号切换器 - 运行环境
+集中描述切换器操作的对象：战网客户端路径、当前数据目录、账号数据存储目录、
+注册表和进程的访问方式。默认值在首次使用时才读取环境变量，
+可以注入其他目录（内存盘、第二块硬盘）或桩实现（测试、基准测试、非Windows平台）
+"""
+import os
+
+
+DEFAULT_BATTLENET_EXE = r"C:\Program Files (x86)\Battle.net\Battle.net Launcher.exe"
+
+# 设置此环境变量可把账号数据存储放到其他位置（例如更快的NVMe或tmpfs）
+STORAGE_ENV = "BNSWITCH_STORAGE_DIR"
+# 设置此环境变量可固定快照复制方式（copy / reflink / hardlink），不设置时自动探测
+SNAPSHOT_MODE_ENV = "BNSWITCH_SNAPSHOT_MODE"
+# 设置此环境变量可选择切换方式（staged 暂存目录后重命名 / inplace 直接增量同步到当前目录）
+SWITCH_MODE_ENV = "BNSWITCH_SWITCH_MODE"
+# 设置此环境变量为1可启用会话胶囊：只保存和切换自动登录需要的文件（见session_capsule）
+CAPSULE_MODE_ENV = "BNSWITCH_CAPSULE_MODE"
+
+
+def _appdata_dir(var: str, fallback: str) -> str:
+    """读取LOCALAPPDATA/APPDATA，没有时（非Windows）使用用户目录下的同名位置"""
+    value = os.environ.get(var)
+    if value:
+        return value
+    return os.path.join(os.path.expanduser("~"), "AppData", fallback)
+
+
+class SwitcherEnvironment:
+    """
+    切换器运行环境
+
+    Args:
+        battlenet_exe: 战网启动器路径
+        local_root: 当前战网数据目录（%LOCALAPPDATA%\\Battle.net）
+        roaming_root: 当前战网配置目录（%APPDATA%\\Battle.net）
+        storage_root: 账号数据存储目录（默认 data 目录，可用 BNSWITCH_STORAGE_DIR 覆盖）
+        registry: 注册表访问对象（RegistryBackend）
+        processes: 进程跟踪对象（ProcessTracker接口）
+        snapshot_mode: 快照复制方式 copy / reflink / hardlink（默认读取 BNSWITCH_SNAPSHOT_MODE，
+                       都没有时启动时自动探测）
+        switch_mode: 切换方式 staged / inplace（默认读取 BNSWITCH_SWITCH_MODE，都没有时为 staged）
+        capsule_mode: 是否使用会话胶囊（默认读取 BNSWITCH_CAPSULE_MODE，都没有时不使用）
+    未指定的项在第一次访问时取默认值
+    """
+
+    def __init__(self, battlenet_exe: str = None, local_root: str = None, roaming_root: str = None,
+                 storage_root: str = None, registry=None, processes=None, snapshot_mode: str = None,
+                 switch_mode: str = None, capsule_mode: bool = None):
+        self._battlenet_exe = battlenet_exe
+        self._local_root = local_root
+        self._roaming_root = roaming_root
+        self._storage_root = storage_root
+        self._registry = registry
+        self._processes = processes
+        self.snapshot_mode = snapshot_mode or os.environ.get(SNAPSHOT_MODE_ENV) or None
+        self.switch_mode = switch_mode or os.environ.get(SWITCH_MODE_ENV) or "staged"
+        if capsule_mode is None:
+            capsule_mode = os.environ.get(CAPSULE_MODE_ENV, "") == "1"
+        self.capsule_mode = capsule_mode
+
+    @property
+    def battlenet_exe(self) -> str:
+        if self._battlenet_exe is None:
+            self._battlenet_exe = DEFAULT_BATTLENET_EXE
+        return self._battlenet_exe
+
+    @property
+    def local_root(self) -> str:
+        if self._local_root is None:
+            self._local_root = os.path.join(_appdata_dir('LOCALAPPDATA', 'Local'), 'Battle.net')
+        return self._local_root
+
+    @property
+    def roaming_root(self) -> str:
+        if self._roaming_root is None:
+            self._roaming_root = os.path.join(_appdata_dir('APPDATA', 'Roaming'), 'Battle.net')
+        return self._roaming_root
+
+    @property
+    def storage_root(self) -> str:
+        if self._storage_root is None:
+            import config
+            self._storage_root = os.environ.get(STORAGE_ENV) or config.DATA_DIR
+        return self._storage_root
+
+    @property
+    def registry(self):
+        if self._registry is None:
+            from registry_backend import default_registry
+            self._registry = default_registry()
+        return self._registry
+
+    @property
+    def processes(self):
+        if self._processes is None:
+            from process_tracker import get_tracker
+            self._processes = get_tracker()
+        return self._processes
+
+    def storage_path(self, *parts) -> str:
+        """账号数据存储目录下的路径"""
+        return os.path.join(self.storage_root, *parts)
+
+    def __repr__(self):
+        return (f"SwitcherEnvironment(local_root={self.local_root!r}, roaming_root={self.roaming_root!r}, "
+                f"storage_root={self.storage_root!r})")
@@ -0,0 +1,307 @@
+"""
+暴雪战网账号切换器 - 文件元数据索引
+把每个账号快照和当前战网目录的 路径/大小/修改时间/哈希 持久化到SQLite，
+目录相关的查询直接查索引，不再每次遍历文件系统
+"""
+import fnmatch
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from snapshot_store import walk_tree
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trees (
+    tree TEXT PRIMARY KEY,
+    root TEXT,
+    signature TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    tree TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    PRIMARY KEY (tree, path)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dirs (
+    tree TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (tree, path)
+) WITHOUT ROWID;
+"""
+
+
+# 会被原地改写（不改变所在目录修改时间）的文件：SQLite数据库及其日志、LevelDB日志和清单、Chromium配置
+INPLACE_PATTERNS = (
+    "cookies", "cookies-journal", "*-journal", "*-wal",
+    "*.log", "manifest-*", "current",
+    "local state", "preferences", "secure preferences",
+)
+
+
+def is_modified_in_place(rel_path: str) -> bool:
+    """相对路径对应的文件是否可能被原地改写"""
+    name = rel_path.rsplit('/', 1)[-1].lower()
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in INPLACE_PATTERNS)
+
+
+def account_tree(account_id: str, name: str) -> str:
+    """账号快照树在索引中的名称"""
+    return f"account:{account_id}/{name}"
+
+
+def live_tree(name: str) -> str:
+    """当前战网目录在索引中的名称"""
+    return f"live:{name}"
+
+
+class FileIndex:
+    """文件元数据索引（SQLite）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    # ---------- 基础操作 ----------
+
+    def get_tree(self, tree: str) -> dict:
+        """获取树的记录（root、signature），不存在返回None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT root, signature, updated_at FROM trees WHERE tree=?", (tree,)).fetchone()
+        if not row:
+            return None
+        return {"root": row[0], "signature": row[1], "updated_at": row[2]}
+
+    def replace_tree(self, tree: str, root: str, files: dict, dirs: dict = None, signature: str = None):
+        """
+        整体替换一棵树的索引
+
+        Args:
+            files: 相对路径 -> (大小, 修改时间ns, 哈希或None)
+            dirs: 相对路径 -> 目录修改时间ns（根目录用空字符串）
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE tree=?", (tree,))
+            conn.execute("DELETE FROM dirs WHERE tree=?", (tree,))
+            conn.executemany(
+                "INSERT INTO files (tree, path, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?)",
+                ((tree, rel, v[0], v[1], v[2]) for rel, v in files.items()))
+            if dirs:
+                conn.executemany(
+                    "INSERT INTO dirs (tree, path, mtime_ns) VALUES (?, ?, ?)",
+                    ((tree, rel, mtime) for rel, mtime in dirs.items()))
+            conn.execute(
+                "INSERT OR REPLACE INTO trees (tree, root, signature, updated_at) VALUES (?, ?, ?, ?)",
+                (tree, root, signature, time.time()))
+
+    def remove_tree(self, tree: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE tree=?", (tree,))
+            conn.execute("DELETE FROM dirs WHERE tree=?", (tree,))
+            conn.execute("DELETE FROM trees WHERE tree=?", (tree,))
+
+    def get_files(self, tree: str, prefix: str = None) -> dict:
+        """相对路径 -> (大小, 修改时间ns, 哈希)，prefix为目录前缀（如 'BrowserCaches/'）"""
+        with self._connect() as conn:
+            if prefix:
+                rows = conn.execute(
+                    "SELECT path, size, mtime_ns, hash FROM files WHERE tree=? AND path >= ? AND path < ?",
+                    (tree, prefix, prefix + '\uffff')).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT path, size, mtime_ns, hash FROM files WHERE tree=?", (tree,)).fetchall()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def file_count(self, tree: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM files WHERE tree=?", (tree,)).fetchone()[0]
+
+    # ---------- 账号快照 ----------
+
+    @staticmethod
+    def _manifest_signature(store, account_id: str) -> str:
+        try:
+            st = os.stat(store.manifest_path(account_id))
+        except OSError:
+            return None
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def sync_account(self, store, account_id: str, names) -> bool:
+        """
+        确保账号快照的索引与清单一致（只stat清单文件，变化时才重新加载）
+        返回账号是否有快照
+        """
+        signature = self._manifest_signature(store, account_id)
+        if signature is None:
+            for name in names:
+                self.remove_tree(account_tree(account_id, name))
+            return False
+        first = self.get_tree(account_tree(account_id, names[0]))
+        if first and first["signature"] == signature:
+            return True
+        # 清单被修改过（或索引里没有），从清单重建
+        manifest = store.load_manifest(account_id) or {}
+        for name in names:
+            tree = manifest.get('trees', {}).get(name, {})
+            files = {rel: (e['size'], e['mtime_ns'], e['blob']) for rel, e in tree.get('files', {}).items()}
+            self.replace_tree(account_tree(account_id, name), None, files, signature=signature)
+        return True
+
+    def account_file_count(self, store, account_id: str, names) -> int:
+        if not self.sync_account(store, account_id, names):
+            return 0
+        return sum(self.file_count(account_tree(account_id, name)) for name in names)
+
+    def remove_account(self, account_id: str, names):
+        for name in names:
+            self.remove_tree(account_tree(account_id, name))
+
+    # ---------- 当前战网目录 ----------
+
+    def scan_live(self, name: str, root: str, known: dict = None):
+        """
+        完整扫描当前战网目录并重建索引
+        known: 相对路径 -> 清单条目，大小和时间一致的文件直接记录其哈希
+        """
+        files, dirs = walk_tree(root)
+        known = known or {}
+        entries = {}
+        for rel, st in files.items():
+            entry = known.get(rel)
+            blob = entry['blob'] if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns else None
+            entries[rel] = (st.st_size, st.st_mtime_ns, blob)
+        try:
+            dirs[''] = os.stat(root).st_mtime_ns
+        except OSError:
+            pass
+        self.replace_tree(live_tree(name), os.path.abspath(root), entries, dirs)
+
+    def refresh_live(self, name: str, root: str, prefix: str = None) -> dict:
+        """
+        增量刷新当前战网目录的索引
+        prefix为目录前缀（如 'BrowserCaches/'），只刷新并返回该前缀下的部分；
+        stat已记录的目录，目录修改时间变化的才重新列出其内容；
+        原地修改的文件（Cookies数据库、LevelDB日志等）不改变目录的修改时间，这类文件再单独stat，
+        大小或修改时间不一致的更新记录并清除哈希（只stat，不读取内容）；
+        索引缺失、根目录变化或目录结构不一致时整体重建
+        返回刷新后的文件字典
+        """
+        tree = live_tree(name)
+        info = self.get_tree(tree)
+        if not info or info["root"] != os.path.abspath(root):
+            self.scan_live(name, root)
+            return self.get_files(tree, prefix)
+
+        dir_prefix = prefix.rstrip('/') if prefix else ''
+        with self._connect() as conn:
+            if dir_prefix:
+                dir_rows = conn.execute(
+                    "SELECT path, mtime_ns FROM dirs WHERE tree=? AND (path=? OR (path >= ? AND path < ?))",
+                    (tree, dir_prefix, dir_prefix + '/', dir_prefix + '/\uffff')).fetchall()
+            else:
+                dir_rows = conn.execute("SELECT path, mtime_ns FROM dirs WHERE tree=?", (tree,)).fetchall()
+        if not dir_rows:
+            self.scan_live(name, root)
+            return self.get_files(tree, prefix)
+        changed = []
+        for rel, mtime in dir_rows:
+            try:
+                st = os.stat(os.path.join(root, *rel.split('/')) if rel else root)
+            except OSError:
+                # 目录被删除，说明结构发生了较大变化，直接重建
+                self.scan_live(name, root)
+                return self.get_files(tree, prefix)
+            if st.st_mtime_ns != mtime:
+                changed.append((rel, st.st_mtime_ns))
+
+        if changed:
+            self._rescan_dirs(tree, root, changed)
+        self._restat_inplace(tree, root, prefix)
+        return self.get_files(tree, prefix)
+
+    def _restat_inplace(self, tree: str, root: str, prefix: str = None):
+        """只stat会被原地修改的文件，不一致的更新大小和修改时间并清除哈希，已不存在的删除"""
+        updates = []
+        removed = []
+        for rel, (size, mtime, _) in self.get_files(tree, prefix).items():
+            if not is_modified_in_place(rel):
+                continue
+            try:
+                st = os.stat(os.path.join(root, *rel.split('/')))
+            except OSError:
+                removed.append((tree, rel))
+                continue
+            if st.st_size != size or st.st_mtime_ns != mtime:
+                updates.append((st.st_size, st.st_mtime_ns, tree, rel))
+        if not updates and not removed:
+            return
+        with self._connect() as conn:
+            conn.executemany("UPDATE files SET size=?, mtime_ns=?, hash=NULL WHERE tree=? AND path=?", updates)
+            conn.executemany("DELETE FROM files WHERE tree=? AND path=?", removed)
+
+    def _rescan_dirs(self, tree: str, root: str, changed: list):
+        """重新列出修改时间变化的目录，更新其直接包含的文件；出现新子目录时递归扫描"""
+        with self._connect() as conn:
+            for rel_dir, mtime in changed:
+                abs_dir = os.path.join(root, *rel_dir.split('/')) if rel_dir else root
+                prefix = f"{rel_dir}/" if rel_dir else ""
+                known_dirs = {row[0] for row in conn.execute(
+                    "SELECT path FROM dirs WHERE tree=? AND path >= ? AND path < ?",
+                    (tree, prefix, prefix + '\uffff'))}
+                seen_files = set()
+                seen_dirs = set()
+                for entry in os.scandir(abs_dir):
+                    rel = prefix + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        seen_dirs.add(rel)
+                        if rel not in known_dirs:
+                            sub_files, sub_dirs = walk_tree(entry.path)
+                            sub_dirs[''] = entry.stat(follow_symlinks=False).st_mtime_ns
+                            conn.executemany(
+                                "INSERT OR REPLACE INTO dirs (tree, path, mtime_ns) VALUES (?, ?, ?)",
+                                ((tree, f"{rel}/{r}" if r else rel, m) for r, m in sub_dirs.items()))
+                            conn.executemany(
+                                "INSERT OR REPLACE INTO files (tree, path, size, mtime_ns, hash) VALUES (?, ?, ?, ?, NULL)",
+                                ((tree, f"{rel}/{r}", s.st_size, s.st_mtime_ns) for r, s in sub_files.items()))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        seen_files.add(rel)
+                        row = conn.execute(
+                            "SELECT size, mtime_ns FROM files WHERE tree=? AND path=?", (tree, rel)).fetchone()
+                        if row != (st.st_size, st.st_mtime_ns):
+                            conn.execute(
+                                "INSERT OR REPLACE INTO files (tree, path, size, mtime_ns, hash) VALUES (?, ?, ?, ?, NULL)",
+                                (tree, rel, st.st_size, st.st_mtime_ns))
+                # 删除已不存在的直接子文件和子目录
+                depth = rel_dir.count('/') + 1 if rel_dir else 0
+                for (path,) in conn.execute(
+                        "SELECT path FROM files WHERE tree=? AND path >= ? AND path < ?",
+                        (tree, prefix, prefix + '\uffff')).fetchall():
+                    if path.count('/') == depth and path not in seen_files:
+                        conn.execute("DELETE FROM files WHERE tree=? AND path=?", (tree, path))
+                for path in known_dirs:
+                    if path.count('/') == depth and path not in seen_dirs:
+                        sub = path + '/'
+                        conn.execute("DELETE FROM dirs WHERE tree=? AND (path=? OR (path >= ? AND path < ?))",
+                                     (tree, path, sub, sub + '\uffff'))
+                        conn.execute("DELETE FROM files WHERE tree=? AND path >= ? AND path < ?",
+                                     (tree, sub, sub + '\uffff'))
+                conn.execute("UPDATE dirs SET mtime_ns=? WHERE tree=? AND path=?", (mtime, tree, rel_dir))
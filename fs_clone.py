@@ -0,0 +1,119 @@
+"""
+暴雪战网账号切换器 - 文件克隆
+快照存储和战网目录之间复制文件时，尽量只操作元数据：
+- reflink: 写时复制克隆（Linux btrfs/XFS 的FICLONE，macOS APFS 的clonefile），数据块共享、互不影响
+- hardlink: 不支持克隆但在同一卷上时，对写入后不再修改的文件（LevelDB表等）使用硬链接
+- copy: 其他情况按字节复制
+启动时探测存储目录和战网目录所在文件系统支持哪种方式
+"""
+import os
+import sys
+import fnmatch
+import tempfile
+
+
+MODE_REFLINK = "reflink"
+MODE_HARDLINK = "hardlink"
+MODE_COPY = "copy"
+
+# 写入后不会被原地修改的文件（只会整体删除或新建），可以与快照共用同一份数据；
+# LevelDB日志/MANIFEST、Cookies等数据库文件会被原地修改，必须复制
+IMMUTABLE_PATTERNS = (
+    "*.ldb", "*.sst",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico",
+    "*.woff", "*.woff2", "*.ttf",
+    "*.pak", "*.dll", "*.exe",
+)
+
+
+def is_immutable(rel_path: str) -> bool:
+    """相对路径对应的文件是否写入后不再修改"""
+    name = rel_path.rsplit('/', 1)[-1].lower()
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in IMMUTABLE_PATTERNS)
+
+
+if sys.platform.startswith('linux'):
+    import fcntl
+
+    _FICLONE = 0x40049409
+
+    def _clone(src: str, dst: str) -> bool:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        return True
+elif sys.platform == 'darwin':
+    import ctypes
+    import ctypes.util
+
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _clonefile = getattr(_libc, 'clonefile', None)
+
+    def _clone(src: str, dst: str) -> bool:
+        if _clonefile is None:
+            return False
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if _clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            raise OSError(ctypes.get_errno(), "clonefile失败")
+        return True
+else:
+    def _clone(src: str, dst: str) -> bool:
+        # Windows的ReFS块克隆需要按簇对齐调用FSCTL_DUPLICATE_EXTENTS_TO_FILE，暂不支持
+        return False
+
+
+def reflink(src: str, dst: str) -> bool:
+    """写时复制克隆src到dst，文件系统不支持时返回False（不留下dst）"""
+    try:
+        if _clone(src, dst):
+            return True
+    except OSError:
+        pass
+    try:
+        if os.path.exists(dst):
+            os.remove(dst)
+    except OSError:
+        pass
+    return False
+
+
+def _existing_dir(path: str) -> str:
+    """path本身或最近的已存在的上级目录"""
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def probe_mode(store_dir: str, live_dir: str) -> str:
+    """
+    探测store_dir和live_dir之间可用的复制方式
+    两个目录都需要支持：保存时从战网目录到存储，切换时从存储到战网目录
+    """
+    store_dir = _existing_dir(store_dir)
+    live_dir = _existing_dir(live_dir)
+    src = dst = None
+    try:
+        fd, src = tempfile.mkstemp(prefix=".bnswitch-probe-", dir=store_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b"probe")
+        dst = os.path.join(live_dir, os.path.basename(src) + ".clone")
+        if reflink(src, dst):
+            return MODE_REFLINK
+        try:
+            os.link(src, dst)
+            return MODE_HARDLINK
+        except (OSError, AttributeError, NotImplementedError):
+            return MODE_COPY
+    except OSError:
+        return MODE_COPY
+    finally:
+        for path in (src, dst):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
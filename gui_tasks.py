@@ -0,0 +1,134 @@
+"""
+暴雪战网账号切换器 - 界面后台任务
+把耗时的切换器调用（复制和删除目录、等待战网退出等）放到后台线程执行，通过Qt信号把进度和结果
+交回界面线程，操作期间界面保持响应。
+会修改战网目录或账号数据的任务交给操作调度器按顺序执行（见operation_scheduler），
+只读或自带锁的任务（读取账号信息、冷存储整理、预取）在线程池中执行
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from operation_scheduler import get_scheduler, OperationRejected, STATE_SUPERSEDED, OP_LABELS
+
+
+# 线程池大小（不经过调度器的任务）
+POOL_WORKERS = 2
+# 已结束的任务再保留几个，结果信号可能还在事件队列中，任务对象不能立即释放
+KEEP_FINISHED = 16
+
+
+class BackgroundTask(QObject):
+    """
+    一个后台任务，信号都在界面线程中处理
+
+    Args:
+        func: 任务函数；with_progress时调用 func(progress)，progress(dict) 发出progress信号
+        kind: 操作类型（operation_scheduler.OP_*），为None时在线程池中执行
+        account_id: 操作的账号
+        label: 任务说明（显示在标题栏），默认使用操作类型的名称；线程池任务没有说明时不显示
+    """
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    progress = pyqtSignal(dict)
+    # 在succeeded/failed之前发出，结果回调中弹出对话框时标题栏已经恢复
+    done = pyqtSignal()
+
+    def __init__(self, func, kind: str = None, account_id: str = None, label: str = None,
+                 with_progress: bool = False):
+        super().__init__()
+        self.func = func
+        self.kind = kind
+        self.account_id = account_id
+        self.label = label or OP_LABELS.get(kind)
+        self.with_progress = with_progress
+
+    def call(self):
+        if self.with_progress:
+            return self.func(self.progress.emit)
+        return self.func()
+
+    def run(self):
+        """在线程池中执行"""
+        try:
+            result = self.call()
+        except Exception as e:
+            print(f"后台任务失败: {e}")
+            self.done.emit()
+            self.failed.emit(str(e))
+        else:
+            self.done.emit()
+            self.succeeded.emit(result)
+
+    def on_operation_done(self, op):
+        """调度器回调（在调度线程中调用）"""
+        self.done.emit()
+        if op.state == STATE_SUPERSEDED:
+            self.failed.emit(f"{op.label}已被新的操作取代")
+        elif op.ok:
+            self.succeeded.emit(op.result)
+        else:
+            self.failed.emit(str(op.error))
+
+
+class TaskRunner(QObject):
+    """提交后台任务并在完成前保持引用"""
+    # 正在执行的任务说明，空字符串表示空闲
+    busy_changed = pyqtSignal(str)
+
+    def __init__(self, scheduler=None, workers: int = POOL_WORKERS):
+        super().__init__()
+        self.scheduler = scheduler or get_scheduler()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gui-task")
+        self._tasks = []
+        self._finished = deque(maxlen=KEEP_FINISHED)
+
+    def run(self, func, on_done=None, on_error=None, on_progress=None, kind: str = None,
+            account_id: str = None, label: str = None) -> BackgroundTask:
+        """
+        提交任务，回调都在界面线程中调用
+
+        Args:
+            on_done: on_done(返回值)
+            on_error: on_error(错误信息)
+            on_progress: on_progress(dict)，提供时 func 以 func(progress) 的形式调用
+
+        Raises:
+            OperationRejected: 与正在进行的操作冲突（只有kind不为None时）
+        """
+        task = BackgroundTask(func, kind, account_id, label, with_progress=on_progress is not None)
+        if on_done:
+            task.succeeded.connect(on_done)
+        if on_error:
+            task.failed.connect(on_error)
+        if on_progress:
+            task.progress.connect(on_progress)
+        task.done.connect(lambda: self._release(task))
+
+        self._tasks.append(task)
+        try:
+            if kind:
+                self.scheduler.submit(kind, task.call, account_id, task.on_operation_done, task.label)
+            else:
+                self.pool.submit(task.run)
+        except OperationRejected:
+            self._tasks.remove(task)
+            raise
+        self._notify()
+        return task
+
+    def _release(self, task: BackgroundTask):
+        if task in self._tasks:
+            self._tasks.remove(task)
+            self._finished.append(task)
+        self._notify()
+
+    def _notify(self):
+        labels = [task.label for task in self._tasks if task.label]
+        self.busy_changed.emit(labels[0] if labels else "")
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._tasks)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
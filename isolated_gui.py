@@ -5,12 +5,12 @@ import sys
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import threading
 import ctypes
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from isolated_switcher import IsolatedSwitcher, is_admin
+from operation_scheduler import submit_tk, OP_SWITCH, OP_SAVE, OP_DELETE
 
 
 class IsolatedGUI:
@@ -127,6 +127,8 @@ class IsolatedGUI:
                 status = "✅ 已登录" if acc['has_data'] else "⚠️ 需重新登录"
             else:
                 status = "❌ 未登录"
+            if acc.get('hot'):
+                status += " ⚡"
             
             last_login = acc.get('last_login', '')
             if last_login:
@@ -193,35 +195,46 @@ class IsolatedGUI:
         
         if nickname:
             # 检查是否已存在相同邮箱的账号
-            for acc_id, acc_info in self.switcher.accounts.items():
-                if acc_info.get("email") == email:
-                    if messagebox.askyesno("账号已存在", 
-                        f"邮箱 {email} 对应的账号已存在\n"
-                        f"昵称: {acc_info.get('nickname')}\n\n"
-                        "是否更新该账号的登录状态？"):
+            acc_id = self.switcher.find_account_by_email(email)
+            if acc_id:
+                acc_info = self.switcher.accounts[acc_id]
+                if messagebox.askyesno("账号已存在", 
+                    f"邮箱 {email} 对应的账号已存在\n"
+                    f"昵称: {acc_info.get('nickname')}\n\n"
+                    "是否更新该账号的登录状态？"):
+                    with self.switcher.account_store.batch():
                         self.switcher.mark_logged_in(acc_id)
                         self.switcher.accounts[acc_id]["email"] = email
                         self.switcher.accounts[acc_id]["battletag"] = account_info.get("battletag")
                         self.switcher._save_accounts()
-                        self.refresh_list()
-                        messagebox.showinfo("成功", f"账号【{acc_info.get('nickname')}】登录状态已更新")
-                    return
+                    self.refresh_list()
+                    messagebox.showinfo("成功", f"账号【{acc_info.get('nickname')}】登录状态已更新")
+                return
             
-            # 创建新账号并复制当前目录数据
-            account_id = self.switcher.create_account_from_current(nickname)
-            if account_id:
-                self.switcher.accounts[account_id]["email"] = email
-                self.switcher.accounts[account_id]["battletag"] = account_info.get("battletag")
-                self.switcher.mark_logged_in(account_id)
-                self.switcher._save_accounts()
-                
-                self.refresh_list()
-                messagebox.showinfo("成功", 
-                    f"已添加并保存账号【{nickname}】\n"
-                    f"邮箱: {email}\n\n"
-                    "之后可直接切换到该账号")
-            else:
-                messagebox.showerror("错误", "保存账号数据失败")
+            # 创建新账号并复制当前目录数据（账号信息合并为一次保存）
+            def save():
+                with self.switcher.account_store.batch():
+                    account_id = self.switcher.create_account_from_current(nickname)
+                    if account_id:
+                        self.switcher.accounts[account_id]["email"] = email
+                        self.switcher.accounts[account_id]["battletag"] = account_info.get("battletag")
+                        self.switcher.mark_logged_in(account_id)
+                        self.switcher._save_accounts()
+                return account_id
+            
+            def on_saved(ok, account_id):
+                self.set_status("就绪")
+                if ok and account_id:
+                    self.refresh_list()
+                    messagebox.showinfo("成功", 
+                        f"已添加并保存账号【{nickname}】\n"
+                        f"邮箱: {email}\n\n"
+                        "之后可直接切换到该账号")
+                else:
+                    messagebox.showerror("错误", "保存账号数据失败")
+            
+            if submit_tk(self.root, OP_SAVE, save, on_result=on_saved):
+                self.set_status("正在保存...")
     
     def switch_account(self):
         account_id = self.get_selected()
@@ -235,31 +248,27 @@ class IsolatedGUI:
         acc_info = self.switcher.accounts.get(account_id, {})
         nickname = acc_info.get('nickname', '未知')
         
-        self.set_status(f"正在切换到 {nickname}...")
-        
-        def switch_thread():
-            success, msg = self.switcher.switch_to_account(account_id)
-            
-            def update_ui():
-                if success:
-                    self.set_status(f"已切换到 {nickname}")
-                    if not acc_info.get('logged_in'):
-                        messagebox.showinfo("切换成功", 
-                            f"已切换到账号【{nickname}】\n\n"
-                            "请在战网中完成登录\n"
-                            "登录成功后点击【确认已登录】按钮")
-                    else:
-                        messagebox.showinfo("切换成功", 
-                            f"已切换到账号【{nickname}】\n\n"
-                            "战网应该会自动登录")
+        def on_switched(ok, result):
+            success, msg = result if ok else (False, str(result))
+            if success:
+                self.set_status(f"已切换到 {nickname}")
+                if not acc_info.get('logged_in'):
+                    messagebox.showinfo("切换成功", 
+                        f"已切换到账号【{nickname}】\n\n"
+                        "请在战网中完成登录\n"
+                        "登录成功后点击【确认已登录】按钮")
                 else:
-                    self.set_status("切换失败")
-                    messagebox.showerror("错误", f"切换失败: {msg}")
-                self.refresh_list()
-            
-            self.root.after(0, update_ui)
+                    messagebox.showinfo("切换成功", 
+                        f"已切换到账号【{nickname}】\n\n"
+                        "战网应该会自动登录")
+            else:
+                self.set_status("切换失败")
+                messagebox.showerror("错误", f"切换失败: {msg}")
+            self.refresh_list()
         
-        threading.Thread(target=switch_thread, daemon=True).start()
+        # 连续点击多个账号时只切换到最后一个
+        if submit_tk(self.root, OP_SWITCH, lambda: self.switcher.switch_to_account(account_id), account_id, on_switched):
+            self.set_status(f"正在切换到 {nickname}...")
     
     def confirm_login(self):
         account_id = self.get_selected()
@@ -289,9 +298,12 @@ class IsolatedGUI:
         if messagebox.askyesno("确认删除", 
             f"确定要删除账号【{nickname}】吗？\n\n"
             "这将删除该账号的所有数据"):
-            self.switcher.delete_account(account_id)
-            self.refresh_list()
-            self.set_status(f"已删除账号: {nickname}")
+            def on_deleted(ok, result):
+                self.refresh_list()
+                self.set_status(f"已删除账号: {nickname}" if ok else f"删除失败: {result}")
+            
+            if submit_tk(self.root, OP_DELETE, lambda: self.switcher.delete_account(account_id), account_id, on_deleted):
+                self.set_status(f"正在删除 {nickname}...")
     
     def start_battlenet(self):
         if self.switcher.start_battlenet():
@@ -3,14 +3,28 @@
 每个账号使用完全独立的数据目录，通过符号链接切换
 """
 import os
+import re
 import shutil
 import json
 import subprocess
-import time
 import ctypes
-import psutil
+import threading
 from datetime import datetime
-from config import DATA_DIR, ensure_dirs
+from environment import SwitcherEnvironment
+from snapshot_store import SnapshotStore
+from file_index import FileIndex, live_tree
+from wait_utils import wait_until, wait_for_unlock
+from registry_backend import save_snapshot, load_snapshot, REG_BINARY
+from account_store import AccountStore, atomic_write_json
+from cold_storage import ColdStorage
+from fs_clone import probe_mode
+from snapshot_rules import RuleBook
+import stage_swap
+from prefetcher import Prefetcher
+from switch_pipeline import SwitchPipeline
+from login_watcher import LoginState, LoginWatcher
+from session_capsule import SessionCapsules
+from cookie_store import CookieStore
 
 
 def is_admin():
@@ -43,7 +57,7 @@ def create_junction(link_path, target_path):
             except:
                 pass
         
-        time.sleep(0.3)
+        wait_until(lambda: not os.path.exists(link_path), timeout=1.0, name="junction_removed")
     
     # 再次确保已删除
     if os.path.exists(link_path):
@@ -54,7 +68,7 @@ def create_junction(link_path, target_path):
                 shutil.rmtree(link_path, ignore_errors=True)
             except:
                 pass
-        time.sleep(0.3)
+        wait_until(lambda: not os.path.exists(link_path), timeout=1.0, name="junction_removed")
     
     if os.path.exists(link_path):
         return False
@@ -71,23 +85,70 @@ def create_junction(link_path, target_path):
 class IsolatedSwitcher:
     """独立数据目录切换器 - 完全隔离版，支持国服和国际服"""
     
-    # Battle.net路径（国服和国际服共用同一个目录，只是启动参数不同）
-    BATTLENET_EXE = r"C:\Program Files (x86)\Battle.net\Battle.net Launcher.exe"
-    BATTLENET_LOCAL = os.path.join(os.environ['LOCALAPPDATA'], 'Battle.net')
-    BATTLENET_ROAMING = os.path.join(os.environ['APPDATA'], 'Battle.net')
-    
     # 战网注册表路径
     BATTLENET_REG_PATH = r"HKCU\Software\Blizzard Entertainment\Battle.net\UnifiedAuth"
     BATTLENET_REG_FULL_PATH = r"HKCU\Software\Blizzard Entertainment\Battle.net"
     
-    def __init__(self):
-        ensure_dirs()
-        self.accounts_dir = os.path.join(DATA_DIR, "isolated_accounts")
-        self.accounts_file = os.path.join(DATA_DIR, "isolated_accounts.json")
-        self.state_file = os.path.join(DATA_DIR, "switcher_state.json")
+    # 快照中的两棵目录树
+    SNAPSHOT_TREES = ("LocalAppData", "Roaming")
+    # 客户端运行中保存时，文件在复制过程中被修改后重新读取的次数
+    LIVE_CAPTURE_RETRIES = 3
+    
+    def __init__(self, env: SwitcherEnvironment = None):
+        # 运行环境（战网路径、存储目录、注册表和进程访问），默认使用本机环境
+        self.env = env or SwitcherEnvironment()
+        # Battle.net路径（国服和国际服共用同一个目录，只是启动参数不同）
+        self.BATTLENET_EXE = self.env.battlenet_exe
+        self.BATTLENET_LOCAL = self.env.local_root
+        self.BATTLENET_ROAMING = self.env.roaming_root
+        self.accounts_dir = self.env.storage_path("isolated_accounts")
+        self.accounts_file = self.env.storage_path("isolated_accounts.json")
+        self.state_file = self.env.storage_path("switcher_state.json")
         os.makedirs(self.accounts_dir, exist_ok=True)
-        self.accounts = self._load_accounts()
+        # 账号数据统一存放在内容寻址存储中，相同文件只保存一份
+        self.store = SnapshotStore(self.env.storage_path("snapshot_store"))
+        # 探测存储目录和战网目录之间能否克隆（reflink）或硬链接，保存时尽量只操作元数据
+        self.store.mode = self.env.snapshot_mode or probe_mode(self.store.blobs_dir, self.BATTLENET_LOCAL)
+        # 快照规则：缓存和垃圾文件不保存、不恢复，按账号地区选择配置
+        self.rule_book = RuleBook(self.env.storage_path("snapshot_rules.json"))
+        self.store.rules = self.rule_book.for_profile()
+        # 长期未使用账号的压缩冷存储；与切换互斥，避免压缩时删除正在同步的blob
+        self.cold = ColdStorage(self.store, self.env.storage_path("cold_storage"))
+        self._storage_lock = threading.RLock()
+        # 共享的战网进程跟踪器
+        self.processes = self.env.processes
+        # 注册表访问（Windows上为winreg，其他平台为内存实现）
+        self.registry = self.env.registry
+        # 快照和当前战网目录的文件元数据索引
+        self.index = FileIndex(self.env.storage_path("file_index.db"))
+        # 切换时是否在大小和时间相同时再比较哈希
+        self.verify_hash = False
+        # 切换方式：staged 客户端运行时在暂存目录准备数据、退出后重命名换入；inplace 退出后直接增量同步
+        self.switch_mode = self.env.switch_mode
+        # 会话胶囊：保存时只保存自动登录需要的文件，切换时胶囊足够则只写入这些文件
+        self.capsule_mode = self.env.capsule_mode
+        self.capsules = SessionCapsules(self)
+        # 胶囊账号的战网Cookie行，切换时只写入这些行而不是整个Cookies数据库
+        self.cookies = CookieStore(self.env.storage_path("cookie_store.db"))
+        # 最近一次切换的同步统计（复制字节数、耗时）
+        self.last_switch_stats = None
+        # 最近一次暂存切换前的账号，用于回滚
+        self.previous_account_id = None
+        # 切换成功后保留切换前目录的秒数，之后由界面调用discard_switch_backup删除
+        self.backup_keep_seconds = 600
+        # 上次切换在两次重命名之间中断时，把旧目录恢复回来
+        for path in (self.BATTLENET_LOCAL, self.BATTLENET_ROAMING):
+            if stage_swap.recover(path):
+                print(f"已恢复上次中断切换前的目录: {path}")
+        # 账号列表只加载一次，保存时原子写入并合并多次修改
+        self.account_store = AccountStore(self.accounts_file)
+        self.accounts = self.account_store.accounts
         self.current_account_id = self._load_current_account()
+        # 预测接下来可能切换的账号，空闲时提前准备暂存目录（由界面启动后台线程）
+        self.prefetcher = Prefetcher(self)
+        # 当前登录的账号（增量读取配置和日志），以及监视登录并自动保存的后台线程（由界面启动）
+        self.login_state = LoginState(self.BATTLENET_LOCAL, self.BATTLENET_ROAMING)
+        self.login_watcher = LoginWatcher(self)
     
     def _load_current_account(self) -> str:
         """加载当前活跃的账号ID"""
@@ -102,18 +163,14 @@ class IsolatedSwitcher:
     
     def _save_current_account(self, account_id: str):
         """保存当前活跃的账号ID"""
-        with open(self.state_file, 'w', encoding='utf-8') as f:
-            json.dump({'current_account_id': account_id}, f)
-    
-    def _load_accounts(self) -> dict:
-        if os.path.exists(self.accounts_file):
-            with open(self.accounts_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        atomic_write_json(self.state_file, {'current_account_id': account_id})
     
     def _save_accounts(self):
-        with open(self.accounts_file, 'w', encoding='utf-8') as f:
-            json.dump(self.accounts, f, ensure_ascii=False, indent=2)
+        self.account_store.save()
+    
+    def find_account_by_email(self, email: str) -> str:
+        """按邮箱查找已保存的账号ID"""
+        return self.account_store.find_by_email(email)
     
     def detect_current_version(self) -> str:
         """检测当前活跃的战网版本：'cn'=国服, 'global'=国际服"""
@@ -138,26 +195,26 @@ class IsolatedSwitcher:
         return self.BATTLENET_EXE, self.BATTLENET_LOCAL, self.BATTLENET_ROAMING
     
     def is_battlenet_running(self) -> bool:
-        for proc in psutil.process_iter(['name']):
-            try:
-                if proc.info['name'] and 'battle.net' in proc.info['name'].lower():
-                    return True
-            except:
-                pass
-        return False
+        return self.processes.is_running()
     
     def close_battlenet(self) -> bool:
-        closed = False
-        for proc in psutil.process_iter(['name', 'pid']):
-            try:
-                if proc.info['name'] and 'battle.net' in proc.info['name'].lower():
-                    proc.terminate()
-                    closed = True
-            except:
-                pass
-        if closed:
-            time.sleep(3)
-        return closed
+        # 结束客户端进程并等待真正退出，超时后强制结束
+        return self.processes.stop(timeout=10)
+    
+    def _lock_sentinels(self, local_path: str, roaming_path: str) -> list:
+        """客户端运行时会占用的关键文件，可以独占打开即说明已释放"""
+        return [
+            os.path.join(roaming_path, "Battle.net.config"),
+            os.path.join(local_path, "BrowserCaches", "common", "Network", "Cookies"),
+            os.path.join(local_path, "BrowserCaches", "common", "Local State"),
+        ]
+    
+    def wait_for_release(self, local_path: str = None, roaming_path: str = None, timeout: float = 5.0) -> bool:
+        """等待客户端释放数据目录中的文件"""
+        local_path = local_path or self.BATTLENET_LOCAL
+        roaming_path = roaming_path or self.BATTLENET_ROAMING
+        return wait_for_unlock(self._lock_sentinels(local_path, roaming_path), timeout=timeout,
+                               name="battlenet_files_released")
     
     def start_battlenet(self, region: str = None) -> bool:
         """启动战网，可选指定地区"""
@@ -167,6 +224,7 @@ class IsolatedSwitcher:
                 if region:
                     args.append(f'--setregion={region}')
                 subprocess.Popen(args)
+                self.processes.invalidate()
                 return True
             except:
                 pass
@@ -190,144 +248,155 @@ class IsolatedSwitcher:
     def get_current_logged_account(self) -> dict:
         """
         自动识别当前登录的战网账号
-        从配置文件和日志中提取账号信息（同时检查国服和国际服路径）
+        从配置文件和日志中提取账号信息（国服和国际服共用同一目录）；
+        配置文件未变化时不重新解析，日志只读取上次之后新追加的内容
         """
-        result = {"account_name": None, "email": None, "battletag": None}
-        
         # 先清理无效junction
         self._cleanup_invalid_junctions()
         
-        # 国服和国际服共用同一目录
-        paths_to_check = [
-            (self.BATTLENET_LOCAL, self.BATTLENET_ROAMING)
-        ]
-        
-        for local_path, roaming_path in paths_to_check:
-            try:
-                # 从Battle.net.config读取SavedAccountNames
-                config_path = os.path.join(roaming_path, "Battle.net.config")
-                if os.path.exists(config_path):
-                    with open(config_path, 'r', encoding='utf-8-sig') as f:
-                        config = json.load(f)
-                    
-                    # 获取保存的账号名列表
-                    saved_names = config.get("Client", {}).get("SavedAccountNames", "")
-                    if saved_names:
-                        # 第一个通常是最近登录的
-                        names = [n.strip() for n in saved_names.split(",") if n.strip()]
-                        if names:
-                            result["email"] = names[0]
-                            result["account_name"] = names[0].split("@")[0] if "@" in names[0] else names[0]
-                
-                # 尝试从日志获取BattleTag
-                logs_dir = os.path.join(local_path, "Logs")
-                if os.path.exists(logs_dir):
-                    log_files = sorted([f for f in os.listdir(logs_dir) if f.endswith('.log')], reverse=True)
-                    for log_file in log_files[:3]:  # 检查最近3个日志
-                        log_path = os.path.join(logs_dir, log_file)
-                        try:
-                            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                                # 查找BattleTag
-                                import re
-                                match = re.search(r'BattleTag[:\s]+([^\s,]+#\d+)', content)
-                                if match:
-                                    result["battletag"] = match.group(1)
-                                    break
-                        except:
-                            pass
-                
-                # 如果找到了账号信息，退出循环
-                if result["email"] or result["battletag"]:
-                    break
-            except Exception as e:
-                print(f"读取账号信息失败: {e}")
-        
-        return result
+        try:
+            return self.login_state.current()
+        except Exception as e:
+            print(f"读取账号信息失败: {e}")
+            return {"account_name": None, "email": None, "battletag": None}
     
     def get_account_local_dir(self, account_id: str) -> str:
-        """获取账号的LocalAppData目录"""
+        """获取账号的LocalAppData目录（旧版完整复制方案，仅用于迁移）"""
         return os.path.join(self.accounts_dir, account_id, "LocalAppData")
     
     def get_account_roaming_dir(self, account_id: str) -> str:
-        """获取账号的Roaming目录"""
+        """获取账号的Roaming目录（旧版完整复制方案，仅用于迁移）"""
         return os.path.join(self.accounts_dir, account_id, "Roaming")
     
+    def get_account_dir(self, account_id: str) -> str:
+        """获取账号目录（存放注册表备份等）"""
+        return os.path.join(self.accounts_dir, account_id)
+    
+    def rules_for(self, account_id: str, version: str = None):
+        """账号使用的快照规则（按国服/国际服配置）"""
+        version = version or self.accounts.get(account_id, {}).get('version', 'cn')
+        return self.rule_book.for_profile(version)
+    
+    def snapshot_rule_report(self, version: str = None) -> dict:
+        """当前战网目录中各分类（登录状态/缓存/垃圾）的大小，以及快照规则节省的空间"""
+        rules = self.rule_book.for_profile(version or self.detect_current_version())
+        return rules.report({"LocalAppData": self.BATTLENET_LOCAL, "Roaming": self.BATTLENET_ROAMING})
+    
+    def _capture_snapshot(self, account_id: str, local_path: str, roaming_path: str, version: str = None,
+                          live: bool = False) -> dict:
+        """
+        把当前战网数据保存到快照存储（只写入新增的blob，跳过缓存和垃圾文件）
+        live: 客户端正在运行，复制过程中有变化的文件（Cookies、LevelDB等）重新读取，避免保存不完整的文件
+        """
+        retries = self.LIVE_CAPTURE_RETRIES if live else 0
+        if self.capsule_mode:
+            stats = self.capsules.capture(account_id, local_path, roaming_path, version, stable_retries=retries)
+            if not stats["missing"]:
+                return stats
+            # 胶囊缺少必需文件时不足以自动登录，同时保存完整快照
+            print(f"会话胶囊缺少 {', '.join(stats['missing'])}，保存完整快照")
+        roots = {"LocalAppData": local_path, "Roaming": roaming_path}
+        # 索引中已知哈希的文件（大小和时间一致）无需重新读取
+        hints = {}
+        for name, root in roots.items():
+            info = self.index.get_tree(live_tree(name))
+            if info and root and info["root"] == os.path.abspath(root):
+                hints[name] = self.index.get_files(live_tree(name))
+        with self._storage_lock:
+            stats = self.store.capture(account_id, roots, hints=hints, rules=self.rules_for(account_id, version),
+                                       stable_retries=retries)
+            # 新清单只引用已在存储中的blob，旧的冷存储归档不再需要
+            self.cold.discard(account_id)
+        self.index.sync_account(self.store, account_id, self.SNAPSHOT_TREES)
+        return stats
+    
+    def _index_live_trees(self, account_id: str, local_path: str, roaming_path: str):
+        """保存或切换后，用账号清单更新当前战网目录的索引"""
+        manifest = self.store.load_manifest(account_id) or {}
+        for name, root in (("LocalAppData", local_path), ("Roaming", roaming_path)):
+            known = manifest.get('trees', {}).get(name, {}).get('files', {})
+            self.index.scan_live(name, root, known)
+    
+    def _ensure_snapshot(self, account_id: str) -> bool:
+        """确保账号有快照；旧版完整复制的账号目录会被导入快照存储后删除"""
+        if self.store.has_snapshot(account_id):
+            return True
+        local_dir = self.get_account_local_dir(account_id)
+        roaming_dir = self.get_account_roaming_dir(account_id)
+        if not os.path.exists(local_dir) and not os.path.exists(roaming_dir):
+            return False
+        self._capture_snapshot(account_id, local_dir, roaming_dir)
+        shutil.rmtree(local_dir, ignore_errors=True)
+        shutil.rmtree(roaming_dir, ignore_errors=True)
+        return True
+    
     def get_account_reg_file(self, account_id: str) -> str:
-        """获取账号的注册表备份文件路径"""
-        return os.path.join(self.accounts_dir, account_id, "battlenet_reg.reg")
+        """获取账号的UnifiedAuth注册表快照路径"""
+        return os.path.join(self.accounts_dir, account_id, "battlenet_reg.json")
+    
+    def _legacy_reg_file(self, account_id: str, full: bool = False) -> str:
+        """旧版reg export导出的.reg文件路径"""
+        name = "battlenet_full_reg.reg" if full else "battlenet_reg.reg"
+        return os.path.join(self.accounts_dir, account_id, name)
+    
+    def _import_legacy_reg_file(self, reg_file: str) -> bool:
+        """导入旧版.reg文件（只在账号尚未生成JSON快照时使用）"""
+        result = subprocess.run(
+            ['reg', 'import', reg_file],
+            capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        return result.returncode == 0
     
     def backup_registry(self, account_id: str) -> bool:
-        """备份战网相关注册表到账号目录"""
-        reg_file = self.get_account_reg_file(account_id)
+        """备份战网UnifiedAuth注册表到账号目录"""
         try:
-            result = subprocess.run(
-                ['reg', 'export', self.BATTLENET_REG_PATH, reg_file, '/y'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            return result.returncode == 0
+            snapshot = self.registry.export_tree(self.BATTLENET_REG_PATH)
+            save_snapshot(snapshot, self.get_account_reg_file(account_id))
+            return True
         except Exception as e:
             print(f"备份注册表失败: {e}")
             return False
     
     def restore_registry(self, account_id: str) -> bool:
-        """从账号目录恢复战网相关注册表"""
-        reg_file = self.get_account_reg_file(account_id)
-        if not os.path.exists(reg_file):
-            return False
+        """从账号目录恢复战网UnifiedAuth注册表"""
         try:
-            # 读取备份中的令牌名称
-            with open(reg_file, 'r', encoding='utf-16') as f:
-                content = f.read()
-            
-            import re
-            token_match = re.search(r'"([A-F0-9]{8})"=', content)
-            if not token_match:
+            snapshot = load_snapshot(self.get_account_reg_file(account_id))
+            if snapshot is None:
+                legacy = self._legacy_reg_file(account_id)
+                return os.path.exists(legacy) and self._import_legacy_reg_file(legacy)
+            
+            # 备份中的令牌名称
+            saved_values = snapshot.get("keys", {}).get("", {})
+            target_tokens = [name for name, v in saved_values.items()
+                             if v["type"] == REG_BINARY and re.fullmatch(r'[A-F0-9]{8}', name)]
+            if not target_tokens:
                 return False
-            target_token = token_match.group(1)
-            
-            # 删除除目标令牌外的所有其他令牌
-            current_tokens = self._get_unified_auth_tokens()
-            for token in current_tokens:
-                if token != target_token:
-                    subprocess.run(
-                        ['reg', 'delete', self.BATTLENET_REG_PATH, '/v', token, '/f'],
-                        capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-                    )
             
-            # 导入目标账号的令牌（会覆盖或添加）
-            result = subprocess.run(
-                ['reg', 'import', reg_file],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            return result.returncode == 0
+            # 删除除目标令牌外的所有其他令牌，再写入目标账号的令牌（一次批量完成）
+            others = [t for t in self._get_unified_auth_tokens() if t not in target_tokens]
+            self.registry.delete_values(self.BATTLENET_REG_PATH, others)
+            return self.registry.import_tree(snapshot)
         except Exception as e:
             print(f"恢复注册表失败: {e}")
             return False
     
     def get_account_full_reg_file(self, account_id: str) -> str:
-        """获取账号的完整注册表备份文件路径（国际服用）"""
-        return os.path.join(self.accounts_dir, account_id, "battlenet_full_reg.reg")
+        """获取账号的完整注册表快照路径（国际服用）"""
+        return os.path.join(self.accounts_dir, account_id, "battlenet_full_reg.json")
     
     def backup_full_registry(self, account_id: str) -> bool:
         """备份完整的战网注册表（国际服用）"""
         reg_file = self.get_account_full_reg_file(account_id)
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(reg_file), exist_ok=True)
-            result = subprocess.run(
-                ['reg', 'export', self.BATTLENET_REG_FULL_PATH, reg_file, '/y'],
-                capture_output=True, text=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            snapshot = self.registry.export_tree(self.BATTLENET_REG_FULL_PATH)
+            save_snapshot(snapshot, reg_file)
             # 写入调试日志
             debug_log = os.path.join(self.accounts_dir, "reg_debug.log")
             with open(debug_log, 'a', encoding='utf-8') as f:
                 f.write(f"backup_full_registry: {account_id}\n")
                 f.write(f"  路径: {reg_file}\n")
-                f.write(f"  返回码: {result.returncode}\n")
-                f.write(f"  stdout: {result.stdout}\n")
-                f.write(f"  stderr: {result.stderr}\n")
-            return result.returncode == 0
+                f.write(f"  键数量: {len(snapshot['keys'])}\n")
+            return True
         except Exception as e:
             print(f"备份完整注册表失败: {e}")
             return False
@@ -336,32 +405,30 @@ class IsolatedSwitcher:
         """恢复完整的战网注册表（国际服用）"""
         reg_file = self.get_account_full_reg_file(account_id)
         debug_log = os.path.join(self.accounts_dir, "restore_debug.log")
+        snapshot = load_snapshot(reg_file)
+        legacy = self._legacy_reg_file(account_id, full=True)
         
         with open(debug_log, 'a', encoding='utf-8') as f:
             f.write(f"\n=== restore_full_registry({account_id}) ===\n")
             f.write(f"reg_file: {reg_file}\n")
-            f.write(f"exists: {os.path.exists(reg_file)}\n")
+            f.write(f"exists: {snapshot is not None}\n")
         
-        if not os.path.exists(reg_file):
+        if snapshot is None and not os.path.exists(legacy):
             return False
         try:
             # 只删除UnifiedAuth，保留EncryptionKey和Identity
-            del_result = subprocess.run(
-                ['reg', 'delete', self.BATTLENET_REG_PATH, '/f'],
-                capture_output=True, text=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            deleted = self.registry.delete_key(self.BATTLENET_REG_PATH)
             # 导入备份（会添加/覆盖UnifiedAuth）
-            result = subprocess.run(
-                ['reg', 'import', reg_file],
-                capture_output=True, text=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            if snapshot is not None:
+                ok = self.registry.import_tree(snapshot)
+            else:
+                ok = self._import_legacy_reg_file(legacy)
             
             with open(debug_log, 'a', encoding='utf-8') as f:
-                f.write(f"delete UnifiedAuth: {del_result.returncode}\n")
-                f.write(f"import: {result.returncode}\n")
-                f.write(f"stderr: {result.stderr}\n")
+                f.write(f"delete UnifiedAuth: {deleted}\n")
+                f.write(f"import: {ok}\n")
             
-            return result.returncode == 0
+            return ok
         except Exception as e:
             with open(debug_log, 'a', encoding='utf-8') as f:
                 f.write(f"error: {e}\n")
@@ -372,11 +439,7 @@ class IsolatedSwitcher:
         import uuid
         account_id = str(uuid.uuid4())[:8]
         
-        local_dir = self.get_account_local_dir(account_id)
-        roaming_dir = self.get_account_roaming_dir(account_id)
-        
-        os.makedirs(local_dir, exist_ok=True)
-        os.makedirs(roaming_dir, exist_ok=True)
+        self.store.create_empty(account_id, self.SNAPSHOT_TREES)
         
         self.accounts[account_id] = {
             "nickname": nickname,
@@ -421,7 +484,7 @@ class IsolatedSwitcher:
         # 关闭战网
         if self.is_battlenet_running():
             self.close_battlenet()
-            time.sleep(2)
+            self.wait_for_release()
         
         # 创建空目录
         os.makedirs(temp_local, exist_ok=True)
@@ -455,28 +518,16 @@ class IsolatedSwitcher:
         
         # 生成正式账号ID
         account_id = str(uuid.uuid4())[:8]
-        local_dir = self.get_account_local_dir(account_id)
-        roaming_dir = self.get_account_roaming_dir(account_id)
         
         try:
             # 关闭战网
             if self.is_battlenet_running():
                 self.close_battlenet()
-                time.sleep(2)
-            
-            # 创建账号目录
-            os.makedirs(local_dir, exist_ok=True)
-            os.makedirs(roaming_dir, exist_ok=True)
-            
-            # 从Battle.net目录复制数据到账号目录（保存备份）
-            subprocess.run(
-                ['robocopy', self.BATTLENET_LOCAL, local_dir, '/E', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            subprocess.run(
-                ['robocopy', self.BATTLENET_ROAMING, roaming_dir, '/E', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
+                self.wait_for_release()
+            
+            # 从Battle.net目录保存快照
+            self._capture_snapshot(account_id, self.BATTLENET_LOCAL, self.BATTLENET_ROAMING)
+            self._index_live_trees(account_id, self.BATTLENET_LOCAL, self.BATTLENET_ROAMING)
             
             # 清理临时目录（如果有）
             if self.current_account_id and self.current_account_id.startswith("temp_"):
@@ -513,35 +564,19 @@ class IsolatedSwitcher:
         version = self.accounts[account_id].get('version', 'cn')
         _, local_path, roaming_path = self.get_paths_for_version(version)
         
-        local_dir = self.get_account_local_dir(account_id)
-        roaming_dir = self.get_account_roaming_dir(account_id)
-        
         try:
             # 关闭战网
             if self.is_battlenet_running():
                 self.close_battlenet()
-                time.sleep(2)
-            
-            # 删除旧的账号数据
-            if os.path.exists(local_dir):
-                shutil.rmtree(local_dir, ignore_errors=True)
-            if os.path.exists(roaming_dir):
-                shutil.rmtree(roaming_dir, ignore_errors=True)
-            
-            os.makedirs(local_dir, exist_ok=True)
-            os.makedirs(roaming_dir, exist_ok=True)
-            
-            # 使用robocopy复制当前战网数据到账号目录
-            if os.path.exists(local_path):
-                subprocess.run(
-                    ['robocopy', local_path, local_dir, '/E', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS', '/XD', 'Logs'],
-                    capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-                )
-            if os.path.exists(roaming_path):
-                subprocess.run(
-                    ['robocopy', roaming_path, roaming_dir, '/E', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                    capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-                )
+                self.wait_for_release(local_path, roaming_path)
+            
+            # 旧版账号目录先导入，之后只需写入有变化的文件
+            self._ensure_snapshot(account_id)
+            os.makedirs(self.get_account_dir(account_id), exist_ok=True)
+            
+            # 覆盖保存快照（未变化的文件沿用已有blob）
+            self._capture_snapshot(account_id, local_path, roaming_path)
+            self._index_live_trees(account_id, local_path, roaming_path)
             
             # 仅国服账号备份注册表
             if version == "cn":
@@ -556,6 +591,33 @@ class IsolatedSwitcher:
             print(f"更新账号数据失败: {e}")
             return False
     
+    def snapshot_login(self, account_id: str) -> bool:
+        """
+        客户端中登录完成后自动保存登录状态（由登录监视触发）
+        不关闭战网，只写入有变化的文件；需要完整一致的快照时仍使用 update_account_data
+        """
+        if account_id not in self.accounts:
+            return False
+        
+        version = self.accounts[account_id].get('version', 'cn')
+        _, local_path, roaming_path = self.get_paths_for_version(version)
+        
+        try:
+            self._ensure_snapshot(account_id)
+            self._capture_snapshot(account_id, local_path, roaming_path, live=True)
+            self._index_live_trees(account_id, local_path, roaming_path)
+            
+            if version == "cn":
+                self.backup_registry(account_id)
+            
+            self.mark_logged_in(account_id)
+            self.current_account_id = account_id
+            self._save_current_account(account_id)
+            return True
+        except Exception as e:
+            print(f"自动保存登录状态失败: {e}")
+            return False
+    
     def _disconnect_junction(self):
         """断开junction，将当前数据转为真实目录"""
         # 如果是junction，先获取目标内容，然后断开
@@ -565,7 +627,7 @@ class IsolatedSwitcher:
             if os.path.exists(temp_local):
                 shutil.rmtree(temp_local)
             # 复制junction目标的内容
-            shutil.copytree(self.BATTLENET_LOCAL, temp_local)
+            self.store.engine.copy_tree(self.BATTLENET_LOCAL, temp_local)
             # 删除junction
             subprocess.run(['cmd', '/c', 'rmdir', self.BATTLENET_LOCAL], capture_output=True)
             # 重命名临时目录
@@ -575,7 +637,7 @@ class IsolatedSwitcher:
             temp_roaming = self.BATTLENET_ROAMING + "_temp"
             if os.path.exists(temp_roaming):
                 shutil.rmtree(temp_roaming)
-            shutil.copytree(self.BATTLENET_ROAMING, temp_roaming)
+            self.store.engine.copy_tree(self.BATTLENET_ROAMING, temp_roaming)
             subprocess.run(['cmd', '/c', 'rmdir', self.BATTLENET_ROAMING], capture_output=True)
             os.rename(temp_roaming, self.BATTLENET_ROAMING)
     
@@ -624,62 +686,23 @@ class IsolatedSwitcher:
     def _get_unified_auth_tokens(self) -> list:
         """获取当前UnifiedAuth中的所有令牌名称"""
         try:
-            result = subprocess.run(
-                ['reg', 'query', self.BATTLENET_REG_PATH],
-                capture_output=True, text=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            tokens = []
-            for line in result.stdout.split('\n'):
-                if 'REG_BINARY' in line:
-                    # 提取令牌名称（第一个字段）
-                    parts = line.strip().split()
-                    if parts:
-                        tokens.append(parts[0])
-            return tokens
+            values = self.registry.list_values(self.BATTLENET_REG_PATH)
+            return [name for name, (value_type, _) in values.items() if value_type == REG_BINARY]
         except:
             return []
     
     def _clear_global_session_registry(self) -> bool:
         """清除国际服的会话相关注册表项，强制使用SavedAccountNames"""
         try:
-            # 删除Launch Options\Pro下的会话相关项
+            # 删除Launch Options\Pro下的会话相关项（一次批量删除）
             reg_path = r"HKCU\Software\Blizzard Entertainment\Battle.net\Launch Options\Pro"
-            for value_name in ['ACCOUNT', 'ACCOUNT_STATE', 'WEB_TOKEN', 'ACCOUNT_TS', 'GAME_ACCOUNT']:
-                subprocess.run(
-                    ['reg', 'delete', reg_path, '/v', value_name, '/f'],
-                    capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-                )
+            self.registry.delete_values(
+                reg_path, ['ACCOUNT', 'ACCOUNT_STATE', 'WEB_TOKEN', 'ACCOUNT_TS', 'GAME_ACCOUNT'])
             return True
         except Exception as e:
             print(f"清除注册表失败: {e}")
             return False
     
-    def _get_current_account_id_folder(self, local_path: str) -> str:
-        """获取当前登录账号的专属文件夹ID（BrowserCaches下最近修改的编号文件夹）"""
-        browser_caches = os.path.join(local_path, "BrowserCaches")
-        if not os.path.exists(browser_caches):
-            return None
-        
-        latest_folder = None
-        latest_time = None
-        
-        for item in os.listdir(browser_caches):
-            item_path = os.path.join(browser_caches, item)
-            if os.path.isdir(item_path) and item != "common" and item.isdigit():
-                # 获取文件夹内最近修改的文件时间
-                try:
-                    for root, dirs, files in os.walk(item_path):
-                        for f in files:
-                            file_path = os.path.join(root, f)
-                            mtime = os.path.getmtime(file_path)
-                            if latest_time is None or mtime > latest_time:
-                                latest_time = mtime
-                                latest_folder = item
-                except:
-                    pass
-        
-        return latest_folder
-    
     def create_account_from_current(self, nickname: str, force_version: str = None) -> str:
         """
         从当前登录状态创建新账号
@@ -703,35 +726,14 @@ class IsolatedSwitcher:
             # 国服和国际服共用同一目录，统一处理
             current_email = self._get_current_email_from_config(roaming_path)
             
-            # 复制数据目录
-            local_dir = self.get_account_local_dir(account_id)
-            roaming_dir = self.get_account_roaming_dir(account_id)
-            
-            if os.path.exists(local_dir):
-                shutil.rmtree(local_dir, ignore_errors=True)
-            if os.path.exists(roaming_dir):
-                shutil.rmtree(roaming_dir, ignore_errors=True)
-            
-            os.makedirs(local_dir, exist_ok=True)
-            os.makedirs(roaming_dir, exist_ok=True)
-            
-            subprocess.run(
-                ['robocopy', local_path, local_dir, '/E', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            subprocess.run(
-                ['robocopy', roaming_path, roaming_dir, '/E', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            # 保存数据快照（保存当前登录时客户端通常正在运行，复制过程中有变化的文件重新读取）
+            self._capture_snapshot(account_id, local_path, roaming_path, version, live=self.is_battlenet_running())
+            self._index_live_trees(account_id, local_path, roaming_path)
             
             # 清理旧令牌，只保留当前账号的令牌
             current_tokens = self._get_unified_auth_tokens()
             if len(current_tokens) > 1:
-                for token in current_tokens[:-1]:
-                    subprocess.run(
-                        ['reg', 'delete', self.BATTLENET_REG_PATH, '/v', token, '/f'],
-                        capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-                    )
+                self.registry.delete_values(self.BATTLENET_REG_PATH, current_tokens[:-1])
             
             # 备份注册表
             self.backup_full_registry(account_id)
@@ -758,83 +760,75 @@ class IsolatedSwitcher:
             traceback.print_exc()
             return None
     
-    def switch_to_account(self, account_id: str) -> tuple:
+    def switch_to_account(self, account_id: str, progress=None, cancel=None) -> tuple:
         """
         切换到指定账号
         国服：复制数据目录 + 恢复注册表
         国际服：只修改config中的邮箱顺序（战网会自动登录第一个邮箱）
-        """
-        if account_id not in self.accounts:
-            return False, "账号不存在"
         
-        # 获取账号的版本类型（默认国服）
-        version = self.accounts[account_id].get('version', 'cn')
-        exe_path, local_path, roaming_path = self.get_paths_for_version(version)
-        
-        # 关闭战网
+        Args:
+            progress: 进度回调 progress(dict)，见switch_pipeline
+            cancel: switch_pipeline.CancelToken，换入文件完成前可以取消
+        """
+        return SwitchPipeline(self, account_id, progress, cancel).run()
+    
+    def _swap_live_trees(self, account_id: str, local_path: str, roaming_path: str) -> float:
+        """换入账号的两棵暂存目录，Roaming失败时LocalAppData也换回原目录"""
+        with self._storage_lock:
+            seconds = stage_swap.swap(local_path, account_id)
+            try:
+                seconds += stage_swap.swap(roaming_path, account_id)
+            except OSError:
+                stage_swap.rollback(local_path, account_id)
+                raise
+        return seconds
+    
+    def rollback_last_switch(self) -> tuple:
+        """
+        撤销最近一次暂存切换：关闭战网，换回切换前的目录并恢复之前账号的注册表
+        不会自动启动战网
+        """
+        local_path, roaming_path = self.BATTLENET_LOCAL, self.BATTLENET_ROAMING
+        if not all(os.path.isdir(stage_swap.previous_path(p)) for p in (local_path, roaming_path)):
+            return False, "没有可恢复的切换前数据"
         if self.is_battlenet_running():
             self.close_battlenet()
-            time.sleep(3)
-        
+            self.wait_for_release(local_path, roaming_path)
         try:
-            # 国服和国际服共用同一目录，统一处理
-            local_dir = self.get_account_local_dir(account_id)
-            roaming_dir = self.get_account_roaming_dir(account_id)
-            
-            if not os.path.exists(local_dir):
-                return False, "账号LocalAppData目录不存在"
-            
-            if not os.path.exists(roaming_dir):
-                return False, "账号Roaming目录不存在"
-            
-            # 删除当前目录
-            self._remove_dir_or_junction(local_path)
-            self._remove_dir_or_junction(roaming_path)
-            
-            # 确保父目录存在
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            os.makedirs(os.path.dirname(roaming_path), exist_ok=True)
-            
-            time.sleep(0.5)
-            
-            # 完全镜像同步
-            subprocess.run(
-                ['robocopy', local_dir, local_path, '/MIR', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            subprocess.run(
-                ['robocopy', roaming_dir, roaming_path, '/MIR', '/R:1', '/W:1', '/NFL', '/NDL', '/NJH', '/NJS'],
-                capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            
-            # 确保config中正确的邮箱在第一位
-            email = self.accounts[account_id].get('email')
-            if email:
-                self._set_first_email_in_config(roaming_path, email)
-            
-            # 恢复注册表令牌
+            for path in (local_path, roaming_path):
+                stage_swap.rollback(path, self.current_account_id)
+        except OSError as e:
+            print(f"恢复切换前数据失败: {e}")
+            return False, f"恢复失败: {e}"
+        
+        # 之前的账号只记录在内存中，重启后回滚只恢复目录
+        account_id = self.previous_account_id
+        if account_id in self.accounts:
+            self._index_live_trees(account_id, local_path, roaming_path)
             self.restore_full_registry(account_id)
-            
-            # 记录当前活跃账号和切换时间
+            self.previous_account_id = self.current_account_id
             self.current_account_id = account_id
             self._save_current_account(account_id)
-            
-            # 更新最后登录时间
-            self.accounts[account_id]['last_login'] = datetime.now().isoformat()
-            self._save_accounts()
-            
-            # 启动战网（根据账号版本指定地区）
-            region = "KR" if version == "global" else "CN"
-            self.start_battlenet(region=region)
-            
-            version_name = "国际服" if version == "global" else "国服"
-            nickname = self.accounts[account_id]['nickname']
-            return True, f"已切换到{version_name}账号【{nickname}】"
-            
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            return False, f"切换失败: {e}"
+        return True, "已恢复切换前的数据"
+    
+    def has_switch_backup(self) -> bool:
+        """是否保留着最近一次暂存切换前的目录（可以回滚）"""
+        return any(os.path.isdir(stage_swap.previous_path(p)) for p in (self.BATTLENET_LOCAL, self.BATTLENET_ROAMING))
+    
+    def discard_switch_backup(self, stages: bool = False):
+        """
+        删除切换前的目录，释放磁盘空间（之后无法回滚）
+        stages为True时预取的暂存目录也一起删除
+        """
+        with self._storage_lock:
+            for path in (self.BATTLENET_LOCAL, self.BATTLENET_ROAMING):
+                if stages:
+                    stage_swap.discard(path)
+                else:
+                    stage_swap.discard_previous(path)
+            if stages:
+                self.prefetcher.evict(())
+            self.previous_account_id = None
     
     def _update_saved_account_names(self, current_account_id: str, roaming_path: str = None):
         """更新SavedAccountNames，确保包含所有已保存账号的邮箱，当前账号排在第一位"""
@@ -924,29 +918,70 @@ class IsolatedSwitcher:
             self.accounts[account_id]["last_login"] = datetime.now().isoformat()
             self._save_accounts()
     
-    def get_all_accounts(self) -> list:
-        result = []
-        for account_id, info in self.accounts.items():
+    def get_account_info(self, account_id: str) -> dict:
+        """单个账号的列表信息（账号列表只刷新变化的账号时使用）"""
+        info = self.accounts[account_id]
+        if self.store.has_snapshot(account_id):
+            has_data = self.index.account_file_count(self.store, account_id, self.SNAPSHOT_TREES) > 0
+        elif self.capsules.has_capsule(account_id):
+            has_data = True
+        else:
             local_dir = self.get_account_local_dir(account_id)
-            result.append({
-                "id": account_id,
-                "nickname": info.get("nickname", "未知"),
-                "logged_in": info.get("logged_in", False),
-                "last_login": info.get("last_login", ""),
-                "has_data": os.path.exists(local_dir) and len(os.listdir(local_dir)) > 0
-            })
-        return result
+            has_data = os.path.exists(local_dir) and len(os.listdir(local_dir)) > 0
+        return {
+            "id": account_id,
+            "nickname": info.get("nickname", "未知"),
+            "logged_in": info.get("logged_in", False),
+            "last_login": info.get("last_login", ""),
+            "has_data": has_data,
+            "cold": self.cold.is_cold(account_id),
+            "hot": self.prefetcher.is_hot(account_id)
+        }
+    
+    def get_all_accounts(self) -> list:
+        return [self.get_account_info(account_id) for account_id in list(self.accounts)]
     
     def delete_account(self, account_id: str) -> bool:
         if account_id in self.accounts:
             del self.accounts[account_id]
             self._save_accounts()
         
-        account_dir = os.path.join(self.accounts_dir, account_id)
+        account_dir = self.get_account_dir(account_id)
         if os.path.exists(account_dir):
             shutil.rmtree(account_dir)
+        # 删除清单并回收不再被任何账号引用的文件
+        with self._storage_lock:
+            self.capsules.discard(account_id)
+            self.cookies.delete(account_id)
+            self.store.delete(account_id)
+            self.cold.discard(account_id)
+        self.prefetcher.forget(account_id)
+        self.index.remove_account(account_id, self.SNAPSHOT_TREES)
         return True
     
+    def apply_storage_tiering(self) -> dict:
+        """把闲置超过阈值的账号转入冷存储（逐个加锁，不会长时间阻塞切换）"""
+        results = {}
+        for account_id in self.cold.idle_accounts(self.accounts, self.current_account_id):
+            with self._storage_lock:
+                # 加锁期间账号可能刚被切换过，重新确认
+                if account_id not in self.cold.idle_accounts(self.accounts, self.current_account_id):
+                    continue
+                stats = self.cold.freeze(account_id)
+            if stats:
+                results[account_id] = stats
+        if results:
+            saved = sum(s["blob_bytes"] - s["archive_bytes"] for s in results.values())
+            print(f"已将 {len(results)} 个闲置账号转入冷存储，节省 {saved / 1024 / 1024:.1f} MB")
+        return results
+    
+    def storage_report(self) -> dict:
+        """存储占用：去重存储大小 + 冷存储节省的空间和解压耗时"""
+        report = self.store.stats()
+        report["cold"] = self.cold.report()
+        report["staging_bytes"] = sum(stage_swap.disk_usage(p) for p in (self.BATTLENET_LOCAL, self.BATTLENET_ROAMING))
+        return report
+    
 
 
 if __name__ == "__main__":
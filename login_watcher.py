@@ -0,0 +1,689 @@
+"""
+暴雪战网账号切换器 - 登录监视
+监视当前战网目录（Windows上为ReadDirectoryChangesW，Linux上为inotify，其他情况轮询），
+只读取Battle.net.config的变化和日志新追加的内容，客户端中完成登录后立即识别出账号，
+可以自动把该账号的登录状态增量保存到快照（不需要再手动"保存当前登录"）
+"""
+import os
+import re
+import sys
+import json
+import time
+import struct
+import select
+import threading
+from datetime import datetime
+from operation_scheduler import get_scheduler, OperationRejected, OP_UPDATE
+
+
+CONFIG_NAME = "Battle.net.config"
+LOGS_DIR = "Logs"
+BATTLETAG_RE = re.compile(r'BattleTag[:\s]+([^\s,]+#\d+)')
+# 第一次读取时完整扫描最近几个日志（之后只读取新追加的内容）
+INITIAL_LOGS = 3
+# 日志中一行最长保留多少字节等待换行
+MAX_PARTIAL = 64 * 1024
+# 最后一次变化后等待多久认为登录已完成（客户端登录时会连续写入配置和日志）
+DEFAULT_SETTLE = 1.0
+# 监视线程的等待间隔（秒）：检查停止标志、目录是否被切换替换
+WAIT_INTERVAL = 1.0
+# 轮询方式的检查间隔（秒）
+POLL_INTERVAL = 1.0
+# 同一账号多久内不重复报告登录（秒）
+REPEAT_SECONDS = 300
+
+
+class LogTail:
+    """记录日志文件读到的位置，每次只读取新追加的字节"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.file_id = None
+        self._partial = b""
+
+    def skip_to_end(self):
+        """从当前末尾开始跟踪（已有内容不再读取）"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        self.file_id = (st.st_dev, st.st_ino)
+        self.offset = st.st_size
+        self._partial = b""
+
+    def read_new(self) -> str:
+        """返回上次读取后新追加的完整行；文件被截断或替换时从头读取"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return ""
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self.file_id or st.st_size < self.offset:
+            self.file_id = file_id
+            self.offset = 0
+            self._partial = b""
+        if st.st_size == self.offset:
+            return ""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(st.st_size - self.offset)
+        except OSError:
+            return ""
+        self.offset += len(data)
+        data = self._partial + data
+        cut = data.rfind(b"\n") + 1
+        self._partial = data[cut:][-MAX_PARTIAL:]
+        return data[:cut].decode('utf-8', errors='ignore')
+
+
+class LoginState:
+    """
+    当前战网目录中登录的账号（邮箱来自Battle.net.config，BattleTag来自日志）
+    配置文件只在大小或修改时间变化时重新解析，日志只读取新追加的内容
+    """
+
+    def __init__(self, local_root: str, roaming_root: str):
+        self.local_root = local_root
+        self.roaming_root = roaming_root
+        self.email = None
+        self.battletag = None
+        # 每出现一次登录信号加一（其他线程调用current()读取了新内容时，监视线程仍能发现变化）
+        self.generation = 0
+        self._config_sig = None
+        self._tails = {}
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def config_path(self) -> str:
+        return os.path.join(self.roaming_root, CONFIG_NAME)
+
+    @property
+    def logs_dir(self) -> str:
+        return os.path.join(self.local_root, LOGS_DIR)
+
+    def _log_names(self) -> list:
+        try:
+            return sorted(f for f in os.listdir(self.logs_dir) if f.endswith('.log'))
+        except OSError:
+            return []
+
+    def _read_config(self) -> bool:
+        """配置文件变化时重新读取第一个保存的账号名，返回邮箱是否改变"""
+        try:
+            st = os.stat(self.config_path)
+            sig = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            sig = None
+        if sig == self._config_sig:
+            return False
+        self._config_sig = sig
+        email = None
+        if sig is not None:
+            try:
+                with open(self.config_path, 'r', encoding='utf-8-sig') as f:
+                    config = json.load(f)
+                saved_names = config.get("Client", {}).get("SavedAccountNames", "")
+                names = [n.strip() for n in saved_names.split(",") if n.strip()]
+                email = names[0] if names else None
+            except (OSError, ValueError) as e:
+                # 客户端正在写入时可能读到不完整的文件，下次变化时再读
+                print(f"读取战网配置失败: {e}")
+                self._config_sig = None
+                return False
+        changed = email != self.email
+        self.email = email
+        return changed
+
+    def _tail_logs(self, names) -> bool:
+        """读取日志新追加的内容，返回是否出现了BattleTag"""
+        found = False
+        for name in sorted(names):
+            path = os.path.join(self.logs_dir, name)
+            tail = self._tails.get(name)
+            if tail is None:
+                # 跟踪开始后新出现的日志（客户端启动时创建）从头读取
+                tail = self._tails[name] = LogTail(path)
+            matches = BATTLETAG_RE.findall(tail.read_new())
+            if matches:
+                self.battletag = matches[-1]
+                found = True
+        return found
+
+    def _baseline(self, scan: bool):
+        """重新建立跟踪起点；scan为True时先从最近几个日志中找出BattleTag"""
+        self._config_sig = None
+        self.email = None
+        self.battletag = None
+        self._read_config()
+        self._tails = {}
+        names = self._log_names()
+        recent = names[-INITIAL_LOGS:] if scan else []
+        for name in names:
+            tail = self._tails[name] = LogTail(os.path.join(self.logs_dir, name))
+            if name not in recent:
+                tail.skip_to_end()
+        if recent:
+            self._tail_logs(recent)
+        self._ready = True
+
+    def rebaseline(self):
+        """
+        当前目录被切换替换后调用：重新读取配置和已有日志中的账号，之后只报告新的变化
+        （换入的目录中的旧日志不算新的登录）
+        """
+        with self._lock:
+            self._baseline(scan=True)
+
+    def update(self, changes: dict = None) -> list:
+        """
+        读取变化的文件
+
+        Args:
+            changes: {目录: 变化的文件名集合或None（未知，检查目录中所有文件）}，None表示全部检查
+
+        Returns:
+            list: 登录信号 [("email", 邮箱) / ("battletag", BattleTag)]
+        """
+        with self._lock:
+            if not self._ready:
+                self._baseline(scan=True)
+                return []
+            signals = []
+            if changes is None or self._touched(changes, self.roaming_root, CONFIG_NAME):
+                if self._read_config() and self.email:
+                    signals.append(("email", self.email))
+            if changes is None or self.logs_dir in changes:
+                names = changes.get(self.logs_dir) if changes else None
+                if names is None:
+                    names = self._log_names()
+                names = [n for n in names if n.endswith('.log')]
+                if self._tail_logs(names):
+                    signals.append(("battletag", self.battletag))
+            self.generation += len(signals)
+            return signals
+
+    @staticmethod
+    def _touched(changes: dict, directory: str, name: str) -> bool:
+        if directory not in changes:
+            return False
+        names = changes[directory]
+        return names is None or name in names
+
+    def current(self) -> dict:
+        """当前登录的账号（格式同 IsolatedSwitcher.get_current_logged_account）"""
+        self.update()
+        with self._lock:
+            email = self.email
+            return {
+                "account_name": (email.split("@")[0] if "@" in email else email) if email else None,
+                "email": email,
+                "battletag": self.battletag
+            }
+
+
+# ---------- 目录变化通知 ----------
+
+class PollingBackend:
+    """轮询目录中文件的大小和修改时间（没有系统通知可用时使用）"""
+
+    name = "polling"
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self._dirs = {}
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _listing(path: str) -> dict:
+        listing = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                        listing[entry.name] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return listing
+
+    def watch(self, path: str) -> bool:
+        self._dirs[path] = self._listing(path)
+        return True
+
+    def unwatch_all(self):
+        self._dirs = {}
+
+    def wait(self, timeout: float) -> dict:
+        if self._stop.wait(min(timeout, self.interval)):
+            return {}
+        changes = {}
+        for path, old in list(self._dirs.items()):
+            new = self._listing(path)
+            names = {name for name in set(old) | set(new) if old.get(name) != new.get(name)}
+            if names:
+                changes[path] = names
+            self._dirs[path] = new
+        return changes
+
+    def close(self):
+        self._stop.set()
+
+
+if sys.platform.startswith('linux'):
+    import ctypes
+    import ctypes.util
+
+    _IN_MODIFY = 0x00000002
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _IN_DELETE_SELF = 0x00000400
+    _IN_MOVE_SELF = 0x00000800
+    _IN_Q_OVERFLOW = 0x00004000
+    _IN_IGNORED = 0x00008000
+    _IN_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                | _IN_DELETE_SELF | _IN_MOVE_SELF)
+    _EVENT_HEADER = struct.Struct('iIII')
+
+    class NativeBackend:
+        """inotify（通过libc调用，不需要额外依赖）"""
+
+        name = "inotify"
+
+        def __init__(self):
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if self.fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1失败")
+            self._wds = {}
+
+        def watch(self, path: str) -> bool:
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _IN_MASK)
+            if wd < 0:
+                return False
+            self._wds[wd] = path
+            return True
+
+        def unwatch_all(self):
+            for wd in list(self._wds):
+                self._libc.inotify_rm_watch(self.fd, wd)
+            self._wds = {}
+
+        def wait(self, timeout: float) -> dict:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return {}
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return {}
+            changes = {}
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                start = offset + _EVENT_HEADER.size
+                name = os.fsdecode(data[start:start + length].split(b'\0', 1)[0])
+                offset = start + length
+                if mask & _IN_Q_OVERFLOW:
+                    # 事件队列溢出，所有目录都需要重新检查
+                    return {path: None for path in self._wds.values()}
+                path = self._wds.get(wd)
+                if path is None:
+                    continue
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED) or not name:
+                    changes[path] = None
+                elif changes.get(path, set()) is not None:
+                    changes.setdefault(path, set()).add(name)
+            return changes
+
+        def close(self):
+            if self.fd >= 0:
+                os.close(self.fd)
+                self.fd = -1
+
+elif sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    _FILE_LIST_DIRECTORY = 0x0001
+    _FILE_SHARE_ALL = 0x00000007
+    _OPEN_EXISTING = 3
+    _FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+    _FILE_FLAG_OVERLAPPED = 0x40000000
+    # FILE_NOTIFY_CHANGE_FILE_NAME | DIR_NAME | SIZE | LAST_WRITE
+    _NOTIFY_FILTER = 0x00000001 | 0x00000002 | 0x00000008 | 0x00000010
+    _WAIT_OBJECT_0 = 0
+    _INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+    _BUFFER_SIZE = 64 * 1024
+    _NOTIFY_HEADER = struct.Struct('<III')
+
+    class _OVERLAPPED(ctypes.Structure):
+        _fields_ = [("Internal", ctypes.c_void_p), ("InternalHigh", ctypes.c_void_p),
+                    ("Offset", wintypes.DWORD), ("OffsetHigh", wintypes.DWORD), ("hEvent", wintypes.HANDLE)]
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _CreateFileW = _kernel32.CreateFileW
+    _CreateFileW.restype = wintypes.HANDLE
+    _CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                             wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    _CreateEventW = _kernel32.CreateEventW
+    _CreateEventW.restype = wintypes.HANDLE
+    _CreateEventW.argtypes = [wintypes.LPVOID, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+    _ReadDirectoryChangesW = _kernel32.ReadDirectoryChangesW
+    _ReadDirectoryChangesW.restype = wintypes.BOOL
+    _ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD, wintypes.BOOL,
+                                       wintypes.DWORD, ctypes.POINTER(wintypes.DWORD),
+                                       ctypes.POINTER(_OVERLAPPED), wintypes.LPVOID]
+    _GetOverlappedResult = _kernel32.GetOverlappedResult
+    _GetOverlappedResult.restype = wintypes.BOOL
+    _GetOverlappedResult.argtypes = [wintypes.HANDLE, ctypes.POINTER(_OVERLAPPED),
+                                     ctypes.POINTER(wintypes.DWORD), wintypes.BOOL]
+    _WaitForMultipleObjects = _kernel32.WaitForMultipleObjects
+    _WaitForMultipleObjects.restype = wintypes.DWORD
+    _WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL,
+                                        wintypes.DWORD]
+    _WaitForSingleObject = _kernel32.WaitForSingleObject
+    _WaitForSingleObject.restype = wintypes.DWORD
+    _WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+    _ResetEvent = _kernel32.ResetEvent
+    _ResetEvent.argtypes = [wintypes.HANDLE]
+    _CancelIoEx = _kernel32.CancelIoEx
+    _CancelIoEx.argtypes = [wintypes.HANDLE, ctypes.POINTER(_OVERLAPPED)]
+    _CloseHandle = _kernel32.CloseHandle
+    _CloseHandle.argtypes = [wintypes.HANDLE]
+
+    class _DirWatch:
+        """一个目录的异步ReadDirectoryChangesW请求（缓冲区在请求完成前必须保持有效）"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self.handle = _CreateFileW(path, _FILE_LIST_DIRECTORY, _FILE_SHARE_ALL, None, _OPEN_EXISTING,
+                                       _FILE_FLAG_BACKUP_SEMANTICS | _FILE_FLAG_OVERLAPPED, None)
+            if self.handle == _INVALID_HANDLE_VALUE:
+                raise ctypes.WinError(ctypes.get_last_error())
+            self.event = _CreateEventW(None, True, False, None)
+            self.overlapped = _OVERLAPPED()
+            self.overlapped.hEvent = self.event
+            self.buffer = ctypes.create_string_buffer(_BUFFER_SIZE)
+            self.issue()
+
+        def issue(self):
+            _ResetEvent(self.event)
+            if not _ReadDirectoryChangesW(self.handle, self.buffer, _BUFFER_SIZE, False, _NOTIFY_FILTER,
+                                          None, ctypes.byref(self.overlapped), None):
+                raise ctypes.WinError(ctypes.get_last_error())
+
+        def collect(self):
+            """读取完成的请求并重新提交，返回变化的文件名集合（缓冲区溢出时返回None）"""
+            nbytes = wintypes.DWORD(0)
+            ok = _GetOverlappedResult(self.handle, ctypes.byref(self.overlapped), ctypes.byref(nbytes), False)
+            names = set()
+            if not ok or nbytes.value == 0:
+                names = None
+            else:
+                data = self.buffer.raw[:nbytes.value]
+                offset = 0
+                while True:
+                    next_offset, _, length = _NOTIFY_HEADER.unpack_from(data, offset)
+                    start = offset + _NOTIFY_HEADER.size
+                    names.add(data[start:start + length].decode('utf-16-le'))
+                    if not next_offset:
+                        break
+                    offset += next_offset
+            self.issue()
+            return names
+
+        def close(self):
+            _CancelIoEx(self.handle, ctypes.byref(self.overlapped))
+            # 等待取消完成后才能释放缓冲区
+            nbytes = wintypes.DWORD(0)
+            _GetOverlappedResult(self.handle, ctypes.byref(self.overlapped), ctypes.byref(nbytes), True)
+            _CloseHandle(self.handle)
+            _CloseHandle(self.event)
+
+    class NativeBackend:
+        """ReadDirectoryChangesW（异步请求 + 等待事件，空闲时不占用CPU）"""
+
+        name = "ReadDirectoryChangesW"
+
+        def __init__(self):
+            self._watches = []
+
+        def watch(self, path: str) -> bool:
+            try:
+                self._watches.append(_DirWatch(path))
+                return True
+            except OSError as e:
+                print(f"监视目录失败: {path}, 错误: {e}")
+                return False
+
+        def unwatch_all(self):
+            for w in self._watches:
+                w.close()
+            self._watches = []
+
+        def wait(self, timeout: float) -> dict:
+            if not self._watches:
+                time.sleep(timeout)
+                return {}
+            handles = (wintypes.HANDLE * len(self._watches))(*[w.event for w in self._watches])
+            result = _WaitForMultipleObjects(len(self._watches), handles, False, int(timeout * 1000))
+            index = result - _WAIT_OBJECT_0
+            if not 0 <= index < len(self._watches):
+                return {}
+            changes = {}
+            # 其他同时完成的目录也一起读取
+            for w in self._watches:
+                if w is self._watches[index] or _WaitForSingleObject(w.event, 0) == _WAIT_OBJECT_0:
+                    changes[w.path] = w.collect()
+            return changes
+
+        def close(self):
+            self.unwatch_all()
+
+else:
+    NativeBackend = None
+
+
+def create_backend(polling: bool = False):
+    """系统目录通知可用时使用系统通知，否则轮询"""
+    if not polling and NativeBackend is not None:
+        try:
+            return NativeBackend()
+        except Exception as e:
+            print(f"目录监视不可用，改为轮询: {e}")
+    return PollingBackend()
+
+
+# ---------- 登录监视 ----------
+
+class LoginWatcher:
+    """
+    后台监视战网登录
+
+    Args:
+        switcher: IsolatedSwitcher（使用其login_state和战网目录）
+        on_login: 识别到登录后在监视线程中调用 on_login(event)，event见 _report
+        on_snapshot: 自动保存结束后在调度线程中调用 on_snapshot(account_id, 是否成功)
+        auto_snapshot: 已保存过的账号登录后自动增量保存登录状态
+    """
+
+    def __init__(self, switcher, on_login=None, on_snapshot=None, auto_snapshot: bool = True,
+                 settle: float = DEFAULT_SETTLE, polling: bool = False):
+        self.switcher = switcher
+        self.state = switcher.login_state
+        self.on_login = on_login
+        self.on_snapshot = on_snapshot
+        self.auto_snapshot = auto_snapshot
+        self.settle = settle
+        self.polling = polling
+        self.scheduler = get_scheduler()
+        self.backend = None
+        self.last_event = None
+        self.events = 0
+        self._roots = None
+        self._generation = 0
+        self._pending = None
+        self._reported = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _targets(self) -> list:
+        """需要监视的目录：Roaming（配置文件）和Logs（日志不存在时监视LocalAppData，等待Logs出现）"""
+        targets = [self.state.roaming_root]
+        logs_dir = self.state.logs_dir
+        targets.append(logs_dir if os.path.isdir(logs_dir) else self.state.local_root)
+        return targets
+
+    @staticmethod
+    def _identity(path: str):
+        try:
+            st = os.stat(path)
+            return (st.st_dev, st.st_ino)
+        except OSError:
+            return None
+
+    def _check_roots(self):
+        """
+        监视的目录被切换替换（重命名、删除后重建）或Logs新出现时重新监视
+
+        Returns:
+            新开始监视的目录列表；目录被替换时返回None（已重新建立跟踪起点，换入的内容不算新的登录）
+        """
+        roots = [(path, self._identity(path)) for path in self._targets()]
+        if roots == self._roots:
+            return []
+        self.backend.unwatch_all()
+        for path, identity in roots:
+            if identity is not None:
+                self.backend.watch(path)
+        old = dict(self._roots or [])
+        first = self._roots is None
+        self._roots = roots
+        if first:
+            self.state.update()
+            self._generation = self.state.generation
+            return []
+        if any(path in old and old[path] != identity for path, identity in roots):
+            self._rebaseline()
+            return None
+        return [path for path, identity in roots if path not in old and identity is not None]
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        """启动后台监视线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="login-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _loop(self):
+        self.backend = create_backend(self.polling)
+        self._roots = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._step()
+                except Exception as e:
+                    print(f"登录监视失败: {e}")
+                    self._stop.wait(WAIT_INTERVAL)
+        finally:
+            self.backend.close()
+
+    def _step(self):
+        if self._roots is None:
+            self._check_roots()
+        timeout = WAIT_INTERVAL
+        if self._pending:
+            timeout = max(0.0, min(timeout, self._pending["last"] + self.settle - time.perf_counter()))
+        changes = self.backend.wait(timeout)
+        added = self._check_roots()
+        if added is None:
+            return
+        if added:
+            # 新出现的目录（客户端第一次创建Logs）中的文件都是新写入的
+            changes = dict(changes, **{path: None for path in added})
+        if changes:
+            if self.scheduler.is_busy():
+                # 切换、保存等操作自己写入的变化不是新的登录
+                self._rebaseline()
+                return
+            signals = self.state.update(changes)
+            if self.state.generation != self._generation:
+                self._generation = self.state.generation
+                now = time.perf_counter()
+                if self._pending is None:
+                    self._pending = {"first": now, "signals": []}
+                self._pending["last"] = now
+                self._pending["signals"].extend(signals)
+        if self._pending and time.perf_counter() - self._pending["last"] >= self.settle:
+            pending, self._pending = self._pending, None
+            self._report(pending)
+
+    def _rebaseline(self):
+        self.state.rebaseline()
+        self._generation = self.state.generation
+        self._pending = None
+
+    def _report(self, pending: dict):
+        """登录完成：确认客户端在运行，查找对应的账号，自动保存"""
+        if not self.switcher.is_battlenet_running():
+            return
+        login = self.state.current()
+        email = login["email"]
+        if not email and not login["battletag"]:
+            return
+        account_id = self.switcher.find_account_by_email(email) if email else None
+        key = (email, login["battletag"])
+        now = time.monotonic()
+        if now - self._reported.get(key, -REPEAT_SECONDS) < REPEAT_SECONDS:
+            return
+        self._reported[key] = now
+
+        event = dict(login)
+        event.update({
+            "account_id": account_id,
+            "signals": [kind for kind, _ in pending["signals"]],
+            "detected_at": datetime.now().isoformat(),
+            # 第一次看到变化到确认登录完成的时间
+            "latency": time.perf_counter() - pending["first"],
+            "auto_snapshot": False,
+        })
+        if account_id and self.auto_snapshot:
+            event["auto_snapshot"] = self._submit_snapshot(account_id)
+        self.last_event = event
+        self.events += 1
+        if self.on_login:
+            try:
+                self.on_login(event)
+            except Exception as e:
+                print(f"登录回调失败: {e}")
+
+    def _submit_snapshot(self, account_id: str) -> bool:
+        def done(op):
+            if self.on_snapshot:
+                self.on_snapshot(account_id, bool(op.ok and op.result))
+
+        try:
+            self.scheduler.submit(OP_UPDATE, lambda: self.switcher.snapshot_login(account_id), account_id,
+                                  done, "自动保存登录状态")
+            return True
+        except OperationRejected as e:
+            print(f"自动保存登录状态跳过: {e}")
+            return False
@@ -0,0 +1,143 @@
+"""
+暴雪战网账号管理工具 - 元数据缓存
+cookies、tokens、callbacks 目录中每个账号一个JSON文件，列出账号时只需要其中几个摘要字段（保存时间、数量等）。
+摘要保存在目录中的索引文件里，按文件的 (大小, 修改时间) 校验：文件没有变化时只需要一次stat，
+变化了（包括其他进程写入，如协议回调）才重新解析该文件。写入文件的一方可以直接更新摘要，不必重新解析
+"""
+import os
+import json
+import threading
+from contextlib import contextmanager
+from account_store import atomic_write_json
+
+
+# 索引文件名（不以.json结尾，不会被当成账号文件）
+INDEX_NAME = ".metadata_index"
+INDEX_VERSION = 1
+
+
+class MetadataCache:
+    """
+    目录中 <账号ID>.json 文件的摘要缓存
+
+    Args:
+        directory: 账号文件所在目录
+        summarize: summarize(文件内容dict) -> 摘要dict（必须能序列化为JSON）
+        name: 摘要的类型名，summarize的字段变化时更换名称使旧索引失效
+    """
+
+    def __init__(self, directory: str, summarize, name: str):
+        self.directory = directory
+        self.summarize = summarize
+        self.name = name
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        # 账号ID -> [大小, 修改时间, 摘要]
+        self._entries = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != INDEX_VERSION or data.get("name") != self.name:
+            return {}
+        return data.get("entries", {})
+
+    def path(self, account_id: str) -> str:
+        return os.path.join(self.directory, f"{account_id}.json")
+
+    # ---------- 查询 ----------
+
+    def get(self, account_id: str) -> dict:
+        """
+        账号文件的摘要，文件不存在返回None
+
+        Raises:
+            OSError, ValueError: 文件有变化且读取或解析失败
+        """
+        try:
+            st = os.stat(self.path(account_id))
+        except FileNotFoundError:
+            self.discard(account_id)
+            return None
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                return entry[2]
+
+        with open(self.path(account_id), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return self._store(account_id, st, data)
+
+    # ---------- 更新 ----------
+
+    def update(self, account_id: str, data: dict) -> dict:
+        """文件刚写入后调用，用写入的内容更新摘要"""
+        try:
+            st = os.stat(self.path(account_id))
+        except OSError:
+            self.discard(account_id)
+            return None
+        return self._store(account_id, st, data)
+
+    def _store(self, account_id: str, st, data: dict) -> dict:
+        summary = self.summarize(data)
+        with self._lock:
+            self._entries[account_id] = [st.st_size, st.st_mtime_ns, summary]
+            self._changed()
+        return summary
+
+    def discard(self, account_id: str):
+        with self._lock:
+            if self._entries.pop(account_id, None) is not None:
+                self._changed()
+
+    # ---------- 保存 ----------
+
+    def _changed(self):
+        self._dirty = True
+        if not self._batch_depth:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        """合并多次查询/更新产生的索引写入（如列出所有账号时）"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self.flush()
+
+    def flush(self):
+        """把索引写入磁盘（索引只是缓存，写入失败不影响使用）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                atomic_write_json(self.index_path, {"version": INDEX_VERSION, "name": self.name,
+                                                    "entries": self._entries},
+                                  ensure_ascii=False, separators=(',', ':'))
+            except OSError as e:
+                print(f"保存元数据索引失败: {e}")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_metadata_cache(directory: str, summarize, name: str) -> MetadataCache:
+    """目录共享的元数据缓存（同一目录的多个处理类实例使用同一份索引）"""
+    key = (os.path.abspath(directory), name)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = MetadataCache(directory, summarize, name)
+        return cache
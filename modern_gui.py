@@ -7,15 +7,19 @@ import ctypes
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QScrollArea, QFrame, QMessageBox,
+    QLabel, QPushButton, QFrame, QMessageBox,
     QInputDialog, QGraphicsDropShadowEffect, QSizePolicy, QDialog,
-    QLineEdit, QCheckBox
+    QLineEdit, QCheckBox, QProgressBar
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSize, QPoint
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QPoint, QTimer
 from PyQt5.QtGui import QFont, QColor, QIcon, QPalette, QPixmap
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from isolated_switcher import IsolatedSwitcher, is_admin
+from switch_pipeline import CancelToken, STAGE_LABELS, STAGE_TOKENS, STAGE_LAUNCH
+from gui_tasks import TaskRunner
+from account_list import AccountListView, mask_email
+from operation_scheduler import OperationRejected, OP_SWITCH, OP_PREPARE, OP_SAVE, OP_UPDATE, OP_DELETE, OP_OTHER
 
 
 # 颜色主题
@@ -98,15 +102,6 @@ QPushButton#dangerBtn {{
 QPushButton#dangerBtn:hover {{
     background-color: #f56565;
 }}
-
-QScrollArea {{
-    border: none;
-    background-color: transparent;
-}}
-
-QWidget#scrollContent {{
-    background-color: transparent;
-}}
 """
 
 
@@ -809,270 +804,180 @@ class SettingsDialog(QDialog):
         return self.settings
 
 
-class AccountCard(QFrame):
-    """账号卡片组件"""
+def format_bytes(n: int) -> str:
+    """字节数转为易读的大小"""
+    if n < 1024 * 1024:
+        return f"{n / 1024:.1f} KB"
+    if n < 1024 * 1024 * 1024:
+        return f"{n / 1024 / 1024:.1f} MB"
+    return f"{n / 1024 / 1024 / 1024:.2f} GB"
+
+
+def format_timings(timings: dict) -> str:
+    """各阶段耗时，如 关闭战网 1.2s · 换入文件 0.1s"""
+    return " · ".join(f"{STAGE_LABELS.get(stage, stage)} {seconds:.1f}s" for stage, seconds in timings.items())
+
+
+class SwitchProgressDialog(QFrame):
+    """切换进度：当前阶段、文件/字节进度、预计剩余时间、各阶段耗时，可以取消"""
+    cancel_clicked = pyqtSignal()
     
-    clicked = pyqtSignal(str)
-    switch_clicked = pyqtSignal(str)
-    delete_clicked = pyqtSignal(str)
-    rename_clicked = pyqtSignal(str)
-    toggle_version_clicked = pyqtSignal(str)
-    update_clicked = pyqtSignal(str)
+    def __init__(self, parent, nickname):
+        super().__init__(parent, Qt.Window | Qt.FramelessWindowHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setWindowModality(Qt.ApplicationModal)
+        self.setup_ui(nickname)
     
-    def __init__(self, account_id, nickname, status, email="", last_login="", version="国服", hide_email=False, parent=None):
-        super().__init__(parent)
-        self.account_id = account_id
-        self.nickname = nickname
-        self.status = status
-        self.version = version
-        self.hide_email = hide_email
-        # 处理邮箱显示
-        display_email = self.mask_email(email) if hide_email and email else email
-        self.setup_ui(display_email, last_login)
-        self.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.customContextMenuRequested.connect(self.show_context_menu)
-    
-    def mask_email(self, email):
-        """隐藏邮箱/手机号中间部分"""
-        if not email:
-            return ""
-        if '@' in email:
-            # 邮箱格式
-            parts = email.split('@')
-            name = parts[0]
-            if len(name) > 2:
-                masked = name[0] + '*' * (len(name) - 2) + name[-1]
-            else:
-                masked = name[0] + '*'
-            return masked + '@' + parts[1]
-        else:
-            # 手机号格式
-            if len(email) > 4:
-                return email[:3] + '*' * (len(email) - 6) + email[-3:]
-            return email
-    
-    def mouseDoubleClickEvent(self, event):
-        """双击切换账号"""
-        self.switch_clicked.emit(self.account_id)
-    
-    def show_context_menu(self, pos):
-        """显示右键菜单"""
-        from PyQt5.QtWidgets import QMenu
-        menu = QMenu(self)
-        menu.setStyleSheet(f"""
-            QMenu {{
-                background-color: white;
-                border: 1px solid {COLORS['border']};
-                border-radius: 8px;
-                padding: 5px;
-            }}
-            QMenu::item {{
-                padding: 8px 20px;
-                border-radius: 4px;
-            }}
-            QMenu::item:selected {{
-                background-color: {COLORS['bg']};
-            }}
-        """)
+    def setup_ui(self, nickname):
+        self.setFixedSize(480, 260)
         
-        switch_action = menu.addAction("🔄 切换")
-        update_action = menu.addAction("💾 更新账号数据")
-        rename_action = menu.addAction("✏️ 重命名")
-        
-        menu.addSeparator()
-        delete_action = menu.addAction("🗑️ 删除")
-        
-        action = menu.exec_(self.mapToGlobal(pos))
-        
-        if action == switch_action:
-            self.switch_clicked.emit(self.account_id)
-        elif action == update_action:
-            self.update_clicked.emit(self.account_id)
-        elif action == rename_action:
-            self.rename_clicked.emit(self.account_id)
-        elif action == delete_action:
-            self.delete_clicked.emit(self.account_id)
-        
-    def setup_ui(self, email, last_login):
-        self.setObjectName("accountCard")
-        self.setFixedHeight(120)  # 增加高度容纳三个按钮
-        self.setCursor(Qt.PointingHandCursor)
-        
-        # 卡片样式
-        self.setStyleSheet(f"""
-            QFrame#accountCard {{
-                background-color: {COLORS['card']};
-                border-radius: 12px;
-                border: none;
-            }}
-            QFrame#accountCard:hover {{
-                background-color: {COLORS['card_hover']};
-            }}
+        container = QFrame(self)
+        container.setGeometry(10, 10, 460, 240)
+        container.setStyleSheet("""
+            QFrame {
+                background-color: white;
+                border-radius: 15px;
+            }
         """)
         
-        # 添加阴影效果
         shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(10)
-        shadow.setColor(QColor(0, 0, 0, 30))
-        shadow.setOffset(0, 2)
-        self.setGraphicsEffect(shadow)
-        
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(20, 15, 20, 15)
-        layout.setSpacing(15)
-        
-        # 头像区域
-        avatar = QLabel()
-        avatar.setFixedSize(60, 60)
-        avatar.setStyleSheet(f"""
-            background-color: {COLORS['primary']};
-            border-radius: 30px;
-            color: white;
-            font-size: 24px;
-            font-weight: bold;
-        """)
-        avatar.setAlignment(Qt.AlignCenter)
-        avatar.setText(self.nickname[0].upper() if self.nickname else "?")
-        layout.addWidget(avatar)
-        
-        # 信息区域
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(4)
-        
-        name_label = QLabel(self.nickname)
-        name_label.setStyleSheet(f"color: {COLORS['text']}; font-size: 16px; font-weight: bold;")
-        info_layout.addWidget(name_label)
-        
-        email_label = QLabel(email or "未知邮箱")
-        email_label.setStyleSheet(f"color: {COLORS['text_light']}; font-size: 12px;")
-        info_layout.addWidget(email_label)
-        
-        time_label = QLabel(f"最后登录: {last_login}" if last_login else "")
-        time_label.setStyleSheet(f"color: {COLORS['text_light']}; font-size: 11px;")
-        info_layout.addWidget(time_label)
-        
-        layout.addLayout(info_layout, 1)
-        
-        # 版本和状态标签容器
-        tags_layout = QVBoxLayout()
-        tags_layout.setSpacing(4)
-        
-        # 版本标签
-        version_color = "#9333ea" if self.version == "国际服" else COLORS['primary']
-        version_label = QLabel(self.version)
-        version_label.setStyleSheet(f"""
-            color: white;
-            background-color: {version_color};
-            padding: 3px 8px;
-            border-radius: 8px;
-            font-size: 10px;
-        """)
-        version_label.setFixedHeight(22)
-        tags_layout.addWidget(version_label)
-        
-        # 状态标签
-        status_text = "已登录" if self.status else "未登录"
-        status_color = COLORS['success'] if self.status else COLORS['warning']
-        status_label = QLabel(status_text)
-        status_label.setStyleSheet(f"""
-            color: white;
-            background-color: {status_color};
-            padding: 3px 8px;
-            border-radius: 8px;
-            font-size: 10px;
-        """)
-        status_label.setFixedHeight(22)
-        tags_layout.addWidget(status_label)
+        shadow.setBlurRadius(20)
+        shadow.setColor(QColor(0, 0, 0, 50))
+        shadow.setOffset(0, 5)
+        container.setGraphicsEffect(shadow)
         
-        layout.addLayout(tags_layout)
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(25, 25, 25, 25)
+        layout.setSpacing(10)
         
-        # 操作按钮
-        btn_layout = QVBoxLayout()
-        btn_layout.setSpacing(5)
+        title_label = QLabel(f"正在切换到【{nickname}】")
+        title_label.setFont(QFont("微软雅黑", 14, QFont.Bold))
+        title_label.setStyleSheet(f"color: {COLORS['text']};")
+        layout.addWidget(title_label)
         
-        switch_btn = QPushButton("切换")
-        switch_btn.setFixedSize(70, 32)
-        switch_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {COLORS['primary']};
-                color: white;
+        self.stage_label = QLabel("准备中...")
+        self.stage_label.setFont(QFont("微软雅黑", 11))
+        self.stage_label.setStyleSheet(f"color: {COLORS['text']};")
+        layout.addWidget(self.stage_label)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedHeight(8)
+        self.progress_bar.setStyleSheet(f"""
+            QProgressBar {{
+                background-color: {COLORS['border']};
                 border: none;
-                border-radius: 6px;
-                font-size: 12px;
-                font-weight: bold;
+                border-radius: 4px;
             }}
-            QPushButton:hover {{
-                background-color: {COLORS['primary_dark']};
+            QProgressBar::chunk {{
+                background-color: {COLORS['primary']};
+                border-radius: 4px;
             }}
         """)
-        switch_btn.clicked.connect(lambda: self.switch_clicked.emit(self.account_id))
-        btn_layout.addWidget(switch_btn)
+        layout.addWidget(self.progress_bar)
+        
+        self.detail_label = QLabel("")
+        self.detail_label.setFont(QFont("微软雅黑", 9))
+        self.detail_label.setStyleSheet(f"color: {COLORS['text_light']};")
+        layout.addWidget(self.detail_label)
+        
+        self.timing_label = QLabel("")
+        self.timing_label.setFont(QFont("微软雅黑", 9))
+        self.timing_label.setStyleSheet(f"color: {COLORS['text_light']};")
+        self.timing_label.setWordWrap(True)
+        layout.addWidget(self.timing_label)
         
-        rename_btn = QPushButton("重命名")
-        rename_btn.setFixedSize(70, 28)
-        rename_btn.setStyleSheet(f"""
+        layout.addStretch()
+        
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setStyleSheet(f"""
             QPushButton {{
-                background-color: transparent;
-                color: {COLORS['text_light']};
+                background-color: white;
+                color: {COLORS['text']};
                 border: 1px solid {COLORS['border']};
-                border-radius: 6px;
-                font-size: 11px;
+                border-radius: 8px;
+                padding: 8px 25px;
+                font-size: 13px;
             }}
             QPushButton:hover {{
-                background-color: {COLORS['border']};
-                color: {COLORS['text']};
-            }}
-        """)
-        rename_btn.clicked.connect(lambda: self.rename_clicked.emit(self.account_id))
-        btn_layout.addWidget(rename_btn)
-        
-        delete_btn = QPushButton("删除")
-        delete_btn.setFixedSize(70, 28)
-        delete_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: transparent;
-                color: {COLORS['danger']};
-                border: 1px solid {COLORS['danger']};
-                border-radius: 6px;
-                font-size: 11px;
+                background-color: {COLORS['bg']};
             }}
-            QPushButton:hover {{
-                background-color: {COLORS['danger']};
-                color: white;
+            QPushButton:disabled {{
+                color: {COLORS['text_light']};
             }}
         """)
-        delete_btn.clicked.connect(lambda: self.delete_clicked.emit(self.account_id))
-        btn_layout.addWidget(delete_btn)
-        
+        self.cancel_btn.clicked.connect(self.on_cancel)
+        btn_layout.addWidget(self.cancel_btn)
         layout.addLayout(btn_layout)
-
-
-class SwitchThread(QThread):
-    """切换账号的后台线程"""
-    finished = pyqtSignal(bool, str)
+        
+        if self.parent():
+            parent_geo = self.parent().geometry()
+            self.move(parent_geo.center().x() - 240, parent_geo.center().y() - 130)
     
-    def __init__(self, switcher, account_id):
-        super().__init__()
-        self.switcher = switcher
-        self.account_id = account_id
+    def on_cancel(self):
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText("正在取消...")
+        self.cancel_clicked.emit()
     
-    def run(self):
-        success, msg = self.switcher.switch_to_account(self.account_id)
-        self.finished.emit(success, msg)
+    def update_progress(self, event):
+        """显示切换流水线的进度事件（见switch_pipeline.StageProgress.emit）"""
+        self.progress_bar.setValue(int(event['percent'] * 10))
+        self.stage_label.setText(f"{event['index'] + 1}/{event['count']}  {event['label']}...")
+        
+        details = []
+        if event['files_total']:
+            details.append(f"{event['files_done']}/{event['files_total']} 个文件")
+        if event['bytes_total']:
+            details.append(f"{format_bytes(event['bytes_done'])}/{format_bytes(event['bytes_total'])}")
+        if event['eta_seconds'] is not None:
+            details.append(f"剩余约 {event['eta_seconds']:.0f} 秒")
+        self.detail_label.setText("  ".join(details))
+        self.timing_label.setText(format_timings(event['timings']))
+        
+        # 换入文件后（恢复令牌、启动战网）不能再取消
+        if event['stage'] in (STAGE_TOKENS, STAGE_LAUNCH) and self.cancel_btn.isEnabled():
+            self.cancel_btn.setEnabled(False)
 
 
 class ModernGUI(QMainWindow):
     """现代化的战网账号切换器（无边框可拖拽）"""
     
+    # 登录监视在后台线程中回调，通过信号交回界面线程
+    login_detected = pyqtSignal(dict)
+    login_saved = pyqtSignal(str, bool)
+    
     def __init__(self):
         super().__init__()
         self.switcher = IsolatedSwitcher()
-        self.switch_thread = None
+        # 耗时操作都在后台执行，界面线程只处理结果
+        self.tasks = TaskRunner()
+        self.tasks.busy_changed.connect(self.on_busy_changed)
+        self.switch_dialog = None
+        # 切换成功后过一段时间删除切换前的目录，期间可以撤销切换
+        self.backup_timer = QTimer(self)
+        self.backup_timer.setSingleShot(True)
+        self.backup_timer.timeout.connect(self.discard_switch_backup)
         self.drag_pos = None
         self.settings = self.load_settings()
         self.apply_settings()
         self.setup_ui()
         self.refresh_accounts()
+        # 后台把长期未使用的账号压缩转入冷存储
+        self.tasks.run(self.switcher.apply_storage_tiering)
+        # 后台为接下来可能切换的账号预取数据
+        if self.settings.get('prefetch_accounts', 2):
+            self.switcher.prefetcher.start()
+        # 监视战网登录，已保存的账号登录后自动保存登录状态
+        self.login_detected.connect(self.on_login_detected)
+        self.login_saved.connect(self.on_login_saved)
+        watcher = self.switcher.login_watcher
+        watcher.on_login = self.login_detected.emit
+        watcher.on_snapshot = self.login_saved.emit
+        if self.settings.get('watch_login', True):
+            watcher.start()
     
     def load_settings(self):
         """加载设置"""
@@ -1108,6 +1013,20 @@ class ModernGUI(QMainWindow):
         """应用设置"""
         if self.settings.get('battlenet_path'):
             self.switcher.BATTLENET_EXE = self.settings['battlenet_path']
+        # 闲置多少天后转入冷存储（0表示不使用冷存储）
+        if 'cold_storage_days' in self.settings:
+            self.switcher.cold.idle_days = self.settings['cold_storage_days']
+        # 预取账号数和磁盘预算（0表示不预取）
+        if 'prefetch_accounts' in self.settings:
+            self.switcher.prefetcher.max_accounts = self.settings['prefetch_accounts']
+        if 'prefetch_disk_mb' in self.settings:
+            self.switcher.prefetcher.disk_budget = self.settings['prefetch_disk_mb'] * 1024 * 1024
+        # 只保存和切换自动登录需要的文件（会话胶囊）
+        if 'capsule_mode' in self.settings:
+            self.switcher.capsule_mode = self.settings['capsule_mode']
+        # 识别到已保存账号登录后是否自动保存登录状态
+        if 'auto_snapshot_login' in self.settings:
+            self.switcher.login_watcher.auto_snapshot = self.settings['auto_snapshot_login']
     
     def get_icon_path(self):
         """获取图标路径（支持打包后的exe）"""
@@ -1393,6 +1312,25 @@ class ModernGUI(QMainWindow):
         close_battlenet_btn.clicked.connect(self.close_battlenet)
         layout.addWidget(close_battlenet_btn)
         
+        # 撤销最近一次切换
+        rollback_btn = QPushButton("↩️ 撤销切换")
+        rollback_btn.setFixedHeight(40)
+        rollback_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COLORS['bg']};
+                color: {COLORS['text']};
+                border: 1px solid {COLORS['border']};
+                border-radius: 8px;
+                font-size: 13px;
+                font-weight: 500;
+            }}
+            QPushButton:hover {{
+                background-color: {COLORS['border']};
+            }}
+        """)
+        rollback_btn.clicked.connect(self.rollback_switch)
+        layout.addWidget(rollback_btn)
+        
         # 设置按钮
         settings_btn = QPushButton("⚙️ 设置")
         settings_btn.setFixedHeight(40)
@@ -1459,25 +1397,19 @@ class ModernGUI(QMainWindow):
         
         refresh_btn = QPushButton("🔄 刷新")
         refresh_btn.setObjectName("secondaryBtn")
-        refresh_btn.clicked.connect(self.refresh_accounts)
+        refresh_btn.clicked.connect(lambda: self.refresh_accounts())
         header.addWidget(refresh_btn)
         
         layout.addLayout(header)
         
-        # 滚动区域
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        
-        self.scroll_content = QWidget()
-        self.scroll_content.setObjectName("scrollContent")
-        self.cards_layout = QVBoxLayout(self.scroll_content)
-        self.cards_layout.setContentsMargins(0, 0, 10, 0)
-        self.cards_layout.setSpacing(15)
-        self.cards_layout.addStretch()
-        
-        scroll.setWidget(self.scroll_content)
-        layout.addWidget(scroll)
+        # 账号列表（只绘制可见的账号）
+        self.account_list = AccountListView(COLORS)
+        self.account_list.switch_clicked.connect(self.switch_account)
+        self.account_list.delete_clicked.connect(self.delete_account)
+        self.account_list.rename_clicked.connect(self.rename_account)
+        self.account_list.toggle_version_clicked.connect(self.toggle_version)
+        self.account_list.update_clicked.connect(self.update_account_data)
+        layout.addWidget(self.account_list)
         
         # 使用说明
         help_frame = QFrame()
@@ -1504,47 +1436,90 @@ class ModernGUI(QMainWindow):
         
         return content
     
-    def refresh_accounts(self):
-        # 清除现有卡片
-        while self.cards_layout.count() > 1:
-            item = self.cards_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # 获取账号列表
-        accounts = self.switcher.get_all_accounts()
-        
-        for acc in accounts:
-            last_login = acc.get('last_login', '')
-            if last_login:
-                try:
-                    dt = datetime.fromisoformat(last_login)
-                    last_login = dt.strftime('%Y-%m-%d %H:%M:%S')  # 精确到秒
-                except:
-                    pass
-            
-            email = self.switcher.accounts.get(acc['id'], {}).get('email', '')
-            version = self.switcher.accounts.get(acc['id'], {}).get('version', 'cn')
-            version_text = "国际服" if version == "global" else "国服"
-            
-            card = AccountCard(
-                acc['id'],
-                acc['nickname'],
-                acc['logged_in'] and acc['has_data'],
-                email,
-                last_login,
-                version_text,
-                self.settings.get('hide_email', False)
-            )
-            card.switch_clicked.connect(self.switch_account)
-            card.delete_clicked.connect(self.delete_account)
-            card.rename_clicked.connect(self.rename_account)
-            card.toggle_version_clicked.connect(self.toggle_version)
-            card.update_clicked.connect(self.update_account_data)
-            
-            self.cards_layout.insertWidget(self.cards_layout.count() - 1, card)
+    def run_task(self, kind, func, on_done, account_id=None, label=None, on_progress=None, on_error=None) -> bool:
+        """
+        后台执行会修改数据的操作，完成后在界面线程中调用 on_done(返回值)
+        执行失败时调用 on_error(错误信息)（默认提示错误）；与正在进行的操作冲突时提示并返回False
+        """
+        on_error = on_error or (lambda msg: ModernDialog.show_error(self, "错误", f"操作失败: {msg}"))
+        try:
+            self.tasks.run(func, on_done, on_error, on_progress, kind=kind, account_id=account_id, label=label)
+            return True
+        except OperationRejected as e:
+            ModernDialog.show_info(self, "提示", str(e))
+            return False
+    
+    def on_busy_changed(self, label):
+        """标题栏显示正在执行的后台操作"""
+        if label:
+            self.setWindowTitle(f"暴雪战网账号切换器 - 正在{label}...")
+        else:
+            self.setWindowTitle("暴雪战网账号切换器")
+    
+    def on_login_detected(self, event):
+        """登录监视识别到战网中完成了登录"""
+        if event.get('account_id'):
+            # 已保存的账号：自动保存结束后（on_login_saved）刷新
+            if not event.get('auto_snapshot'):
+                self.refresh_accounts([event['account_id']])
+            return
+        if self.tasks.busy:
+            return
+        name = event.get('email') or event.get('battletag')
+        if ModernDialog.show_question(self, "检测到新登录", f"战网中登录了未保存的账号：{name}\n\n是否保存为新账号？"):
+            self.auto_add_account()
+    
+    def on_login_saved(self, account_id, ok):
+        """登录后自动保存登录状态结束"""
+        if account_id in self.switcher.accounts:
+            self.refresh_accounts([account_id])
+        if not ok:
+            nickname = self.switcher.accounts.get(account_id, {}).get('nickname', account_id)
+            print(f"自动保存账号【{nickname}】的登录状态失败")
+    
+    def _account_row(self, acc):
+        """get_account_info的结果转换为账号列表的一行"""
+        info = self.switcher.accounts.get(acc['id'], {})
+        last_login = acc.get('last_login', '')
+        if last_login:
+            try:
+                dt = datetime.fromisoformat(last_login)
+                last_login = dt.strftime('%Y-%m-%d %H:%M:%S')  # 精确到秒
+            except:
+                pass
+        
+        email = info.get('email', '')
+        if self.settings.get('hide_email', False) and email:
+            email = mask_email(email)
+        
+        return {
+            "id": acc['id'],
+            "nickname": acc['nickname'],
+            "status": acc['logged_in'] and acc['has_data'],
+            "email": email,
+            "last_login": last_login,
+            "version": "国际服" if info.get('version', 'cn') == "global" else "国服",
+            "hot": acc.get('hot', False),
+        }
+    
+    def refresh_accounts(self, account_ids=None):
+        """
+        刷新账号列表，只更新有变化的行
+        
+        Args:
+            account_ids: 只刷新这些账号（已删除的账号从列表中移除），None时刷新全部
+        """
+        model = self.account_list.account_model
+        if account_ids is None:
+            model.set_accounts([self._account_row(acc) for acc in self.switcher.get_all_accounts()])
+        else:
+            for account_id in account_ids:
+                if account_id in self.switcher.accounts:
+                    model.update_accounts([self._account_row(self.switcher.get_account_info(account_id))])
+                else:
+                    model.remove_account(account_id)
         
-        self.count_label.setText(f"共 {len(accounts)} 个账号")
+        self.count_label.setText(f"共 {model.rowCount()} 个账号")
     
     def prepare_new_login(self):
         """准备添加新账号 - 创建干净的临时目录"""
@@ -1559,18 +1534,25 @@ class ModernGUI(QMainWindow):
         if not reply:
             return
         
-        temp_id = self.switcher.prepare_for_new_login()
-        if temp_id:
-            # 启动战网
-            self.switcher.start_battlenet()
-            ModernDialog.show_info(
-                self, "准备完成",
-                "已创建干净的登录环境。\n\n"
-                "请在战网中登录账号，\n"
-                "登录成功后点击【保存当前登录】保存。"
-            )
-        else:
-            ModernDialog.show_error(self, "错误", "准备新登录失败")
+        def prepare():
+            temp_id = self.switcher.prepare_for_new_login()
+            if temp_id:
+                # 启动战网
+                self.switcher.start_battlenet()
+            return temp_id
+        
+        def on_prepared(temp_id):
+            if temp_id:
+                ModernDialog.show_info(
+                    self, "准备完成",
+                    "已创建干净的登录环境。\n\n"
+                    "请在战网中登录账号，\n"
+                    "登录成功后点击【保存当前登录】保存。"
+                )
+            else:
+                ModernDialog.show_error(self, "错误", "准备新登录失败")
+        
+        self.run_task(OP_PREPARE, prepare, on_prepared)
     
     def save_current_login(self):
         """保存当前登录的账号 - 自动创建新的隔离文件夹"""
@@ -1589,21 +1571,18 @@ class ModernGUI(QMainWindow):
         email = account_info.get("email", "")
         
         # 检查是否已存在相同邮箱的账号
-        for acc_id, acc_info in self.switcher.accounts.items():
-            if acc_info.get("email") == email:
-                reply = ModernDialog.show_question(
-                    self, "账号已存在",
-                    f"邮箱 {email} 对应的账号已存在\n昵称: {acc_info.get('nickname')}\n\n"
-                    "是否更新该账号的数据？（会覆盖旧数据）"
-                )
-                if reply:
-                    # 更新现有账号的数据
-                    self.switcher.update_account_data(acc_id)
-                    self.switcher.mark_logged_in(acc_id)
-                    self.switcher._save_accounts()
-                    self.refresh_accounts()
-                    ModernDialog.show_success(self, "成功", f"账号【{acc_info.get('nickname')}】数据已更新")
-                return
+        acc_id = self.switcher.find_account_by_email(email)
+        if acc_id:
+            acc_info = self.switcher.accounts[acc_id]
+            reply = ModernDialog.show_question(
+                self, "账号已存在",
+                f"邮箱 {email} 对应的账号已存在\n昵称: {acc_info.get('nickname')}\n\n"
+                "是否更新该账号的数据？（会覆盖旧数据）"
+            )
+            if reply:
+                # 更新现有账号的数据（合并为一次保存）
+                self._run_update(acc_id)
+            return
         
         # 保存对话框（国服账号）
         dialog = SaveAccountDialog(self, email, default_name)
@@ -1613,29 +1592,28 @@ class ModernGUI(QMainWindow):
             # 记录保存前已有多少账号
             existing_count = len(self.switcher.accounts)
             
-            # 自动创建新文件夹并保存（国服账号）
-            account_id = self.switcher.create_account_from_current(nickname, force_version="cn")
-            if account_id:
-                self.switcher.accounts[account_id]["email"] = email
-                self.switcher.accounts[account_id]["battletag"] = account_info.get("battletag")
-                self.switcher.accounts[account_id]["version"] = "cn"
-                self.switcher._save_accounts()
-                self.refresh_accounts()
-                
-                # 如果之前已有账号，提示需要重新保存
-                if existing_count > 0:
-                    ModernDialog.show_info(
-                        self, "保存成功", 
-                        f"已保存账号【{nickname}】\n\n"
-                        "⚠️ 重要提示：\n"
-                        "由于战网会话机制限制，之前保存的账号可能无法自动登录。\n\n"
-                        "请依次登录并重新保存所有之前的账号，\n"
-                        "这样所有账号就能正常切换了。"
-                    )
+            # 自动创建新文件夹并保存（国服账号），账号信息合并为一次保存
+            def on_saved(account_id):
+                if account_id:
+                    self.refresh_accounts([account_id])
+                    
+                    # 如果之前已有账号，提示需要重新保存
+                    if existing_count > 0:
+                        ModernDialog.show_info(
+                            self, "保存成功", 
+                            f"已保存账号【{nickname}】\n\n"
+                            "⚠️ 重要提示：\n"
+                            "由于战网会话机制限制，之前保存的账号可能无法自动登录。\n\n"
+                            "请依次登录并重新保存所有之前的账号，\n"
+                            "这样所有账号就能正常切换了。"
+                        )
+                    else:
+                        ModernDialog.show_success(self, "成功", f"已保存账号【{nickname}】")
                 else:
-                    ModernDialog.show_success(self, "成功", f"已保存账号【{nickname}】")
-            else:
-                ModernDialog.show_error(self, "错误", "保存账号数据失败")
+                    ModernDialog.show_error(self, "错误", "保存账号数据失败")
+            
+            self.run_task(OP_SAVE, lambda: self._create_from_current(
+                nickname, email, account_info.get("battletag"), "cn"), on_saved)
     
     def save_current_login_global(self):
         """保存当前登录的国际服账号"""
@@ -1651,20 +1629,17 @@ class ModernGUI(QMainWindow):
         email = account_info.get("email") or account_info.get("battletag") or ""
         
         # 检查是否已存在相同邮箱的账号
-        for acc_id, acc_info in self.switcher.accounts.items():
-            if acc_info.get("email") == email:
-                reply = ModernDialog.show_question(
-                    self, "账号已存在",
-                    f"邮箱 {email} 对应的账号已存在\n昵称: {acc_info.get('nickname')}\n\n"
-                    "是否更新该账号的数据？（会覆盖旧数据）"
-                )
-                if reply:
-                    self.switcher.update_account_data(acc_id)
-                    self.switcher.mark_logged_in(acc_id)
-                    self.switcher._save_accounts()
-                    self.refresh_accounts()
-                    ModernDialog.show_success(self, "成功", f"账号【{acc_info.get('nickname')}】数据已更新")
-                return
+        acc_id = self.switcher.find_account_by_email(email)
+        if acc_id:
+            acc_info = self.switcher.accounts[acc_id]
+            reply = ModernDialog.show_question(
+                self, "账号已存在",
+                f"邮箱 {email} 对应的账号已存在\n昵称: {acc_info.get('nickname')}\n\n"
+                "是否更新该账号的数据？（会覆盖旧数据）"
+            )
+            if reply:
+                self._run_update(acc_id)
+            return
         
         # 使用国际服专用对话框
         dialog = SaveGlobalAccountDialog(self, email, default_name)
@@ -1672,16 +1647,15 @@ class ModernGUI(QMainWindow):
             nickname = dialog.result_nickname
             
             # 强制设置为国际服版本
-            account_id = self.switcher.create_account_from_current(nickname, force_version="global")
-            if account_id:
-                self.switcher.accounts[account_id]["email"] = email
-                self.switcher.accounts[account_id]["battletag"] = account_info.get("battletag")
-                self.switcher.accounts[account_id]["version"] = "global"
-                self.switcher._save_accounts()
-                self.refresh_accounts()
-                ModernDialog.show_success(self, "成功", f"已保存国际服账号【{nickname}】")
-            else:
-                ModernDialog.show_error(self, "错误", "保存账号数据失败")
+            def on_saved(account_id):
+                if account_id:
+                    self.refresh_accounts([account_id])
+                    ModernDialog.show_success(self, "成功", f"已保存国际服账号【{nickname}】")
+                else:
+                    ModernDialog.show_error(self, "错误", "保存账号数据失败")
+            
+            self.run_task(OP_SAVE, lambda: self._create_from_current(
+                nickname, email, account_info.get("battletag"), "global"), on_saved)
     
     def auto_add_account(self):
         if not self.switcher.is_battlenet_running():
@@ -1705,32 +1679,35 @@ class ModernGUI(QMainWindow):
         
         if ok and nickname:
             # 检查是否已存在
-            for acc_id, acc_info in self.switcher.accounts.items():
-                if acc_info.get("email") == email:
-                    reply = ModernDialog.show_question(
-                        self, "账号已存在",
-                        f"邮箱 {email} 对应的账号已存在\n昵称: {acc_info.get('nickname')}\n\n是否更新该账号的登录状态？"
-                    )
-                    if reply:
+            acc_id = self.switcher.find_account_by_email(email)
+            if acc_id:
+                acc_info = self.switcher.accounts[acc_id]
+                reply = ModernDialog.show_question(
+                    self, "账号已存在",
+                    f"邮箱 {email} 对应的账号已存在\n昵称: {acc_info.get('nickname')}\n\n是否更新该账号的登录状态？"
+                )
+                if reply:
+                    battletag = account_info.get("battletag")
+                    
+                    def mark(info):
+                        info["email"] = email
+                        info["battletag"] = battletag
                         self.switcher.mark_logged_in(acc_id)
-                        self.switcher.accounts[acc_id]["email"] = email
-                        self.switcher.accounts[acc_id]["battletag"] = account_info.get("battletag")
-                        self.switcher._save_accounts()
-                        self.refresh_accounts()
-                        ModernDialog.show_success(self, "成功", f"账号【{acc_info.get('nickname')}】登录状态已更新")
-                    return
+                    
+                    self._edit_account(acc_id, mark, lambda: ModernDialog.show_success(
+                        self, "成功", f"账号【{acc_info.get('nickname')}】登录状态已更新"))
+                return
             
             # 创建新账号
-            account_id = self.switcher.create_account_from_current(nickname)
-            if account_id:
-                self.switcher.accounts[account_id]["email"] = email
-                self.switcher.accounts[account_id]["battletag"] = account_info.get("battletag")
-                self.switcher.mark_logged_in(account_id)
-                self.switcher._save_accounts()
-                self.refresh_accounts()
-                ModernDialog.show_success(self, "成功", f"已添加并保存账号【{nickname}】\n邮箱: {email}")
-            else:
-                ModernDialog.show_error(self, "错误", "保存账号数据失败")
+            def on_saved(account_id):
+                if account_id:
+                    self.refresh_accounts([account_id])
+                    ModernDialog.show_success(self, "成功", f"已添加并保存账号【{nickname}】\n邮箱: {email}")
+                else:
+                    ModernDialog.show_error(self, "错误", "保存账号数据失败")
+            
+            self.run_task(OP_SAVE, lambda: self._create_from_current(
+                nickname, email, account_info.get("battletag"), mark_logged_in=True), on_saved)
     
     def prepare_new_account(self):
         """清除当前登录状态，准备登录新账号（保留地区设置）"""
@@ -1743,14 +1720,21 @@ class ModernGUI(QMainWindow):
         if not reply:
             return
         
+        self.run_task(OP_PREPARE, self._clear_login_state, lambda _: ModernDialog.show_info(
+            self, "准备完成",
+            "已清除登录状态，战网已启动。\n\n"
+            "请登录新账号，登录成功后点击【保存当前登录】。"
+        ))
+    
+    def _clear_login_state(self):
+        """关闭战网，清除登录状态（BrowserCaches和保存的账号名），再启动国服战网"""
         import shutil
         import json
-        import time
         
         # 关闭战网
         if self.switcher.is_battlenet_running():
             self.switcher.close_battlenet()
-            time.sleep(2)
+            self.switcher.wait_for_release()
         
         # 清除Roaming下的BrowserCaches
         roaming_cache = os.path.join(self.switcher.BATTLENET_ROAMING, "BrowserCaches")
@@ -1778,12 +1762,7 @@ class ModernGUI(QMainWindow):
         
         # 启动战网（指定中国区）
         self.switcher.start_battlenet(region="CN")
-        
-        ModernDialog.show_info(
-            self, "准备完成",
-            "已清除登录状态，战网已启动。\n\n"
-            "请登录新账号，登录成功后点击【保存当前登录】。"
-        )
+        return True
     
     def prepare_global_account(self):
         """准备登录国际服新账号 - 使用和国服相同的方法"""
@@ -1798,64 +1777,134 @@ class ModernGUI(QMainWindow):
             return
         
         # 使用和国服相同的方法创建干净环境
-        temp_id = self.switcher.prepare_for_new_login()
-        if temp_id:
-            # 启动战网（指定KR区）
-            self.switcher.start_battlenet(region="KR")
-            ModernDialog.show_info(
-                self, "准备完成",
-                "已创建干净的登录环境，战网已启动（国际服）。\n\n"
-                "请登录国际服账号，\n"
-                "登录成功后点击【保存当前登录(国际服)】保存。"
-            )
-        else:
-            ModernDialog.show_error(self, "错误", "准备新登录失败")
+        def prepare():
+            temp_id = self.switcher.prepare_for_new_login()
+            if temp_id:
+                # 启动战网（指定KR区）
+                self.switcher.start_battlenet(region="KR")
+            return temp_id
+        
+        def on_prepared(temp_id):
+            if temp_id:
+                ModernDialog.show_info(
+                    self, "准备完成",
+                    "已创建干净的登录环境，战网已启动（国际服）。\n\n"
+                    "请登录国际服账号，\n"
+                    "登录成功后点击【保存当前登录(国际服)】保存。"
+                )
+            else:
+                ModernDialog.show_error(self, "错误", "准备新登录失败")
+        
+        self.run_task(OP_PREPARE, prepare, on_prepared)
     
     def manual_add_account(self):
         nickname, ok = ModernInputDialog.get_text(self, "➕ 创建账号", "请输入账号昵称（便于识别）：", "")
-        if ok and nickname:
-            account_id = self.switcher.create_account(nickname)
-            self.refresh_accounts()
-            
+        if not (ok and nickname):
+            return
+        
+        def on_created(account_id):
+            self.refresh_accounts([account_id])
             reply = ModernDialog.show_question(
                 self, "创建成功",
                 f"已创建账号【{nickname}】\n\n是否立即切换到该账号进行登录？"
             )
             if reply:
                 self.switch_account(account_id)
+        
+        self.run_task(OP_UPDATE, lambda: self.switcher.create_account(nickname), on_created,
+                      label=f"创建 {nickname}")
     
     def switch_account(self, account_id):
         acc_info = self.switcher.accounts.get(account_id, {})
         nickname = acc_info.get('nickname', '未知')
         
-        # 禁用UI
-        self.setEnabled(False)
-        self.setWindowTitle(f"暴雪战网账号切换器 - 正在切换到 {nickname}...")
-        
-        self.switch_thread = SwitchThread(self.switcher, account_id)
-        self.switch_thread.finished.connect(lambda s, m: self.on_switch_finished(s, m, account_id))
-        self.switch_thread.start()
+        # 进度窗口是模态的，切换期间主界面不能操作
+        dialog = SwitchProgressDialog(self, nickname)
+        cancel = CancelToken()
+        dialog.cancel_clicked.connect(cancel.cancel)
+        previous_id = self.switcher.current_account_id
+        started = self.run_task(
+            OP_SWITCH,
+            lambda progress: self.switcher.switch_to_account(account_id, progress, cancel),
+            lambda result: self.on_switch_finished(*result, account_id, previous_id),
+            account_id, f"切换到 {nickname}", dialog.update_progress,
+            lambda msg: self.on_switch_finished(False, msg, account_id, previous_id)
+        )
+        if started:
+            self.switch_dialog = dialog
+            dialog.show()
     
-    def on_switch_finished(self, success, msg, account_id):
-        self.setEnabled(True)
-        self.setWindowTitle("暴雪战网账号切换器")
+    def on_switch_finished(self, success, msg, account_id, previous_id=None):
+        if self.switch_dialog:
+            self.switch_dialog.close()
+            self.switch_dialog = None
         
         acc_info = self.switcher.accounts.get(account_id, {})
         nickname = acc_info.get('nickname', '未知')
         version = acc_info.get('version', 'cn')
         
+        stats = self.switcher.last_switch_stats or {}
+        timings = f"\n\n耗时：{format_timings(stats['stages'])}" if stats.get('stages') else ""
+        
         if success:
             if acc_info.get('logged_in'):
-                ModernDialog.show_success(self, "切换成功", f"已切换到账号【{nickname}】\n\n战网应该会自动登录")
+                ModernDialog.show_success(self, "切换成功", f"已切换到账号【{nickname}】\n\n战网应该会自动登录{timings}")
             else:
                 ModernDialog.show_info(
                     self, "切换成功",
-                    f"已切换到账号【{nickname}】\n\n请在战网中完成登录\n登录成功后再次点击【保存当前登录】保存状态"
+                    f"已切换到账号【{nickname}】\n\n请在战网中完成登录\n登录成功后再次点击【保存当前登录】保存状态{timings}"
                 )
+        elif stats.get('cancelled'):
+            ModernDialog.show_info(self, "已取消", msg)
         else:
             ModernDialog.show_error(self, "切换失败", f"切换失败: {msg}")
         
-        self.refresh_accounts()
+        # 切换前的目录保留一段时间用于撤销，战网启动成功后到时删除
+        if success and self.switcher.has_switch_backup():
+            self.backup_timer.start(int(self.switcher.backup_keep_seconds * 1000))
+        
+        # 只有切换前后的两个账号（登录时间、热账号标记）有变化
+        self.refresh_accounts(list(dict.fromkeys(acc for acc in (previous_id, account_id) if acc)))
+        # 常用账号顺序变了，重新预取
+        if success and self.switcher.prefetcher.max_accounts:
+            self.tasks.run(self.switcher.prefetcher.run_once, lambda stats: self.refresh_hot_accounts())
+    
+    def rollback_switch(self):
+        """撤销最近一次切换：换回切换前的目录和账号"""
+        if not self.switcher.has_switch_backup():
+            ModernDialog.show_info(self, "提示", "没有可以撤销的切换")
+            return
+        reply = ModernDialog.show_question(
+            self, "撤销切换",
+            "这将关闭战网，恢复到上一次切换前的账号和数据。\n\n确定继续？"
+        )
+        if not reply:
+            return
+        previous_id = self.switcher.current_account_id
+        
+        def on_rolled_back(result):
+            ok, msg = result
+            if ok:
+                self.backup_timer.stop()
+                ModernDialog.show_success(self, "撤销成功", msg)
+            else:
+                ModernDialog.show_error(self, "撤销失败", msg)
+            current_id = self.switcher.current_account_id
+            self.refresh_accounts(list(dict.fromkeys(acc for acc in (previous_id, current_id) if acc)))
+        
+        self.run_task(OP_SWITCH, self.switcher.rollback_last_switch, on_rolled_back, label="撤销切换")
+    
+    def discard_switch_backup(self):
+        """到时删除切换前的目录，释放磁盘空间"""
+        self.tasks.run(self.switcher.discard_switch_backup, kind=OP_OTHER, label="清理切换前数据")
+    
+    def refresh_hot_accounts(self):
+        """预取后只更新热账号标记有变化的行"""
+        hot = self.switcher.prefetcher.hot_accounts()
+        flags = self.account_list.account_model.hot_flags()
+        changed = [account_id for account_id, flag in flags.items() if flag != (account_id in hot)]
+        if changed:
+            self.refresh_accounts(changed)
     
     def rename_account(self, account_id):
         """重命名账号"""
@@ -1869,10 +1918,8 @@ class ModernGUI(QMainWindow):
         )
         
         if ok and new_nickname and new_nickname != old_nickname:
-            self.switcher.accounts[account_id]['nickname'] = new_nickname
-            self.switcher._save_accounts()
-            self.refresh_accounts()
-            ModernDialog.show_success(self, "成功", f"账号已重命名为【{new_nickname}】")
+            self._edit_account(account_id, lambda info: info.update(nickname=new_nickname),
+                               lambda: ModernDialog.show_success(self, "成功", f"账号已重命名为【{new_nickname}】"))
     
     def toggle_version(self, account_id):
         """切换账号的版本标记（国服/国际服）"""
@@ -1887,10 +1934,64 @@ class ModernGUI(QMainWindow):
             new_version = 'cn'
             new_version_text = '国服'
         
-        self.switcher.accounts[account_id]['version'] = new_version
-        self.switcher._save_accounts()
-        self.refresh_accounts()
-        ModernDialog.show_success(self, "成功", f"账号【{nickname}】已标记为{new_version_text}")
+        self._edit_account(account_id, lambda info: info.update(version=new_version),
+                           lambda: ModernDialog.show_success(self, "成功", f"账号【{nickname}】已标记为{new_version_text}"))
+    
+    def _edit_account(self, account_id, edit, on_done):
+        """
+        在调度线程中修改账号信息并保存：edit(账号信息dict)，完成后刷新该行并调用 on_done()
+        不传账号ID提交，只改账号信息的操作不会取代同一账号排队中的保存/更新
+        """
+        nickname = self.switcher.accounts.get(account_id, {}).get('nickname', '未知')
+        
+        def apply():
+            if account_id not in self.switcher.accounts:
+                return False
+            with self.switcher.account_store.batch():
+                edit(self.switcher.accounts[account_id])
+                self.switcher._save_accounts()
+            return True
+        
+        def on_edited(edited):
+            self.refresh_accounts([account_id])
+            if edited:
+                on_done()
+            else:
+                ModernDialog.show_error(self, "错误", f"账号【{nickname}】已不存在")
+        
+        self.run_task(OP_UPDATE, apply, on_edited, label=f"修改 {nickname}")
+    
+    def _update_and_mark(self, account_id):
+        """用当前战网状态覆盖账号数据并标记已登录（账号信息合并为一次保存）"""
+        with self.switcher.account_store.batch():
+            self.switcher.update_account_data(account_id)
+            self.switcher.mark_logged_in(account_id)
+        return True
+    
+    def _create_from_current(self, nickname, email, battletag, version=None, mark_logged_in=False):
+        """从当前战网状态创建账号并记录邮箱等信息，返回账号ID（失败返回None）"""
+        with self.switcher.account_store.batch():
+            account_id = self.switcher.create_account_from_current(nickname, force_version=version)
+            if account_id:
+                self.switcher.accounts[account_id]["email"] = email
+                self.switcher.accounts[account_id]["battletag"] = battletag
+                if version:
+                    self.switcher.accounts[account_id]["version"] = version
+                if mark_logged_in:
+                    self.switcher.mark_logged_in(account_id)
+                self.switcher._save_accounts()
+        return account_id
+    
+    def _run_update(self, account_id):
+        """后台用当前战网状态覆盖账号数据"""
+        nickname = self.switcher.accounts.get(account_id, {}).get('nickname', '未知')
+        
+        def on_updated(_):
+            self.refresh_accounts([account_id])
+            ModernDialog.show_success(self, "成功", f"账号【{nickname}】数据已更新")
+        
+        self.run_task(OP_UPDATE, lambda: self._update_and_mark(account_id), on_updated,
+                      account_id, f"更新 {nickname}")
     
     def update_account_data(self, account_id):
         """更新账号数据（从当前战网状态覆盖保存的数据）"""
@@ -1907,11 +2008,7 @@ class ModernGUI(QMainWindow):
             "⚠️ 请确保当前战网已登录的是该账号"
         )
         if reply:
-            self.switcher.update_account_data(account_id)
-            self.switcher.mark_logged_in(account_id)
-            self.switcher._save_accounts()
-            self.refresh_accounts()
-            ModernDialog.show_success(self, "成功", f"账号【{nickname}】数据已更新")
+            self._run_update(account_id)
     
     def delete_account(self, account_id):
         acc_info = self.switcher.accounts.get(account_id, {})
@@ -1922,8 +2019,8 @@ class ModernGUI(QMainWindow):
             f"确定要删除账号【{nickname}】吗？\n\n这将删除该账号的所有数据"
         )
         if reply:
-            self.switcher.delete_account(account_id)
-            self.refresh_accounts()
+            self.run_task(OP_DELETE, lambda: self.switcher.delete_account(account_id),
+                          lambda _: self.refresh_accounts([account_id]), account_id, f"删除 {nickname}")
     
     def start_battlenet(self):
         if self.switcher.start_battlenet():
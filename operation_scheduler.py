@@ -0,0 +1,304 @@
+"""
+暴雪战网账号切换器 - 操作调度
+所有会修改战网目录或账号数据的操作（切换、保存、更新、删除、准备新登录）都提交到同一个
+后台线程按顺序执行，避免两个操作同时读写当前的战网目录：
+- 合并：排队中的切换被新的切换取代（先点A再点B只切换到B），同一账号重复的保存/更新只执行最后一次
+- 拒绝：与排队中或执行中的操作冲突的请求直接拒绝（如切换过程中保存当前登录、删除正在切换的账号）
+- 统计：队列长度、等待时间、执行时间
+"""
+import time
+import threading
+import itertools
+from collections import deque
+
+
+OP_SWITCH = "switch"
+OP_PREPARE = "prepare"
+OP_SAVE = "save"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+OP_OTHER = "other"
+
+OP_LABELS = {
+    OP_SWITCH: "切换账号",
+    OP_PREPARE: "准备新登录",
+    OP_SAVE: "保存当前登录",
+    OP_UPDATE: "更新账号数据",
+    OP_DELETE: "删除账号",
+    OP_OTHER: "操作",
+}
+
+# 会改变当前登录的是哪个账号的操作
+LIVE_CHANGING = (OP_SWITCH, OP_PREPARE)
+# 读取当前登录状态保存的操作，执行前当前账号不能变
+LIVE_CAPTURING = (OP_SAVE, OP_UPDATE)
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_SUPERSEDED = "superseded"
+
+# 统计最近多少个操作的等待/执行时间
+STATS_WINDOW = 100
+
+
+class OperationRejected(Exception):
+    """操作与排队中或执行中的操作冲突，消息直接显示给用户"""
+
+
+class Operation:
+    """一个排队的操作"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind: str, func, account_id: str = None, callback=None, label: str = None):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.func = func
+        self.account_id = account_id
+        self.callback = callback
+        self.label = label or OP_LABELS.get(kind, kind)
+        self.state = STATE_PENDING
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.started or time.perf_counter()) - self.submitted
+
+    @property
+    def run_seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def ok(self) -> bool:
+        return self.state == STATE_DONE
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待操作结束（完成、失败或被取代）"""
+        return self._done.wait(timeout)
+
+    def __repr__(self):
+        return f"<Operation {self.id} {self.kind} {self.account_id} {self.state}>"
+
+
+class OperationScheduler:
+    """单线程操作队列"""
+
+    def __init__(self):
+        self._queue = deque()
+        self._running = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._counts = {}
+        self._waits = deque(maxlen=STATS_WINDOW)
+        self._runs = deque(maxlen=STATS_WINDOW)
+
+    # ---------- 提交 ----------
+
+    def _count(self, kind: str, key: str, n: int = 1):
+        counts = self._counts.setdefault(kind, {})
+        counts[key] = counts.get(key, 0) + n
+
+    def _conflict(self, kind: str, account_id: str):
+        """返回与新操作冲突的原因，没有冲突时返回None"""
+        active = ([self._running] if self._running else []) + list(self._queue)
+        for op in active:
+            running = op is self._running
+            if kind in LIVE_CAPTURING and op.kind in LIVE_CHANGING:
+                return f"正在{op.label}，请完成后再{OP_LABELS[kind]}"
+            if account_id is None or op.account_id != account_id:
+                continue
+            if op.kind == OP_DELETE:
+                return "该账号正在删除"
+            if kind == OP_DELETE and (running or op.kind == OP_SWITCH):
+                return f"请等待{op.label}完成后再删除该账号"
+        return None
+
+    def _coalesce(self, kind: str, account_id: str) -> list:
+        """取出被新操作取代的排队中操作"""
+        superseded = []
+        for op in list(self._queue):
+            if kind in LIVE_CHANGING and op.kind in LIVE_CHANGING:
+                # 只有最后一次切换/准备新登录有意义
+                superseded.append(op)
+            elif account_id is not None and op.account_id == account_id and (
+                    op.kind == kind or (kind == OP_DELETE and op.kind in LIVE_CAPTURING)):
+                # 同一账号重复的保存/更新只执行最后一次；删除前的保存/更新没有意义
+                superseded.append(op)
+        for op in superseded:
+            self._queue.remove(op)
+        return superseded
+
+    def submit(self, kind: str, func, account_id: str = None, callback=None, label: str = None) -> Operation:
+        """
+        提交操作
+
+        Args:
+            kind: 操作类型 OP_*
+            func: 在调度线程中执行的函数（无参数），返回值保存在 Operation.result
+            account_id: 操作的账号
+            callback: 操作结束（完成、失败或被取代）后在调度线程中调用 callback(operation)
+
+        Raises:
+            OperationRejected: 与排队中或执行中的操作冲突
+        """
+        op = Operation(kind, func, account_id, callback, label)
+        with self._cond:
+            reason = self._conflict(kind, account_id)
+            if reason:
+                self._count(kind, "rejected")
+                raise OperationRejected(reason)
+            superseded = self._coalesce(kind, account_id)
+            for old in superseded:
+                old.state = STATE_SUPERSEDED
+                self._count(old.kind, "coalesced")
+            self._queue.append(op)
+            self._count(kind, "submitted")
+            self._ensure_worker()
+            self._cond.notify()
+        for old in superseded:
+            self._finish(old)
+        return op
+
+    def run(self, kind: str, func, account_id: str = None, label: str = None):
+        """提交操作并等待执行完成，返回func的返回值（func抛出的异常会重新抛出）"""
+        op = self.submit(kind, func, account_id, label=label)
+        op.wait()
+        if op.state == STATE_SUPERSEDED:
+            raise OperationRejected(f"{op.label}已被新的操作取代")
+        if op.error is not None:
+            raise op.error
+        return op.result
+
+    # ---------- 执行 ----------
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="operations", daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                op = self._queue.popleft()
+                self._running = op
+                op.state = STATE_RUNNING
+                op.started = time.perf_counter()
+            try:
+                op.result = op.func()
+                op.state = STATE_DONE
+            except Exception as e:
+                print(f"{op.label}失败: {e}")
+                op.error = e
+                op.state = STATE_FAILED
+            op.finished = time.perf_counter()
+            with self._cond:
+                self._running = None
+                self._waits.append(op.wait_seconds)
+                self._runs.append(op.run_seconds)
+                self._count(op.kind, "failed" if op.error else "completed")
+                self._cond.notify_all()
+            self._finish(op)
+
+    def _finish(self, op: Operation):
+        op._done.set()
+        if op.callback:
+            try:
+                op.callback(op)
+            except Exception as e:
+                print(f"操作回调失败: {e}")
+
+    # ---------- 状态 ----------
+
+    @property
+    def depth(self) -> int:
+        """排队中的操作数（不含正在执行的）"""
+        with self._cond:
+            return len(self._queue)
+
+    @property
+    def running(self) -> Operation:
+        return self._running
+
+    def is_busy(self, account_id: str = None) -> bool:
+        """是否有排队中或执行中的操作（指定account_id时只看该账号的操作）"""
+        with self._cond:
+            ops = ([self._running] if self._running else []) + list(self._queue)
+        return any(account_id is None or op.account_id == account_id for op in ops)
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """等待队列清空"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while self._queue or self._running:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: {"depth", "running", "counts": {类型: {"submitted", "completed", "failed", "coalesced", "rejected"}},
+                   "wait_avg_ms", "wait_max_ms", "run_avg_ms", "run_max_ms"}
+        """
+        with self._cond:
+            waits = list(self._waits)
+            runs = list(self._runs)
+            # 排队中的操作也计入等待时间，队列堵塞时能立即看到
+            pending_waits = [op.wait_seconds for op in self._queue]
+            result = {
+                "depth": len(self._queue),
+                "running": self._running.kind if self._running else None,
+                "counts": {kind: dict(counts) for kind, counts in self._counts.items()},
+            }
+        all_waits = waits + pending_waits
+        result["wait_avg_ms"] = sum(all_waits) / len(all_waits) * 1000 if all_waits else 0.0
+        result["wait_max_ms"] = max(all_waits) * 1000 if all_waits else 0.0
+        result["run_avg_ms"] = sum(runs) / len(runs) * 1000 if runs else 0.0
+        result["run_max_ms"] = max(runs) * 1000 if runs else 0.0
+        return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> OperationScheduler:
+    """全局共享的操作调度器（所有界面共用）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OperationScheduler()
+        return _scheduler
+
+
+def submit_tk(root, kind: str, func, account_id: str = None, on_result=None, scheduler=None) -> bool:
+    """
+    tkinter界面使用：把操作交给调度线程执行，结束后通过 root.after 在界面线程中调用
+    on_result(成功与否, 返回值或错误)；被新操作取代时不回调，与正在进行的操作冲突时提示并返回False
+    """
+    # 只有tkinter界面调用，调度器本身不依赖界面库
+    from tkinter import messagebox
+
+    def on_done(op):
+        if op.state != STATE_SUPERSEDED and on_result:
+            root.after(0, lambda: on_result(op.ok, op.result if op.ok else op.error))
+
+    try:
+        (scheduler or get_scheduler()).submit(kind, func, account_id, on_done)
+        return True
+    except OperationRejected as e:
+        messagebox.showwarning("提示", str(e), parent=root)
+        return False
@@ -0,0 +1,269 @@
+"""
+暴雪战网账号切换器 - 预取
+根据账号的切换历史（最近、最常使用）预测接下来可能切换的账号，空闲时在暂存目录中提前
+准备好它们的数据；切换到已预取（"热"）的账号时只需两次重命名。
+受磁盘预算（所有预取暂存目录的总大小）和I/O预算（每轮最多写入的字节数、写入速率）限制
+"""
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from account_store import atomic_write_json
+import stage_swap
+
+
+# 最多同时预取几个账号
+DEFAULT_MAX_ACCOUNTS = 2
+# 预取暂存目录最多占用的磁盘空间
+DEFAULT_DISK_BUDGET = 2 * 1024 * 1024 * 1024
+# 每轮预取最多写入的字节数
+DEFAULT_IO_BUDGET = 512 * 1024 * 1024
+# 预取写入速率上限（字节/秒），避免和正在运行的客户端、游戏争抢磁盘
+DEFAULT_RATE = 32 * 1024 * 1024
+# 后台预取间隔（秒）
+DEFAULT_INTERVAL = 300
+# 切换记录的权重半衰期（天）
+HALF_LIFE_DAYS = 7.0
+# 每个账号保留的切换记录数
+HISTORY_LIMIT = 20
+
+
+def _parse_time(value: str):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def record_switch(info: dict, when: datetime = None):
+    """在账号信息中记录一次切换（保留最近HISTORY_LIMIT次）"""
+    when = when or datetime.now()
+    history = info.get('switch_history', [])
+    history.append(when.isoformat())
+    info['switch_history'] = history[-HISTORY_LIMIT:]
+    info['switch_count'] = info.get('switch_count', 0) + 1
+
+
+def frecency(info: dict, now: datetime = None) -> float:
+    """
+    账号的使用热度：每次切换按距今时间衰减后累加，兼顾最近使用和使用频率
+    没有切换记录的旧账号按 last_login 算一次
+    """
+    now = now or datetime.now()
+    times = info.get('switch_history') or [info.get('last_login')]
+    score = 0.0
+    for value in times:
+        when = _parse_time(value)
+        if when is None:
+            continue
+        age_days = max((now - when).total_seconds(), 0) / 86400
+        score += 0.5 ** (age_days / HALF_LIFE_DAYS)
+    return score
+
+
+class Prefetcher:
+    """为可能切换的账号预先准备暂存目录"""
+
+    def __init__(self, switcher, max_accounts: int = DEFAULT_MAX_ACCOUNTS, disk_budget: int = DEFAULT_DISK_BUDGET,
+                 io_budget: int = DEFAULT_IO_BUDGET, rate: int = DEFAULT_RATE, interval: float = DEFAULT_INTERVAL):
+        self.switcher = switcher
+        self.max_accounts = max_accounts
+        self.disk_budget = disk_budget
+        self.io_budget = io_budget
+        self.rate = rate
+        self.interval = interval
+        self.state_file = switcher.env.storage_path("prefetch.json")
+        # 账号ID -> {"manifest_mtime_ns", "mode", "bytes", "staged_at"}
+        self.state = self._load_state()
+        self.last_run = None
+        # 正在切换的目标账号，它的暂存目录不能被清理
+        self.pinned = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_state(self):
+        atomic_write_json(self.state_file, self.state, indent=2)
+
+    @property
+    def roots(self) -> tuple:
+        return (("LocalAppData", self.switcher.BATTLENET_LOCAL), ("Roaming", self.switcher.BATTLENET_ROAMING))
+
+    # ---------- 预测 ----------
+
+    def predict(self, now: datetime = None) -> list:
+        """按使用热度排序的候选账号（不含当前账号、没有快照和冷存储的账号）"""
+        switcher = self.switcher
+        scored = []
+        for account_id, info in switcher.accounts.items():
+            if account_id == switcher.current_account_id:
+                continue
+            if not switcher.store.has_snapshot(account_id) or switcher.cold.is_cold(account_id):
+                continue
+            score = frecency(info, now)
+            if score > 0:
+                scored.append((score, account_id))
+        scored.sort(reverse=True)
+        return [account_id for _, account_id in scored[:self.max_accounts]]
+
+    # ---------- 状态 ----------
+
+    def _manifest_mtime(self, account_id: str):
+        try:
+            return os.stat(self.switcher.store.manifest_path(account_id)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _snapshot_bytes(self, account_id: str) -> int:
+        manifest = self.switcher.store.load_manifest(account_id) or {}
+        return sum(entry['size'] for tree in manifest.get('trees', {}).values()
+                   for entry in tree.get('files', {}).values())
+
+    def is_hot(self, account_id: str) -> bool:
+        """暂存目录已按账号当前的快照准备好，切换时可以直接换入"""
+        entry = self.state.get(account_id)
+        if not entry:
+            return False
+        if entry.get("manifest_mtime_ns") != self._manifest_mtime(account_id):
+            return False
+        if entry.get("mode") != self.switcher.store.mode:
+            return False
+        return all(os.path.isdir(stage_swap.stage_path(root, account_id)) for _, root in self.roots)
+
+    def hot_accounts(self) -> set:
+        return {account_id for account_id in list(self.state) if self.is_hot(account_id)}
+
+    def consume(self, account_id: str):
+        """暂存目录已被换入（或失效），不再记录为热账号"""
+        if self.state.pop(account_id, None) is not None:
+            self._save_state()
+
+    def forget(self, account_id: str):
+        """删除账号的预取暂存目录"""
+        for _, root in self.roots:
+            stage_swap.discard_stage(root, account_id)
+        self.consume(account_id)
+
+    def evict(self, keep) -> list:
+        """删除不在keep中的预取暂存目录，返回被删除的账号ID"""
+        staged = set(self.state)
+        for _, root in self.roots:
+            staged.update(stage_swap.staged_accounts(root))
+        evicted = sorted(staged - set(keep) - {self.pinned})
+        with self.switcher._storage_lock:
+            for account_id in evicted:
+                self.forget(account_id)
+        return evicted
+
+    # ---------- 预取 ----------
+
+    def _throttle(self, nbytes: int, seconds: float):
+        """按写入速率上限补足等待时间"""
+        if self.rate:
+            delay = nbytes / self.rate - seconds
+            if delay > 0:
+                self._stop.wait(delay)
+
+    def run_once(self) -> dict:
+        """
+        执行一轮预取：删除预测之外的暂存目录，再按热度依次准备候选账号
+
+        Returns:
+            dict: 统计信息 {"staged", "hot", "skipped", "evicted", "bytes_written", "seconds"}
+        """
+        with self._lock:
+            start = time.perf_counter()
+            switcher = self.switcher
+            # 按热度在磁盘预算内选出要保留的账号，其余暂存目录删除
+            targets = []
+            skipped = []
+            disk_used = 0
+            for account_id in self.predict():
+                size = self._snapshot_bytes(account_id)
+                if disk_used + size > self.disk_budget:
+                    skipped.append(account_id)
+                    continue
+                targets.append((account_id, size))
+                disk_used += size
+            evicted = self.evict(account_id for account_id, _ in targets)
+            written = 0
+            staged, hot = [], []
+
+            for account_id, size in targets:
+                if self._stop.is_set():
+                    break
+                if self.is_hot(account_id):
+                    hot.append(account_id)
+                    continue
+                if written >= self.io_budget:
+                    skipped.append(account_id)
+                    continue
+
+                t = time.perf_counter()
+                moved = 0
+                try:
+                    mtime = self._manifest_mtime(account_id)
+                    for name, root in self.roots:
+                        # 逐棵树加锁，不会长时间阻塞用户发起的切换
+                        with switcher._storage_lock:
+                            if account_id == switcher.current_account_id:
+                                break
+                            stats = stage_swap.stage_tree(switcher.store, account_id, name, root, recycle=False,
+                                                          rules=switcher.rules_for(account_id))
+                        moved += stats["bytes_moved"]
+                    else:
+                        self.state[account_id] = {
+                            "manifest_mtime_ns": mtime,
+                            "mode": switcher.store.mode,
+                            "bytes": size,
+                            "staged_at": datetime.now().isoformat(),
+                        }
+                        self._save_state()
+                        staged.append(account_id)
+                except Exception as e:
+                    print(f"预取账号数据失败: {account_id}, 错误: {e}")
+                    self.forget(account_id)
+                written += moved
+                self._throttle(moved, time.perf_counter() - t)
+
+            self.last_run = {
+                "staged": staged,
+                "hot": hot,
+                "skipped": skipped,
+                "evicted": evicted,
+                "bytes_written": written,
+                "disk_used": disk_used,
+                "seconds": time.perf_counter() - start,
+            }
+            return self.last_run
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        """启动后台预取线程（每隔interval秒执行一轮）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="prefetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"预取失败: {e}")
+            self._stop.wait(self.interval)
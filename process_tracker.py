@@ -0,0 +1,137 @@
+"""
+暴雪战网账号切换器 - 进程跟踪
+缓存战网/Agent/Blizzard相关进程，按PID+创建时间低成本复核，供所有切换器和界面共用。
+已缓存客户端进程时轮询只复核缓存，不遍历进程表；没有缓存的客户端（未运行或已退出）、
+invalidate()之后或结束客户端时才遍历整个进程表。之后启动的辅助进程按较长的间隔发现
+"""
+import time
+import threading
+
+import psutil
+from wait_utils import wait_for_processes
+
+
+# 战网客户端进程（判断是否运行、关闭时结束）
+CLIENT_KEYWORDS = ('battle.net',)
+# 其他暴雪相关进程（只跟踪）
+RELATED_NAMES = ('agent.exe',)
+RELATED_KEYWORDS = ('blizzard',)
+
+
+def classify_process(name: str) -> str:
+    """返回进程类别：'client' / 'related' / None"""
+    if not name:
+        return None
+    name = name.lower()
+    if any(k in name for k in CLIENT_KEYWORDS):
+        return 'client'
+    if name in RELATED_NAMES or any(k in name for k in RELATED_KEYWORDS):
+        return 'related'
+    return None
+
+
+class ProcessTracker:
+    """战网相关进程跟踪器"""
+
+    def __init__(self, min_scan_interval: float = 2.0, helper_scan_interval: float = 60.0):
+        # 没有缓存的客户端时两次全量扫描的最短间隔
+        self.min_scan_interval = min_scan_interval
+        # 已缓存客户端时，为发现新启动的辅助进程而全量扫描的间隔
+        self.helper_scan_interval = helper_scan_interval
+        self._tracked = {}          # pid -> (psutil.Process, 类别)
+        self._last_scan = float('-inf')
+        self._lock = threading.Lock()
+        self.full_scans = 0
+
+    def _revalidate(self):
+        """复核缓存的进程：is_running()会比较PID和创建时间，防止PID被复用"""
+        for pid, (proc, _) in list(self._tracked.items()):
+            try:
+                if not proc.is_running():
+                    del self._tracked[pid]
+            except psutil.Error:
+                del self._tracked[pid]
+
+    def _full_scan(self):
+        self.full_scans += 1
+        self._last_scan = time.monotonic()
+        for proc in psutil.process_iter(['name']):
+            try:
+                kind = classify_process(proc.info['name'])
+                if kind:
+                    self._tracked[proc.pid] = (proc, kind)
+            except psutil.Error:
+                pass
+
+    def refresh(self, force: bool = False):
+        """
+        复核缓存；有存活的客户端进程时只按PID复核，超过helper_scan_interval才全量扫描，
+        没有时按min_scan_interval全量扫描；force时总是全量扫描
+        """
+        with self._lock:
+            self._revalidate()
+            has_client = any(kind == 'client' for _, kind in self._tracked.values())
+            interval = self.helper_scan_interval if has_client else self.min_scan_interval
+            if force or time.monotonic() - self._last_scan >= interval:
+                self._full_scan()
+
+    def invalidate(self):
+        """启动客户端后调用，下次查询立即重新扫描"""
+        with self._lock:
+            self._last_scan = float('-inf')
+
+    def processes(self, kind: str = 'client') -> list:
+        self.refresh()
+        with self._lock:
+            return [proc for proc, k in self._tracked.values() if kind is None or k == kind]
+
+    def is_running(self) -> bool:
+        """战网客户端是否在运行"""
+        return bool(self.processes('client'))
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """
+        结束战网客户端进程并等待其退出，返回是否有进程被结束
+        每一轮都重新遍历进程表（不只结束缓存的进程），等待期间新启动的辅助进程也会被结束
+        """
+        deadline = time.monotonic() + timeout
+        stopped = False
+        while True:
+            self.refresh(force=True)
+            with self._lock:
+                clients = [proc for proc, kind in self._tracked.values() if kind == 'client']
+            terminated = []
+            for proc in clients:
+                try:
+                    proc.terminate()
+                    terminated.append(proc)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            remaining = deadline - time.monotonic()
+            if not terminated or remaining <= 0:
+                break
+            stopped = True
+            self.wait_exit(terminated, remaining)
+        return stopped
+
+    def wait_exit(self, procs=None, timeout: float = 10.0) -> bool:
+        """等待进程退出（默认等待所有客户端进程）"""
+        if procs is None:
+            procs = self.processes('client')
+        ok = wait_for_processes(procs, timeout=timeout, name="close_battlenet")
+        with self._lock:
+            self._revalidate()
+        return ok
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker() -> ProcessTracker:
+    """全局共享的进程跟踪器"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ProcessTracker()
+        return _tracker
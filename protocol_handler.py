@@ -10,6 +10,15 @@ import subprocess
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 from config import DATA_DIR, ensure_dirs
+from metadata_cache import get_metadata_cache
+
+
+def summarize_callback(callback_data: dict) -> dict:
+    """get_callback_info 使用的摘要字段"""
+    return {
+        "saved_at": callback_data.get("saved_at", "未知"),
+        "has_url": bool(callback_data.get("callback_url"))
+    }
 
 
 class ProtocolHandler:
@@ -18,10 +27,11 @@ class ProtocolHandler:
     PROTOCOL_NAME = "battlenet"
     APP_NAME = "BattleNetAccountManager"
     
-    def __init__(self):
+    def __init__(self, callbacks_dir: str = None):
         ensure_dirs()
-        self.callbacks_dir = os.path.join(DATA_DIR, "callbacks")
+        self.callbacks_dir = callbacks_dir or os.path.join(DATA_DIR, "callbacks")
         os.makedirs(self.callbacks_dir, exist_ok=True)
+        self.metadata = get_metadata_cache(self.callbacks_dir, summarize_callback, "callbacks")
         self.original_handler = None
     
     def get_current_handler(self):
@@ -93,6 +103,7 @@ class ProtocolHandler:
             
             with open(callback_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            self.metadata.update(account_id, data)
             
             return True
         except Exception as e:
@@ -153,21 +164,22 @@ class ProtocolHandler:
             callback_file = os.path.join(self.callbacks_dir, f"{account_id}.json")
             if os.path.exists(callback_file):
                 os.remove(callback_file)
+            self.metadata.discard(account_id)
             return True
         except:
             return False
     
     def get_callback_info(self, account_id: str) -> dict:
-        """获取回调信息摘要"""
-        callback_data = self.load_callback(account_id)
-        if not callback_data:
+        """获取回调信息摘要，文件没有变化时不读取文件"""
+        try:
+            summary = self.metadata.get(account_id)
+        except Exception as e:
+            print(f"加载回调失败: {e}")
+            summary = None
+        if not summary:
             return {"exists": False}
         
-        return {
-            "exists": True,
-            "saved_at": callback_data.get("saved_at", "未知"),
-            "has_url": bool(callback_data.get("callback_url"))
-        }
+        return {"exists": True, **summary}
 
 
 def handle_protocol_callback(url: str):
@@ -0,0 +1,262 @@
+"""
+暴雪战网账号切换器 - 注册表访问
+用winreg在进程内完成查询、删除和批量导入，不再为每个值启动一次reg.exe；
+快照保存为结构化JSON，另提供内存实现，便于在非Windows平台测试和基准测试
+"""
+import os
+import json
+
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+
+# 注册表值类型（与winreg常量一致）
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+HIVE_NAMES = {
+    'HKCU': 'HKEY_CURRENT_USER',
+    'HKEY_CURRENT_USER': 'HKEY_CURRENT_USER',
+    'HKLM': 'HKEY_LOCAL_MACHINE',
+    'HKEY_LOCAL_MACHINE': 'HKEY_LOCAL_MACHINE',
+}
+
+
+def split_path(path: str) -> tuple:
+    """'HKCU\\Software\\xxx' -> ('HKEY_CURRENT_USER', 'Software\\xxx')"""
+    hive, _, sub = path.partition('\\')
+    if hive.upper() not in HIVE_NAMES:
+        raise ValueError(f"不支持的注册表根键: {hive}")
+    return HIVE_NAMES[hive.upper()], sub.strip('\\')
+
+
+# 快照条目中标记数据编码的字段：bytes数据保存为十六进制字符串
+HEX_ENCODING = "hex"
+
+
+def encode_value(value_type: int, data) -> dict:
+    """注册表值 -> 快照条目（可JSON序列化），bytes数据标记为十六进制编码"""
+    if isinstance(data, (bytes, bytearray)):
+        return {"type": value_type, "data": data.hex(), "encoding": HEX_ENCODING}
+    return {"type": value_type, "data": data}
+
+
+def decode_value(entry: dict) -> tuple:
+    """
+    快照条目 -> (类型, 数据)
+    有十六进制标记的按bytes解码（与类型无关）；没有标记的旧快照只有REG_BINARY是十六进制
+    """
+    value_type, data = entry["type"], entry["data"]
+    if isinstance(data, str) and (entry.get("encoding") == HEX_ENCODING
+                                  or ("encoding" not in entry and value_type == REG_BINARY)):
+        return value_type, bytes.fromhex(data)
+    return value_type, data
+
+
+def save_snapshot(snapshot: dict, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str) -> dict:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class RegistryBackend:
+    """
+    注册表访问接口
+    快照格式: {"root": 路径, "keys": {相对子键: {值名: {"type": 类型, "data": 数据[, "encoding": "hex"]}}}}
+    根键自身的值使用空字符串作为子键名
+    """
+
+    def list_values(self, path: str) -> dict:
+        """值名 -> (类型, 数据)，键不存在返回空字典"""
+        raise NotImplementedError
+
+    def list_subkeys(self, path: str) -> list:
+        raise NotImplementedError
+
+    def set_values(self, path: str, values: dict) -> None:
+        """批量写入 值名 -> (类型, 数据)，键不存在时自动创建"""
+        raise NotImplementedError
+
+    def delete_values(self, path: str, names) -> int:
+        """批量删除值，返回实际删除的数量"""
+        raise NotImplementedError
+
+    def delete_key(self, path: str) -> bool:
+        """递归删除键"""
+        raise NotImplementedError
+
+    def delete_value(self, path: str, name: str) -> bool:
+        return self.delete_values(path, [name]) == 1
+
+    def export_tree(self, path: str) -> dict:
+        """导出键及其所有子键为快照"""
+        keys = {}
+        stack = ['']
+        while stack:
+            rel = stack.pop()
+            full = f"{path}\\{rel}" if rel else path
+            values = self.list_values(full)
+            keys[rel] = {name: encode_value(t, d) for name, (t, d) in values.items()}
+            for sub in self.list_subkeys(full):
+                stack.append(f"{rel}\\{sub}" if rel else sub)
+        return {"root": path, "keys": keys}
+
+    def import_tree(self, snapshot: dict) -> bool:
+        """一次性写入快照中的所有键和值"""
+        root = snapshot["root"]
+        for rel, values in snapshot.get("keys", {}).items():
+            full = f"{root}\\{rel}" if rel else root
+            self.set_values(full, {name: decode_value(v) for name, v in values.items()})
+        return True
+
+
+class WinRegBackend(RegistryBackend):
+    """基于winreg的进程内实现"""
+
+    def _open(self, path: str, access):
+        hive, sub = split_path(path)
+        return winreg.OpenKey(getattr(winreg, hive), sub, 0, access)
+
+    def list_values(self, path: str) -> dict:
+        try:
+            key = self._open(path, winreg.KEY_READ)
+        except OSError:
+            return {}
+        values = {}
+        with key:
+            i = 0
+            while True:
+                try:
+                    name, data, value_type = winreg.EnumValue(key, i)
+                except OSError:
+                    break
+                values[name] = (value_type, data)
+                i += 1
+        return values
+
+    def list_subkeys(self, path: str) -> list:
+        try:
+            key = self._open(path, winreg.KEY_READ)
+        except OSError:
+            return []
+        subkeys = []
+        with key:
+            i = 0
+            while True:
+                try:
+                    subkeys.append(winreg.EnumKey(key, i))
+                except OSError:
+                    break
+                i += 1
+        return subkeys
+
+    def set_values(self, path: str, values: dict) -> None:
+        hive, sub = split_path(path)
+        with winreg.CreateKeyEx(getattr(winreg, hive), sub, 0, winreg.KEY_WRITE) as key:
+            for name, (value_type, data) in values.items():
+                winreg.SetValueEx(key, name, 0, value_type, data)
+
+    def delete_values(self, path: str, names) -> int:
+        try:
+            key = self._open(path, winreg.KEY_SET_VALUE)
+        except OSError:
+            return 0
+        deleted = 0
+        with key:
+            for name in names:
+                try:
+                    winreg.DeleteValue(key, name)
+                    deleted += 1
+                except OSError:
+                    pass
+        return deleted
+
+    def delete_key(self, path: str) -> bool:
+        for sub in self.list_subkeys(path):
+            self.delete_key(f"{path}\\{sub}")
+        hive, sub = split_path(path)
+        try:
+            winreg.DeleteKey(getattr(winreg, hive), sub)
+            return True
+        except OSError:
+            return False
+
+
+class MemoryRegistryBackend(RegistryBackend):
+    """内存实现（非Windows平台、测试和基准测试使用），键名不区分大小写"""
+
+    def __init__(self):
+        self.keys = {}      # 规范化路径 -> {值名: (类型, 数据)}
+        self.names = {}     # 规范化路径 -> 原始路径
+
+    @staticmethod
+    def _norm(path: str) -> str:
+        hive, sub = split_path(path)
+        return f"{hive}\\{sub}".lower()
+
+    def list_values(self, path: str) -> dict:
+        return dict(self.keys.get(self._norm(path), {}))
+
+    def list_subkeys(self, path: str) -> list:
+        prefix = self._norm(path) + '\\'
+        subkeys = []
+        for norm, original in self.names.items():
+            if norm.startswith(prefix) and '\\' not in norm[len(prefix):]:
+                subkeys.append(original.rsplit('\\', 1)[1])
+        return subkeys
+
+    def _create(self, path: str) -> dict:
+        hive, sub = split_path(path)
+        parts = sub.split('\\')
+        for i in range(1, len(parts) + 1):
+            partial = f"{hive}\\" + '\\'.join(parts[:i])
+            norm = partial.lower()
+            if norm not in self.keys:
+                self.keys[norm] = {}
+                self.names[norm] = partial
+        return self.keys[self._norm(path)]
+
+    def set_values(self, path: str, values: dict) -> None:
+        key = self._create(path)
+        key.update(values)
+
+    def delete_values(self, path: str, names) -> int:
+        key = self.keys.get(self._norm(path))
+        if key is None:
+            return 0
+        deleted = 0
+        for name in names:
+            if key.pop(name, None) is not None:
+                deleted += 1
+        return deleted
+
+    def delete_key(self, path: str) -> bool:
+        norm = self._norm(path)
+        if norm not in self.keys:
+            return False
+        for other in [k for k in self.keys if k == norm or k.startswith(norm + '\\')]:
+            del self.keys[other]
+            del self.names[other]
+        return True
+
+
+def default_registry() -> RegistryBackend:
+    """Windows上使用winreg，其他平台使用内存实现"""
+    if winreg is not None:
+        return WinRegBackend()
+    return MemoryRegistryBackend()
@@ -0,0 +1,273 @@
+"""
+暴雪战网账号切换器 - 会话胶囊
+切换后自动登录只依赖少量数据：BrowserCaches中Chromium的Cookies数据库、Local State（Cookies的加密密钥）
+和Local Storage，Battle.net.config中的SavedAccountNames，以及注册表UnifiedAuth中的令牌。
+胶囊只保存这些文件（每个账号通常只有几十KB，与完整快照共用blob存储），切换时只把它们写入当前目录；
+verify() 检查胶囊是否足够自动登录，不够时需要使用完整快照。
+同时把Cookies中战网相关的行保存到Cookie行存储（见cookie_store），切换时可以只写入这些行
+"""
+import os
+import json
+import fnmatch
+from registry_backend import load_snapshot
+from delta_sync import plan_account
+
+
+# 胶囊清单保存在快照存储中，清单名为 账号ID + 后缀
+CAPSULE_SUFFIX = ".capsule"
+
+# 模式语法同 snapshot_rules（/开头的相对路径，不区分大小写，*可以跨目录，"树名:模式"）
+CAPSULE_PATTERNS = [
+    "LocalAppData:/BrowserCaches/*/Cookies",
+    "LocalAppData:/BrowserCaches/*/Cookies-journal",
+    "LocalAppData:/BrowserCaches/*/Local State",
+    "LocalAppData:/BrowserCaches/*/Local Storage/*",
+    "Roaming:/Battle.net.config",
+]
+
+# Cookies数据库文件（使用Cookie行存储时胶囊切换不写入这些文件）
+COOKIE_FILES = ("cookies", "cookies-journal")
+
+# 自动登录必需的文件（文件名，小写）
+REQUIRED_FILES = {
+    "LocalAppData": ("cookies", "local state"),
+    "Roaming": ("battle.net.config",),
+}
+# 胶囊写入前当前目录中必须已有的客户端数据
+LIVE_BASE_DIR = "BrowserCaches"
+# 注册表快照中保存登录令牌的子键
+TOKENS_KEY = "UnifiedAuth"
+
+
+class CapsuleRules:
+    """
+    只选中胶囊文件的快照规则，接口同 snapshot_rules.RuleSet（快照存储和增量同步直接使用）
+
+    Args:
+        base: 账号的快照规则，缓存和垃圾目录即使在胶囊目录下也不遍历
+        patterns: 胶囊文件模式
+        cookies: 是否包括Cookies数据库文件
+    """
+
+    name = "capsule"
+
+    def __init__(self, base=None, patterns=None, cookies: bool = True):
+        self.base = base
+        self.cookies = cookies
+        self.patterns = []
+        for pattern in patterns or CAPSULE_PATTERNS:
+            tree, sep, body = pattern.partition(':')
+            if not sep:
+                tree, body = None, pattern
+            body = body.lower()
+            if not body.startswith(('/', '*')):
+                body = '/' + body
+            wild = min((body.index(c) for c in '*?[' if c in body), default=-1)
+            literal = body if wild < 0 else body[:wild]
+            # 模式中第一个通配符之前的目录，遍历时只需进入它的上级目录和（有通配符时）它下面的目录
+            prefix = literal[:literal.rfind('/') + 1]
+            self.patterns.append((tree or None, body, prefix, wild >= 0))
+
+    def includes(self, tree: str, rel: str, is_dir: bool = False) -> bool:
+        path = '/' + rel.lower()
+        patterns = [p for p in self.patterns if p[0] in (None, tree)]
+        if is_dir:
+            path += '/'
+            return any(prefix.startswith(path) or (deep and path.startswith(prefix))
+                       for _, _, prefix, deep in patterns)
+        if not self.cookies and path.rsplit('/', 1)[-1] in COOKIE_FILES:
+            return False
+        return any(fnmatch.fnmatchcase(path, body) for _, body, _, _ in patterns)
+
+    def excludes(self, tree: str, rel: str, is_dir: bool = False) -> bool:
+        if self.base and self.base.excludes(tree, rel, is_dir):
+            return True
+        return not self.includes(tree, rel, is_dir)
+
+    def skipper(self, tree: str):
+        return lambda rel, is_dir: self.excludes(tree, rel, is_dir)
+
+    def filter_tree(self, tree: str, entries: dict) -> dict:
+        files = {rel: entry for rel, entry in entries.get('files', {}).items() if not self.excludes(tree, rel)}
+        dirs = [rel for rel in entries.get('dirs', []) if not self.excludes(tree, rel, is_dir=True)]
+        return {**entries, "files": files, "dirs": dirs}
+
+
+def capsule_id(account_id: str) -> str:
+    return account_id + CAPSULE_SUFFIX
+
+
+def missing_files(manifest: dict) -> list:
+    """胶囊清单中缺少的必需文件"""
+    missing = []
+    trees = (manifest or {}).get('trees', {})
+    for name, required in REQUIRED_FILES.items():
+        present = {rel.rsplit('/', 1)[-1].lower() for rel in trees.get(name, {}).get('files', {})}
+        missing += [f"{name}/{filename}" for filename in required if filename not in present]
+    return missing
+
+
+class SessionCapsules:
+    """账号的会话胶囊：保存、校验、生成切换计划"""
+
+    def __init__(self, switcher):
+        self.switcher = switcher
+        self.store = switcher.store
+        # 账号ID -> (签名, 校验结果)
+        self._verified = {}
+
+    def rules(self, account_id: str, version: str = None, cookies: bool = True) -> CapsuleRules:
+        return CapsuleRules(self.switcher.rules_for(account_id, version), cookies=cookies)
+
+    def has_capsule(self, account_id: str) -> bool:
+        return self.store.has_snapshot(capsule_id(account_id))
+
+    def load(self, account_id: str) -> dict:
+        return self.store.load_manifest(capsule_id(account_id))
+
+    def capture(self, account_id: str, local_path: str, roaming_path: str, version: str = None,
+                stable_retries: int = 0) -> dict:
+        """
+        只保存胶囊文件（stable_retries 见 SnapshotStore.capture）
+
+        Returns:
+            dict: 快照存储的统计信息，另加 "bytes"（胶囊大小）和 "missing"（缺少的必需文件）
+        """
+        switcher = self.switcher
+        with switcher._storage_lock:
+            stats = self.store.capture(capsule_id(account_id), {"LocalAppData": local_path, "Roaming": roaming_path},
+                                       rules=self.rules(account_id, version), stable_retries=stable_retries)
+        manifest = self.load(account_id)
+        stats["bytes"] = self._size(manifest)
+        stats["missing"] = missing_files(manifest)
+        stats["cookies"] = switcher.cookies.capture(account_id, local_path)
+        return stats
+
+    def discard(self, account_id: str):
+        """删除胶囊清单（blob由快照存储回收）"""
+        self._verified.pop(account_id, None)
+        try:
+            os.remove(self.store.manifest_path(capsule_id(account_id)))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _size(manifest: dict) -> int:
+        return sum(entry['size'] for tree in (manifest or {}).get('trees', {}).values()
+                   for entry in tree.get('files', {}).values())
+
+    # ---------- 校验 ----------
+
+    def _signature(self, account_id: str) -> tuple:
+        paths = (self.store.manifest_path(capsule_id(account_id)),
+                 self.switcher.get_account_full_reg_file(account_id))
+        sig = []
+        for path in paths:
+            try:
+                sig.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                sig.append(None)
+        sig.append(self.switcher.accounts.get(account_id, {}).get('email'))
+        return tuple(sig)
+
+    def _saved_names(self, manifest: dict) -> list:
+        """胶囊中Battle.net.config的SavedAccountNames"""
+        for rel, entry in manifest['trees'].get('Roaming', {}).get('files', {}).items():
+            if rel.lower() == "battle.net.config":
+                with open(self.store.blob_path(entry['blob']), 'r', encoding='utf-8-sig') as f:
+                    saved = json.load(f).get("Client", {}).get("SavedAccountNames", "")
+                return [n.strip() for n in saved.split(",") if n.strip()]
+        return []
+
+    def verify(self, account_id: str) -> dict:
+        """
+        检查胶囊能否单独完成自动登录
+
+        Returns:
+            dict: {"sufficient": 是否足够, "missing": [缺少的文件或令牌], "email_ok": 配置中是否有账号邮箱
+                   （账号没有邮箱时为None）, "files", "bytes", "uncovered": 完整快照中有而胶囊中没有的登录状态文件数}
+        """
+        sig = self._signature(account_id)
+        cached = self._verified.get(account_id)
+        if cached and cached[0] == sig:
+            return cached[1]
+
+        report = {"sufficient": False, "missing": [], "email_ok": None, "files": 0, "bytes": 0, "uncovered": 0}
+        manifest = self.load(account_id)
+        if manifest is None:
+            report["missing"].append("capsule")
+            return report
+        report["files"] = sum(len(tree.get('files', {})) for tree in manifest.get('trees', {}).values())
+        report["bytes"] = self._size(manifest)
+        report["missing"] = missing_files(manifest)
+
+        try:
+            names = self._saved_names(manifest)
+        except (OSError, ValueError) as e:
+            print(f"读取胶囊配置失败: {e}")
+            names = []
+        if not names and "Roaming/battle.net.config" not in report["missing"]:
+            report["missing"].append("SavedAccountNames")
+        email = self.switcher.accounts.get(account_id, {}).get('email')
+        if email:
+            report["email_ok"] = email in names
+
+        try:
+            snapshot = load_snapshot(self.switcher.get_account_full_reg_file(account_id))
+        except (OSError, ValueError):
+            snapshot = None
+        if not snapshot or not snapshot.get('keys', {}).get(TOKENS_KEY):
+            report["missing"].append(TOKENS_KEY)
+
+        # 完整快照中的其他登录状态文件（IndexedDB、Session Storage等）不在胶囊中，仅供参考
+        full = self.store.load_manifest(account_id)
+        if full:
+            rules = self.switcher.rules_for(account_id)
+            for name, tree in full.get('trees', {}).items():
+                kept = manifest['trees'].get(name, {}).get('files', {})
+                report["uncovered"] += sum(1 for rel in rules.filter_tree(name, tree).get('files', {})
+                                           if rel not in kept)
+
+        report["sufficient"] = not report["missing"] and report["email_ok"] is not False
+        self._verified[account_id] = (sig, report)
+        return report
+
+    def live_ready(self, local_path: str) -> bool:
+        """当前目录中已有客户端数据，只写入胶囊文件即可使用"""
+        return os.path.isdir(os.path.join(local_path, LIVE_BASE_DIR))
+
+    def has_full_data(self, account_id: str) -> bool:
+        """账号是否有完整快照（或旧版完整复制的账号目录）"""
+        switcher = self.switcher
+        return (self.store.has_snapshot(account_id)
+                or os.path.exists(switcher.get_account_local_dir(account_id))
+                or os.path.exists(switcher.get_account_roaming_dir(account_id)))
+
+    def usable(self, account_id: str, local_path: str) -> bool:
+        """
+        切换时能否只写入胶囊
+        当前目录中没有客户端数据时优先使用完整快照；账号只保存了胶囊时把胶囊写入空目录，其他数据由客户端启动时重建
+        """
+        if not self.verify(account_id)["sufficient"]:
+            return False
+        return self.live_ready(local_path) or not self.has_full_data(account_id)
+
+    def plan(self, account_id: str, name: str, live_root: str, verify_hash: bool = False, cookies: bool = True):
+        """
+        计算把live_root中的胶囊文件同步成账号胶囊需要的操作（其他文件不处理）
+        cookies为False时不处理Cookies数据库文件（改为用Cookie行存储写入）
+        """
+        return plan_account(self.store, capsule_id(account_id), name, live_root, verify_hash,
+                            self.rules(account_id, cookies=cookies))
+
+    def report(self) -> dict:
+        """所有账号胶囊的数量、大小和可用数"""
+        result = {"capsules": 0, "bytes": 0, "sufficient": 0}
+        for account_id in list(self.switcher.accounts):
+            if not self.has_capsule(account_id):
+                continue
+            verified = self.verify(account_id)
+            result["capsules"] += 1
+            result["bytes"] += verified["bytes"]
+            result["sufficient"] += int(verified["sufficient"])
+        return result
@@ -0,0 +1,189 @@
+"""
+暴雪战网账号切换器 - 快照规则
+按路径把战网目录中的文件分为四类：
+- session: 登录状态（Cookies、Local State、Local Storage、IndexedDB、Battle.net.config等），必须保存
+- cache: 可以重建的缓存（HTTP缓存、Code Cache、GPUCache、着色器缓存等）
+- junk: 日志、崩溃转储、临时文件
+- other: 没有匹配任何规则的文件，按session处理
+保存、切换、恢复时都跳过cache和junk（不保存、不覆盖、也不删除当前目录中的这些文件）。
+规则可按地区/配置（cn、global）在 snapshot_rules.json 中追加或覆盖
+"""
+import os
+import json
+import fnmatch
+from snapshot_store import walk_tree
+
+
+CATEGORY_SESSION = "session"
+CATEGORY_CACHE = "cache"
+CATEGORY_JUNK = "junk"
+CATEGORY_OTHER = "other"
+
+# 按此顺序匹配，先匹配到的分类生效（session规则优先，避免误删登录状态）
+CATEGORIES = (CATEGORY_SESSION, CATEGORY_JUNK, CATEGORY_CACHE)
+# 默认不保存的分类
+DEFAULT_EXCLUDED = (CATEGORY_CACHE, CATEGORY_JUNK)
+
+# 模式与以/开头的相对路径匹配（不区分大小写，*可以跨目录）；目录按 /路径/ 匹配，
+# 所以 */Cache/* 既匹配任意层级的Cache目录，也匹配其中的文件。
+# 可以用 "树名:模式" 限定在 LocalAppData 或 Roaming 中生效
+DEFAULT_RULES = {
+    CATEGORY_SESSION: [
+        "*/Network/Cookies", "*/Network/Cookies-journal", "*/Cookies", "*/Cookies-journal",
+        "*/Local State", "*/Preferences", "*/Secure Preferences",
+        "*/Local Storage/*", "*/Session Storage/*", "*/IndexedDB/*",
+        "*/Web Data", "*/Web Data-journal", "*/Login Data", "*/Login Data-journal",
+        "LocalAppData:/Account/*",
+        "Roaming:/Battle.net.config",
+    ],
+    CATEGORY_JUNK: [
+        "*/Logs/*", "*/Crashpad/*", "*/Crash Reports/*", "*/BrowserMetrics/*",
+        "*.dmp", "*.tmp", "*.pma", "*/LOG.old",
+    ],
+    CATEGORY_CACHE: [
+        "*/Cache/*", "*/Code Cache/*", "*/GPUCache/*", "*/Media Cache/*",
+        "*/DawnCache/*", "*/DawnGraphiteCache/*", "*/DawnWebGPUCache/*",
+        "*/GrShaderCache/*", "*/GraphiteDawnCache/*", "*/ShaderCache/*",
+        "*/Service Worker/CacheStorage/*", "*/Service Worker/ScriptCache/*",
+        "*/blob_storage/*", "*/component_crx_cache/*",
+    ],
+}
+
+DEFAULT_PROFILE = "default"
+
+
+class RuleSet:
+    """
+    一组分类规则
+
+    Args:
+        rules: 分类 -> [模式]
+        excluded: 不保存的分类
+        name: 配置名（用于报告）
+    """
+
+    def __init__(self, rules: dict = None, excluded=DEFAULT_EXCLUDED, name: str = DEFAULT_PROFILE):
+        self.name = name
+        self.excluded = frozenset(excluded)
+        self.rules = []
+        for category in CATEGORIES:
+            for pattern in (rules if rules is not None else DEFAULT_RULES).get(category, []):
+                tree, sep, body = pattern.partition(':')
+                if not sep:
+                    tree, body = None, pattern
+                body = body.lower()
+                if not body.startswith(('/', '*')):
+                    body = '/' + body
+                self.rules.append((category, tree or None, body))
+
+    def classify(self, tree: str, rel: str, is_dir: bool = False) -> str:
+        """tree中相对路径rel（/分隔）所属的分类"""
+        path = '/' + rel.lower() + ('/' if is_dir else '')
+        for category, rule_tree, pattern in self.rules:
+            if rule_tree and rule_tree != tree:
+                continue
+            if fnmatch.fnmatchcase(path, pattern):
+                return category
+        return CATEGORY_OTHER
+
+    def excludes(self, tree: str, rel: str, is_dir: bool = False) -> bool:
+        return self.classify(tree, rel, is_dir) in self.excluded
+
+    def skipper(self, tree: str):
+        """返回walk_tree使用的过滤函数 (相对路径, 是否目录) -> 是否跳过"""
+        if not self.excluded:
+            return None
+        return lambda rel, is_dir: self.excludes(tree, rel, is_dir)
+
+    def filter_tree(self, tree: str, entries: dict) -> dict:
+        """从快照清单的一棵树中去掉被排除的文件和目录（规则生效前保存的旧清单）"""
+        if not self.excluded:
+            return entries
+        files = {rel: entry for rel, entry in entries.get('files', {}).items() if not self.excludes(tree, rel)}
+        dirs = [rel for rel in entries.get('dirs', []) if not self.excludes(tree, rel, is_dir=True)]
+        return {**entries, "files": files, "dirs": dirs}
+
+    def report(self, roots: dict) -> dict:
+        """
+        统计目录中各分类的文件数和字节数
+
+        Args:
+            roots: 树名 -> 目录
+
+        Returns:
+            dict: {"profile", "categories": {分类: {"files", "bytes"}}, "kept_bytes", "saved_bytes"}
+        """
+        categories = {c: {"files": 0, "bytes": 0} for c in CATEGORIES + (CATEGORY_OTHER,)}
+        for tree, root in roots.items():
+            files, _ = walk_tree(root)
+            for rel, st in files.items():
+                item = categories[self.classify(tree, rel)]
+                item["files"] += 1
+                item["bytes"] += st.st_size
+        saved = sum(v["bytes"] for c, v in categories.items() if c in self.excluded)
+        total = sum(v["bytes"] for v in categories.values())
+        return {
+            "profile": self.name,
+            "categories": categories,
+            "kept_bytes": total - saved,
+            "saved_bytes": saved,
+        }
+
+
+class RuleBook:
+    """
+    按配置（地区）加载规则：默认规则 + snapshot_rules.json 中的追加规则
+    文件格式: {"default": {"session": [...], "cache": [...], "junk": [...], "keep": ["cache"]},
+               "cn": {...}, "global": {...}}
+    配置中的模式优先于默认模式；keep 中的分类不再排除
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._config = self._load()
+        self._cache = {}
+
+    def _load(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取快照规则失败: {e}")
+            return {}
+
+    def for_profile(self, profile: str = None) -> RuleSet:
+        profile = profile or DEFAULT_PROFILE
+        if profile not in self._cache:
+            layers = [self._config.get(profile, {})]
+            if profile != DEFAULT_PROFILE:
+                layers.append(self._config.get(DEFAULT_PROFILE, {}))
+            rules = {}
+            keep = set()
+            for category in CATEGORIES:
+                rules[category] = [p for layer in layers for p in layer.get(category, [])]
+                rules[category] += DEFAULT_RULES[category]
+            for layer in layers:
+                keep.update(layer.get("keep", []))
+            excluded = [c for c in DEFAULT_EXCLUDED if c not in keep]
+            self._cache[profile] = RuleSet(rules, excluded, profile)
+        return self._cache[profile]
+
+
+def _format_size(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+if __name__ == "__main__":
+    import sys
+    from environment import SwitcherEnvironment
+
+    env = SwitcherEnvironment()
+    profile = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PROFILE
+    rules = RuleBook(env.storage_path("snapshot_rules.json")).for_profile(profile)
+    result = rules.report({"LocalAppData": env.local_root, "Roaming": env.roaming_root})
+    for category, item in result["categories"].items():
+        mark = "跳过" if category in rules.excluded else "保存"
+        print(f"{category:<8} {mark}  {item['files']:>7} 个文件  {_format_size(item['bytes'])}")
+    print(f"快照大小 {_format_size(result['kept_bytes'])}，节省 {_format_size(result['saved_bytes'])}")
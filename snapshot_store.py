@@ -0,0 +1,413 @@
+"""
+暴雪战网账号切换器 - 内容寻址快照存储
+文件按内容哈希只保存一份（blobs），每个账号只保存一份清单（manifest），
+记录 相对路径 -> blob 的映射，相同文件在所有账号之间共享
+"""
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+from copy_engine import get_engine
+from fs_clone import MODE_COPY, MODE_HARDLINK, is_immutable
+
+
+CHUNK_SIZE = 1024 * 1024
+# 保存正在使用的目录时，文件有变化后重新读取前等待的时间（秒，按重试次数递增）
+STABLE_RETRY_DELAY = 0.2
+# 写入blob的内容与计算哈希时读到的不一致时（文件在两次读取之间被修改），至少重新读取的次数
+MISMATCH_RETRIES = 2
+
+
+class SourceChangedError(OSError):
+    """保存快照时源文件持续变化（客户端正在写入）"""
+
+
+def new_hash():
+    """blob ID使用的哈希对象"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_file(path: str) -> str:
+    """计算文件内容哈希（blob ID）"""
+    h = new_hash()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def walk_tree(root: str, exclude_dirs=None, skip=None):
+    """
+    遍历目录树，返回 (文件字典, 目录字典)
+    文件字典: 相对路径(使用/分隔) -> os.stat_result
+    目录字典: 相对路径 -> 目录修改时间(ns)
+    exclude_dirs: 任意层级下需要跳过的目录名（同robocopy /XD）
+    skip: 过滤函数 (相对路径, 是否目录) -> 是否跳过，见 snapshot_rules.RuleSet.skipper
+    """
+    files = {}
+    dirs = {}
+    if not root or not os.path.isdir(root):
+        return files, dirs
+    exclude_dirs = set(exclude_dirs or ())
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in exclude_dirs or (skip and skip(rel, True)):
+                        continue
+                    dirs[rel] = entry.stat(follow_symlinks=False).st_mtime_ns
+                    stack.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    if skip and skip(rel, False):
+                        continue
+                    files[rel] = entry.stat(follow_symlinks=False)
+            except OSError:
+                pass
+    return files, dirs
+
+
+class SnapshotStore:
+    """内容寻址快照存储"""
+
+    def __init__(self, root: str, engine=None, mode: str = MODE_COPY, rules=None):
+        self.root = root
+        # 写入blob和恢复文件使用的复制引擎
+        self.engine = engine or get_engine()
+        # 与战网目录之间的复制方式：copy / reflink / hardlink（见fs_clone.probe_mode）
+        self.mode = mode
+        # 默认的快照规则（snapshot_rules.RuleSet），None表示保存所有文件
+        self.rules = rules
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.manifests_dir = os.path.join(root, "manifests")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    # ---------- 路径 ----------
+
+    def blob_path(self, blob_id: str) -> str:
+        """blob按前两位分桶存放，避免单目录文件过多"""
+        return os.path.join(self.blobs_dir, blob_id[:2], blob_id)
+
+    def manifest_path(self, account_id: str) -> str:
+        return os.path.join(self.manifests_dir, f"{account_id}.json")
+
+    # ---------- 清单 ----------
+
+    def has_snapshot(self, account_id: str) -> bool:
+        return os.path.exists(self.manifest_path(account_id))
+
+    def load_manifest(self, account_id: str) -> dict:
+        """加载账号清单，不存在返回None"""
+        path = self.manifest_path(account_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取快照清单失败: {account_id}, 错误: {e}")
+            return None
+
+    def _save_manifest(self, account_id: str, manifest: dict):
+        path = self.manifest_path(account_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def file_count(self, account_id: str) -> int:
+        manifest = self.load_manifest(account_id)
+        if not manifest:
+            return 0
+        return sum(len(tree.get('files', {})) for tree in manifest.get('trees', {}).values())
+
+    # ---------- blob ----------
+
+    def has_blob(self, blob_id: str) -> bool:
+        return os.path.exists(self.blob_path(blob_id))
+
+    def is_linked(self, path: str, blob_id: str) -> bool:
+        """hardlink模式下，path是否就是该blob的硬链接（内容必然相同，修改时间以blob为准）"""
+        if self.mode != MODE_HARDLINK:
+            return False
+        try:
+            return os.path.samefile(path, self.blob_path(blob_id))
+        except OSError:
+            return False
+
+    def copy_job(self, src: str, dst: str, rel: str, size: int, mtime_ns=None, expected: str = None) -> tuple:
+        """
+        复制引擎任务，写入后不再修改的文件在hardlink模式下可以链接
+        expected: 写入blob时校验写入内容的哈希（见CopyEngine.copy_file）
+        """
+        return (src, dst, size, mtime_ns, is_immutable(rel), expected)
+
+    # ---------- 保存 / 恢复 ----------
+
+    def capture(self, account_id: str, roots: dict, exclude_dirs=None, hints=None, rules=None,
+                stable_retries: int = 0) -> dict:
+        """
+        把目录保存为账号快照
+
+        Args:
+            account_id: 账号ID
+            roots: 树名 -> 源目录，例如 {"LocalAppData": ..., "Roaming": ...}
+            exclude_dirs: 跳过的目录名
+            hints: 树名 -> {相对路径: (大小, 修改时间ns, 哈希)}，来自文件索引，
+                   大小和时间一致时直接使用其中的哈希，避免重新读取文件
+            rules: 快照规则，跳过缓存和垃圾文件（默认使用self.rules）
+            stable_retries: 源目录正在被客户端写入时使用：读取后文件的大小或修改时间有变化（复制结果可能不完整），
+                            重新读取这些文件，最多重试的次数；为0时不检查。
+                            无论是否检查，写入blob的内容都按实际写入的字节校验哈希，不一致的blob不会保留
+
+        Returns:
+            dict: 统计信息（文件数、新增blob数、写入字节数、重试次数）
+
+        Raises:
+            SourceChangedError: 重试后文件仍在变化（或仍无法写入blob）
+        """
+        rules = rules or self.rules
+        previous = self.load_manifest(account_id) or {}
+        prev_trees = previous.get('trees', {})
+        stats = {"files": 0, "hashed": 0, "new_blobs": 0, "bytes_written": 0, "retries": 0}
+        trees = {}
+        # 树名 -> {相对路径: 清单条目}
+        entries = {}
+        # 需要计算哈希的文件: (树名, 相对路径, stat, 绝对路径)
+        pending = []
+
+        for name, src_root in roots.items():
+            prev_files = prev_trees.get(name, {}).get('files', {})
+            tree_hints = (hints or {}).get(name, {})
+            files, dirs = walk_tree(src_root, exclude_dirs, rules.skipper(name) if rules else None)
+            tree_entries = entries[name] = {}
+            for rel, st in files.items():
+                prev = prev_files.get(rel)
+                # 大小和修改时间都没变，直接沿用之前的blob
+                if (prev and prev['size'] == st.st_size and prev['mtime_ns'] == st.st_mtime_ns
+                        and self.has_blob(prev['blob'])):
+                    tree_entries[rel] = {"blob": prev['blob'], "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                elif self._hint_matches(tree_hints.get(rel), st):
+                    tree_entries[rel] = {"blob": tree_hints[rel][2], "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                elif (prev and prev['size'] == st.st_size
+                        and self.is_linked(os.path.join(src_root, *rel.split('/')), prev['blob'])):
+                    # 硬链接到blob的文件，修改时间可能被共用该blob的其他账号改过
+                    tree_entries[rel] = {"blob": prev['blob'], "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                else:
+                    pending.append((name, rel, st, os.path.join(src_root, *rel.split('/'))))
+            trees[name] = {"dirs": sorted(dirs)}
+
+        while pending:
+            new_blobs, failed = self._store_pending(pending, entries, stats)
+            changed = self._changed_sources(pending, entries, new_blobs, failed, check_stat=bool(stable_retries))
+            if not changed:
+                break
+            if stats["retries"] >= max(stable_retries, MISMATCH_RETRIES):
+                raise SourceChangedError(f"文件在保存过程中持续变化: {', '.join(rel for _, rel, _, _ in changed)}")
+            stats["retries"] += 1
+            # 等客户端写完再重新读取
+            time.sleep(STABLE_RETRY_DELAY * stats["retries"])
+            pending = changed
+
+        for name, tree_entries in entries.items():
+            trees[name]["files"] = {rel: tree_entries[rel] for rel in sorted(tree_entries)}
+            stats["files"] += len(tree_entries)
+
+        self._save_manifest(account_id, {
+            "account_id": account_id,
+            "saved_at": datetime.now().isoformat(),
+            "rules": rules.name if rules else None,
+            "trees": trees
+        })
+        return stats
+
+    def _store_pending(self, pending: list, entries: dict, stats: dict) -> dict:
+        """
+        计算文件哈希（线程池中并行）并写入新的blob，更新清单条目和统计信息
+
+        Returns:
+            tuple: (本次写入的blob: blob ID -> (源文件, 相对路径, 大小)（同一次保存中相同内容只写一次），
+                    没有写入的blob ID集合（写入的内容与哈希不一致或复制失败）)
+        """
+        new_blobs = {}
+        for (name, rel, st, abs_path), blob_id in zip(pending, self.engine.map(self._try_hash, [p[3] for p in pending])):
+            if blob_id is None:
+                entries[name].pop(rel, None)
+                continue
+            stats["hashed"] += 1
+            if blob_id not in new_blobs and not self.has_blob(blob_id):
+                new_blobs[blob_id] = (abs_path, rel, st.st_size)
+            entries[name][rel] = {"blob": blob_id, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+        failed = set()
+        if new_blobs:
+            # 写入时按实际写入的字节计算哈希，与blob ID不一致的不会改名为blob
+            copy_stats = self.engine.copy_files(
+                [self.copy_job(src, self.blob_path(blob_id), rel, size, expected=blob_id)
+                 for blob_id, (src, rel, size) in new_blobs.items()],
+                atomic=True, mode=self.mode, digest=new_hash)
+            stats["new_blobs"] += copy_stats["files"]
+            stats["bytes_written"] += copy_stats["bytes_copied"]
+            stats["bytes_cloned"] = stats.get("bytes_cloned", 0) + copy_stats["bytes"] - copy_stats["bytes_copied"]
+            stats["copy"] = copy_stats["phases"]
+            if copy_stats["errors"]:
+                failed = {blob_id for blob_id in new_blobs if not self.has_blob(blob_id)}
+        return new_blobs, failed
+
+    def _changed_sources(self, pending: list, entries: dict, new_blobs: dict, failed: set,
+                         check_stat: bool = True) -> list:
+        """
+        需要重新读取的文件（按当前stat），返回列表：
+        blob没有写入的文件；check_stat时还有读取前后大小或修改时间不一致的文件（写入的blob可能不完整，一并删除）
+        """
+        sources = {src: blob_id for blob_id, (src, _, _) in new_blobs.items()}
+        stable = []
+        changed = []
+        removed = set(failed)
+        for name, rel, st, abs_path in pending:
+            blob_id = entries[name].get(rel, {}).get("blob")
+            if blob_id not in failed and not check_stat:
+                stable.append((name, rel, st, abs_path))
+                continue
+            try:
+                now = os.stat(abs_path)
+            except FileNotFoundError:
+                now = None
+            if blob_id not in failed and now and now.st_size == st.st_size and now.st_mtime_ns == st.st_mtime_ns:
+                stable.append((name, rel, st, abs_path))
+                continue
+            blob_id = sources.get(abs_path)
+            if blob_id and blob_id not in failed:
+                try:
+                    os.remove(self.blob_path(blob_id))
+                except FileNotFoundError:
+                    pass
+                removed.add(blob_id)
+            entries[name].pop(rel, None)
+            if now:
+                changed.append((name, rel, now, abs_path))
+        # 内容相同、共用被删除（或没有写入）blob的文件也要重新写入
+        for name, rel, st, abs_path in stable:
+            if entries[name].get(rel, {}).get("blob") in removed:
+                del entries[name][rel]
+                changed.append((name, rel, st, abs_path))
+        return changed
+
+    @staticmethod
+    def _try_hash(path: str) -> str:
+        try:
+            return hash_file(path)
+        except OSError as e:
+            print(f"跳过无法读取的文件: {path}, 错误: {e}")
+            return None
+
+    def _hint_matches(self, hint, st) -> bool:
+        return bool(hint and hint[2] and hint[0] == st.st_size and hint[1] == st.st_mtime_ns
+                    and self.has_blob(hint[2]))
+
+    def create_empty(self, account_id: str, names) -> None:
+        """创建空快照（手动创建、尚未登录的账号）"""
+        self._save_manifest(account_id, {
+            "account_id": account_id,
+            "saved_at": datetime.now().isoformat(),
+            "trees": {name: {"files": {}, "dirs": []} for name in names}
+        })
+
+    def restore(self, account_id: str, name: str, dst_root: str, rules=None) -> dict:
+        """
+        把账号快照中的一棵树完整写出到目标目录（目标目录应为空或不存在）
+        恢复的文件保留保存时的修改时间，方便下次按大小+时间判断是否变化
+        rules: 快照规则，旧清单中的缓存和垃圾文件不再写出（默认使用self.rules）
+        """
+        manifest = self.load_manifest(account_id)
+        if manifest is None or name not in manifest.get('trees', {}):
+            raise FileNotFoundError(f"账号 {account_id} 没有 {name} 快照")
+        tree = manifest['trees'][name]
+        rules = rules or self.rules
+        if rules:
+            tree = rules.filter_tree(name, tree)
+        stats = {"files": 0, "bytes_written": 0}
+
+        os.makedirs(dst_root, exist_ok=True)
+        for rel in tree.get('dirs', []):
+            os.makedirs(os.path.join(dst_root, *rel.split('/')), exist_ok=True)
+        copy_stats = self.engine.copy_files([
+            self.copy_job(self.blob_path(entry['blob']), os.path.join(dst_root, *rel.split('/')), rel,
+                          entry['size'], entry['mtime_ns'])
+            for rel, entry in tree.get('files', {}).items()
+        ], mode=self.mode)
+        stats["files"] = copy_stats["files"]
+        stats["bytes_written"] = copy_stats["bytes"]
+        stats["copy"] = copy_stats["phases"]
+        return stats
+
+    # ---------- 删除 / 回收 ----------
+
+    def referenced_blobs(self, exclude_account: str = None) -> set:
+        """所有清单引用的blob集合"""
+        referenced = set()
+        for filename in os.listdir(self.manifests_dir):
+            if not filename.endswith('.json'):
+                continue
+            account_id = filename[:-5]
+            if account_id == exclude_account:
+                continue
+            manifest = self.load_manifest(account_id) or {}
+            for tree in manifest.get('trees', {}).values():
+                for entry in tree.get('files', {}).values():
+                    referenced.add(entry['blob'])
+        return referenced
+
+    def delete(self, account_id: str) -> int:
+        """删除账号快照并回收不再被引用的blob，返回回收字节数"""
+        path = self.manifest_path(account_id)
+        if os.path.exists(path):
+            os.remove(path)
+        return self.gc()
+
+    def gc(self) -> int:
+        """回收没有任何清单引用的blob"""
+        referenced = self.referenced_blobs()
+        freed = 0
+        for bucket in os.listdir(self.blobs_dir):
+            bucket_dir = os.path.join(self.blobs_dir, bucket)
+            if not os.path.isdir(bucket_dir):
+                continue
+            for blob_id in os.listdir(bucket_dir):
+                if blob_id in referenced:
+                    continue
+                blob = os.path.join(bucket_dir, blob_id)
+                try:
+                    freed += os.path.getsize(blob)
+                    os.remove(blob)
+                except OSError:
+                    pass
+        return freed
+
+    def stats(self) -> dict:
+        """存储占用统计：去重后的实际大小 vs 各账号逻辑大小之和"""
+        logical = 0
+        for filename in os.listdir(self.manifests_dir):
+            if filename.endswith('.json'):
+                manifest = self.load_manifest(filename[:-5]) or {}
+                for tree in manifest.get('trees', {}).values():
+                    logical += sum(e['size'] for e in tree.get('files', {}).values())
+        physical = 0
+        for bucket in os.listdir(self.blobs_dir):
+            bucket_dir = os.path.join(self.blobs_dir, bucket)
+            if os.path.isdir(bucket_dir):
+                for blob_id in os.listdir(bucket_dir):
+                    physical += os.path.getsize(os.path.join(bucket_dir, blob_id))
+        return {"logical_bytes": logical, "physical_bytes": physical}
@@ -0,0 +1,172 @@
+"""
+暴雪战网账号切换器 - 暂存目录切换
+在战网目录旁边（同一卷）的暂存目录中提前准备好目标账号的数据，客户端仍在运行时即可完成；
+客户端退出后只需两次重命名：当前目录 -> 旧目录，暂存目录 -> 当前目录。
+旧目录保留到下一次切换，可以立即回滚；下一次切换时旧目录又作为暂存目录的增量基础，
+只需同步差异文件。每个账号有自己的暂存目录，可以提前为多个账号准备（见prefetcher）
+"""
+import os
+import shutil
+import time
+from delta_sync import sync_tree
+
+
+SWITCH_INPLACE = "inplace"
+SWITCH_STAGED = "staged"
+
+STAGE_SUFFIX = ".bnswitch-stage"
+PREVIOUS_SUFFIX = ".bnswitch-prev"
+
+
+def _base(live_root: str) -> str:
+    return live_root.rstrip('\\/')
+
+
+def stage_path(live_root: str, account_id: str) -> str:
+    """live_root下账号account_id的暂存目录"""
+    return f"{_base(live_root)}{STAGE_SUFFIX}.{account_id}"
+
+
+def previous_path(live_root: str) -> str:
+    """live_root切换前的旧目录"""
+    return _base(live_root) + PREVIOUS_SUFFIX
+
+
+def staged_accounts(live_root: str) -> list:
+    """live_root旁边已有暂存目录的账号ID"""
+    parent, name = os.path.split(_base(live_root))
+    prefix = name + STAGE_SUFFIX + "."
+    try:
+        entries = os.listdir(parent)
+    except OSError:
+        return []
+    return sorted(entry[len(prefix):] for entry in entries
+                  if entry.startswith(prefix) and os.path.isdir(os.path.join(parent, entry)))
+
+
+def prepare_stage(live_root: str, account_id: str, recycle: bool = True) -> str:
+    """
+    准备账号的暂存目录：优先复用已有的暂存目录，其次（recycle时）把旧目录改名为暂存目录，
+    都没有时新建空目录（需要完整复制）
+    """
+    stage = stage_path(live_root, account_id)
+    prev = previous_path(live_root)
+    if os.path.isdir(stage):
+        # 暂存目录已经可用，多余的旧目录趁客户端还在运行时删除，避免占用切换窗口
+        if recycle and os.path.isdir(prev):
+            shutil.rmtree(prev, ignore_errors=True)
+    elif recycle and os.path.isdir(prev):
+        os.rename(prev, stage)
+    else:
+        os.makedirs(stage)
+    return stage
+
+
+def stage_tree(store, account_id: str, name: str, live_root: str, verify_hash: bool = False,
+               recycle: bool = True, rules=None) -> dict:
+    """把账号快照中的一棵树同步到账号在live_root旁的暂存目录，返回同步统计"""
+    stage = prepare_stage(live_root, account_id, recycle)
+    stats = sync_tree(store, account_id, name, stage, verify_hash, rules)
+    stats["stage"] = stage
+    return stats
+
+
+def swap(live_root: str, account_id: str) -> float:
+    """
+    用账号的暂存目录替换当前目录（两次重命名），第二次重命名失败时把当前目录改回原位
+
+    Returns:
+        float: 耗时（秒）
+    """
+    start = time.perf_counter()
+    stage = stage_path(live_root, account_id)
+    prev = previous_path(live_root)
+    if not os.path.isdir(stage):
+        raise FileNotFoundError(f"暂存目录不存在: {stage}")
+    if os.path.lexists(prev):
+        shutil.rmtree(prev)
+    had_live = os.path.lexists(live_root)
+    if had_live:
+        os.rename(live_root, prev)
+    try:
+        os.rename(stage, live_root)
+    except OSError:
+        if had_live:
+            os.rename(prev, live_root)
+        raise
+    return time.perf_counter() - start
+
+
+def rollback(live_root: str, account_id: str = None) -> bool:
+    """
+    恢复切换前的目录；当前目录放回account_id的暂存位置，下一次切换到该账号时继续作为增量基础
+    （不知道当前目录属于哪个账号时直接删除）
+
+    Returns:
+        bool: 是否有可恢复的旧目录
+    """
+    prev = previous_path(live_root)
+    if not os.path.isdir(prev):
+        return False
+    if os.path.lexists(live_root):
+        if account_id:
+            stage = stage_path(live_root, account_id)
+            if os.path.lexists(stage):
+                shutil.rmtree(stage)
+            os.rename(live_root, stage)
+        else:
+            shutil.rmtree(live_root)
+    os.rename(prev, live_root)
+    return True
+
+
+def recover(live_root: str) -> bool:
+    """上次切换在两次重命名之间中断（当前目录不存在、旧目录还在）时恢复旧目录"""
+    prev = previous_path(live_root)
+    if os.path.lexists(live_root) or not os.path.isdir(prev):
+        return False
+    try:
+        os.rename(prev, live_root)
+        return True
+    except OSError as e:
+        print(f"恢复战网目录失败: {live_root}, 错误: {e}")
+        return False
+
+
+def discard_stage(live_root: str, account_id: str):
+    """删除一个账号的暂存目录"""
+    stage = stage_path(live_root, account_id)
+    if os.path.lexists(stage):
+        shutil.rmtree(stage, ignore_errors=True)
+
+
+def discard_previous(live_root: str):
+    """删除切换前的旧目录（之后无法回滚）"""
+    prev = previous_path(live_root)
+    if os.path.lexists(prev):
+        shutil.rmtree(prev, ignore_errors=True)
+
+
+def discard(live_root: str):
+    """删除所有暂存目录和旧目录（释放磁盘空间，之后无法回滚）"""
+    for account_id in staged_accounts(live_root):
+        discard_stage(live_root, account_id)
+    discard_previous(live_root)
+
+
+def tree_size(path: str) -> int:
+    """目录下所有文件的字节数"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def disk_usage(live_root: str) -> int:
+    """暂存目录和旧目录占用的字节数"""
+    paths = [stage_path(live_root, a) for a in staged_accounts(live_root)] + [previous_path(live_root)]
+    return sum(tree_size(path) for path in paths)
@@ -0,0 +1,368 @@
+"""
+暴雪战网账号切换器 - 切换流水线
+把切换拆成明确的阶段：关闭战网、准备文件、换入文件、恢复令牌、启动战网。
+每个阶段报告进度（文件数、字节数、预计剩余时间）并检查取消标记，取消或失败时撤销已完成的阶段
+（换回切换前的目录，重新启动原来的客户端）。
+暂存模式下先在客户端运行时准备文件再关闭战网；直接同步模式下文件写入当前目录，
+换入阶段开始后不能再取消。
+启用会话胶囊且胶囊足够自动登录时，只把胶囊文件直接写入当前目录（见session_capsule）
+"""
+import time
+import threading
+import traceback
+from datetime import datetime
+import stage_swap
+from delta_sync import plan_account, apply_plan
+from prefetcher import record_switch
+
+
+STAGE_STOP = "stop"
+STAGE_PREPARE = "prepare"
+STAGE_APPLY = "apply"
+STAGE_TOKENS = "tokens"
+STAGE_LAUNCH = "launch"
+
+STAGE_LABELS = {
+    STAGE_STOP: "关闭战网",
+    STAGE_PREPARE: "准备文件",
+    STAGE_APPLY: "换入文件",
+    STAGE_TOKENS: "恢复令牌",
+    STAGE_LAUNCH: "启动战网",
+}
+
+# 进度回调的最小间隔（秒），复制大量小文件时避免刷屏
+PROGRESS_INTERVAL = 0.05
+
+
+class SwitchCancelled(Exception):
+    """切换被用户取消"""
+
+
+class SwitchError(Exception):
+    """切换无法进行（账号数据不存在等），消息直接显示给用户"""
+
+
+class CancelToken(threading.Event):
+    """取消标记，可以在任意线程中调用cancel()"""
+
+    def cancel(self):
+        self.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.is_set()
+
+    def check(self):
+        if self.is_set():
+            raise SwitchCancelled("已取消切换")
+
+
+class StageProgress:
+    """一个阶段的进度，复制引擎的progress回调（可能在工作线程中调用）"""
+
+    def __init__(self, pipeline, stage: str, index: int):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.index = index
+        self.files_done = self.files_total = 0
+        self.bytes_done = self.bytes_total = 0
+        self.start = time.perf_counter()
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+
+    def add_total(self, files: int, nbytes: int):
+        with self._lock:
+            self.files_total += files
+            self.bytes_total += nbytes
+        self.emit(force=True)
+
+    def __call__(self, files: int, nbytes: int):
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += nbytes
+        self.emit()
+
+    def eta(self):
+        """按当前阶段已用时间和进度估算剩余秒数，进度未知时返回None"""
+        elapsed = time.perf_counter() - self.start
+        if self.bytes_total and self.bytes_done:
+            return elapsed * (self.bytes_total - self.bytes_done) / self.bytes_done
+        if self.files_total and self.files_done:
+            return elapsed * (self.files_total - self.files_done) / self.files_done
+        return None
+
+    def fraction(self, done: bool = False) -> float:
+        if done:
+            return 1.0
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.files_total:
+            return min(self.files_done / self.files_total, 1.0)
+        return 0.0
+
+    def emit(self, force: bool = False, done: bool = False):
+        now = time.perf_counter()
+        if not force and not done and now - self._last_emit < PROGRESS_INTERVAL:
+            return
+        self._last_emit = now
+        self.pipeline.emit({
+            "stage": self.stage,
+            "label": STAGE_LABELS[self.stage],
+            "index": self.index,
+            "count": len(self.pipeline.stages),
+            "done": done,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "eta_seconds": None if done else self.eta(),
+            "stage_seconds": now - self.start,
+            "percent": (self.index + self.fraction(done)) / len(self.pipeline.stages) * 100,
+            "timings": dict(self.pipeline.timings),
+        })
+
+
+class SwitchPipeline:
+    """
+    IsolatedSwitcher的一次切换
+
+    Args:
+        switcher: IsolatedSwitcher
+        account_id: 目标账号
+        progress: 进度回调 progress(dict)，可能在工作线程中调用
+        cancel: CancelToken
+    """
+
+    def __init__(self, switcher, account_id: str, progress=None, cancel: CancelToken = None):
+        self.switcher = switcher
+        self.account_id = account_id
+        self.progress = progress
+        self.cancel = cancel or CancelToken()
+        self.info = switcher.accounts.get(account_id, {})
+        self.version = self.info.get('version', 'cn')
+        _, self.local_path, self.roaming_path = switcher.get_paths_for_version(self.version)
+        self.roots = (("LocalAppData", self.local_path), ("Roaming", self.roaming_path))
+        # 胶囊只有几十KB，直接写入当前目录，不需要暂存
+        self.capsule = (switcher.capsule_mode and account_id in switcher.accounts
+                        and switcher.capsules.usable(account_id, self.local_path))
+        self.staged = switcher.switch_mode == stage_swap.SWITCH_STAGED and not self.capsule
+        # 胶囊切换时Cookies数据库只写入保存的战网行（见cookie_store），失败时再写入整个文件；
+        # 胶囊写入空目录时没有可写入行的数据库，直接写入整个文件
+        self.cookie_rows = (self.capsule and switcher.capsules.live_ready(self.local_path)
+                            and switcher.cookies.has_rows(account_id))
+        self.cookie_stats = None
+        # 暂存模式在客户端运行时准备文件，关闭战网后只剩重命名
+        if self.staged:
+            self.stages = [STAGE_PREPARE, STAGE_STOP, STAGE_APPLY, STAGE_TOKENS, STAGE_LAUNCH]
+        else:
+            self.stages = [STAGE_STOP, STAGE_PREPARE, STAGE_APPLY, STAGE_TOKENS, STAGE_LAUNCH]
+        # 阶段 -> 耗时（秒）
+        self.timings = {}
+        self.was_running = False
+        self.stopped = False
+        self.swapped = False
+        self.applying = False
+        self.prestaged = False
+        self.thaw_stats = None
+        self.tree_stats = {}
+        self.plans = {}
+        self.down_start = None
+
+    def emit(self, event: dict):
+        if self.progress:
+            try:
+                self.progress(event)
+            except Exception as e:
+                print(f"进度回调失败: {e}")
+
+    # ---------- 执行 ----------
+
+    def run(self) -> tuple:
+        """执行所有阶段，返回 (成功与否, 消息)"""
+        switcher = self.switcher
+        if self.account_id not in switcher.accounts:
+            return False, "账号不存在"
+        switcher.prefetcher.pinned = self.account_id
+        try:
+            for index, stage in enumerate(self.stages):
+                # 换入完成后（恢复令牌、启动）不再响应取消
+                if stage not in (STAGE_TOKENS, STAGE_LAUNCH):
+                    self.cancel.check()
+                tracker = StageProgress(self, stage, index)
+                tracker.emit(force=True)
+                getattr(self, f"_{stage}")(tracker)
+                self.timings[stage] = time.perf_counter() - tracker.start
+                tracker.emit(done=True)
+            self._record_stats()
+            version_name = "国际服" if self.version == "global" else "国服"
+            return True, f"已切换到{version_name}账号【{self.info['nickname']}】"
+        except SwitchCancelled:
+            self._rollback()
+            self._record_stats(cancelled=True)
+            return False, "已取消切换，账号数据未改变"
+        except SwitchError as e:
+            self._rollback()
+            self._record_stats(error=str(e))
+            return False, str(e)
+        except Exception as e:
+            traceback.print_exc()
+            restored = self._rollback()
+            self._record_stats(error=str(e))
+            if restored:
+                return False, f"切换失败，已恢复原数据: {e}"
+            return False, f"切换失败: {e}"
+        finally:
+            switcher.prefetcher.pinned = None
+
+    def _stop(self, tracker: StageProgress):
+        """关闭战网，并等待客户端释放文件；从这里开始到重新启动是客户端不可用的时间"""
+        switcher = self.switcher
+        self.down_start = time.perf_counter()
+        if switcher.is_battlenet_running():
+            self.was_running = True
+            switcher.close_battlenet()
+            switcher.wait_for_release(self.local_path, self.roaming_path)
+        self.stopped = True
+        # 旧版junction方案遗留的链接先断开，普通目录保留做增量同步
+        for _, path in self.roots:
+            if switcher._is_junction(path):
+                switcher._remove_dir_or_junction(path)
+
+    def _prepare(self, tracker: StageProgress):
+        """解压冷存储，计算差异；暂存模式下同时把目标数据写入暂存目录"""
+        switcher = self.switcher
+        account_id = self.account_id
+        if self.capsule:
+            for name, path in self.roots:
+                plan = switcher.capsules.plan(account_id, name, path, switcher.verify_hash,
+                                              cookies=not self.cookie_rows)
+                self.plans[name] = (plan, path)
+                tracker.add_total(len(plan.adds) + len(plan.replaces), plan.bytes_to_copy)
+            return
+        if not switcher._ensure_snapshot(account_id):
+            raise SwitchError("账号数据不存在")
+        with switcher._storage_lock:
+            self.thaw_stats = switcher.cold.thaw(account_id)
+            self.cancel.check()
+            rules = switcher.rules_for(account_id)
+            self.prestaged = self.staged and switcher.prefetcher.is_hot(account_id)
+            if self.prestaged:
+                # 已预取：暂存目录和快照一致，只需清理旧目录
+                for name, path in self.roots:
+                    stage_swap.prepare_stage(path, account_id)
+                    self.tree_stats[name] = {"bytes_moved": 0, "prestaged": True}
+                return
+            for name, path in self.roots:
+                target = stage_swap.prepare_stage(path, account_id) if self.staged else path
+                plan = plan_account(switcher.store, account_id, name, target, switcher.verify_hash, rules)
+                self.plans[name] = (plan, target)
+                tracker.add_total(len(plan.adds) + len(plan.replaces), plan.bytes_to_copy)
+            if self.staged:
+                # 暂存目录不影响当前数据，复制过程中随时可以取消
+                self._apply_plans(tracker, self.cancel)
+
+    def _apply(self, tracker: StageProgress):
+        """暂存模式：两次重命名换入暂存目录；直接同步模式：把差异写入当前目录"""
+        switcher = self.switcher
+        if self.staged:
+            switcher._swap_live_trees(self.account_id, self.local_path, self.roaming_path)
+            self.swapped = True
+            switcher.prefetcher.consume(self.account_id)
+        else:
+            for plan, _ in self.plans.values():
+                tracker.add_total(len(plan.adds) + len(plan.replaces), plan.bytes_to_copy)
+            # 写入当前目录后无法回到原状态，不再响应取消
+            self.applying = True
+            with switcher._storage_lock:
+                self._apply_plans(tracker, None)
+                if self.cookie_rows:
+                    self._apply_cookie_rows(tracker)
+        # 胶囊切换只改动了几个文件，索引中其他文件仍按大小和时间校验，不重新扫描整个目录
+        if not self.capsule:
+            switcher._index_live_trees(self.account_id, self.local_path, self.roaming_path)
+
+    def _apply_plans(self, tracker: StageProgress, cancel):
+        for name, (plan, target) in self.plans.items():
+            stats = apply_plan(plan, self.switcher.store, target, progress=tracker, cancel=cancel)
+            self.tree_stats[name] = stats
+            if stats.get("cancelled"):
+                raise SwitchCancelled("已取消切换")
+
+    def _apply_cookie_rows(self, tracker: StageProgress):
+        """把账号的战网Cookie行写入当前的Cookies数据库，不能写入时改为同步整个Cookies文件"""
+        switcher = self.switcher
+        self.cookie_stats = switcher.cookies.apply(self.account_id, self.local_path)
+        if self.cookie_stats["applied"]:
+            return
+        print(f"Cookie行写入跳过（{self.cookie_stats['reason']}），写入整个Cookies文件")
+        name, path = self.roots[0]
+        plan = switcher.capsules.plan(self.account_id, name, path, switcher.verify_hash)
+        tracker.add_total(len(plan.adds) + len(plan.replaces), plan.bytes_to_copy)
+        stats = apply_plan(plan, switcher.store, path, progress=tracker)
+        self.tree_stats[name]["bytes_moved"] += stats["bytes_moved"]
+
+    def _tokens(self, tracker: StageProgress):
+        """修改config中的邮箱顺序，恢复注册表令牌，记录当前账号"""
+        switcher = self.switcher
+        account_id = self.account_id
+        email = self.info.get('email')
+        if email:
+            switcher._set_first_email_in_config(self.roaming_path, email)
+        switcher.restore_full_registry(account_id)
+
+        if self.staged:
+            switcher.previous_account_id = switcher.current_account_id
+        switcher.current_account_id = account_id
+        switcher._save_current_account(account_id)
+        self.info['last_login'] = datetime.now().isoformat()
+        record_switch(self.info)
+        switcher._save_accounts()
+
+    def _launch(self, tracker: StageProgress):
+        """启动战网（根据账号版本指定地区）"""
+        region = "KR" if self.version == "global" else "CN"
+        self.switcher.start_battlenet(region=region)
+
+    # ---------- 撤销 / 统计 ----------
+
+    def _rollback(self) -> bool:
+        """撤销已完成的阶段，返回是否恢复了切换前的目录"""
+        switcher = self.switcher
+        restored = False
+        if self.swapped:
+            for _, path in self.roots:
+                try:
+                    restored = stage_swap.rollback(path, self.account_id) or restored
+                except OSError as e:
+                    print(f"恢复切换前数据失败: {path}, 错误: {e}")
+            self.swapped = False
+        # 原来在运行的客户端重新启动（直接同步模式写入一半时不启动，避免使用不完整的数据）
+        if self.was_running and not self.applying:
+            previous = switcher.accounts.get(switcher.current_account_id, {})
+            switcher.start_battlenet(region="KR" if previous.get('version') == "global" else "CN")
+        return restored
+
+    def _record_stats(self, cancelled: bool = False, error: str = None):
+        empty = {"bytes_moved": 0}
+        local_stats = self.tree_stats.get("LocalAppData", empty)
+        roaming_stats = self.tree_stats.get("Roaming", empty)
+        stats = {
+            "LocalAppData": local_stats,
+            "Roaming": roaming_stats,
+            "mode": "capsule" if self.capsule else self.switcher.switch_mode,
+            "prestaged": self.prestaged,
+            "bytes_moved": local_stats["bytes_moved"] + roaming_stats["bytes_moved"],
+            "thaw_seconds": self.thaw_stats["thaw_seconds"] if self.thaw_stats else 0.0,
+            "stage_seconds": self.timings.get(STAGE_PREPARE, 0.0) if self.staged else 0.0,
+            "stop_seconds": self.timings.get(STAGE_STOP, 0.0),
+            "swap_seconds": self.timings.get(STAGE_APPLY, 0.0) if self.staged else 0.0,
+            "seconds": sum(self.timings.values()),
+            "down_seconds": time.perf_counter() - self.down_start if self.down_start else 0.0,
+            "stages": dict(self.timings),
+            "cancelled": cancelled,
+        }
+        if self.cookie_stats:
+            stats["cookies"] = self.cookie_stats
+        if error:
+            stats["error"] = error
+        self.switcher.last_switch_stats = stats
@@ -5,11 +5,11 @@ import sys
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import threading
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from battlenet_switcher import BattleNetSwitcher
+from operation_scheduler import submit_tk, OP_SWITCH, OP_SAVE, OP_DELETE
 
 
 class SwitcherGUI:
@@ -165,18 +165,18 @@ class SwitcherGUI:
             f"确定要保存当前登录状态到账号【{nickname}】吗？\n\n"
             "这将覆盖该账号之前的备份"):
             
-            self.set_status("正在保存...")
-            
-            def do_save():
-                if self.switcher.backup_current_state(account_id, nickname):
-                    self.root.after(0, lambda: messagebox.showinfo("成功", 
-                        f"账号【{nickname}】登录状态已保存！\n\n下次可直接切换到此账号"))
-                    self.root.after(0, self.refresh_list)
+            def on_saved(ok, saved):
+                if ok and saved:
+                    messagebox.showinfo("成功", 
+                        f"账号【{nickname}】登录状态已保存！\n\n下次可直接切换到此账号")
+                    self.refresh_list()
                 else:
-                    self.root.after(0, lambda: messagebox.showerror("错误", "保存失败"))
-                self.root.after(0, lambda: self.set_status("就绪"))
+                    messagebox.showerror("错误", "保存失败")
+                self.set_status("就绪")
             
-            threading.Thread(target=do_save, daemon=True).start()
+            if submit_tk(self.root, OP_SAVE, lambda: self.switcher.backup_current_state(account_id, nickname),
+                           account_id, on_saved):
+                self.set_status("正在保存...")
     
     def switch_account(self):
         """切换账号"""
@@ -195,17 +195,17 @@ class SwitcherGUI:
             f"确定要切换到账号【{nickname}】吗？\n\n"
             "这将关闭当前战网并启动新账号"):
             
-            self.set_status(f"正在切换到 {nickname}...")
-            
-            def do_switch():
-                success, msg = self.switcher.switch_account(account_id)
+            def on_switched(ok, result):
+                success, msg = result if ok else (False, str(result))
                 if success:
-                    self.root.after(0, lambda: messagebox.showinfo("成功", f"已切换到账号【{nickname}】\n\n{msg}"))
+                    messagebox.showinfo("成功", f"已切换到账号【{nickname}】\n\n{msg}")
                 else:
-                    self.root.after(0, lambda: messagebox.showerror("错误", f"切换失败: {msg}"))
-                self.root.after(0, lambda: self.set_status("就绪"))
+                    messagebox.showerror("错误", f"切换失败: {msg}")
+                self.set_status("就绪")
             
-            threading.Thread(target=do_switch, daemon=True).start()
+            # 连续切换多个账号时只执行最后一次
+            if submit_tk(self.root, OP_SWITCH, lambda: self.switcher.switch_account(account_id), account_id, on_switched):
+                self.set_status(f"正在切换到 {nickname}...")
     
     def delete_account(self):
         """删除账号"""
@@ -217,9 +217,12 @@ class SwitcherGUI:
         nickname = acc_info.get('nickname', '未知')
         
         if messagebox.askyesno("确认删除", f"确定要删除账号【{nickname}】及其备份吗？"):
-            self.switcher.delete_account(account_id)
-            self.refresh_list()
-            self.set_status(f"已删除账号: {nickname}")
+            def on_deleted(ok, result):
+                self.refresh_list()
+                self.set_status(f"已删除账号: {nickname}" if ok else f"删除失败: {result}")
+            
+            if submit_tk(self.root, OP_DELETE, lambda: self.switcher.delete_account(account_id), account_id, on_deleted):
+                self.set_status(f"正在删除 {nickname}...")
     
     def start_battlenet(self):
         """启动战网"""
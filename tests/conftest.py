@@ -0,0 +1,9 @@
+"""
+测试公共设置：项目模块都在仓库根目录，直接导入
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
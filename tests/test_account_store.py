@@ -0,0 +1,81 @@
+"""
+AccountStore：日志重放与压缩的崩溃安全
+"""
+import os
+import json
+import pytest
+import account_store
+from account_store import AccountStore
+
+
+def test_journal_replayed_after_reload(tmp_path):
+    path = str(tmp_path / "accounts.json")
+    store = AccountStore(path, compact_threshold=16)
+    store.accounts["a"] = {"v": 1}
+    store.save()
+    store.accounts["a"] = {"v": 2}
+    store.accounts["b"] = {"v": 1}
+    store.save()
+    del store.accounts["b"]
+    store.save()
+
+    assert os.path.exists(path + ".journal")
+    assert AccountStore(path).accounts == {"a": {"v": 2}}
+
+
+def test_truncated_journal_line_is_dropped(tmp_path):
+    path = str(tmp_path / "accounts.json")
+    store = AccountStore(path)
+    store.accounts["a"] = {"v": 1}
+    store.save()
+    store.accounts["a"] = {"v": 2}
+    store.save()
+    with open(path + ".journal", 'a', encoding='utf-8') as f:
+        f.write('{"id": "a", "data": {"v"')
+
+    reloaded = AccountStore(path)
+    assert reloaded.accounts == {"a": {"v": 2}}
+    reloaded.accounts["a"] = {"v": 3}
+    reloaded.save()
+    assert AccountStore(path).accounts == {"a": {"v": 3}}
+
+
+def test_crash_between_compact_and_journal_removal(tmp_path, monkeypatch):
+    path = str(tmp_path / "accounts.json")
+    store = AccountStore(path, compact_threshold=16)
+    store.accounts["x"] = {"v": 1}
+    store.save()
+    store.accounts["x"] = {"v": 2}
+    store.save()
+    assert os.path.exists(path + ".journal")
+
+    def crash(_path):
+        raise KeyboardInterrupt("模拟崩溃")
+
+    store.accounts["x"] = {"v": 3}
+    monkeypatch.setattr(account_store.os, "remove", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+    monkeypatch.undo()
+
+    # 旧日志还在，但不能重放到新的主文件上
+    assert os.path.exists(path + ".journal")
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {"x": {"v": 3}}
+    reloaded = AccountStore(path)
+    assert reloaded.accounts == {"x": {"v": 3}}
+    assert not os.path.exists(path + ".journal")
+
+    reloaded.accounts["y"] = {"v": 1}
+    reloaded.save()
+    assert AccountStore(path).accounts == {"x": {"v": 3}, "y": {"v": 1}}
+
+
+def test_headerless_journal_still_replayed(tmp_path):
+    """旧版本写的日志没有日志头，照常重放"""
+    path = str(tmp_path / "accounts.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"a": {"v": 1}}, f)
+    with open(path + ".journal", 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"id": "a", "data": {"v": 2}}) + "\n")
+    assert AccountStore(path).accounts == {"a": {"v": 2}}
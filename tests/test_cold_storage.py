@@ -0,0 +1,92 @@
+"""
+cold_storage：冷存储压缩、解压后恢复，共享的blob不受影响
+"""
+import os
+from datetime import datetime, timedelta
+import pytest
+from cold_storage import ColdStorage
+from copy_engine import CopyEngine
+from snapshot_store import SnapshotStore
+
+
+def _write(root, rel, data: bytes):
+    path = os.path.join(root, *rel.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(root, rel) -> bytes:
+    with open(os.path.join(root, *rel.split('/')), 'rb') as f:
+        return f.read()
+
+
+def _blobs(store, account_id) -> dict:
+    """相对路径 -> blob ID"""
+    manifest = store.load_manifest(account_id)
+    return {rel: entry['blob'] for rel, entry in manifest['trees']['LocalAppData']['files'].items()}
+
+
+@pytest.fixture
+def setup(tmp_path):
+    """两个账号共用一个文件，各有一个自己的文件"""
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    for account_id in ("a", "b"):
+        root = str(tmp_path / "live" / account_id)
+        _write(root, "Local State", b"shared-settings")
+        _write(root, "BrowserCaches/common/Cookies", f"cookies-{account_id}".encode() * 100)
+        store.capture(account_id, {"LocalAppData": root})
+    cold = ColdStorage(store, str(tmp_path / "cold"))
+    return store, cold, tmp_path
+
+
+def test_freeze_thaw_restore_round_trip(setup):
+    store, cold, tmp_path = setup
+    blobs = _blobs(store, "a")
+    shared = blobs["Local State"]
+    own = blobs["BrowserCaches/common/Cookies"]
+
+    stats = cold.freeze("a")
+    assert stats["blobs"] == 1
+    assert cold.is_cold("a")
+    # 只删除账号独有的blob，另一个账号引用的blob保留
+    assert not store.has_blob(own)
+    assert store.has_blob(shared)
+    assert store.has_snapshot("a")
+    # 账号B不受影响
+    dst_b = str(tmp_path / "restore_b")
+    store.restore("b", "LocalAppData", dst_b)
+    assert _read(dst_b, "Local State") == b"shared-settings"
+
+    thawed = cold.thaw("a")
+    assert thawed["blobs"] == 1
+    assert not cold.is_cold("a")
+    assert store.has_blob(own)
+
+    dst_a = str(tmp_path / "restore_a")
+    store.restore("a", "LocalAppData", dst_a)
+    assert _read(dst_a, "Local State") == b"shared-settings"
+    assert _read(dst_a, "BrowserCaches/common/Cookies") == b"cookies-a" * 100
+
+
+def test_freeze_twice_and_thaw_missing(setup):
+    store, cold, _ = setup
+    assert cold.thaw("a") is None
+    assert cold.freeze("a")
+    assert cold.freeze("a") is None
+    assert cold.freeze("missing") is None
+    assert cold.report()["cold_accounts"] == ["a"]
+
+
+def test_tiering_skips_current_and_recent_accounts(setup):
+    _, cold, _ = setup
+    old = (datetime.now() - timedelta(days=cold.idle_days + 1)).isoformat()
+    accounts = {
+        "a": {"last_login": old},
+        "b": {"last_login": datetime.now().isoformat()},
+        "c": {"last_login": old},
+    }
+    assert cold.idle_accounts(accounts, current_account_id="c") == ["a"]
+    results = cold.apply_tiering(accounts, current_account_id="c")
+    assert list(results) == ["a"]
+    assert not cold.is_cold("b")
@@ -0,0 +1,124 @@
+"""
+cookie_store：从Chromium结构的Cookies数据库保存战网相关行，切换时只写入这些行
+"""
+import os
+import json
+import sqlite3
+import pytest
+from cookie_store import CookieStore, find_cookie_dbs
+
+
+COOKIES_SCHEMA = """
+CREATE TABLE cookies (
+    creation_utc INTEGER NOT NULL,
+    host_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    encrypted_value BLOB NOT NULL DEFAULT '',
+    path TEXT NOT NULL,
+    expires_utc INTEGER NOT NULL,
+    UNIQUE (host_key, name, path)
+);
+"""
+
+DB = "BrowserCaches/common/Network/Cookies"
+
+
+def _make_profile(local_root, rows, key="key-1", schema=COOKIES_SCHEMA):
+    """写入 Local State 和 Cookies 数据库，rows: [(host_key, name, encrypted_value)]"""
+    profile = os.path.join(local_root, "BrowserCaches", "common")
+    os.makedirs(os.path.join(profile, "Network"), exist_ok=True)
+    with open(os.path.join(profile, "Local State"), 'w', encoding='utf-8') as f:
+        json.dump({"os_crypt": {"encrypted_key": key}}, f)
+    path = os.path.join(profile, "Network", "Cookies")
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(schema)
+        conn.executemany(
+            "INSERT INTO cookies (creation_utc, host_key, name, value, encrypted_value, path, expires_utc) "
+            "VALUES (1, ?, ?, '', ?, '/', 2)", rows)
+    conn.close()
+    return path
+
+
+def _rows(path) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        return {(host, name): value for host, name, value in
+                conn.execute("SELECT host_key, name, encrypted_value FROM cookies")}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CookieStore(str(tmp_path / "cookie_store.db"))
+
+
+def test_capture_and_apply_round_trip(tmp_path, store):
+    live = str(tmp_path / "Local" / "Battle.net")
+    _make_profile(live, [
+        (".battle.net", "BA-tassadar", b"session-a"),
+        ("account.blizzard.com", "web.id", b"id-a"),
+        ("site.example.com", "other", b"other-a"),
+    ])
+    assert find_cookie_dbs(live) == [DB]
+    stats = store.capture("a", live)
+    assert (stats["dbs"], stats["rows"]) == (1, 2)
+    assert store.has_rows("a")
+
+    # 切换到账号B后，战网行属于B，其他网站的行也变了
+    path = _make_profile(live, [
+        (".battle.net", "BA-tassadar", b"session-b"),
+        (".battle.net", "only-b", b"extra-b"),
+        ("site.example.com", "other", b"other-b"),
+    ])
+    result = store.apply("a", live)
+    assert result["applied"], result["reason"]
+    assert result["rows"] == 2
+    assert _rows(path) == {
+        (".battle.net", "BA-tassadar"): b"session-a",
+        ("account.blizzard.com", "web.id"): b"id-a",
+        # 其他网站的行不动
+        ("site.example.com", "other"): b"other-b",
+    }
+
+
+def test_apply_refuses_different_key(tmp_path, store):
+    live = str(tmp_path / "Local" / "Battle.net")
+    _make_profile(live, [(".battle.net", "BA-tassadar", b"session-a")])
+    store.capture("a", live)
+    path = _make_profile(live, [(".battle.net", "BA-tassadar", b"session-b")], key="key-2")
+
+    result = store.apply("a", live)
+    assert not result["applied"]
+    assert "密钥" in result["reason"]
+    assert _rows(path) == {(".battle.net", "BA-tassadar"): b"session-b"}
+
+    assert store.apply("missing", live)["reason"] == "没有保存的Cookie"
+
+
+def test_apply_fills_columns_added_by_newer_client(tmp_path, store):
+    live = str(tmp_path / "Local" / "Battle.net")
+    _make_profile(live, [(".battle.net", "BA-tassadar", b"session-a")])
+    store.capture("a", live)
+    # 客户端升级后的表多了一个必填列
+    newer = COOKIES_SCHEMA.replace("expires_utc INTEGER NOT NULL,",
+                                   "expires_utc INTEGER NOT NULL,\n    source_port INTEGER NOT NULL,")
+    path = os.path.join(live, *DB.split('/'))
+    os.remove(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(newer)
+    conn.close()
+
+    result = store.apply("a", live)
+    assert result["applied"], result["reason"]
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("SELECT host_key, encrypted_value, source_port FROM cookies").fetchall() == [
+            (".battle.net", b"session-a", 0)]
+    finally:
+        conn.close()
@@ -0,0 +1,124 @@
+"""
+copy_engine：分块复制、原子替换和写入内容校验
+"""
+import os
+import pytest
+import copy_engine
+from copy_engine import CopyEngine, ContentMismatchError, TMP_SUFFIX
+from snapshot_store import new_hash
+
+
+def _write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _hash(data: bytes) -> str:
+    h = new_hash()
+    h.update(data)
+    return h.hexdigest()
+
+
+@pytest.fixture
+def engine():
+    # 小文件上限和块大小都很小，几KB的文件就会走分块复制
+    return CopyEngine(workers=2, small_limit=64, chunk_size=7)
+
+
+def test_chunked_copy_round_trip(tmp_path, engine, monkeypatch):
+    data = os.urandom(5000)
+    src = str(tmp_path / "src" / "data.bin")
+    _write(src, data)
+    # 不使用内核复制，逐块经过缓冲区
+    monkeypatch.setattr(copy_engine, "_kernel_copy", lambda in_fd, out_fd, chunk: False)
+
+    dst = str(tmp_path / "dst" / "data.bin")
+    os.makedirs(os.path.dirname(dst))
+    assert engine.copy_file(src, dst) == len(data)
+    assert _read(dst) == data
+
+    # 同时计算哈希
+    hashed = str(tmp_path / "dst" / "hashed.bin")
+    engine.copy_file(src, hashed, expected=_hash(data), digest=new_hash)
+    assert _read(hashed) == data
+
+
+def test_copy_files_mixed_sizes(tmp_path, engine):
+    jobs = []
+    expected = {}
+    for i, size in enumerate((0, 10, 63, 64, 500, 4096)):
+        data = os.urandom(size)
+        src = str(tmp_path / "src" / f"f{i}")
+        dst = str(tmp_path / "dst" / "sub" / f"f{i}")
+        _write(src, data)
+        jobs.append((src, dst, size, None))
+        expected[dst] = data
+
+    stats = engine.copy_files(jobs)
+    assert stats["files"] == len(jobs)
+    assert stats["errors"] == 0
+    assert stats["bytes"] == sum(len(data) for data in expected.values())
+    assert stats["phases"]["small"]["files"] == 3
+    assert stats["phases"]["large"]["files"] == 3
+    for dst, data in expected.items():
+        assert _read(dst) == data
+
+
+def test_atomic_copy_replaces_target(tmp_path, engine):
+    src = str(tmp_path / "src" / "Cookies")
+    dst = str(tmp_path / "dst" / "Cookies")
+    data = os.urandom(1000)
+    _write(src, data)
+    _write(dst, b"old")
+    mtime_ns = 1_600_000_000_123_456_789
+
+    engine.copy_file(src, dst, mtime_ns=mtime_ns, atomic=True)
+    assert _read(dst) == data
+    assert os.stat(dst).st_mtime_ns == mtime_ns
+    assert not os.path.exists(dst + TMP_SUFFIX)
+
+
+def test_failed_atomic_copy_keeps_old_target(tmp_path, engine, monkeypatch):
+    src = str(tmp_path / "src" / "Cookies")
+    dst = str(tmp_path / "dst" / "Cookies")
+    _write(src, os.urandom(1000))
+    _write(dst, b"old")
+
+    def broken_copy(src, dst, h=None):
+        with open(dst, 'wb') as f:
+            f.write(b"half")
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(engine, "_copy_large", broken_copy)
+    with pytest.raises(OSError):
+        engine.copy_file(src, dst, atomic=True)
+    assert _read(dst) == b"old"
+    assert not os.path.exists(dst + TMP_SUFFIX)
+
+
+def test_content_mismatch_removes_target(tmp_path, engine):
+    src = str(tmp_path / "src" / "Cookies")
+    dst = str(tmp_path / "dst" / "Cookies")
+    _write(src, b"changed while copying")
+    os.makedirs(os.path.dirname(dst))
+
+    with pytest.raises(ContentMismatchError):
+        engine.copy_file(src, dst, expected=_hash(b"original"), digest=new_hash)
+    assert not os.path.exists(dst)
+
+    # 批量复制时计入错误，不影响其他文件
+    other = str(tmp_path / "src" / "other")
+    _write(other, b"other")
+    stats = engine.copy_files([
+        (src, dst, os.path.getsize(src), None, False, _hash(b"original")),
+        (other, str(tmp_path / "dst" / "other"), 5, None, False, _hash(b"other")),
+    ], digest=new_hash)
+    assert stats["files"] == 1
+    assert stats["errors"] == 1
+    assert not os.path.exists(dst)
@@ -0,0 +1,95 @@
+"""
+delta_sync：在临时目录中计算并执行增量同步
+"""
+import os
+from copy_engine import CopyEngine
+from snapshot_store import SnapshotStore
+from delta_sync import plan_account, apply_plan, sync_tree
+
+
+def _write(root, rel, data: bytes, mtime_ns: int = None):
+    path = os.path.join(root, *rel.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def _snapshot(tmp_path, files: dict):
+    """保存一个账号快照，返回 (store, 快照源目录)"""
+    src = str(tmp_path / "source")
+    for rel, data in files.items():
+        _write(src, rel, data, 1_600_000_000_000_000_000)
+    os.makedirs(os.path.join(src, "EmptyDir"))
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    store.capture("acc", {"LocalAppData": src})
+    return store, src
+
+
+def _tree(root) -> dict:
+    result = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel = os.path.relpath(path, root).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                result[rel] = (f.read(), os.stat(path).st_mtime_ns)
+        for dirname in dirnames:
+            rel = os.path.relpath(os.path.join(dirpath, dirname), root).replace(os.sep, '/')
+            result.setdefault(rel + '/', None)
+    return result
+
+
+FILES = {
+    "same.txt": b"same",
+    "resized.txt": b"snapshot-version",
+    "touched.txt": b"touch",
+    "missing/deep/file.bin": b"\x00\x01\x02",
+}
+
+
+def test_plan_classifies_differences(tmp_path):
+    store, _ = _snapshot(tmp_path, FILES)
+    live = str(tmp_path / "live")
+    _write(live, "same.txt", b"same", 1_600_000_000_000_000_000)
+    _write(live, "resized.txt", b"live", 1_600_000_000_000_000_000)
+    _write(live, "touched.txt", b"touch", 1_700_000_000_000_000_000)
+    _write(live, "extra/unwanted.log", b"junk")
+
+    plan = plan_account(store, "acc", "LocalAppData", live)
+    assert [rel for rel, _ in plan.adds] == ["missing/deep/file.bin"]
+    assert sorted(rel for rel, _ in plan.replaces) == ["resized.txt", "touched.txt"]
+    assert plan.deletes == ["extra/unwanted.log"]
+    assert plan.unchanged == 1
+    assert plan.remove_dirs == ["extra"]
+    assert "EmptyDir" in plan.make_dirs
+    assert plan.bytes_to_copy == len(b"snapshot-version") + len(b"touch") + 3
+
+
+def test_apply_makes_live_match_snapshot(tmp_path):
+    store, src = _snapshot(tmp_path, FILES)
+    live = str(tmp_path / "live")
+    _write(live, "resized.txt", b"live")
+    _write(live, "extra/nested/unwanted.log", b"junk")
+
+    stats = sync_tree(store, "acc", "LocalAppData", live)
+    assert stats["errors"] == 0
+    assert _tree(live) == _tree(src)
+    # 再次计算没有需要执行的操作
+    assert plan_account(store, "acc", "LocalAppData", live).is_empty()
+
+
+def test_verify_hash_detects_same_size_and_mtime(tmp_path):
+    store, _ = _snapshot(tmp_path, {"data.bin": b"AAAA"})
+    live = str(tmp_path / "live")
+    _write(live, "data.bin", b"BBBB", 1_600_000_000_000_000_000)
+    os.makedirs(os.path.join(live, "EmptyDir"))
+
+    assert plan_account(store, "acc", "LocalAppData", live).is_empty()
+    plan = plan_account(store, "acc", "LocalAppData", live, verify_hash=True)
+    assert [rel for rel, _ in plan.replaces] == ["data.bin"]
+    apply_plan(plan, store, live)
+    with open(os.path.join(live, "data.bin"), 'rb') as f:
+        assert f.read() == b"AAAA"
@@ -0,0 +1,76 @@
+"""
+FileIndex：当前目录索引的增量刷新
+"""
+import os
+import time
+from file_index import FileIndex, live_tree
+
+
+def _write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_file_changed_in_place_is_detected(tmp_path):
+    root = tmp_path / "live"
+    cookies = root / "BrowserCaches" / "common" / "Cookies"
+    _write(str(cookies), b"x")
+    index = FileIndex(str(tmp_path / "index.db"))
+    index.scan_live("LocalAppData", str(root))
+    with index._connect() as conn:
+        conn.execute("UPDATE files SET hash='abc' WHERE tree=?", (live_tree("LocalAppData"),))
+    dir_mtime = os.stat(cookies.parent).st_mtime_ns
+
+    # 原地改写：目录的修改时间不变
+    with open(cookies, 'r+b') as f:
+        f.write(b"xxxxx")
+    _bump_mtime(str(cookies))
+    os.utime(cookies.parent, ns=(dir_mtime, dir_mtime))
+
+    files = index.refresh_live("LocalAppData", str(root))
+    size, mtime, blob = files["BrowserCaches/common/Cookies"]
+    assert size == 5
+    assert mtime == os.stat(cookies).st_mtime_ns
+    assert blob is None
+
+
+def test_new_and_removed_files(tmp_path):
+    root = tmp_path / "live"
+    _write(str(root / "a" / "one"), b"1")
+    _write(str(root / "a" / "two"), b"2")
+    index = FileIndex(str(tmp_path / "index.db"))
+    index.scan_live("Roaming", str(root))
+
+    time.sleep(0.01)
+    os.remove(root / "a" / "one")
+    _write(str(root / "a" / "b" / "three"), b"333")
+    _bump_mtime(str(root / "a"))
+
+    files = index.refresh_live("Roaming", str(root))
+    assert set(files) == {"a/two", "a/b/three"}
+    assert files["a/b/three"][0] == 3
+
+
+def test_refresh_limited_to_prefix(tmp_path):
+    root = tmp_path / "live"
+    _write(str(root / "BrowserCaches" / "common" / "Cookies"), b"x")
+    _write(str(root / "Cache" / "data_1"), b"1")
+    index = FileIndex(str(tmp_path / "index.db"))
+    index.scan_live("LocalAppData", str(root))
+
+    time.sleep(0.01)
+    _write(str(root / "Cache" / "data_2"), b"2")
+    _bump_mtime(str(root / "Cache"))
+    _write(str(root / "BrowserCaches" / "common" / "Cookies-journal"), b"j")
+    _bump_mtime(str(root / "BrowserCaches" / "common"))
+
+    files = index.refresh_live("LocalAppData", str(root), prefix="BrowserCaches/")
+    assert set(files) == {"BrowserCaches/common/Cookies", "BrowserCaches/common/Cookies-journal"}
+    # 前缀之外的目录不在本次刷新范围内
+    assert "Cache/data_2" not in index.get_files(live_tree("LocalAppData"))
@@ -0,0 +1,211 @@
+"""
+fs_clone：复制方式探测、reflink失败时的退回、hardlink模式下快照blob不被修改
+reflink用例需要支持克隆的文件系统：设置 BNSWITCH_REFLINK_DIR 指向已挂载的btrfs/XFS目录，
+或以root运行且有mkfs.btrfs/mkfs.xfs和loop设备（自动创建回环文件系统），否则跳过
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import pytest
+import fs_clone
+from fs_clone import MODE_COPY, MODE_HARDLINK, MODE_REFLINK, probe_mode, reflink, is_immutable
+from copy_engine import CopyEngine
+from snapshot_store import SnapshotStore, hash_file
+
+REFLINK_DIR_ENV = "BNSWITCH_REFLINK_DIR"
+
+
+def _write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+# ---------- 回环文件系统 ----------
+
+def _mount_loopback(mountpoint: str, image: str) -> bool:
+    """在image上创建btrfs（或启用reflink的XFS）并挂载，失败返回False"""
+    if os.name != 'posix' or os.geteuid() != 0:
+        return False
+    for mkfs, size, args in (("mkfs.btrfs", 160, ["-q"]), ("mkfs.xfs", 320, ["-q", "-m", "reflink=1"])):
+        if not shutil.which(mkfs):
+            continue
+        with open(image, 'wb') as f:
+            f.truncate(size * 1024 * 1024)
+        if subprocess.run([mkfs, *args, image], capture_output=True).returncode != 0:
+            continue
+        if subprocess.run(["mount", "-o", "loop", image, mountpoint], capture_output=True).returncode == 0:
+            return True
+    return False
+
+
+@pytest.fixture(scope="module")
+def reflink_dir():
+    preset = os.environ.get(REFLINK_DIR_ENV)
+    if preset:
+        path = tempfile.mkdtemp(dir=preset)
+        yield path
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    work = tempfile.mkdtemp(prefix="bnswitch-loop-")
+    mountpoint = os.path.join(work, "mnt")
+    os.makedirs(mountpoint)
+    if not _mount_loopback(mountpoint, os.path.join(work, "fs.img")):
+        shutil.rmtree(work, ignore_errors=True)
+        pytest.skip(f"没有可用的回环设备或支持reflink的文件系统（可设置{REFLINK_DIR_ENV}）")
+    try:
+        yield mountpoint
+    finally:
+        subprocess.run(["umount", mountpoint], capture_output=True)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_reflink_on_loopback_filesystem(reflink_dir):
+    store_dir = os.path.join(reflink_dir, "store")
+    live_dir = os.path.join(reflink_dir, "live")
+    os.makedirs(store_dir)
+    os.makedirs(live_dir)
+    assert probe_mode(store_dir, live_dir) == MODE_REFLINK
+
+    src = os.path.join(store_dir, "blob")
+    dst = os.path.join(live_dir, "Cookies")
+    _write(src, b"a" * 100000)
+    assert reflink(src, dst)
+    # 克隆是独立的文件：修改克隆不影响源文件
+    with open(dst, 'r+b') as f:
+        f.write(b"b")
+    assert _read(src) == b"a" * 100000
+    assert os.stat(src).st_ino != os.stat(dst).st_ino
+
+    written = CopyEngine(workers=2).copy_file(src, os.path.join(live_dir, "other"), mode=MODE_REFLINK)
+    assert written == 0
+
+
+# ---------- 探测 ----------
+
+def test_probe_same_volume_without_clone_is_hardlink(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs_clone, "_clone", lambda src, dst: False)
+    assert probe_mode(str(tmp_path / "store"), str(tmp_path / "live" / "missing")) == MODE_HARDLINK
+    # 探测文件不留在目录中
+    assert os.listdir(tmp_path) == []
+
+
+def test_probe_without_links_is_copy(tmp_path, monkeypatch):
+    def no_link(src, dst):
+        raise OSError("跨卷")
+
+    monkeypatch.setattr(fs_clone, "_clone", lambda src, dst: False)
+    monkeypatch.setattr(fs_clone.os, "link", no_link)
+    assert probe_mode(str(tmp_path), str(tmp_path)) == MODE_COPY
+
+
+def test_probe_prefers_reflink(tmp_path, monkeypatch):
+    def fake_clone(src, dst):
+        shutil.copyfile(src, dst)
+        return True
+
+    monkeypatch.setattr(fs_clone, "_clone", fake_clone)
+    assert probe_mode(str(tmp_path), str(tmp_path)) == MODE_REFLINK
+
+
+# ---------- 退回 ----------
+
+def test_failed_reflink_leaves_no_target(tmp_path, monkeypatch):
+    def failing_clone(src, dst):
+        with open(dst, 'wb') as f:
+            f.write(b"partial")
+        raise OSError("EOPNOTSUPP")
+
+    monkeypatch.setattr(fs_clone, "_clone", failing_clone)
+    src = str(tmp_path / "src")
+    _write(src, b"data")
+    assert not reflink(src, str(tmp_path / "dst"))
+    assert not os.path.exists(tmp_path / "dst")
+
+
+def test_reflink_mode_falls_back_to_copy(tmp_path, monkeypatch):
+    import copy_engine
+    monkeypatch.setattr(copy_engine, "reflink", lambda src, dst: False)
+    src = str(tmp_path / "src")
+    dst = str(tmp_path / "out" / "dst")
+    _write(src, b"x" * 5000)
+    os.makedirs(os.path.dirname(dst))
+    written = CopyEngine(workers=2).copy_file(src, dst, mtime_ns=1_000_000_000, atomic=True, mode=MODE_REFLINK)
+    assert written == 5000
+    assert _read(dst) == b"x" * 5000
+    assert os.stat(dst).st_mtime_ns == 1_000_000_000
+    assert os.stat(dst).st_ino != os.stat(src).st_ino
+
+
+def test_hardlink_mode_falls_back_to_copy_when_link_fails(tmp_path, monkeypatch):
+    def no_link(src, dst):
+        raise OSError("跨卷")
+
+    monkeypatch.setattr(os, "link", no_link)
+    src = str(tmp_path / "000003.ldb")
+    dst = str(tmp_path / "copy.ldb")
+    _write(src, b"table")
+    written = CopyEngine(workers=2).copy_file(src, dst, mode=MODE_HARDLINK, link=True)
+    assert written == 5
+    assert os.stat(dst).st_ino != os.stat(src).st_ino
+
+
+# ---------- hardlink模式下blob不可变 ----------
+
+def test_immutable_patterns():
+    assert is_immutable("Local Storage/leveldb/000005.ldb")
+    assert is_immutable("BrowserCaches/common/icon.PNG")
+    for mutable in ("Local Storage/leveldb/000006.log", "Local Storage/leveldb/MANIFEST-000001",
+                    "BrowserCaches/common/Network/Cookies", "BrowserCaches/common/Local State",
+                    "Battle.net.config"):
+        assert not is_immutable(mutable)
+
+
+def test_hardlinked_snapshot_blobs_stay_immutable(tmp_path):
+    live = tmp_path / "live"
+    files = {
+        "Local Storage/leveldb/000005.ldb": b"table-data",
+        "Local Storage/leveldb/000006.log": b"log-data",
+        "BrowserCaches/common/Network/Cookies": b"cookie-db",
+    }
+    for rel, data in files.items():
+        _write(str(live.joinpath(*rel.split('/'))), data)
+
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2), mode=MODE_HARDLINK)
+    store.capture("acc", {"LocalAppData": str(live)})
+    manifest = store.load_manifest("acc")["trees"]["LocalAppData"]["files"]
+
+    restored = tmp_path / "restored"
+    store.restore("acc", "LocalAppData", str(restored))
+    for rel, data in files.items():
+        path = str(restored.joinpath(*rel.split('/')))
+        blob = store.blob_path(manifest[rel]["blob"])
+        linked = os.path.samefile(path, blob)
+        # 只有写入后不再修改的文件与blob共用inode
+        assert linked == is_immutable(rel)
+        assert store.is_linked(path, manifest[rel]["blob"]) == linked
+
+    # 客户端原地修改可变文件，不能改到快照中的blob
+    for rel in ("Local Storage/leveldb/000006.log", "BrowserCaches/common/Network/Cookies"):
+        with open(restored.joinpath(*rel.split('/')), 'r+b') as f:
+            f.write(b"CHANGED")
+    for rel, data in files.items():
+        blob = store.blob_path(manifest[rel]["blob"])
+        assert _read(blob) == data
+        assert hash_file(blob) == manifest[rel]["blob"]
+
+
+def test_copy_mode_never_links(tmp_path):
+    live = tmp_path / "live"
+    _write(str(live / "000005.ldb"), b"table")
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2), mode=MODE_COPY)
+    store.capture("acc", {"LocalAppData": str(live)})
+    store.restore("acc", "LocalAppData", str(tmp_path / "restored"))
+    blob = store.load_manifest("acc")["trees"]["LocalAppData"]["files"]["000005.ldb"]["blob"]
+    assert not os.path.samefile(str(tmp_path / "restored" / "000005.ldb"), store.blob_path(blob))
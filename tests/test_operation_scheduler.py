@@ -0,0 +1,69 @@
+"""
+operation_scheduler：tkinter界面共用的提交函数
+"""
+import queue
+import threading
+from tkinter import messagebox
+from operation_scheduler import OperationScheduler, submit_tk, OP_SWITCH, OP_SAVE
+
+
+class FakeRoot:
+    """记录 after 回调，由测试在"界面线程"中执行"""
+
+    def __init__(self):
+        self.calls = queue.Queue()
+
+    def after(self, delay, func):
+        self.calls.put(func)
+
+    def run_next(self, timeout=5):
+        self.calls.get(timeout=timeout)()
+
+
+def test_result_delivered_through_root_after():
+    root = FakeRoot()
+    results = []
+    assert submit_tk(root, OP_SAVE, lambda: 42, "a", lambda ok, value: results.append((ok, value)),
+                     scheduler=OperationScheduler())
+    root.run_next()
+    assert results == [(True, 42)]
+
+
+def test_failure_and_superseded():
+    scheduler = OperationScheduler()
+    root = FakeRoot()
+    results = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("失败")
+
+    assert submit_tk(root, OP_SWITCH, fail, "a", lambda ok, value: results.append(("a", ok, str(value))),
+                     scheduler=scheduler)
+    assert started.wait(5)
+    # 排队中的切换被后一个取代，不回调
+    assert submit_tk(root, OP_SWITCH, lambda: 1, "b", lambda ok, value: results.append(("b", ok, value)),
+                     scheduler=scheduler)
+    assert submit_tk(root, OP_SWITCH, lambda: 2, "c", lambda ok, value: results.append(("c", ok, value)),
+                     scheduler=scheduler)
+    release.set()
+    root.run_next()
+    root.run_next()
+    assert results == [("a", False, "失败"), ("c", True, 2)]
+    assert root.calls.empty()
+
+
+def test_rejected_shows_warning(monkeypatch):
+    scheduler = OperationScheduler()
+    warnings = []
+    monkeypatch.setattr(messagebox, "showwarning", lambda title, msg, **kwargs: warnings.append(msg))
+    release = threading.Event()
+    root = FakeRoot()
+    assert submit_tk(root, OP_SWITCH, lambda: release.wait(5), "a", scheduler=scheduler)
+    # 切换过程中保存当前登录被拒绝
+    assert not submit_tk(root, OP_SAVE, lambda: None, "b", scheduler=scheduler)
+    release.set()
+    assert len(warnings) == 1
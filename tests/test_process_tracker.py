@@ -0,0 +1,90 @@
+"""
+ProcessTracker：用真实的子进程代替战网客户端（只把这些子进程交给跟踪器，不影响系统中的其他进程）
+"""
+import sys
+import time
+import subprocess
+import psutil
+import pytest
+import process_tracker
+from process_tracker import ProcessTracker
+
+
+@pytest.fixture
+def fake_clients(monkeypatch):
+    """启动的子进程在跟踪器看来都是战网客户端"""
+    children = []
+
+    def spawn():
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        children.append(child)
+        return child
+
+    def process_iter(attrs=None):
+        for child in children:
+            if child.poll() is None:
+                proc = psutil.Process(child.pid)
+                proc.info = {"name": "Battle.net.exe"}
+                yield proc
+
+    monkeypatch.setattr(process_tracker.psutil, "process_iter", process_iter)
+    yield spawn
+    for child in children:
+        if child.poll() is None:
+            child.kill()
+        child.wait()
+
+
+def test_stop_terminates_processes_started_after_caching(fake_clients):
+    tracker = ProcessTracker(min_scan_interval=60)
+    first = fake_clients()
+    assert tracker.is_running()
+
+    # 缓存中已有客户端，之后启动的辅助进程也要被结束
+    second = fake_clients()
+    assert tracker.stop(timeout=5)
+    assert first.wait(timeout=5) is not None
+    assert second.wait(timeout=5) is not None
+    assert not tracker.is_running()
+
+
+def test_polling_with_cached_client_does_not_scan(fake_clients):
+    tracker = ProcessTracker(min_scan_interval=0)
+    first = fake_clients()
+    assert tracker.is_running()
+    assert tracker.full_scans == 1
+    # 轮询只按PID复核缓存
+    for _ in range(20):
+        assert tracker.is_running()
+    assert tracker.full_scans == 1
+
+    # 客户端退出后缓存为空，下一次查询重新扫描
+    first.kill()
+    first.wait()
+    assert not tracker.is_running()
+    assert tracker.full_scans == 2
+
+
+def test_helpers_found_after_helper_interval(fake_clients):
+    tracker = ProcessTracker(min_scan_interval=0, helper_scan_interval=0.05)
+    fake_clients()
+    assert len(tracker.processes('client')) == 1
+    fake_clients()
+    assert len(tracker.processes('client')) == 1
+    time.sleep(0.06)
+    assert len(tracker.processes('client')) == 2
+    tracker.stop(timeout=5)
+
+
+def test_invalidate_forces_scan(fake_clients):
+    tracker = ProcessTracker()
+    fake_clients()
+    assert len(tracker.processes('client')) == 1
+    fake_clients()
+    tracker.invalidate()
+    assert len(tracker.processes('client')) == 2
+    tracker.stop(timeout=5)
+
+
+def test_stop_without_clients(fake_clients):
+    assert ProcessTracker().stop(timeout=1) is False
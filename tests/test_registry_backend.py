@@ -0,0 +1,36 @@
+"""
+registry_backend：快照中bytes数据的编码与旧快照兼容
+"""
+import json
+from registry_backend import (MemoryRegistryBackend, REG_SZ, REG_BINARY, REG_DWORD, REG_MULTI_SZ,
+                              decode_value)
+
+ROOT = "HKCU\\Software\\Blizzard Entertainment\\Battle.net"
+REG_NONE = 0
+REG_RESOURCE_LIST = 8
+
+
+def test_bytes_round_trip_for_any_type():
+    registry = MemoryRegistryBackend()
+    values = {
+        "blob": (REG_BINARY, b"\x00\x01\xff"),
+        "none": (REG_NONE, b"\x10\x20"),
+        "resources": (REG_RESOURCE_LIST, b"\xaa" * 4),
+        "text": (REG_SZ, "abcd"),
+        "hexlike": (REG_SZ, "00ff"),
+        "number": (REG_DWORD, 7),
+        "lines": (REG_MULTI_SZ, ["a", "b"]),
+    }
+    registry.set_values(ROOT + "\\Launch Options", values)
+    # 经过JSON保存和读取
+    snapshot = json.loads(json.dumps(registry.export_tree(ROOT)))
+
+    restored = MemoryRegistryBackend()
+    restored.import_tree(snapshot)
+    assert restored.list_values(ROOT + "\\Launch Options") == values
+
+
+def test_legacy_snapshot_without_marker():
+    assert decode_value({"type": REG_BINARY, "data": "0aff"}) == (REG_BINARY, b"\x0a\xff")
+    assert decode_value({"type": REG_SZ, "data": "0aff"}) == (REG_SZ, "0aff")
+    assert decode_value({"type": REG_NONE, "data": "0aff", "encoding": "hex"}) == (REG_NONE, b"\x0a\xff")
@@ -0,0 +1,58 @@
+"""
+session_capsule：只保存了胶囊的账号在当前目录没有客户端数据时也能切换
+"""
+import os
+import shutil
+import pytest
+from bench_switch import SyntheticBattleNet, StubProcessTracker
+from environment import SwitcherEnvironment
+from registry_backend import MemoryRegistryBackend, REG_BINARY
+from isolated_switcher import IsolatedSwitcher
+
+
+@pytest.fixture
+def switcher(tmp_path):
+    env = SwitcherEnvironment(
+        battlenet_exe=str(tmp_path / "Battle.net Launcher.exe"),
+        local_root=str(tmp_path / "Local" / "Battle.net"),
+        roaming_root=str(tmp_path / "Roaming" / "Battle.net"),
+        storage_root=str(tmp_path / "data"),
+        registry=MemoryRegistryBackend(),
+        processes=StubProcessTracker(),
+        capsule_mode=True,
+    )
+    switcher = IsolatedSwitcher(env)
+    tree = SyntheticBattleNet(env.local_root, env.roaming_root, files=40, avg_size=512)
+    tree.generate("13800000000")
+    switcher.registry.set_values(switcher.BATTLENET_REG_PATH, {"0A1B2C3D": (REG_BINARY, b"token")})
+    return switcher
+
+
+def _cookies(root) -> bytes:
+    with open(os.path.join(root, "BrowserCaches", "common", "Network", "Cookies"), 'rb') as f:
+        return f.read()
+
+
+def test_capsule_only_account_switches_into_empty_tree(switcher):
+    account_id = switcher.create_account_from_current("capsule", force_version="cn")
+    assert account_id
+    assert switcher.capsules.has_capsule(account_id)
+    assert not switcher.store.has_snapshot(account_id)
+    saved = _cookies(switcher.BATTLENET_LOCAL)
+
+    # 当前目录被清空（如客户端重装），胶囊直接写入空目录
+    shutil.rmtree(switcher.BATTLENET_LOCAL)
+    assert not switcher.capsules.live_ready(switcher.BATTLENET_LOCAL)
+    ok, msg = switcher.switch_to_account(account_id)
+    assert ok, msg
+    assert switcher.last_switch_stats["mode"] == "capsule"
+    assert _cookies(switcher.BATTLENET_LOCAL) == saved
+
+
+def test_empty_tree_prefers_full_snapshot(switcher):
+    account_id = switcher.create_account_from_current("capsule", force_version="cn")
+    # 账号有完整快照时，当前目录没有客户端数据就使用完整快照
+    switcher.store.capture(account_id, {"LocalAppData": switcher.BATTLENET_LOCAL,
+                                        "Roaming": switcher.BATTLENET_ROAMING})
+    shutil.rmtree(switcher.BATTLENET_LOCAL)
+    assert not switcher.capsules.usable(account_id, switcher.BATTLENET_LOCAL)
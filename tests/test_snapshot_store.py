@@ -0,0 +1,113 @@
+"""
+snapshot_store：客户端运行中保存时，复制过程中被修改的文件重新读取
+"""
+import os
+import pytest
+import snapshot_store
+from copy_engine import CopyEngine
+from snapshot_store import SnapshotStore, SourceChangedError, hash_file
+
+
+@pytest.fixture(autouse=True)
+def no_delay(monkeypatch):
+    monkeypatch.setattr(snapshot_store, "STABLE_RETRY_DELAY", 0)
+
+
+@pytest.fixture
+def live(tmp_path):
+    root = tmp_path / "live"
+    (root / "Network").mkdir(parents=True)
+    (root / "Network" / "Cookies").write_bytes(b"cookies-v1")
+    (root / "Network" / "Cookies-copy").write_bytes(b"cookies-v1")
+    (root / "Local State").write_bytes(b"key")
+    return root
+
+
+def _writer(monkeypatch, path, times: int):
+    """计算哈希之后、复制blob之前修改文件（模拟客户端写入），共修改times次"""
+    written = []
+    real_copy = CopyEngine.copy_files
+
+    def copy_files(self, jobs, *args, **kwargs):
+        if len(written) < times:
+            written.append(1)
+            path.write_bytes(b"cookies-v" + str(len(written) + 1).encode() * len(written))
+        return real_copy(self, jobs, *args, **kwargs)
+
+    monkeypatch.setattr(CopyEngine, "copy_files", copy_files)
+    return written
+
+
+def _check_blobs(store, account_id, live):
+    files = store.load_manifest(account_id)["trees"]["LocalAppData"]["files"]
+    for rel, entry in files.items():
+        blob = store.blob_path(entry["blob"])
+        assert hash_file(blob) == entry["blob"]
+        with open(blob, 'rb') as f:
+            assert f.read() == (live / rel).read_bytes()
+        assert entry["size"] == os.stat(live / rel).st_size
+    return files
+
+
+def test_changed_file_is_read_again(tmp_path, live, monkeypatch):
+    cookies = live / "Network" / "Cookies"
+    _writer(monkeypatch, cookies, 1)
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    stats = store.capture("acc", {"LocalAppData": str(live)}, stable_retries=3)
+    assert stats["retries"] == 1
+    files = _check_blobs(store, "acc", live)
+    assert set(files) == {"Network/Cookies", "Network/Cookies-copy", "Local State"}
+
+
+def test_keeps_changing_raises(tmp_path, live, monkeypatch):
+    cookies = live / "Network" / "Cookies"
+    _writer(monkeypatch, cookies, 10)
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    with pytest.raises(SourceChangedError):
+        store.capture("acc", {"LocalAppData": str(live)}, stable_retries=2)
+    assert store.load_manifest("acc") is None
+    # 可能不完整的blob已删除，留下的blob都与哈希一致
+    for blob in (os.path.join(d, f) for d, _, names in os.walk(store.blobs_dir) for f in names):
+        assert hash_file(blob) == os.path.basename(blob)
+
+
+def test_blob_content_verified_without_retries(tmp_path, live, monkeypatch):
+    # 不检查修改时间（客户端已关闭的保存），写入blob的内容仍按实际字节校验
+    (live / "Network" / "Cookies-copy").unlink()
+    cookies = live / "Network" / "Cookies"
+    _writer(monkeypatch, cookies, 1)
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    stats = store.capture("acc", {"LocalAppData": str(live)})
+    assert stats["retries"] == 1
+    _check_blobs(store, "acc", live)
+
+
+def test_same_size_and_mtime_rewrite_is_caught(tmp_path, live, monkeypatch):
+    """大小和修改时间都没变（时间精度内的改写），只有内容校验能发现"""
+    (live / "Network" / "Cookies-copy").unlink()
+    cookies = live / "Network" / "Cookies"
+    st = os.stat(cookies)
+    real_copy = CopyEngine.copy_files
+    rewrites = []
+
+    def copy_files(self, jobs, *args, **kwargs):
+        if not rewrites:
+            rewrites.append(1)
+            cookies.write_bytes(b"COOKIES-v1")
+            os.utime(cookies, ns=(st.st_atime_ns, st.st_mtime_ns))
+        return real_copy(self, jobs, *args, **kwargs)
+
+    monkeypatch.setattr(CopyEngine, "copy_files", copy_files)
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    store.capture("acc", {"LocalAppData": str(live)}, stable_retries=3)
+    _check_blobs(store, "acc", live)
+
+
+def test_blob_never_kept_under_wrong_id(tmp_path, live, monkeypatch):
+    (live / "Network" / "Cookies-copy").unlink()
+    _writer(monkeypatch, live / "Network" / "Cookies", 10)
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    with pytest.raises(SourceChangedError):
+        store.capture("acc", {"LocalAppData": str(live)})
+    for blob in (os.path.join(d, f) for d, _, names in os.walk(store.blobs_dir) for f in names):
+        assert hash_file(blob) == os.path.basename(blob)
@@ -0,0 +1,156 @@
+"""
+stage_swap：暂存目录切换、回滚和中断恢复
+"""
+import os
+import pytest
+import stage_swap
+from bench_switch import SyntheticBattleNet, StubProcessTracker
+from copy_engine import CopyEngine
+from environment import SwitcherEnvironment
+from isolated_switcher import IsolatedSwitcher
+from registry_backend import MemoryRegistryBackend
+from snapshot_store import SnapshotStore
+from stage_swap import (stage_tree, swap, rollback, recover, stage_path, previous_path, staged_accounts,
+                        discard_previous)
+
+
+def _write(root, rel, data: bytes):
+    path = os.path.join(root, *rel.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(root, rel) -> bytes:
+    with open(os.path.join(root, *rel.split('/')), 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def setup(tmp_path):
+    """账号B的快照和当前属于账号A的战网目录"""
+    src = str(tmp_path / "source")
+    _write(src, "Cookies", b"account-b")
+    store = SnapshotStore(str(tmp_path / "store"), engine=CopyEngine(workers=2))
+    store.capture("b", {"LocalAppData": src})
+    live = str(tmp_path / "Battle.net")
+    _write(live, "Cookies", b"account-a")
+    return store, live
+
+
+def test_swap_and_rollback(setup):
+    store, live = setup
+    stage_tree(store, "b", "LocalAppData", live)
+    assert staged_accounts(live) == ["b"]
+
+    swap(live, "b")
+    assert _read(live, "Cookies") == b"account-b"
+    assert _read(previous_path(live), "Cookies") == b"account-a"
+    assert not os.path.exists(stage_path(live, "b"))
+
+    assert rollback(live, "b")
+    assert _read(live, "Cookies") == b"account-a"
+    # 回滚前的目录作为账号B的暂存目录保留
+    assert _read(stage_path(live, "b"), "Cookies") == b"account-b"
+    assert not os.path.exists(previous_path(live))
+
+
+def test_failed_second_rename_restores_live(setup, monkeypatch):
+    store, live = setup
+    stage_tree(store, "b", "LocalAppData", live)
+    real_rename = os.rename
+
+    def rename(src, dst):
+        if src == stage_path(live, "b"):
+            raise PermissionError("目录被占用")
+        return real_rename(src, dst)
+
+    monkeypatch.setattr(stage_swap.os, "rename", rename)
+    with pytest.raises(PermissionError):
+        swap(live, "b")
+    monkeypatch.undo()
+
+    assert _read(live, "Cookies") == b"account-a"
+    assert os.path.isdir(stage_path(live, "b"))
+    assert not os.path.exists(previous_path(live))
+
+
+def test_recover_after_interrupted_swap(setup):
+    store, live = setup
+    stage_tree(store, "b", "LocalAppData", live)
+    # 模拟在两次重命名之间崩溃：当前目录已改名为旧目录，暂存目录还没有改名
+    os.rename(live, previous_path(live))
+    assert not os.path.exists(live)
+
+    assert recover(live)
+    assert _read(live, "Cookies") == b"account-a"
+    assert not os.path.exists(previous_path(live))
+    # 暂存目录不受影响，可以重新切换
+    swap(live, "b")
+    assert _read(live, "Cookies") == b"account-b"
+
+
+def test_recover_does_nothing_when_live_exists(setup):
+    store, live = setup
+    stage_tree(store, "b", "LocalAppData", live)
+    swap(live, "b")
+    assert not recover(live)
+    assert _read(live, "Cookies") == b"account-b"
+    assert os.path.isdir(previous_path(live))
+
+
+def test_next_stage_recycles_previous_dir(setup):
+    store, live = setup
+    stage_tree(store, "b", "LocalAppData", live)
+    swap(live, "b")
+    store.capture("a", {"LocalAppData": previous_path(live)})
+    stats = stage_tree(store, "a", "LocalAppData", live)
+    # 旧目录就是账号A的数据，改名为暂存目录后不需要复制
+    assert stats["adds"] == stats["replaces"] == 0
+    assert not os.path.exists(previous_path(live))
+
+
+def test_discard_previous_after_swap(setup):
+    store, live = setup
+    store.capture("c", {"LocalAppData": live})
+    stage_tree(store, "b", "LocalAppData", live)
+    stage_tree(store, "c", "LocalAppData", live)
+    swap(live, "b")
+
+    discard_previous(live)
+    assert not os.path.exists(previous_path(live))
+    assert _read(live, "Cookies") == b"account-b"
+    # 只删除切换前的目录，预取的暂存目录保留
+    assert staged_accounts(live) == ["c"]
+    assert not rollback(live, "b")
+
+
+def test_switcher_discards_backup_after_switch(tmp_path):
+    env = SwitcherEnvironment(
+        battlenet_exe=str(tmp_path / "Battle.net Launcher.exe"),
+        local_root=str(tmp_path / "Local" / "Battle.net"),
+        roaming_root=str(tmp_path / "Roaming" / "Battle.net"),
+        storage_root=str(tmp_path / "data"),
+        registry=MemoryRegistryBackend(),
+        processes=StubProcessTracker(),
+        switch_mode="staged",
+        capsule_mode=False,
+    )
+    switcher = IsolatedSwitcher(env)
+    tree = SyntheticBattleNet(env.local_root, env.roaming_root, files=40, avg_size=512)
+    tree.generate("13800000000")
+    first = switcher.create_account_from_current("first", force_version="cn")
+    tree.generate("13900000000")
+    second = switcher.create_account_from_current("second", force_version="cn")
+
+    ok, msg = switcher.switch_to_account(first)
+    assert ok, msg
+    assert switcher.has_switch_backup()
+    assert switcher.previous_account_id == second
+
+    switcher.discard_switch_backup()
+    assert not switcher.has_switch_backup()
+    assert switcher.previous_account_id is None
+    ok, _ = switcher.rollback_last_switch()
+    assert not ok
+    assert switcher.current_account_id == first
@@ -0,0 +1,82 @@
+"""
+wait_utils：用真实的子进程代替战网客户端
+"""
+import os
+import sys
+import time
+import subprocess
+import psutil
+import pytest
+import wait_utils
+from wait_utils import wait_for_processes, wait_until, wait_for_unlock, recent_waits
+
+
+def _spawn(code: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", code])
+
+
+@pytest.fixture
+def children():
+    procs = []
+    yield procs
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+def test_wait_returns_when_child_exits(children):
+    child = _spawn("import time; time.sleep(0.3)")
+    children.append(child)
+    start = time.perf_counter()
+    assert wait_for_processes([psutil.Process(child.pid)], timeout=10, name="test_exit")
+    assert time.perf_counter() - start < 5
+    assert recent_waits(1)[0]["name"] == "test_exit"
+    assert recent_waits(1)[0]["ok"]
+
+
+def test_wait_times_out_without_kill(children):
+    child = _spawn("import time; time.sleep(60)")
+    children.append(child)
+    start = time.perf_counter()
+    assert not wait_for_processes([psutil.Process(child.pid)], timeout=0.3, kill_after=False, name="test_timeout")
+    assert 0.25 < time.perf_counter() - start < 5
+    assert child.poll() is None
+    last = recent_waits(1)[0]
+    assert last["name"] == "test_timeout" and not last["ok"]
+
+
+def test_wait_kills_after_timeout(children):
+    child = _spawn("import time; time.sleep(60)")
+    children.append(child)
+    assert wait_for_processes([psutil.Process(child.pid)], timeout=0.2, kill_after=True)
+    assert child.wait(timeout=5) is not None
+
+
+def test_wait_until_backs_off_and_times_out():
+    calls = []
+    assert not wait_until(lambda: calls.append(1), timeout=0.2, name="never")
+    assert 1 < len(calls) < 50
+    deadline = time.perf_counter() + 0.1
+    assert wait_until(lambda: time.perf_counter() >= deadline, timeout=5)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="子进程使用flock持有文件锁")
+def test_wait_for_unlock_after_child_releases(tmp_path, children):
+    path = str(tmp_path / "Cookies")
+    with open(path, 'wb') as f:
+        f.write(b"db")
+    ready = str(tmp_path / "locked")
+    child = _spawn(
+        "import fcntl, time, sys\n"
+        f"f = open({path!r}, 'rb+')\n"
+        "fcntl.flock(f.fileno(), fcntl.LOCK_EX)\n"
+        f"open({ready!r}, 'w').close()\n"
+        "time.sleep(0.5)\n")
+    children.append(child)
+    assert wait_until(lambda: os.path.exists(ready), timeout=5)
+    assert not wait_utils.is_file_unlocked(path)
+    start = time.perf_counter()
+    assert wait_for_unlock([path], timeout=10)
+    assert time.perf_counter() - start < 5
+    assert wait_utils.is_file_unlocked(path)
@@ -7,15 +7,26 @@ import json
 import subprocess
 from datetime import datetime
 from config import DATA_DIR, ensure_dirs
+from metadata_cache import get_metadata_cache
+
+
+def summarize_token(token_data: dict) -> dict:
+    """get_token_info 使用的摘要字段（不包含敏感数据）"""
+    return {
+        "saved_at": token_data.get("saved_at", "未知"),
+        "has_callback": bool(token_data.get("callback_url")),
+        "has_auth_code": bool(token_data.get("auth_code"))
+    }
 
 
 class TokenManager:
     """OAuth令牌管理类"""
     
-    def __init__(self):
+    def __init__(self, tokens_dir: str = None):
         ensure_dirs()
-        self.tokens_dir = os.path.join(DATA_DIR, "tokens")
+        self.tokens_dir = tokens_dir or os.path.join(DATA_DIR, "tokens")
         os.makedirs(self.tokens_dir, exist_ok=True)
+        self.metadata = get_metadata_cache(self.tokens_dir, summarize_token, "tokens")
     
     def save_token(self, account_id: str, token_data: dict) -> bool:
         """
@@ -38,6 +49,7 @@ class TokenManager:
             
             with open(token_file, 'w', encoding='utf-8') as f:
                 json.dump(save_data, f, ensure_ascii=False, indent=2)
+            self.metadata.update(account_id, save_data)
             
             return True
         except Exception as e:
@@ -94,20 +106,20 @@ class TokenManager:
             token_file = os.path.join(self.tokens_dir, f"{account_id}.json")
             if os.path.exists(token_file):
                 os.remove(token_file)
+            self.metadata.discard(account_id)
             return True
         except Exception as e:
             print(f"删除令牌失败: {e}")
             return False
     
     def get_token_info(self, account_id: str) -> dict:
-        """获取令牌信息（不包含敏感数据）"""
-        token_data = self.load_token(account_id)
-        if not token_data:
+        """获取令牌信息（不包含敏感数据），文件没有变化时不读取文件"""
+        try:
+            summary = self.metadata.get(account_id)
+        except Exception as e:
+            print(f"加载令牌失败: {e}")
+            summary = None
+        if not summary:
             return {"exists": False}
         
-        return {
-            "exists": True,
-            "saved_at": token_data.get("saved_at", "未知"),
-            "has_callback": bool(token_data.get("callback_url")),
-            "has_auth_code": bool(token_data.get("auth_code"))
-        }
+        return {"exists": True, **summary}
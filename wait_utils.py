@@ -0,0 +1,119 @@
+"""
+暴雪战网账号切换器 - 事件驱动等待
+替代固定的time.sleep：等待进程真正退出、等待文件可以独占打开，
+带超时和退避，并记录每次等待实际花费的时间
+"""
+import os
+import sys
+import time
+from collections import deque
+
+import psutil
+
+
+# 最近的等待记录: {"name", "seconds", "ok"}
+wait_log = deque(maxlen=200)
+
+
+def _record(name: str, start: float, ok: bool) -> float:
+    seconds = time.perf_counter() - start
+    wait_log.append({"name": name, "seconds": seconds, "ok": ok})
+    return seconds
+
+
+def recent_waits(limit: int = 20) -> list:
+    """最近的等待记录（最新的在最后）"""
+    return list(wait_log)[-limit:]
+
+
+def wait_until(predicate, timeout: float = 5.0, name: str = "wait_until",
+               initial_delay: float = 0.01, max_delay: float = 0.25) -> bool:
+    """轮询直到predicate()为真，间隔按指数退避，超时返回False"""
+    start = time.perf_counter()
+    deadline = start + timeout
+    delay = initial_delay
+    while True:
+        try:
+            if predicate():
+                _record(name, start, True)
+                return True
+        except Exception:
+            pass
+        now = time.perf_counter()
+        if now >= deadline:
+            _record(name, start, False)
+            return False
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * 2, max_delay)
+
+
+def wait_for_processes(procs, timeout: float = 10.0, kill_after: bool = True,
+                       name: str = "wait_processes") -> bool:
+    """
+    等待进程退出（psutil.wait_procs），超时后可强制结束剩余进程
+
+    Returns:
+        bool: 所有进程是否都已退出
+    """
+    start = time.perf_counter()
+    procs = list(procs)
+    if not procs:
+        _record(name, start, True)
+        return True
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    if alive and kill_after:
+        for proc in alive:
+            try:
+                proc.kill()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        _, alive = psutil.wait_procs(alive, timeout=2)
+    ok = not alive
+    _record(name, start, ok)
+    return ok
+
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    _GENERIC_READ = 0x80000000
+    _GENERIC_WRITE = 0x40000000
+    _OPEN_EXISTING = 3
+    _INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+    _CreateFileW = ctypes.windll.kernel32.CreateFileW
+    _CreateFileW.restype = wintypes.HANDLE
+    _CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                             wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    _CloseHandle = ctypes.windll.kernel32.CloseHandle
+
+    def is_file_unlocked(path: str) -> bool:
+        """文件能否以不共享方式打开（没有其他进程占用）"""
+        if not os.path.exists(path):
+            return True
+        handle = _CreateFileW(path, _GENERIC_READ | _GENERIC_WRITE, 0, None, _OPEN_EXISTING, 0, None)
+        if handle == _INVALID_HANDLE_VALUE:
+            return False
+        _CloseHandle(handle)
+        return True
+else:
+    import fcntl
+
+    def is_file_unlocked(path: str) -> bool:
+        """文件能否获得独占锁（非Windows平台使用flock）"""
+        if not os.path.exists(path):
+            return True
+        try:
+            with open(path, 'rb+') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            return True
+        except OSError:
+            return False
+
+
+def wait_for_unlock(paths, timeout: float = 5.0, name: str = "wait_unlock") -> bool:
+    """等待所有文件都能独占打开"""
+    paths = [p for p in paths if p]
+    return wait_until(lambda: all(is_file_unlocked(p) for p in paths), timeout=timeout, name=name)